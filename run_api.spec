@@ -3,10 +3,17 @@
 
 a = Analysis(
     ['src\\interfaces\\api\\run_api.py'],
-    pathex=[],
+    pathex=['src'],
     binaries=[],
     datas=[('src/frontend/build', 'frontend/build'), ('vdb/models_text-embedding-004', 'vdb/models_text-embedding-004')],
-    hiddenimports=[],
+    # Servidores de produção (ver ProductionServer) e módulos que o gunicorn carrega pelo nome
+    hiddenimports=[
+        'interfaces.api.llm_controller',
+        'gunicorn.glogging',
+        'gunicorn.workers.sync',
+        'gunicorn.workers.gthread',
+        'waitress',
+    ],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
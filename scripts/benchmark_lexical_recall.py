@@ -0,0 +1,150 @@
+# scripts/benchmark_lexical_recall.py
+
+"""
+Benchmark de recall e latência do índice léxico (trigramas) e da fusão RRF com a busca vetorial.
+
+Cada consulta tem uma tabela esperada. Quando a tabela esperada não aparece no top-k da
+iteração 0, o loop do RAGService precisa de pelo menos mais uma rodada de verificação
+(resposta 1001 + embedding + busca), então 'iterações evitadas' conta as consultas que a
+fusão acerta e a busca vetorial sozinha erra.
+
+Uso:
+    # Latência e recall léxico em um catálogo sintético de 50 mil tabelas
+    python -m scripts.benchmark_lexical_recall --sintetico 50000
+
+    # Catálogo real (backend configurado no .env), comparando vetorial x léxico x fusão
+    python -m scripts.benchmark_lexical_recall --com-vetorial --consultas consultas.jsonl
+
+O arquivo de consultas é JSONL com {"consulta": "empenho", "esperada": "el_cpe_ex.ct_empenho"}.
+Sem ele, as consultas são derivadas do próprio catálogo removendo o prefixo ('ct_empenho' -> 'empenho').
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from typing import Any, Dict, List
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from infrastructure.vector_database.lexical_index import LexicalIndex
+
+PREFIXOS = ["ct", "cp", "el_cpe_ex", "tb", "rh", "pt", "cf"]
+PALAVRAS = [
+    "empenho", "contrato", "liquidacao", "pagamento", "orgao", "unidade", "fornecedor", "item",
+    "documento", "tipo", "receita", "despesa", "dotacao", "credor", "licitacao", "processo",
+    "servidor", "folha", "evento", "conta", "banco", "agencia", "programa", "acao", "fonte",
+    "exercicio", "natureza", "modalidade", "retencao", "anulacao", "estorno", "convenio", "obra",
+    "bem", "patrimonio", "veiculo", "cargo", "lotacao", "municipio", "entidade",
+]
+
+
+def catalogo_sintetico(quantidade: int, rng: random.Random) -> List[Dict[str, Any]]:
+    # Mesmo padrão dos nomes reais: prefixo do módulo + 1 a 4 palavras, distribuídos em 40 schemas.
+    # O vocabulário pequeno é um pior caso: cada palavra aparece em ~10% das tabelas.
+    nomes = set()
+    while len(nomes) < quantidade:
+        nomes.add("_".join(rng.sample(PALAVRAS, rng.randint(1, 4))))
+    return [
+        {"table_name": f"schema_{rng.randint(0, 39)}.{rng.choice(PREFIXOS)}_{nome}", "content": ""}
+        for nome in sorted(nomes)
+    ]
+
+
+def consultas_derivadas(tabelas: List[Dict[str, Any]], quantidade: int, rng: random.Random) -> List[Dict[str, str]]:
+    amostra = rng.sample(tabelas, min(quantidade, len(tabelas)))
+    consultas = []
+    for tabela in amostra:
+        palavras = tabela["table_name"].split(".", 1)[-1].split("_")
+        # Remove prefixos curtos de módulo ('ct_', 'cp_', 'el_cpe_ex_'), mantendo ao menos uma palavra
+        while len(palavras) > 1 and len(palavras[0]) <= 3:
+            palavras = palavras[1:]
+        consultas.append({"consulta": " ".join(palavras), "esperada": tabela["table_name"]})
+    return consultas
+
+
+def posicao(ranking: List[str], esperada: str) -> int:
+    return ranking.index(esperada) + 1 if esperada in ranking else 0
+
+
+def resumo(nome: str, posicoes: List[int], k: int) -> str:
+    total = len(posicoes) or 1
+    top1 = sum(1 for p in posicoes if p == 1) / total
+    topk = sum(1 for p in posicoes if p) / total
+    return f"{nome:<10} recall@1={top1:6.1%}  recall@{k}={topk:6.1%}"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sintetico", type=int, default=0, help="Usa um catálogo sintético com N tabelas")
+    parser.add_argument("--consultas", help="Arquivo JSONL com consultas rotuladas")
+    parser.add_argument("--amostras", type=int, default=500, help="Consultas derivadas quando não há arquivo")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--com-vetorial", action="store_true", help="Compara com a busca vetorial (usa a API de embeddings)")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    if args.sintetico:
+        tabelas = catalogo_sintetico(args.sintetico, rng)
+    else:
+        from infrastructure.persistence.schema_catalog import SchemaCatalog
+        tabelas = SchemaCatalog.get_tables()
+    if not tabelas:
+        sys.exit("Catálogo vazio: verifique o backend de busca ou use --sintetico N.")
+
+    if args.consultas:
+        with open(args.consultas, encoding="utf-8") as f:
+            consultas = [json.loads(linha) for linha in f if linha.strip()]
+    else:
+        consultas = consultas_derivadas(tabelas, args.amostras, rng)
+
+    inicio = time.perf_counter()
+    indice = LexicalIndex(tabelas)
+    print(f"Índice léxico: {len(indice)} tabelas construído em {(time.perf_counter() - inicio) * 1000:.0f} ms")
+
+    latencias = []
+    rankings_lexicos = []
+    for consulta in consultas:
+        inicio = time.perf_counter()
+        resultado = indice.search(consulta["consulta"], k=args.k)
+        latencias.append((time.perf_counter() - inicio) * 1000)
+        rankings_lexicos.append([t["table_name"] for t, _ in resultado])
+
+    latencias.sort()
+    p99 = latencias[min(len(latencias) - 1, int(len(latencias) * 0.99))]
+    print(f"Latência léxica: p50={statistics.median(latencias):.3f} ms  p99={p99:.3f} ms  ({len(consultas)} consultas)")
+    posicoes_lexicas = [posicao(r, c["esperada"]) for r, c in zip(rankings_lexicos, consultas)]
+    print(resumo("léxico", posicoes_lexicas, args.k))
+
+    if not args.com_vetorial:
+        return
+
+    from infrastructure.external_services.embedding_service import EmbeddingService
+    from infrastructure.vector_database.search_service import SearchService
+
+    nomes = [c["consulta"] for c in consultas]
+    embeddings = EmbeddingService.embed_texts(nomes)
+    if embeddings is None:
+        sys.exit("Falha ao gerar embeddings para as consultas.")
+    resultados_vetoriais = SearchService._get_search_backend().find_top_similar_tables(embeddings, nomes, k=args.k)
+
+    posicoes_vetoriais, posicoes_fundidas = [], []
+    for consulta, resultado, ranking_lexico in zip(consultas, resultados_vetoriais, rankings_lexicos):
+        matches_vetoriais = resultado.get("matches", [])
+        matches_lexicos = [{"table_name": nome} for nome in ranking_lexico]
+        fundidos = SearchService.fuse_rankings({"vetorial": matches_vetoriais, "lexical": matches_lexicos}, args.k)
+        posicoes_vetoriais.append(posicao([m["table_name"] for m in matches_vetoriais], consulta["esperada"]))
+        posicoes_fundidas.append(posicao([m["table_name"] for m in fundidos], consulta["esperada"]))
+
+    print(resumo("vetorial", posicoes_vetoriais, args.k))
+    print(resumo("fusão RRF", posicoes_fundidas, args.k))
+    evitadas = sum(1 for v, f in zip(posicoes_vetoriais, posicoes_fundidas) if not v and f)
+    perdidas = sum(1 for v, f in zip(posicoes_vetoriais, posicoes_fundidas) if v and not f)
+    print(f"Iterações de verificação evitadas (erro vetorial -> acerto na fusão): {evitadas}; pioras: {perdidas}")
+
+
+if __name__ == "__main__":
+    main()
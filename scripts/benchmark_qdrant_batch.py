@@ -0,0 +1,96 @@
+# scripts/benchmark_qdrant_batch.py
+
+"""
+Benchmark: busca por consulta (uma requisição por tabela) vs. busca em lote
+(uma requisição para todas as tabelas) no QdrantSearchService.
+
+Requer uma instância local do Qdrant, por exemplo:
+    docker run -p 6333:6333 qdrant/qdrant
+
+Uso:
+    python -m scripts.benchmark_qdrant_batch --url http://localhost:6333 --max-queries 20 --repeticoes 15
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from qdrant_client import QdrantClient, models
+from infrastructure.vector_database.qdrant_search_service import QdrantSearchService
+
+COLECAO_BENCHMARK = "benchmark_busca_lote"
+
+
+def _vetores_normalizados(quantidade: int, dimensao: int, rng: np.random.Generator) -> np.ndarray:
+    vetores = rng.standard_normal((quantidade, dimensao)).astype(np.float32)
+    return vetores / np.linalg.norm(vetores, axis=1, keepdims=True)
+
+
+def preparar_colecao(client: QdrantClient, total_tabelas: int, dimensao: int, rng: np.random.Generator) -> None:
+    if client.collection_exists(COLECAO_BENCHMARK):
+        client.delete_collection(COLECAO_BENCHMARK)
+    client.create_collection(
+        collection_name=COLECAO_BENCHMARK,
+        vectors_config=models.VectorParams(size=dimensao, distance=models.Distance.COSINE)
+    )
+    vetores = _vetores_normalizados(total_tabelas, dimensao, rng)
+    for inicio in range(0, total_tabelas, 500):
+        client.upsert(
+            collection_name=COLECAO_BENCHMARK,
+            points=[
+                models.PointStruct(
+                    id=i,
+                    vector=vetores[i].tolist(),
+                    payload={"schema": "bench", "name": f"tabela_{i}", "content": f"bench;tabela_{i};desc;id;PK:id"}
+                )
+                for i in range(inicio, min(inicio + 500, total_tabelas))
+            ]
+        )
+
+
+def medir(servico: QdrantSearchService, consultas: np.ndarray, nomes, batch: bool, repeticoes: int) -> float:
+    latencias = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        servico.find_top_similar_tables(consultas, nomes, k=5, batch=batch)
+        latencias.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(latencias)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=os.getenv("QDRANT_BENCH_URL", "http://localhost:6333"),
+                        help="URL do Qdrant local (ou ':memory:' para um teste rápido sem servidor)")
+    parser.add_argument("--tabelas", type=int, default=5000, help="Quantidade de pontos na coleção de teste")
+    parser.add_argument("--dimensao", type=int, default=768)
+    parser.add_argument("--max-queries", type=int, default=20)
+    parser.add_argument("--repeticoes", type=int, default=15)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    client = QdrantClient(location=args.url)
+    preparar_colecao(client, args.tabelas, args.dimensao, rng)
+    servico = QdrantSearchService(collection_name=COLECAO_BENCHMARK, client=client)
+
+    # Aquecimento da conexão HTTP
+    medir(servico, _vetores_normalizados(1, args.dimensao, rng), ["aquecimento"], batch=True, repeticoes=3)
+
+    print(f"{'N':>3} | {'por consulta (ms)':>18} | {'em lote (ms)':>13} | {'ganho':>6}")
+    print("-" * 50)
+    for n in range(1, args.max_queries + 1):
+        consultas = _vetores_normalizados(n, args.dimensao, rng)
+        nomes = [f"consulta_{i}" for i in range(n)]
+        por_consulta = medir(servico, consultas, nomes, batch=False, repeticoes=args.repeticoes)
+        em_lote = medir(servico, consultas, nomes, batch=True, repeticoes=args.repeticoes)
+        print(f"{n:>3} | {por_consulta:>18.2f} | {em_lote:>13.2f} | {por_consulta / em_lote:>5.1f}x")
+
+    client.delete_collection(COLECAO_BENCHMARK)
+
+
+if __name__ == "__main__":
+    main()
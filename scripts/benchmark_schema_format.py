@@ -0,0 +1,106 @@
+# scripts/benchmark_schema_format.py
+
+"""
+Comparação de tokens entre o chunk bruto e o formato compacto (compact_schema) em todo o catálogo.
+
+A contagem padrão é a estimativa usada pelo ContextPacker (~4 caracteres por token). Com
+--gemini N, uma amostra de N chunks também é contada pela API (count_tokens do modelo de
+resposta final), para conferir a estimativa com o tokenizador real.
+
+Uso:
+    # Catálogo real (backend configurado no .env)
+    python -m scripts.benchmark_schema_format
+
+    # Catálogo sintético, com contagem real em 50 chunks
+    python -m scripts.benchmark_schema_format --sintetico 20000 --gemini 50
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+from typing import Any, Dict, List
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from shared.utils.request_budget import estimate_tokens
+from shared.utils.schema_chunk_serializer import LEGENDA_FORMATO_COMPACTO, compact_schema
+
+SCHEMAS = ["el_cpe_ex", "el_cpe_base", "el_compras", "el_rh", "el_patrimonio"]
+PALAVRAS = [
+    "empenho", "contrato", "liquidacao", "pagamento", "orgao", "unidade", "fornecedor", "item",
+    "documento", "receita", "despesa", "dotacao", "credor", "licitacao", "processo", "servidor",
+]
+
+
+def catalogo_sintetico(quantidade: int, rng: random.Random) -> List[Dict[str, Any]]:
+    # Chunks no formato real: colunas, PK, FKs de saída/entrada (metade no mesmo schema) e índices
+    nomes = [f"{rng.choice(SCHEMAS)}.ct_{'_'.join(rng.sample(PALAVRAS, rng.randint(1, 3)))}_{i}" for i in range(quantidade)]
+    tabelas = []
+    for nome in nomes:
+        schema, tabela = nome.split(".", 1)
+        colunas = ["id"] + [f"{rng.choice(['id', 'vl', 'dt', 'nr', 'ds', 'fl'])}_{rng.choice(PALAVRAS)}" for _ in range(rng.randint(3, 15))]
+        partes = [schema, tabela, f"Tabela de {tabela.replace('_', ' ')}"] + colunas + ["PK:id"]
+        for _ in range(rng.randint(0, 4)):
+            partes.append(f"FK:{rng.choice(colunas)}>{rng.choice(nomes)}(id)[DIR:OUTGOING]")
+        for _ in range(rng.randint(0, 6)):
+            partes.append(f"FK:id<{rng.choice(nomes)}(id_{tabela[3:13]})[DIR:INCOMING]")
+        for coluna in rng.sample(colunas, rng.randint(0, 3)):
+            partes.append(f"IDX:ix_{tabela[:20]}_{coluna}({coluna})")
+        tabelas.append({"table_name": nome, "content": ";".join(partes)})
+    return tabelas
+
+
+def percentil(valores: List[float], p: float) -> float:
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p))]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sintetico", type=int, default=0, help="Usa um catálogo sintético com N tabelas")
+    parser.add_argument("--gemini", type=int, default=0, help="Conta N chunks amostrados com o tokenizador do Gemini")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    if args.sintetico:
+        tabelas = catalogo_sintetico(args.sintetico, rng)
+    else:
+        from infrastructure.persistence.schema_catalog import SchemaCatalog
+        tabelas = SchemaCatalog.get_tables()
+    tabelas = [t for t in tabelas if t.get("content")]
+    if not tabelas:
+        sys.exit("Catálogo vazio: verifique o backend de busca ou use --sintetico N.")
+
+    brutos, compactos, reducoes = [], [], []
+    for tabela in tabelas:
+        bruto = estimate_tokens(tabela["content"])
+        compacto = estimate_tokens(compact_schema(tabela["content"], nome=tabela["table_name"]))
+        brutos.append(bruto)
+        compactos.append(compacto)
+        reducoes.append(1 - compacto / bruto)
+
+    total_bruto, total_compacto = sum(brutos), sum(compactos)
+    print(f"Chunks: {len(tabelas)}  (legenda do formato compacto: {estimate_tokens(LEGENDA_FORMATO_COMPACTO)} tokens por prompt)")
+    print(f"Tokens estimados  bruto={total_bruto}  compacto={total_compacto}  redução={1 - total_compacto / total_bruto:.1%}")
+    print(f"Por chunk (bruto)    p50={statistics.median(brutos):.0f}  p95={percentil(brutos, 0.95):.0f}")
+    print(f"Por chunk (compacto) p50={statistics.median(compactos):.0f}  p95={percentil(compactos, 0.95):.0f}")
+    print(f"Redução por chunk    p50={statistics.median(reducoes):.1%}  p5={percentil(reducoes, 0.05):.1%}")
+
+    if not args.gemini:
+        return
+
+    from config.api.api_config import GeminiConfig
+    from infrastructure.external_services.llm_service import LLMService
+    modelo = GeminiConfig.get_client().GenerativeModel(LLMService.MODELOS["forte"])
+    amostra = rng.sample(tabelas, min(args.gemini, len(tabelas)))
+    real_bruto = sum(modelo.count_tokens(t["content"]).total_tokens for t in amostra)
+    real_compacto = sum(modelo.count_tokens(compact_schema(t["content"], nome=t["table_name"])).total_tokens for t in amostra)
+    estimado_bruto = sum(estimate_tokens(t["content"]) for t in amostra)
+    print(f"Gemini ({len(amostra)} chunks)  bruto={real_bruto}  compacto={real_compacto}  redução={1 - real_compacto / real_bruto:.1%}")
+    print(f"Erro da estimativa no formato bruto: {estimado_bruto / real_bruto - 1:+.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,320 @@
+# src/application/services/job_service.py
+
+import asyncio
+import hashlib
+import json
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple, TypeVar
+
+from application.services.rag_service import RAGService
+from infrastructure.persistence.job_store import (
+    JobStore, STATUS_CANCELADO, STATUS_CONCLUIDO, STATUS_EXECUTANDO, STATUS_FALHOU, STATUS_PENDENTE
+)
+from infrastructure.persistence.semantic_response_cache import SemanticResponseCache
+from shared.utils.async_runner import AsyncRunner
+from shared.utils.request_budget import RequestBudget
+from config.core.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+T = TypeVar("T")
+
+
+class JobService:
+    """
+    Fila de jobs para gerações longas: o cliente submete o prompt, recebe o id do job e
+    acompanha o status (consulta ou stream) sem segurar uma thread do servidor web.
+
+    Os jobs ficam no JobStore (SQLite) e são executados por JOB_WORKERS corrotinas no loop do
+    AsyncRunner, cada pipeline em sua própria tarefa para poder ser cancelado. Um prompt
+    repetido com os mesmos parâmetros (ou a mesma chave de idempotência) enquanto o job
+    anterior está ativo, ou com resultado ainda válido, devolve o mesmo job: o cliente que
+    refaz a requisição se reconecta a ele em vez de iniciar outro pipeline.
+
+    Um monitor periódico renova o `atualizado_em` dos jobs deste processo, atende pedidos de
+    cancelamento feitos por outros processos, marca como falhos os jobs de processos
+    encerrados e apaga os resultados expirados (JOB_RESULT_TTL_SECONDS).
+
+    Os workers e o monitor nunca acessam o SQLite no loop: as chamadas ao JobStore (que podem
+    esperar até o timeout de lock do banco quando outro processo está gravando) vão para uma
+    thread dedicada, e o loop segue atendendo os pipelines e streams enquanto isso.
+    """
+    WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+    MAX_PENDENTES = int(os.getenv("JOB_MAX_PENDING", "1000"))
+    TTL_SEGUNDOS = float(os.getenv("JOB_RESULT_TTL_SECONDS", "3600"))
+    INTERVALO_MONITOR_SEGUNDOS = float(os.getenv("JOB_HEARTBEAT_SECONDS", "5"))
+    LIMITE_ABANDONO_SEGUNDOS = float(os.getenv("JOB_STALE_SECONDS", "60"))
+    _STORE_PATH = os.getenv("JOB_STORE_PATH", os.path.join("cache", "jobs.sqlite3"))
+
+    _store: Optional[JobStore] = None
+    _store_lock = threading.Lock()
+    # Uma thread só: as operações do loop no banco ficam em ordem e não ocupam o executor padrão
+    _executor_store = ThreadPoolExecutor(max_workers=1, thread_name_prefix="job-store")
+
+    # Estado do processo: a fila e as tarefas vivem no loop do AsyncRunner; o histórico de
+    # eventos e os assinantes são acessados também pelas threads do servidor web
+    _fila: Optional[asyncio.Queue] = None
+    _tarefas: Dict[str, asyncio.Task] = {}
+    _lock = threading.Lock()
+    _na_fila: Set[str] = set()
+    _historico: Dict[str, List[Dict[str, Any]]] = {}
+    _assinantes: Dict[str, List["queue.Queue"]] = {}
+    _stats: Dict[str, int] = {"submetidos": 0, "reaproveitados": 0, "rejeitados": 0, "concluidos": 0, "falhos": 0, "cancelados": 0}
+
+    @staticmethod
+    def get_store() -> JobStore:
+        """
+        Retorna o armazenamento de jobs do processo, criando-o na primeira chamada.
+        """
+        if JobService._store is None:
+            with JobService._store_lock:
+                if JobService._store is None:
+                    JobService._store = JobStore(JobService._STORE_PATH)
+        return JobService._store
+
+    @staticmethod
+    def set_store(store: JobStore) -> None:
+        """
+        Substitui o armazenamento de jobs (ex.: banco temporário nos testes).
+        """
+        with JobService._store_lock:
+            JobService._store = store
+
+    @staticmethod
+    async def _no_store(operacao: Callable[[JobStore], T]) -> T:
+        """
+        Executa `operacao(store)` na thread do JobStore, fora do loop de eventos.
+        """
+        return await asyncio.get_running_loop().run_in_executor(
+            JobService._executor_store, lambda: operacao(JobService.get_store())
+        )
+
+    @staticmethod
+    def chave_padrao(prompt: str, parametros: Dict[str, Any]) -> str:
+        """
+        Chave de idempotência de (prompt normalizado, parâmetros).
+        """
+        conteudo = json.dumps([SemanticResponseCache.normalizar_prompt(prompt), parametros], ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(conteudo.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _publico(job: Dict[str, Any]) -> Dict[str, Any]:
+        return {campo: valor for campo, valor in job.items() if campo not in ("chave", "atualizado_em")}
+
+    @staticmethod
+    def submit(prompt: str, parametros: Optional[Dict[str, Any]] = None, chave: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Submete um prompt. `parametros` aceita 'incluir_timings', 'orcamento' (formato do campo
+        da requisição) e 'usar_cache'.
+
+        Returns:
+            {"sucesso": True, "job": {...}, "reaproveitado": bool}, ou {"sucesso": False, "erro"}
+            quando a fila do processo está cheia.
+        """
+        parametros = parametros or {}
+        chave = chave or JobService.chave_padrao(prompt, parametros)
+        store = JobService.get_store()
+
+        existente = store.get_by_key(chave)
+        if existente is None:
+            with JobService._lock:
+                if len(JobService._na_fila) >= JobService.MAX_PENDENTES:
+                    JobService._stats["rejeitados"] += 1
+                    logger.warning(f"\n[Job Service] Fila cheia ({JobService.MAX_PENDENTES} jobs pendentes). Job rejeitado.")
+                    return {"sucesso": False, "erro": "Fila de jobs cheia. Tente novamente em instantes."}
+            job = store.create(prompt, parametros, chave)
+        else:
+            job = existente
+
+        with JobService._lock:
+            if job["reaproveitado"]:
+                JobService._stats["reaproveitados"] += 1
+            else:
+                JobService._stats["submetidos"] += 1
+                JobService._na_fila.add(job["id"])
+                JobService._historico[job["id"]] = [{"tipo": "status", "status": STATUS_PENDENTE}]
+
+        if job["reaproveitado"]:
+            logger.info(f"\n[Job Service] Prompt já submetido; reaproveitando o job {job['id']} ({job['status']}).")
+        else:
+            logger.info(f"\n[Job Service] Job {job['id']} criado para o prompt: '{prompt[:100]}...'")
+            AsyncRunner.submit(JobService._enfileirar(job["id"], prompt, parametros))
+        return {"sucesso": True, "job": JobService._publico(job), "reaproveitado": job["reaproveitado"]}
+
+    @staticmethod
+    def get(job_id: str) -> Optional[Dict[str, Any]]:
+        job = JobService.get_store().get(job_id)
+        return JobService._publico(job) if job is not None else None
+
+    @staticmethod
+    def cancel(job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Cancela um job ativo. Um job pendente é finalizado na hora; um job em execução é
+        interrompido pelo processo que o executa (este, ou outro no próximo ciclo do monitor).
+        Devolve o job (None se não existe); um job já finalizado volta inalterado.
+        """
+        store = JobService.get_store()
+        job = store.request_cancel(job_id)
+        if job is None:
+            return None
+        if job["status"] == STATUS_PENDENTE:
+            store.finish(job_id, STATUS_CANCELADO, JobService.TTL_SEGUNDOS, erro="Job cancelado.")
+            with JobService._lock:
+                local = job_id in JobService._na_fila
+                JobService._na_fila.discard(job_id)
+                if local:
+                    JobService._stats["cancelados"] += 1
+            if local:
+                JobService._encerrar(job_id, STATUS_CANCELADO)
+        elif job["status"] == STATUS_EXECUTANDO:
+            AsyncRunner.get_loop().call_soon_threadsafe(JobService._cancelar_tarefa, job_id)
+        logger.info(f"\n[Job Service] Cancelamento solicitado para o job {job_id} ({job['status']}).")
+        return JobService.get(job_id)
+
+    @staticmethod
+    def subscribe(job_id: str) -> Optional[Tuple[List[Dict[str, Any]], "queue.Queue"]]:
+        """
+        Assina os eventos de um job ativo deste processo: devolve (eventos já emitidos, fila dos
+        próximos), terminando com {"tipo": "fim"}. None se o job não está ativo neste processo
+        (já finalizado ou executado por outro worker): nesse caso acompanhe pelo JobStore.
+        """
+        with JobService._lock:
+            historico = JobService._historico.get(job_id)
+            if historico is None:
+                return None
+            eventos: "queue.Queue" = queue.Queue()
+            JobService._assinantes.setdefault(job_id, []).append(eventos)
+            return list(historico), eventos
+
+    @staticmethod
+    def unsubscribe(job_id: str, eventos: "queue.Queue") -> None:
+        with JobService._lock:
+            assinantes = JobService._assinantes.get(job_id, [])
+            if eventos in assinantes:
+                assinantes.remove(eventos)
+
+    @staticmethod
+    def _publicar(job_id: str, evento: Dict[str, Any]) -> None:
+        # Chamado no loop do AsyncRunner (notificar do pipeline); rápido e thread-safe
+        with JobService._lock:
+            historico = JobService._historico.get(job_id)
+            if historico is None:
+                return
+            historico.append(evento)
+            for eventos in JobService._assinantes.get(job_id, []):
+                eventos.put(evento)
+
+    @staticmethod
+    def _encerrar(job_id: str, status: str) -> None:
+        """
+        Avisa os assinantes do fim do job e descarta o histórico: daqui em diante o job é lido do JobStore.
+        """
+        with JobService._lock:
+            JobService._historico.pop(job_id, None)
+            for eventos in JobService._assinantes.pop(job_id, []):
+                eventos.put({"tipo": "fim", "status": status})
+
+    @staticmethod
+    def _cancelar_tarefa(job_id: str) -> None:
+        tarefa = JobService._tarefas.get(job_id)
+        if tarefa is not None and not tarefa.done():
+            tarefa.cancel()
+
+    @staticmethod
+    async def _enfileirar(job_id: str, prompt: str, parametros: Dict[str, Any]) -> None:
+        # Roda no loop do AsyncRunner: a fila, os workers e o monitor são criados na primeira vez
+        if JobService._fila is None:
+            JobService._fila = asyncio.Queue()
+            for indice in range(max(1, JobService.WORKERS)):
+                asyncio.create_task(JobService._worker(indice))
+            asyncio.create_task(JobService._monitor())
+            logger.info(f"\n[Job Service] {max(1, JobService.WORKERS)} workers iniciados.")
+        JobService._fila.put_nowait((job_id, prompt, parametros))
+
+    @staticmethod
+    async def _worker(indice: int) -> None:
+        while True:
+            job_id, prompt, parametros = await JobService._fila.get()
+            with JobService._lock:
+                if job_id not in JobService._na_fila:
+                    # Cancelado enquanto aguardava
+                    continue
+                JobService._na_fila.discard(job_id)
+            if not await JobService._no_store(lambda store: store.mark_running(job_id)):
+                await JobService._no_store(lambda store: store.finish(job_id, STATUS_CANCELADO, JobService.TTL_SEGUNDOS, erro="Job cancelado."))
+                JobService._encerrar(job_id, STATUS_CANCELADO)
+                continue
+
+            JobService._publicar(job_id, {"tipo": "status", "status": STATUS_EXECUTANDO})
+            tarefa = asyncio.create_task(JobService._executar(job_id, prompt, parametros))
+            JobService._tarefas[job_id] = tarefa
+            # wait (e não await) para que o cancelamento do pipeline não interrompa o worker
+            await asyncio.wait([tarefa])
+            JobService._tarefas.pop(job_id, None)
+
+            resultado, erro = None, None
+            if tarefa.cancelled():
+                status, erro = STATUS_CANCELADO, "Job cancelado."
+            elif tarefa.exception() is not None:
+                status, erro = STATUS_FALHOU, f"Erro ao processar o prompt: {tarefa.exception()}"
+                logger.error(f"\n[Job Service] Job {job_id} falhou no worker {indice}: {tarefa.exception()}")
+            else:
+                resultado = tarefa.result()
+                status = STATUS_CONCLUIDO if resultado.get("sucesso") else STATUS_FALHOU
+                erro = resultado.get("erro")
+            await JobService._no_store(lambda store: store.finish(job_id, status, JobService.TTL_SEGUNDOS, resultado=resultado, erro=erro))
+            with JobService._lock:
+                campo = {STATUS_CONCLUIDO: "concluidos", STATUS_FALHOU: "falhos", STATUS_CANCELADO: "cancelados"}[status]
+                JobService._stats[campo] += 1
+            logger.info(f"\n[Job Service] Job {job_id} finalizado: {status}.")
+            JobService._encerrar(job_id, status)
+
+    @staticmethod
+    async def _executar(job_id: str, prompt: str, parametros: Dict[str, Any]) -> Dict[str, Any]:
+        return await RAGService.generate_sql_from_prompt_async(
+            prompt,
+            notificar=lambda evento: JobService._publicar(job_id, evento),
+            incluir_timings=bool(parametros.get("incluir_timings")),
+            orcamento=RequestBudget.from_dict(parametros.get("orcamento")),
+            usar_cache=parametros.get("usar_cache", True) is not False
+        )
+
+    @staticmethod
+    async def _monitor() -> None:
+        while True:
+            await asyncio.sleep(JobService.INTERVALO_MONITOR_SEGUNDOS)
+            try:
+                with JobService._lock:
+                    ativos = list(JobService._na_fila) + list(JobService._tarefas)
+                executando = list(JobService._tarefas)
+
+                def manutencao(store: JobStore) -> Tuple[List[str], int]:
+                    store.heartbeat(ativos)
+                    cancelados = store.cancel_requested(executando)
+                    abandonados = store.mark_abandoned(JobService.LIMITE_ABANDONO_SEGUNDOS, JobService.TTL_SEGUNDOS)
+                    store.purge_expired()
+                    return cancelados, abandonados
+
+                cancelados, abandonados = await JobService._no_store(manutencao)
+                for job_id in cancelados:
+                    JobService._cancelar_tarefa(job_id)
+                if abandonados:
+                    logger.warning(f"\n[Job Service] {abandonados} jobs abandonados por processos encerrados marcados como falhos.")
+            except Exception as e:
+                logger.error(f"\n[Job Service] Falha no monitor de jobs: {e}", exc_info=True)
+
+    @staticmethod
+    def get_stats() -> Dict[str, Any]:
+        with JobService._lock:
+            stats = {
+                **JobService._stats,
+                "workers": max(1, JobService.WORKERS),
+                "na_fila": len(JobService._na_fila),
+                "executando": len(JobService._tarefas),
+            }
+        if JobService._store is not None:
+            stats["por_status"] = JobService._store.count_by_status()
+        return stats
@@ -0,0 +1,179 @@
+# src/application/services/maestro/context_packer.py
+
+import os
+from typing import Any, Dict, List, Set
+
+from shared.utils.schema_chunk_parser import parse_foreign_key
+from shared.utils.request_budget import estimate_tokens
+from shared.utils.schema_chunk_serializer import LEGENDA_FORMATO_COMPACTO, compact_schema
+from config.core.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# Níveis de compactação de um chunk, do completo ao mínimo
+NIVEL_COMPLETO = 0
+NIVEL_SEM_INDICES = 1       # remove as partes 'IDX:'
+NIVEL_FKS_INTERNAS = 2      # mantém apenas as FKs entre tabelas do próprio contexto
+NIVEL_MINIMO = 3            # schema, tabela, descrição, PK e FKs internas (sem a lista de colunas)
+
+
+class ContextPacker:
+    """
+    Monta a seção de chunks dos prompts de verificação e de resposta final dentro de um
+    orçamento de tokens.
+
+    Os chunks são deduplicados pelo nome qualificado e ordenados por valor: similaridade da
+    busca mais a centralidade no grafo de FKs do próprio contexto (tabelas que ligam várias
+    outras são as que tornam os JOINs possíveis). Se o total passa do orçamento, os chunks
+    de menor valor são compactados primeiro (índices, depois FKs para fora do contexto,
+    depois a lista de colunas) e, em último caso, omitidos.
+
+    Com SCHEMA_PROMPT_FORMAT=compacto (padrão) os chunks vão para o prompt no formato denso
+    de `compact_schema`, precedidos de uma legenda; 'bruto' mantém o texto original.
+    """
+    ENABLED = os.getenv("CONTEXT_PACKING", "1") != "0"
+    VERIFY_TOKENS = int(os.getenv("CONTEXT_VERIFY_TOKENS", "12000"))
+    FINAL_TOKENS = int(os.getenv("CONTEXT_FINAL_TOKENS", "24000"))
+    PESO_CENTRALIDADE = float(os.getenv("CONTEXT_FK_CENTRALITY_WEIGHT", "0.3"))
+    FORMATO = os.getenv("SCHEMA_PROMPT_FORMAT", "compacto")
+
+    @staticmethod
+    def _itens(resultados: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Aceita resultados de busca ({"query_table", "matches"}) e a lista acumulada de matches,
+        e devolve um match por tabela (o de maior similaridade), na ordem de primeira aparição.
+        """
+        por_nome: Dict[str, Dict[str, Any]] = {}
+        for resultado in resultados or []:
+            matches = resultado.get("matches") if "matches" in resultado else [resultado]
+            for match in matches or []:
+                nome = match.get("table_name", "")
+                if not nome:
+                    continue
+                chave = nome.strip().lower()
+                atual = por_nome.get(chave)
+                if atual is None or ContextPacker._similaridade(match) > ContextPacker._similaridade(atual):
+                    por_nome[chave] = match
+        return list(por_nome.values())
+
+    @staticmethod
+    def _similaridade(match: Dict[str, Any]) -> float:
+        if "similarity_percentage" in match:
+            return float(match.get("similarity_percentage") or 0.0) / 100.0
+        return float(match.get("similarity_score") or 0.0)
+
+    @staticmethod
+    def _centralidade(itens: List[Dict[str, Any]]) -> Dict[str, float]:
+        """
+        Grau de cada tabela no subgrafo de FKs induzido pelo contexto, normalizado em [0, 1].
+        As ligações vêm dos próprios chunks (FKs de saída e de entrada).
+        """
+        nomes = {item["table_name"].lower() for item in itens}
+        vizinhos: Dict[str, Set[str]] = {nome: set() for nome in nomes}
+        for item in itens:
+            origem = item["table_name"].lower()
+            for parte in item.get("content", "").split(";"):
+                if not parte.strip().startswith("FK:"):
+                    continue
+                foreign_key = parse_foreign_key(parte)
+                if foreign_key is None:
+                    continue
+                destino = foreign_key.tabela_relacionada.lower()
+                if destino in nomes and destino != origem:
+                    vizinhos[origem].add(destino)
+                    vizinhos[destino].add(origem)
+        maior_grau = max((len(v) for v in vizinhos.values()), default=0)
+        if maior_grau == 0:
+            return {nome: 0.0 for nome in nomes}
+        return {nome: len(v) / maior_grau for nome, v in vizinhos.items()}
+
+    @staticmethod
+    def compact_chunk(conteudo: str, nivel: int, tabelas_contexto: Set[str]) -> str:
+        """
+        Remove partes do chunk conforme o nível (ver NIVEL_*). `tabelas_contexto` são os nomes
+        qualificados (minúsculos) das tabelas que estarão no prompt.
+        """
+        if nivel <= NIVEL_COMPLETO:
+            return conteudo
+        mantidas = []
+        for indice, parte in enumerate(conteudo.split(";")):
+            texto = parte.strip()
+            if texto.startswith("IDX:"):
+                continue
+            if texto.startswith("FK:") and nivel >= NIVEL_FKS_INTERNAS:
+                foreign_key = parse_foreign_key(texto)
+                if foreign_key is None or foreign_key.tabela_relacionada.lower() not in tabelas_contexto:
+                    continue
+            # Posições 0-2 são schema, tabela e descrição; o restante sem prefixo são colunas
+            if nivel >= NIVEL_MINIMO and indice > 2 and not texto.startswith(("PK:", "FK:")):
+                continue
+            mantidas.append(parte)
+        return ";".join(mantidas)
+
+    @staticmethod
+    def _formatar(item: Dict[str, Any], conteudo: str) -> str:
+        similaridade = item.get("similarity_percentage", 0) or 0
+        if ContextPacker.FORMATO == "compacto":
+            return compact_schema(conteudo, nome=item.get("table_name") or None, anotacao=f"({similaridade:.0f}%)")
+        return f"Tabela: {item.get('table_name', '')} (Similaridade: {similaridade:.2f}%)\nConteúdo: {conteudo}\n"
+
+    @staticmethod
+    def _legenda(itens: List[Dict[str, Any]]) -> str:
+        return LEGENDA_FORMATO_COMPACTO if itens and ContextPacker.FORMATO == "compacto" else ""
+
+    @staticmethod
+    def pack(resultados: List[Dict[str, Any]], max_tokens: int) -> Dict[str, Any]:
+        """
+        Empacota os chunks em até `max_tokens` tokens estimados.
+
+        Returns:
+            Dict com 'texto' (seção pronta para o prompt), 'tabelas' (incluídas, por valor),
+            'compactadas', 'omitidas' e 'tokens_estimados'.
+        """
+        itens = ContextPacker._itens(resultados)
+        legenda = ContextPacker._legenda(itens)
+        if not ContextPacker.ENABLED:
+            texto = legenda + "".join(ContextPacker._formatar(item, item.get("content", "")) for item in itens)
+            return {"texto": texto, "tabelas": [i["table_name"] for i in itens], "compactadas": [], "omitidas": [], "tokens_estimados": estimate_tokens(texto)}
+
+        centralidade = ContextPacker._centralidade(itens)
+        itens.sort(
+            key=lambda item: ContextPacker._similaridade(item) + ContextPacker.PESO_CENTRALIDADE * centralidade[item["table_name"].lower()],
+            reverse=True
+        )
+
+        tabelas_contexto = {item["table_name"].lower() for item in itens}
+        niveis = [NIVEL_COMPLETO] * len(itens)
+        custos = [estimate_tokens(ContextPacker._formatar(item, item.get("content", ""))) for item in itens]
+        total = estimate_tokens(legenda) + sum(custos)
+
+        # Compacta do menos ao mais valioso, um nível por vez, até caber
+        for nivel in (NIVEL_SEM_INDICES, NIVEL_FKS_INTERNAS, NIVEL_MINIMO):
+            for posicao in range(len(itens) - 1, -1, -1):
+                if total <= max_tokens:
+                    break
+                conteudo = ContextPacker.compact_chunk(itens[posicao].get("content", ""), nivel, tabelas_contexto)
+                novo_custo = estimate_tokens(ContextPacker._formatar(itens[posicao], conteudo))
+                total += novo_custo - custos[posicao]
+                custos[posicao], niveis[posicao] = novo_custo, nivel
+
+        # Ainda acima do orçamento: omite os de menor valor, mantendo sempre o primeiro
+        incluidos = len(itens)
+        while total > max_tokens and incluidos > 1:
+            incluidos -= 1
+            total -= custos[incluidos]
+
+        texto = legenda + "".join(
+            ContextPacker._formatar(item, ContextPacker.compact_chunk(item.get("content", ""), niveis[posicao], tabelas_contexto))
+            for posicao, item in enumerate(itens[:incluidos])
+        )
+        resultado = {
+            "texto": texto,
+            "tabelas": [item["table_name"] for item in itens[:incluidos]],
+            "compactadas": [item["table_name"] for posicao, item in enumerate(itens[:incluidos]) if niveis[posicao] > NIVEL_COMPLETO],
+            "omitidas": [item["table_name"] for item in itens[incluidos:]],
+            "tokens_estimados": total,
+        }
+        if resultado["compactadas"] or resultado["omitidas"]:
+            logger.info(f"\n[Context Packer] {len(itens)} chunks em {total} tokens (limite {max_tokens}). Compactadas: {resultado['compactadas']}. Omitidas: {resultado['omitidas']}")
+        return resultado
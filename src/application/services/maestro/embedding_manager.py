@@ -14,6 +14,38 @@ class EmbeddingManager:
     Responsável por transformar as tabelas extraídas em embeddings para busca vetorial.
     """
     
+    @staticmethod
+    def _sem_embeddings() -> Dict[str, Any]:
+        return {
+            "sucesso": True,
+            "embeddings": None,
+            "similar_tables_result": []  # Lista vazia para evitar erros posteriores
+        }
+
+    @staticmethod
+    def _montar_resultado(tables_list: List[str], embedding_result_array: Optional[np.ndarray]) -> Dict[str, Any]:
+        # Verifica se os embeddings foram gerados corretamente
+        if not isinstance(embedding_result_array, np.ndarray) or embedding_result_array.size == 0:
+            logger.warning(f"\n[EmbeddingManager]\nFalha ao gerar embeddings para as tabelas: {tables_list}. Continuando sem busca vetorial.")
+            return EmbeddingManager._sem_embeddings()
+
+        # Embeddings gerados com sucesso
+        logger.info(f"\n[EmbeddingManager]\nEmbeddings gerados com sucesso: shape {embedding_result_array.shape}")
+        return {
+            "sucesso": True,
+            "embeddings": embedding_result_array,
+            "tabelas": tables_list
+        }
+
+    @staticmethod
+    def _montar_erro(e: Exception) -> Dict[str, Any]:
+        logger.error(f"\n[EmbeddingManager]\nErro durante a geração de embeddings: {str(e)}")
+        return {
+            "sucesso": False,
+            "erro": "Erro durante a geração de embeddings",
+            "detalhes": str(e)
+        }
+
     @staticmethod
     def generate_embeddings_for_tables(tables_list: List[str]) -> Dict[str, Any]:
         """
@@ -31,36 +63,27 @@ class EmbeddingManager:
             # Verifica se há tabelas para processar
             if not tables_list:
                 logger.info("\n[EmbeddingManager]\nNenhuma tabela para gerar embeddings. Pulando etapa.")
-                return {
-                    "sucesso": True,
-                    "embeddings": None,
-                    "similar_tables_result": []  # Lista vazia para evitar erros posteriores
-                }
+                return EmbeddingManager._sem_embeddings()
             
             # Gera embeddings para as tabelas
-            embedding_result_array = EmbeddingService.embed_texts(tables_list)
-            
-            # Verifica se os embeddings foram gerados corretamente
-            if not isinstance(embedding_result_array, np.ndarray) or embedding_result_array.size == 0:
-                logger.warning(f"\n[EmbeddingManager]\nFalha ao gerar embeddings para as tabelas: {tables_list}. Continuando sem busca vetorial.")
-                return {
-                    "sucesso": True,
-                    "embeddings": None,
-                    "similar_tables_result": []  # Lista vazia para evitar erros posteriores
-                }
-            
-            # Embeddings gerados com sucesso
-            logger.info(f"\n[EmbeddingManager]\nEmbeddings gerados com sucesso: shape {embedding_result_array.shape}")
-            return {
-                "sucesso": True,
-                "embeddings": embedding_result_array,
-                "tabelas": tables_list
-            }
+            return EmbeddingManager._montar_resultado(tables_list, EmbeddingService.embed_texts(tables_list))
             
         except Exception as e:
-            logger.error(f"\n[EmbeddingManager]\nErro durante a geração de embeddings: {str(e)}")
-            return {
-                "sucesso": False,
-                "erro": "Erro durante a geração de embeddings",
-                "detalhes": str(e)
-            }
\ No newline at end of file
+            return EmbeddingManager._montar_erro(e)
+
+    @staticmethod
+    async def generate_embeddings_for_tables_async(tables_list: List[str]) -> Dict[str, Any]:
+        """
+        Versão assíncrona de `generate_embeddings_for_tables`.
+        """
+        logger.info(f"\n[EmbeddingManager]\nGerando embeddings (async) para {len(tables_list)} tabelas...")
+
+        try:
+            if not tables_list:
+                logger.info("\n[EmbeddingManager]\nNenhuma tabela para gerar embeddings. Pulando etapa.")
+                return EmbeddingManager._sem_embeddings()
+
+            return EmbeddingManager._montar_resultado(tables_list, await EmbeddingService.embed_texts_async(tables_list))
+
+        except Exception as e:
+            return EmbeddingManager._montar_erro(e)
@@ -1,7 +1,9 @@
-from typing import Dict, Any, List
+from typing import AsyncIterator, Dict, Any, List, Optional
 from config.prompts.base_instructions import BaseInstructions
 from infrastructure.external_services.llm_service import LLMService
-from shared.utils.llm_response_parser import parse_llm_structured_response
+from shared.utils.tracing import Tracer
+from application.services.maestro.context_packer import ContextPacker
+from shared.utils.llm_response_parser import parse_llm_structured_response, parse_verification_response
 from config.core.logging_config import get_logger
 
 logger = get_logger(__name__)
@@ -9,13 +11,12 @@ logger = get_logger(__name__)
 class ExtractionManager:
     
     @staticmethod
-    def extract_entities_from_prompt(prompt_usuario: str, nivel_modelo: str = "fraco") -> Dict[str, Any]:
+    def _montar_prompt_extracao(prompt_usuario: str) -> str:
         instrucoes_extracao = BaseInstructions.get_stract_infos_instruction()
-        prompt_completo = f"{instrucoes_extracao}\n\nPrompt do usuário:\n{prompt_usuario}"
+        return f"{instrucoes_extracao}\n\nPrompt do usuário:\n{prompt_usuario}"
 
-        # Passando o nível do modelo para o LLMService
-        resposta_texto = LLMService.processar_prompt(prompt_completo, nivel_modelo=nivel_modelo)
-        
+    @staticmethod
+    def _interpretar_extracao(resposta_texto: str) -> Dict[str, Any]:
         parsed = parse_llm_structured_response(resposta_texto)
         logger.info(f"\n[Extraction Manager] Entidades extraídas do prompt:\n Schemas: {parsed.get('schemas', [])}\n Tabelas: {parsed.get('tabelas', [])}\n Colunas: {parsed.get('colunas', [])}")
         
@@ -25,6 +26,65 @@ class ExtractionManager:
             "colunas": parsed.get("colunas", [])
         }
 
+    @staticmethod
+    def _validar_extracao(resposta_texto: str) -> Optional[str]:
+        """
+        Validador da cascata de modelos para a extração: None aceita a resposta; 'formato' se
+        não está no padrão 'SCHEMA','TABELA','COLUNA' e 'baixa_confianca' se não trouxe
+        nenhuma tabela nem coluna.
+        """
+        try:
+            parsed = parse_llm_structured_response(resposta_texto)
+        except ValueError:
+            return "formato"
+        if not parsed.get("tabelas") and not parsed.get("colunas"):
+            return "baixa_confianca"
+        return None
+
+    @staticmethod
+    def _validar_verificacao(resposta_verificacao: str) -> Optional[str]:
+        """
+        Validador da cascata de modelos para a verificação: 'erro' se o código não foi
+        reconhecido e 'baixa_confianca' para um 1001 que não solicita nenhuma tabela.
+        """
+        resultado = parse_verification_response(resposta_verificacao)
+        if resultado.get("codigo") == "erro":
+            return "erro"
+        if resultado.get("codigo") == "1001" and not resultado.get("tabelas_solicitadas"):
+            return "baixa_confianca"
+        return None
+
+    @staticmethod
+    def extract_entities_from_prompt(prompt_usuario: str, nivel_modelo: str = "fraco") -> Dict[str, Any]:
+        """
+        Extrai schemas, tabelas e colunas do prompt. `nivel_modelo` é o nível mais alto da
+        cascata de modelos (ver LLMService.niveis_cascata).
+        """
+        with Tracer.span("extracao.entidades", nivel_modelo=nivel_modelo) as span:
+            prompt_completo = ExtractionManager._montar_prompt_extracao(prompt_usuario)
+
+            resposta_texto, nivel_usado = LLMService.processar_prompt_cascata(
+                prompt_completo, ExtractionManager._validar_extracao, etapa="extracao", nivel_maximo=nivel_modelo
+            )
+
+            resultado = ExtractionManager._interpretar_extracao(resposta_texto)
+            span.set(nivel_usado=nivel_usado, tabelas=len(resultado.get("tabelas", [])), colunas=len(resultado.get("colunas", [])))
+            return resultado
+
+    @staticmethod
+    async def extract_entities_from_prompt_async(prompt_usuario: str, nivel_modelo: str = "fraco") -> Dict[str, Any]:
+        """
+        Versão assíncrona de `extract_entities_from_prompt`.
+        """
+        with Tracer.span("extracao.entidades", nivel_modelo=nivel_modelo) as span:
+            prompt_completo = ExtractionManager._montar_prompt_extracao(prompt_usuario)
+            resposta_texto, nivel_usado = await LLMService.processar_prompt_cascata_async(
+                prompt_completo, ExtractionManager._validar_extracao, etapa="extracao", nivel_maximo=nivel_modelo
+            )
+            resultado = ExtractionManager._interpretar_extracao(resposta_texto)
+            span.set(nivel_usado=nivel_usado, tabelas=len(resultado.get("tabelas", [])), colunas=len(resultado.get("colunas", [])))
+            return resultado
+
     @staticmethod
     def verify_data_sufficiency(prompt_usuario: str, tabelas_similares: List[Dict[str, Any]], nivel_modelo: str = "medio") -> Dict[str, Any]:
         """
@@ -33,24 +93,46 @@ class ExtractionManager:
         Args:
             prompt_usuario: O prompt original do usuário.
             tabelas_similares: Lista de dicionários com as tabelas similares encontradas.
-            nivel_modelo: Nível do modelo LLM a ser usado (padrão: medio).
+            nivel_modelo: Nível mais alto da cascata de modelos (padrão: medio).
             
         Returns:
             Dict: Dicionário com o código de retorno, tabelas mantidas, tabelas solicitadas e motivo.
         """
-        # Formatar os dados das tabelas encontradas para enviar ao LLM
-        chunks_tabelas = []
-        for resultado in tabelas_similares:
-            matches = resultado.get("matches", [])
-            
-            for match in matches:
-                table_name = match.get("table_name", "")
-                similarity = match.get("similarity_percentage", 0)
-                content = match.get("content", "")
-                
-                # Adiciona informações formatadas sobre a tabela
-                chunks_tabelas.append(f"Tabela: {table_name} (Similaridade: {similarity:.2f}%)\nConteúdo: {content}\n")
-        
+        with Tracer.span("extracao.verificacao", nivel_modelo=nivel_modelo, resultados=len(tabelas_similares)) as span:
+            prompt_verificacao = ExtractionManager._montar_prompt_verificacao(prompt_usuario, tabelas_similares)
+            span.set(caracteres_contexto=len(prompt_verificacao))
+
+            # Enviar para o LLM com o modelo especificado
+            logger.info(f"\n[Extraction Manager] Verificando se os dados encontrados são suficientes para responder à pergunta")
+            resposta_verificacao, nivel_usado = LLMService.processar_prompt_cascata(
+                prompt_verificacao, ExtractionManager._validar_verificacao, etapa="verificacao", nivel_maximo=nivel_modelo
+            )
+
+            resultado = ExtractionManager._interpretar_verificacao(resposta_verificacao)
+            span.set(codigo=resultado.get("codigo"), nivel_usado=nivel_usado)
+            return resultado
+
+    @staticmethod
+    async def verify_data_sufficiency_async(prompt_usuario: str, tabelas_similares: List[Dict[str, Any]], nivel_modelo: str = "medio") -> Dict[str, Any]:
+        """
+        Versão assíncrona de `verify_data_sufficiency`.
+        """
+        with Tracer.span("extracao.verificacao", nivel_modelo=nivel_modelo, resultados=len(tabelas_similares)) as span:
+            prompt_verificacao = ExtractionManager._montar_prompt_verificacao(prompt_usuario, tabelas_similares)
+            span.set(caracteres_contexto=len(prompt_verificacao))
+            logger.info(f"\n[Extraction Manager] Verificando se os dados encontrados são suficientes para responder à pergunta")
+            resposta_verificacao, nivel_usado = await LLMService.processar_prompt_cascata_async(
+                prompt_verificacao, ExtractionManager._validar_verificacao, etapa="verificacao", nivel_maximo=nivel_modelo
+            )
+            resultado = ExtractionManager._interpretar_verificacao(resposta_verificacao)
+            span.set(codigo=resultado.get("codigo"), nivel_usado=nivel_usado)
+            return resultado
+
+    @staticmethod
+    def _montar_prompt_verificacao(prompt_usuario: str, tabelas_similares: List[Dict[str, Any]]) -> str:
+        # Chunks deduplicados, ordenados por relevância e limitados ao orçamento de tokens da verificação
+        contexto = ContextPacker.pack(tabelas_similares, ContextPacker.VERIFY_TOKENS)
+
         # Obter o prompt de verificação de colunas
         instrucao_verificacao = BaseInstructions.get_verification_columns()
         
@@ -62,18 +144,16 @@ class ExtractionManager:
             {prompt_usuario}
 
             Chunks de tabelas encontradas:
-            {''.join(chunks_tabelas)}
+            {contexto["texto"]}
             """
-        
-        # Enviar para o LLM com o modelo especificado
-        logger.info(f"\n[Extraction Manager] Verificando se os dados encontrados são suficientes para responder à pergunta")
-        resposta_verificacao = LLMService.processar_prompt(prompt_verificacao, nivel_modelo=nivel_modelo)
-        
+        return prompt_verificacao
+
+    @staticmethod
+    def _interpretar_verificacao(resposta_verificacao: str) -> Dict[str, Any]:
         # Logar a resposta da verificação
         logger.info(f"\n[Extraction Manager] Resposta da verificação: {resposta_verificacao}")
         
         # Parsear a resposta usando a nova função
-        from shared.utils.llm_response_parser import parse_verification_response
         resultado_verificacao = parse_verification_response(resposta_verificacao)
         
         return resultado_verificacao
@@ -91,39 +171,49 @@ class ExtractionManager:
         Returns:
             str: Resposta final para o usuário.
         """
-        # Formatar os dados das tabelas encontradas para enviar ao LLM
-        chunks_tabelas = []
-        # Verifica se os resultados têm a estrutura esperada
-        if resultados_similares and isinstance(resultados_similares[0], dict):
-            # Verifica se tem o atributo "matches" (estrutura do SearchManager)
-            if "matches" in resultados_similares[0]:
-                # Formato vindo do SearchManager
-                for resultado in resultados_similares:
-                    matches = resultado.get("matches", [])
-                    for match in matches:
-                        table_name = match.get("table_name", "")
-                        similarity = match.get("similarity_percentage", 0)
-                        content = match.get("content", "")
-                        chunks_tabelas.append(f"Tabela: {table_name} (Similaridade: {similarity:.2f}%)\nConteúdo: {content}\n")
-            else:
-                # Formato da lista acumulada (já direto com table_name, similarity_percentage, content)
-                for item in resultados_similares:
-                    table_name = item.get("table_name", "")
-                    similarity = item.get("similarity_percentage", 0)
-                    content = item.get("content", "")
-                    chunks_tabelas.append(f"Tabela: {table_name} (Similaridade: {similarity:.2f}%)\nConteúdo: {content}\n")
-
-        for resultado in resultados_similares:
-            matches = resultado.get("matches", [])
-            
-            for match in matches:
-                table_name = match.get("table_name", "")
-                similarity = match.get("similarity_percentage", 0)
-                content = match.get("content", "")
-                
-                # Adiciona informações formatadas sobre a tabela
-                chunks_tabelas.append(f"Tabela: {table_name} (Similaridade: {similarity:.2f}%)\nConteúdo: {content}\n")
-        
+        with Tracer.span("extracao.resposta_final", nivel_modelo=nivel_modelo, tabelas=len(resultados_similares)) as span:
+            prompt_resposta = ExtractionManager._montar_prompt_resposta_final(prompt_usuario, resultados_similares)
+            span.set(caracteres_contexto=len(prompt_resposta))
+
+            # Enviar para o LLM com o modelo especificado
+            logger.info(f"\n[Extraction Manager] Gerando resposta final com modelo {nivel_modelo}")
+            resposta_final = LLMService.processar_prompt(prompt_resposta, nivel_modelo=nivel_modelo, etapa="resposta_final")
+
+            return ExtractionManager._registrar_resposta_final(resposta_final)
+
+    @staticmethod
+    async def final_response_async(prompt_usuario: str, resultados_similares: List[Dict[str, Any]], nivel_modelo: str = "extremo") -> str:
+        """
+        Versão assíncrona de `final_response`.
+        """
+        with Tracer.span("extracao.resposta_final", nivel_modelo=nivel_modelo, tabelas=len(resultados_similares)) as span:
+            prompt_resposta = ExtractionManager._montar_prompt_resposta_final(prompt_usuario, resultados_similares)
+            span.set(caracteres_contexto=len(prompt_resposta))
+            logger.info(f"\n[Extraction Manager] Gerando resposta final com modelo {nivel_modelo}")
+            resposta_final = await LLMService.processar_prompt_async(prompt_resposta, nivel_modelo=nivel_modelo, etapa="resposta_final")
+            return ExtractionManager._registrar_resposta_final(resposta_final)
+
+    @staticmethod
+    async def final_response_stream_async(prompt_usuario: str, resultados_similares: List[Dict[str, Any]], nivel_modelo: str = "extremo") -> AsyncIterator[str]:
+        """
+        Versão em streaming de `final_response`: produz os trechos da resposta conforme são gerados.
+        """
+        with Tracer.span("extracao.resposta_final", nivel_modelo=nivel_modelo, tabelas=len(resultados_similares), stream=True) as span:
+            prompt_resposta = ExtractionManager._montar_prompt_resposta_final(prompt_usuario, resultados_similares)
+            span.set(caracteres_contexto=len(prompt_resposta))
+            logger.info(f"\n[Extraction Manager] Gerando resposta final (stream) com modelo {nivel_modelo}")
+            trechos: List[str] = []
+            async for trecho in LLMService.processar_prompt_stream_async(prompt_resposta, nivel_modelo=nivel_modelo, etapa="resposta_final"):
+                trechos.append(trecho)
+                yield trecho
+            ExtractionManager._registrar_resposta_final("".join(trechos))
+
+    @staticmethod
+    def _montar_prompt_resposta_final(prompt_usuario: str, resultados_similares: List[Dict[str, Any]]) -> str:
+        # Aceita tanto resultados de busca ("matches") quanto a lista acumulada de matches;
+        # cada tabela entra uma única vez, dentro do orçamento de tokens da resposta final
+        contexto = ContextPacker.pack(resultados_similares, ContextPacker.FINAL_TOKENS)
+
         # Obter o prompt de resposta final
         instrucao_resposta = BaseInstructions.get_resposta_final()
         
@@ -135,13 +225,12 @@ class ExtractionManager:
             {prompt_usuario}
 
             Chunks de tabelas disponíveis:
-            {''.join(chunks_tabelas)}
+            {contexto["texto"]}
             """
-        
-        # Enviar para o LLM com o modelo especificado
-        logger.info(f"\n[Extraction Manager] Gerando resposta final com modelo {nivel_modelo}")
-        resposta_final = LLMService.processar_prompt(prompt_resposta, nivel_modelo=nivel_modelo)
-        
+        return prompt_resposta
+
+    @staticmethod
+    def _registrar_resposta_final(resposta_final: str) -> str:
         # Logar a resposta final (resumida para não poluir o log)
         resposta_resumida = resposta_final[:100] + "..." if len(resposta_final) > 100 else resposta_final
         logger.info(f"\n[Extraction Manager] Resposta final gerada: {resposta_resumida}")
@@ -0,0 +1,173 @@
+# src/application/services/maestro/foreign_key_graph.py
+
+import threading
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+
+from infrastructure.persistence.schema_catalog import SchemaCatalog
+from shared.utils.schema_chunk_parser import extract_foreign_keys
+from config.core.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+class ForeignKeyGraph:
+    """
+    Grafo de chaves estrangeiras de todo o catálogo, compilado uma única vez a partir das
+    definições 'FK:' dos chunks (OUTGOING e INCOMING).
+
+    Cada tabela recebe um id inteiro. As arestas 'origem referencia destino' ficam em arrays
+    no formato CSR (offsets + vizinhos), um para as referências de saída e outro para as de
+    entrada, então obter os vizinhos de uma tabela é apenas o fatiamento de um array.
+    `get_current()` devolve o grafo do catálogo atual, reconstruído só quando a versão muda.
+    """
+
+    _atual: Optional["ForeignKeyGraph"] = None
+    _versao_atual: Optional[str] = None
+    _lock = threading.Lock()
+
+    def __init__(self, tabelas: Iterable[Dict[str, Any]]):
+        self._nomes: List[str] = []
+        self._ids: Dict[str, int] = {}
+        self._ids_por_nome_simples: Dict[str, List[int]] = defaultdict(list)
+        self._colunas: Dict[Tuple[int, int], List[Tuple[str, str]]] = defaultdict(list)
+
+        for tabela in tabelas:
+            table_name = tabela.get("table_name")
+            if not table_name:
+                continue
+            tabela_id = self._intern(table_name)
+            for foreign_key in extract_foreign_keys(tabela.get("content", "") or ""):
+                relacionada_id = self._intern(foreign_key.tabela_relacionada)
+                # As duas pontas descrevem a mesma FK; a aresta é sempre 'quem referencia -> referenciada'
+                if foreign_key.direcao == "INCOMING":
+                    aresta = (relacionada_id, tabela_id)
+                    colunas = (foreign_key.coluna_relacionada, foreign_key.coluna_local)
+                else:
+                    aresta = (tabela_id, relacionada_id)
+                    colunas = (foreign_key.coluna_local, foreign_key.coluna_relacionada)
+                if colunas not in self._colunas[aresta]:
+                    self._colunas[aresta].append(colunas)
+
+        origens = np.fromiter((a[0] for a in self._colunas), dtype=np.int32, count=len(self._colunas))
+        destinos = np.fromiter((a[1] for a in self._colunas), dtype=np.int32, count=len(self._colunas))
+        self._saida_offsets, self._saida_vizinhos = self._csr(origens, destinos)
+        self._entrada_offsets, self._entrada_vizinhos = self._csr(destinos, origens)
+
+    def _intern(self, table_name: str) -> int:
+        chave = table_name.strip().lower()
+        tabela_id = self._ids.get(chave)
+        if tabela_id is None:
+            tabela_id = len(self._nomes)
+            self._ids[chave] = tabela_id
+            self._nomes.append(table_name.strip())
+            self._ids_por_nome_simples[chave.split(".", 1)[-1]].append(tabela_id)
+        return tabela_id
+
+    def _csr(self, origens: np.ndarray, destinos: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        ordem = np.lexsort((destinos, origens))
+        offsets = np.zeros(len(self._nomes) + 1, dtype=np.int32)
+        np.cumsum(np.bincount(origens, minlength=len(self._nomes)), out=offsets[1:])
+        return offsets, destinos[ordem]
+
+    @staticmethod
+    def get_current() -> "ForeignKeyGraph":
+        """
+        Retorna o grafo do catálogo atual, reconstruindo-o apenas quando a versão do catálogo muda.
+        """
+        tabelas = SchemaCatalog.get_tables()
+        versao = SchemaCatalog.get_version()
+        if ForeignKeyGraph._atual is not None and versao == ForeignKeyGraph._versao_atual:
+            return ForeignKeyGraph._atual
+
+        with ForeignKeyGraph._lock:
+            if ForeignKeyGraph._atual is None or versao != ForeignKeyGraph._versao_atual:
+                grafo = ForeignKeyGraph(tabelas)
+                ForeignKeyGraph._atual = grafo
+                ForeignKeyGraph._versao_atual = versao
+                logger.info(f"\n[Foreign Key Graph] Grafo de FKs construído: {len(grafo)} tabelas, {grafo.num_edges} relacionamentos (versão {versao}).")
+        return ForeignKeyGraph._atual
+
+    def __len__(self) -> int:
+        return len(self._nomes)
+
+    @property
+    def num_edges(self) -> int:
+        return int(self._saida_vizinhos.size)
+
+    def ids_of(self, nome: str) -> List[int]:
+        """
+        Ids das tabelas com o nome 'schema.tabela' ou apenas 'tabela' (pode haver várias em schemas diferentes).
+        """
+        chave = nome.strip().strip('"`\'').lower()
+        if "." in chave:
+            tabela_id = self._ids.get(chave)
+            return [tabela_id] if tabela_id is not None else []
+        return list(self._ids_por_nome_simples.get(chave, []))
+
+    def name_of(self, tabela_id: int) -> str:
+        return self._nomes[tabela_id]
+
+    def neighbors(self, tabela_id: int, direcao: str = "ambas") -> np.ndarray:
+        """
+        Ids vizinhos de uma tabela: 'saida' (tabelas que ela referencia), 'entrada'
+        (tabelas que a referenciam) ou 'ambas'.
+        """
+        saida = self._saida_vizinhos[self._saida_offsets[tabela_id]:self._saida_offsets[tabela_id + 1]]
+        if direcao == "saida":
+            return saida
+        entrada = self._entrada_vizinhos[self._entrada_offsets[tabela_id]:self._entrada_offsets[tabela_id + 1]]
+        if direcao == "entrada":
+            return entrada
+        return np.concatenate([saida, entrada])
+
+    def expand(self, nomes: Iterable[str], hops: int = 1, direcao: str = "ambas") -> Dict[str, int]:
+        """
+        Vizinhança de até `hops` saltos a partir das tabelas informadas.
+
+        Returns:
+            Dicionário 'schema.tabela' -> distância em saltos (0 para as próprias tabelas
+            informadas), em ordem de distância. Nomes ausentes do grafo são ignorados.
+        """
+        distancias = np.full(len(self._nomes), -1, dtype=np.int32)
+        fronteira = [tabela_id for nome in nomes for tabela_id in self.ids_of(nome)]
+        distancias[fronteira] = 0
+        visitados = list(dict.fromkeys(fronteira))
+
+        for salto in range(1, hops + 1):
+            if not fronteira:
+                break
+            vizinhos = np.unique(np.concatenate([self.neighbors(tabela_id, direcao) for tabela_id in fronteira]))
+            novos = vizinhos[distancias[vizinhos] < 0]
+            distancias[novos] = salto
+            fronteira = novos.tolist()
+            visitados.extend(fronteira)
+
+        return {self._nomes[tabela_id]: int(distancias[tabela_id]) for tabela_id in visitados}
+
+    def referencing(self, nome: str) -> List[str]:
+        """
+        Busca reversa: tabelas que possuem FK apontando para `nome`.
+        """
+        return sorted({
+            self._nomes[vizinho]
+            for tabela_id in self.ids_of(nome)
+            for vizinho in self.neighbors(tabela_id, "entrada").tolist()
+        })
+
+    def join_columns(self, origem: str, destino: str) -> List[Tuple[str, str]]:
+        """
+        Pares (coluna em `origem`, coluna em `destino`) das FKs entre as duas tabelas, em qualquer direção.
+        """
+        pares: List[Tuple[str, str]] = []
+        for origem_id in self.ids_of(origem):
+            for destino_id in self.ids_of(destino):
+                pares.extend(self._colunas.get((origem_id, destino_id), []))
+                pares.extend((b, a) for a, b in self._colunas.get((destino_id, origem_id), []))
+        return pares
+
+    @staticmethod
+    def reset() -> None:
+        with ForeignKeyGraph._lock:
+            ForeignKeyGraph._atual = None
+            ForeignKeyGraph._versao_atual = None
@@ -1,6 +1,7 @@
 # src/application/services/maestro/foreign_key_manager.py
-import re
 from typing import Dict, List, Set, Tuple
+from application.services.maestro.foreign_key_graph import ForeignKeyGraph
+from shared.utils.schema_chunk_parser import parse_foreign_key
 from config.core.logging_config import get_logger
 
 logger = get_logger(__name__)
@@ -21,6 +22,47 @@ class ForeignKeyManager:
             return table_name_with_schema.split('.', 1)[-1]
         return table_name_with_schema
 
+    @staticmethod
+    def _parse_chunk_foreign_keys(chunk_content: str, processed_table_name_of_chunk: str, table_name_of_chunk_with_schema: str) -> List[str]:
+        """
+        Fallback para chunks fora do catálogo: extrai as tabelas relacionadas das partes 'FK:' do chunk.
+        Ex.: 'FK:id_contrato>el_compras.cp_contrato(id)[DIR:OUTGOING]' -> 'el_compras.cp_contrato'
+        """
+        related_tables_with_schema = []
+        # Os chunks são strings no formato: schema;tabela;desc;col1;col2;PK:col;FK:def1;FK:def2;IDX:idx
+        for part in chunk_content.strip().split(';'):
+            part = part.strip()
+            if not part.startswith("FK:"):
+                continue
+            foreign_key = parse_foreign_key(part)
+            if foreign_key is not None:
+                related_tables_with_schema.append(foreign_key.tabela_relacionada)
+            else:
+                logger.warning(
+                    f"Não foi possível parsear a definição de FK: '{part}' "
+                    f"no chunk de '{processed_table_name_of_chunk}' "
+                    f"(original: {table_name_of_chunk_with_schema})"
+                )
+        return related_tables_with_schema
+
+    @staticmethod
+    def expand_related_tables(table_list: List[str], hops: int = 1) -> Dict[str, any]:
+        """
+        Expande uma lista de tabelas ('schema.tabela' ou 'tabela') com as tabelas alcançáveis
+        por até `hops` FKs (saída e entrada), usando apenas o grafo pré-compilado do catálogo.
+
+        Returns:
+            {"sucesso": True, "tabelas": {'schema.tabela': distância em saltos}} ou
+            {"sucesso": False, "erro": mensagem}.
+        """
+        try:
+            tabelas = ForeignKeyGraph.get_current().expand(table_list, hops=hops)
+        except Exception as e:
+            logger.error(f"Falha ao expandir tabelas pelo grafo de FKs: {e}")
+            return {"sucesso": False, "erro": str(e)}
+        logger.info(f"Expansão por FKs ({hops} salto(s)) de {table_list}: {len(tabelas)} tabelas.")
+        return {"sucesso": True, "tabelas": tabelas}
+
     @staticmethod
     def extract_related_tables_from_chunks(
         retrieved_context_parts: Dict[str, str],
@@ -48,58 +90,39 @@ class ForeignKeyManager:
             ForeignKeyManager._remove_schema_prefix(t) for t in initial_table_list
         }
 
-        # Regex para encontrar 'schema.tabela' após um '>' (saída) OU '<' (entrada) e antes de um '('
-        # Exemplo OUTGOING: FK:id_contrato>el_compras.cp_contrato(id)[DIR:OUTGOING] -> captura 'el_compras.cp_contrato'
-        # Exemplo INCOMING: FK:id<el_compras.cp_contrato_item(id_contrato)[DIR:INCOMING] -> captura 'el_compras.cp_contrato_item'
-        # O grupo (?:>|<) é um non-capturing group para OR entre > e <.
-        # O grupo (\w[\w\.]*) captura o nome da tabela (permitindo letras, números, _ e .)
-        fk_table_pattern = re.compile(r"(?:>|<)(\w[\w\.]*)\(")
-
         # Logger para as tabelas iniciais processadas
         processed_initial_list = [ForeignKeyManager._remove_schema_prefix(t) for t in initial_table_list]
         logger.info(f"Iniciando extração de tabelas referenciadas por FKs. Tabelas iniciais (processadas): {processed_initial_list}")
 
+        # Grafo de FKs pré-compilado do catálogo; os chunks só são parseados se a tabela não estiver nele
+        try:
+            fk_graph = ForeignKeyGraph.get_current()
+        except Exception as e:
+            logger.warning(f"Grafo de FKs indisponível, parseando os chunks: {e}")
+            fk_graph = None
+
         for table_name_of_chunk_with_schema, chunk_content in retrieved_context_parts.items():
             processed_table_name_of_chunk = ForeignKeyManager._remove_schema_prefix(table_name_of_chunk_with_schema)
             all_identified_tables_set.add(processed_table_name_of_chunk) # Adiciona a tabela do chunk
 
-            # Os chunks são strings no formato: schema;tabela;desc;col1;col2;PK:col;FK:def1;FK:def2;IDX:idx
-            # Vamos dividir o chunk por ';' para analisar cada parte.
-            parts = chunk_content.strip().split(';')
-
-            for part in parts:
-                part = part.strip()
-                if not part.startswith("FK:"):
-                    continue
-
-                # 'part' é agora uma definição individual de FK, ex: "FK:id_tipo>el_cpe_base.ct_documento_tipo(id)[DIR:OUTGOING]"
-                # ou "FK:id<el_cpe_ex.ct_liquidacao(id_documento)[DIR:INCOMING]"
-
-                # Remove o prefixo "FK:"
-                fk_definition_str = part[len("FK:"):]
-
-                # Usamos o regex para encontrar a tabela referenciada/referenciadora
-                match = fk_table_pattern.search(fk_definition_str)
-                if match:
-                    # O grupo 1 do regex captura o nome da tabela (com schema)
-                    # ex: 'el_cpe_base.ct_documento_tipo' ou 'el_cpe_ex.ct_liquidacao'
-                    related_table_with_schema = match.group(1)
-                    processed_related_table_name = ForeignKeyManager._remove_schema_prefix(related_table_with_schema)
-
-                    if processed_related_table_name not in all_identified_tables_set:
-                        logger.info(
-                            f"Nova tabela relacionada por FK descoberta: '{processed_related_table_name}' "
-                            f"(original: '{related_table_with_schema}', a partir da FK '{fk_definition_str}' "
-                            f"no chunk de '{processed_table_name_of_chunk}')"
-                        )
-                        all_identified_tables_set.add(processed_related_table_name)
-                else:
-                    logger.warning(
-                        f"Não foi possível parsear a definição de FK: '{part}' "
-                        f"no chunk de '{processed_table_name_of_chunk}' "
-                        f"(original: {table_name_of_chunk_with_schema})"
+            if fk_graph is not None and "." in table_name_of_chunk_with_schema and fk_graph.ids_of(table_name_of_chunk_with_schema):
+                related_tables_with_schema = [
+                    name for name, distance in fk_graph.expand([table_name_of_chunk_with_schema], hops=1).items() if distance > 0
+                ]
+            else:
+                related_tables_with_schema = ForeignKeyManager._parse_chunk_foreign_keys(
+                    chunk_content, processed_table_name_of_chunk, table_name_of_chunk_with_schema
+                )
+
+            for related_table_with_schema in related_tables_with_schema:
+                processed_related_table_name = ForeignKeyManager._remove_schema_prefix(related_table_with_schema)
+                if processed_related_table_name not in all_identified_tables_set:
+                    logger.info(
+                        f"Nova tabela relacionada por FK descoberta: '{processed_related_table_name}' "
+                        f"(original: '{related_table_with_schema}', a partir do chunk de '{processed_table_name_of_chunk}')"
                     )
-            # Fim do loop de partes do chunk
+                    all_identified_tables_set.add(processed_related_table_name)
+            # Fim do loop de tabelas relacionadas
         # Fim do loop de chunks
 
         final_table_list = sorted(list(all_identified_tables_set))
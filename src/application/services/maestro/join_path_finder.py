@@ -0,0 +1,167 @@
+# src/application/services/maestro/join_path_finder.py
+
+import os
+from typing import Any, Dict, List, Set, Tuple
+import numpy as np
+
+from application.services.maestro.foreign_key_graph import ForeignKeyGraph
+from application.services.maestro.table_name_resolver import TableNameResolver
+from config.core.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+class JoinPathFinder:
+    """
+    Encontra as tabelas intermediárias ('pontes') necessárias para juntar as tabelas recuperadas,
+    usando o grafo de FKs do catálogo.
+
+    Aproxima a árvore de Steiner mínima de forma gulosa: parte da primeira tabela e, a cada passo,
+    liga à árvore a tabela recuperada mais próxima (BFS a partir de todos os nós da árvore),
+    incorporando o caminho mais curto. Caminhos mais longos que JOIN_PATH_MAX_HOPS são ignorados,
+    e tabelas sem ligação dentro desse limite iniciam uma nova componente.
+    """
+    ENABLED = os.getenv("JOIN_PATH_ENABLED", "1") != "0"
+    MAX_HOPS = int(os.getenv("JOIN_PATH_MAX_HOPS", "4"))
+    MAX_BRIDGES = int(os.getenv("JOIN_PATH_MAX_BRIDGES", "6"))
+
+    @staticmethod
+    def _caminho_ate_a_arvore(grafo: ForeignKeyGraph, arvore: Set[int], alvos: Set[int], max_saltos: int) -> List[int]:
+        """
+        BFS a partir de todos os nós da árvore até o alvo mais próximo.
+        Retorna o caminho [alvo, ..., nó da árvore] ou lista vazia se nenhum alvo estiver ao alcance.
+        """
+        pais = np.full(len(grafo), -2, dtype=np.int64)
+        fronteira = list(arvore)
+        pais[fronteira] = -1
+        for _ in range(max_saltos):
+            proxima_fronteira = []
+            for no in fronteira:
+                for vizinho in grafo.neighbors(no).tolist():
+                    if pais[vizinho] != -2:
+                        continue
+                    pais[vizinho] = no
+                    if vizinho in alvos:
+                        caminho = [vizinho]
+                        while pais[caminho[-1]] != -1:
+                            caminho.append(int(pais[caminho[-1]]))
+                        return caminho
+                    proxima_fronteira.append(vizinho)
+            if not proxima_fronteira:
+                break
+            fronteira = proxima_fronteira
+        return []
+
+    @staticmethod
+    def find_join_tree(tabelas: List[str], max_saltos: int = None) -> Dict[str, Any]:
+        """
+        Calcula os caminhos de junção entre as tabelas informadas ('schema.tabela').
+
+        Returns:
+            {
+                "tabelas_ponte": tabelas intermediárias que não estavam na lista, na ordem em que foram incorporadas,
+                "arestas": pares (tabela, tabela) das junções da árvore,
+                "desconectadas": tabelas sem caminho até nenhuma outra dentro do limite de saltos
+            }
+        """
+        max_saltos = JoinPathFinder.MAX_HOPS if max_saltos is None else max_saltos
+        grafo = ForeignKeyGraph.get_current()
+        terminais = list(dict.fromkeys(
+            tabela_id for nome in tabelas if "." in nome for tabela_id in grafo.ids_of(nome)
+        ))
+        resultado = {"tabelas_ponte": [], "arestas": [], "desconectadas": []}
+        if len(terminais) < 2:
+            return resultado
+
+        arvore: Set[int] = {terminais[0]}
+        restantes: Set[int] = set(terminais[1:])
+        pontes: List[int] = []
+        arestas: List[Tuple[int, int]] = []
+
+        while restantes:
+            caminho = JoinPathFinder._caminho_ate_a_arvore(grafo, arvore, restantes, max_saltos)
+            if not caminho:
+                # Nenhuma tabela restante alcança a árvore: a próxima inicia uma nova componente
+                proxima = min(restantes, key=terminais.index)
+                restantes.discard(proxima)
+                arvore.add(proxima)
+                continue
+            for origem, destino in zip(caminho, caminho[1:]):
+                arestas.append((destino, origem))
+            for no in caminho:
+                if no not in arvore and no not in restantes and no not in terminais:
+                    pontes.append(no)
+                arvore.add(no)
+                restantes.discard(no)
+
+        conectados = {no for aresta in arestas for no in aresta}
+        resultado["tabelas_ponte"] = [grafo.name_of(no) for no in pontes]
+        resultado["arestas"] = [(grafo.name_of(a), grafo.name_of(b)) for a, b in arestas]
+        resultado["desconectadas"] = [grafo.name_of(no) for no in terminais if no not in conectados]
+        return resultado
+
+    @staticmethod
+    def _extremidades(ponte: str, arestas: List[Tuple[str, str]], pontes: Set[str]) -> Set[str]:
+        """
+        Tabelas (não-ponte) que a ponte liga na árvore, atravessando outras pontes do mesmo caminho.
+        """
+        vizinhos: Dict[str, Set[str]] = {}
+        for a, b in arestas:
+            vizinhos.setdefault(a.lower(), set()).add(b.lower())
+            vizinhos.setdefault(b.lower(), set()).add(a.lower())
+        extremidades, visitados, pilha = set(), {ponte.lower()}, [ponte.lower()]
+        while pilha:
+            for vizinho in vizinhos.get(pilha.pop(), ()):
+                if vizinho in visitados:
+                    continue
+                visitados.add(vizinho)
+                if vizinho in pontes:
+                    pilha.append(vizinho)
+                else:
+                    extremidades.add(vizinho)
+        return extremidades
+
+    @staticmethod
+    def bridging_results(resultados_busca: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        A partir dos resultados da busca, retorna resultados adicionais (mesmo formato do
+        SearchService) com os chunks das tabelas-ponte entre os melhores matches de cada consulta.
+        Lista vazia se desabilitado, se não houver pontes ou em caso de erro.
+
+        A ponte não foi pedida pelo usuário: recebe a similaridade da menor das tabelas que ela
+        liga, para nunca ficar à frente delas no contexto.
+        """
+        if not JoinPathFinder.ENABLED:
+            return []
+        try:
+            melhores_matches = [r["matches"][0] for r in resultados_busca if r.get("matches")]
+            melhores = [m.get("table_name", "") for m in melhores_matches]
+            por_nome = {m.get("table_name", "").lower(): m for m in melhores_matches}
+            arvore = JoinPathFinder.find_join_tree(melhores)
+            todas_pontes = {nome.lower() for nome in arvore["tabelas_ponte"]}
+            pontes = arvore["tabelas_ponte"][:JoinPathFinder.MAX_BRIDGES]
+            resultados = []
+            for nome in pontes:
+                chunks = TableNameResolver.lookup(nome)
+                if not chunks:
+                    continue
+                extremidades = [
+                    por_nome[t] for t in JoinPathFinder._extremidades(nome, arvore["arestas"], todas_pontes) if t in por_nome
+                ] or melhores_matches
+                menor = min(extremidades, key=lambda m: m.get("similarity_score") or 0.0)
+                score = menor.get("similarity_score") or 0.0
+                resultados.append({
+                    "query_table": f"ponte de junção: {nome}",
+                    "matches": [{
+                        **{campo: valor for campo, valor in chunks[0].items() if campo not in ("rrf_score", "lexical_score", "fontes")},
+                        "similarity_score": score,
+                        "similarity_percentage": menor.get("similarity_percentage", score * 100),
+                        "fontes": ["join_path"],
+                    }]
+                })
+        except Exception as e:
+            logger.error(f"\n[Join Path Finder] Falha ao calcular caminhos de junção: {e}")
+            return []
+
+        if resultados:
+            logger.info(f"\n[Join Path Finder] Tabelas-ponte adicionadas entre {melhores}: {[r['matches'][0]['table_name'] for r in resultados]}")
+        return resultados
@@ -0,0 +1,146 @@
+# src/application/services/maestro/prefetch_buffer.py
+
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from application.services.maestro.foreign_key_graph import ForeignKeyGraph
+from application.services.maestro.table_name_resolver import TableNameResolver
+from config.core.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+class PrefetchBuffer:
+    """
+    Buffer de uma requisição com os chunks das tabelas mostradas à LLM de verificação e de
+    seus vizinhos (1 salto) por FK.
+
+    `start()` preenche o buffer enquanto a verificação está em andamento. Não gera embeddings,
+    mas consulta o grafo de FKs e o catálogo, que podem ser (re)carregados do backend: por isso
+    roda fora do event loop, numa thread. Na iteração seguinte, `take()` atende direto do buffer
+    os nomes solicitados na resposta 1001, sem busca, esperando o prefetch no máximo
+    FK_PREFETCH_WAIT_SECONDS. A taxa de acerto agregada do processo fica em `get_stats()`.
+    """
+    ENABLED = os.getenv("FK_PREFETCH_ENABLED", "1") != "0"
+    WAIT_SECONDS = float(os.getenv("FK_PREFETCH_WAIT_SECONDS", "2"))
+
+    _stats_lock = threading.Lock()
+    _stats = {"solicitadas": 0, "acertos": 0, "chunks_prefetch": 0}
+
+    def __init__(self):
+        # chave -> {nome da tabela: chunk}; mais de uma tabela na mesma chave = nome ambíguo
+        self._chunks: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+        self._cancelado = False
+
+    @staticmethod
+    def _chaves(nome: str) -> List[str]:
+        """
+        Chaves pelas quais um chunk pode ser pedido: 'schema.tabela', 'tabela' e a tabela sem
+        os prefixos curtos de módulo ('cp_contrato_item' -> 'contrato_item'). Como várias tabelas
+        podem compartilhar a mesma chave, `take` só a usa quando ela aponta para uma única tabela.
+        """
+        qualificado = nome.strip().strip('"`\'').lower()
+        simples = qualificado.split(".", 1)[-1]
+        chaves = [qualificado, simples]
+        partes = simples.split("_")
+        while len(partes) > 1 and len(partes[0]) <= 3:
+            partes = partes[1:]
+            chaves.append("_".join(partes))
+        return list(dict.fromkeys(chaves))
+
+    def start(self, resultados_busca: List[Dict[str, Any]]) -> None:
+        """
+        Carrega no buffer os chunks das tabelas presentes nos resultados e de seus vizinhos por FK.
+        """
+        if not PrefetchBuffer.ENABLED:
+            return
+        nomes = [m.get("table_name", "") for r in resultados_busca for m in r.get("matches", []) if m.get("table_name")]
+        if not nomes:
+            return
+        try:
+            adicionados = self._prefetch(nomes)
+        except Exception as e:
+            logger.error(f"\n[Prefetch Buffer] Falha no prefetch dos vizinhos por FK: {e}")
+            return
+        with PrefetchBuffer._stats_lock:
+            PrefetchBuffer._stats["chunks_prefetch"] += adicionados
+        logger.info(f"\n[Prefetch Buffer] {adicionados} chunks de vizinhos por FK pré-carregados.")
+
+    def cancel(self) -> None:
+        """
+        Interrompe o prefetch em andamento quando não haverá outra iteração para usá-lo.
+        """
+        self._cancelado = True
+
+    def _prefetch(self, nomes: List[str]) -> int:
+        if self._cancelado:
+            return 0
+        # Inclui as próprias tabelas mostradas: a LLM às vezes pede de novo uma delas com outro nome
+        vizinhos = list(ForeignKeyGraph.get_current().expand(nomes, hops=1))
+        adicionados = 0
+        for vizinho in vizinhos:
+            if self._cancelado:
+                break
+            chunks = TableNameResolver.lookup(vizinho)
+            if not chunks:
+                continue
+            with self._lock:
+                for chave in self._chaves(vizinho):
+                    self._chunks.setdefault(chave, {})[chunks[0].get("table_name", vizinho).lower()] = chunks[0]
+            adicionados += 1
+        return adicionados
+
+    def _encontrar(self, nome: str) -> Optional[Dict[str, Any]]:
+        # Da chave mais específica para a mais curta; uma chave ambígua encerra a procura (vai para a busca)
+        for chave in self._chaves(nome):
+            candidatos = self._chunks.get(chave)
+            if candidatos:
+                return next(iter(candidatos.values())) if len(candidatos) == 1 else None
+        return None
+
+    def take(self, nomes_tabelas: List[str]) -> Tuple[List[Dict[str, Any]], List[str]]:
+        """
+        Separa os nomes solicitados em acertos do buffer e nomes que ainda precisam de busca.
+
+        Returns:
+            (resultados, faltantes): `resultados` no formato do SearchService ({"query_table", "matches"});
+            `faltantes` com os nomes não encontrados no buffer, na ordem original.
+        """
+        if not PrefetchBuffer.ENABLED or not nomes_tabelas:
+            return [], list(nomes_tabelas)
+
+        resultados: List[Dict[str, Any]] = []
+        faltantes: List[str] = []
+        with self._lock:
+            for nome in nomes_tabelas:
+                encontrado = self._encontrar(nome)
+                if encontrado is not None:
+                    resultados.append({
+                        "query_table": nome,
+                        "matches": [{**encontrado, "similarity_score": 1.0, "similarity_percentage": 100.0, "fontes": ["prefetch_fk"]}]
+                    })
+                else:
+                    faltantes.append(nome)
+
+        with PrefetchBuffer._stats_lock:
+            PrefetchBuffer._stats["solicitadas"] += len(nomes_tabelas)
+            PrefetchBuffer._stats["acertos"] += len(resultados)
+        if resultados:
+            logger.info(f"\n[Prefetch Buffer] Atendidas pelo buffer: {[r['query_table'] for r in resultados]}. Faltantes: {faltantes}")
+        return resultados, faltantes
+
+    @staticmethod
+    def get_stats() -> Dict[str, Any]:
+        """
+        Métricas agregadas do processo: tabelas solicitadas em respostas 1001, acertos no buffer e taxa de acerto.
+        """
+        with PrefetchBuffer._stats_lock:
+            stats = dict(PrefetchBuffer._stats)
+        stats["taxa_acerto"] = stats["acertos"] / stats["solicitadas"] if stats["solicitadas"] else 0.0
+        return stats
+
+    @staticmethod
+    def reset_stats() -> None:
+        with PrefetchBuffer._stats_lock:
+            PrefetchBuffer._stats = {"solicitadas": 0, "acertos": 0, "chunks_prefetch": 0}
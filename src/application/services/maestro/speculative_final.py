@@ -0,0 +1,156 @@
+# src/application/services/maestro/speculative_final.py
+
+import asyncio
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from application.services.maestro.extraction_manager import ExtractionManager
+from shared.utils.request_budget import RequestBudget, estimate_tokens
+from config.core.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+
+class SpeculativeFinal:
+    """
+    Resposta final gerada de forma especulativa, em paralelo com a verificação de suficiência.
+
+    A geração começa sobre o contexto que a resposta final usaria se a verificação devolvesse
+    2002 (tabelas mantidas + matches da busca atual). Com 2002 o resultado é confirmado
+    (`commit`) e a espera pelo modelo da resposta final sai do caminho crítico; com qualquer
+    outro código a tarefa é cancelada e descartada (`cancel`).
+
+    No modo streaming os trechos gerados antes da confirmação ficam retidos e são repassados
+    de uma vez no `commit`; os seguintes seguem direto para `notificar`.
+
+    Política (RAG_SPECULATIVE_FINAL): 'sempre', 'nunca' ou 'auto' (padrão), que especula
+    enquanto a taxa observada de 2002 (média móvel, separada para a primeira verificação e
+    para as seguintes) estiver acima de RAG_SPECULATIVE_MIN_RATE. A taxa começa abaixo do
+    mínimo: cada especulação descartada é uma chamada ao modelo mais caro paga à toa, então
+    o processo só passa a especular depois de observar verificações que a justifiquem.
+
+    A chamada especulativa é cobrada do RequestBudget da requisição mesmo quando cancelada.
+    """
+    POLITICA = os.getenv("RAG_SPECULATIVE_FINAL", "auto")
+    TAXA_MINIMA = float(os.getenv("RAG_SPECULATIVE_MIN_RATE", "0.6"))
+    _TAXA_INICIAL = 0.5
+    _ALFA_EWMA = 0.1
+
+    _lock = threading.Lock()
+    _taxa_2002: Dict[str, float] = {"primeira": _TAXA_INICIAL, "seguintes": _TAXA_INICIAL}
+    _stats: Dict[str, float] = {"iniciadas": 0, "aproveitadas": 0, "descartadas": 0, "economia_estimada_ms": 0.0}
+
+    def __init__(
+        self,
+        prompt_usuario: str,
+        tabelas: List[Dict[str, Any]],
+        notificar: Optional[Callable[[Dict[str, Any]], None]] = None,
+        nivel_modelo: str = "forte"
+    ):
+        self._prompt_usuario = prompt_usuario
+        self._tabelas = tabelas
+        self._notificar = notificar
+        self._nivel_modelo = nivel_modelo
+        self._trechos: List[str] = []
+        self._confirmada = False
+        self._tarefa: Optional[asyncio.Task] = None
+        self._inicio = 0.0
+
+    @staticmethod
+    def _grupo(iteracao: int) -> str:
+        return "primeira" if iteracao == 0 else "seguintes"
+
+    @staticmethod
+    def should_speculate(iteracao: int) -> bool:
+        if SpeculativeFinal.POLITICA == "sempre":
+            return True
+        if SpeculativeFinal.POLITICA != "auto":
+            return False
+        with SpeculativeFinal._lock:
+            return SpeculativeFinal._taxa_2002[SpeculativeFinal._grupo(iteracao)] >= SpeculativeFinal.TAXA_MINIMA
+
+    @staticmethod
+    def record_verification(iteracao: int, codigo: Optional[str]) -> None:
+        """
+        Atualiza a taxa de 2002 usada pela política 'auto'.
+        """
+        grupo = SpeculativeFinal._grupo(iteracao)
+        with SpeculativeFinal._lock:
+            anterior = SpeculativeFinal._taxa_2002[grupo]
+            SpeculativeFinal._taxa_2002[grupo] = (1 - SpeculativeFinal._ALFA_EWMA) * anterior + SpeculativeFinal._ALFA_EWMA * (1.0 if codigo == "2002" else 0.0)
+
+    def start(self) -> "SpeculativeFinal":
+        """
+        Dispara a geração como tarefa no loop atual (herda o contexto: trace e orçamento).
+        """
+        self._inicio = time.monotonic()
+        self._tarefa = asyncio.create_task(self._gerar())
+        # Evita o aviso de exceção não lida quando a tarefa é descartada
+        self._tarefa.add_done_callback(lambda tarefa: tarefa.cancelled() or tarefa.exception())
+        with SpeculativeFinal._lock:
+            SpeculativeFinal._stats["iniciadas"] += 1
+        return self
+
+    async def _gerar(self) -> str:
+        if self._notificar is None:
+            return await ExtractionManager.final_response_async(
+                prompt_usuario=self._prompt_usuario,
+                resultados_similares=self._tabelas,
+                nivel_modelo=self._nivel_modelo
+            )
+        async for trecho in ExtractionManager.final_response_stream_async(self._prompt_usuario, self._tabelas, nivel_modelo=self._nivel_modelo):
+            self._trechos.append(trecho)
+            if self._confirmada:
+                self._notificar({"tipo": "token", "texto": trecho})
+        return "".join(self._trechos)
+
+    async def commit(self) -> str:
+        """
+        Confirma a resposta especulativa e aguarda o seu término.
+        """
+        adiantado = time.monotonic() - self._inicio
+        if self._notificar is not None:
+            self._notificar({"tipo": "etapa", "etapa": "resposta_final", "tabelas": len(self._tabelas), "especulativa": True})
+            # Sem await entre o repasse e a marcação: nenhum trecho é perdido nem duplicado
+            for trecho in self._trechos:
+                self._notificar({"tipo": "token", "texto": trecho})
+        self._confirmada = True
+
+        resposta_final = await self._tarefa
+        duracao = time.monotonic() - self._inicio
+        RequestBudget.record_stage_cost("resposta_final", duracao)
+        with SpeculativeFinal._lock:
+            SpeculativeFinal._stats["aproveitadas"] += 1
+            SpeculativeFinal._stats["economia_estimada_ms"] += min(adiantado, duracao) * 1000
+        logger.info(f"\n[Speculative Final] Resposta especulativa confirmada ({min(adiantado, duracao):.2f}s adiantados).")
+        return resposta_final
+
+    def cancel(self) -> None:
+        """
+        Descarta a resposta especulativa, cancelando a geração se ainda estiver em andamento.
+        """
+        if self._tarefa is not None and not self._tarefa.done():
+            self._tarefa.cancel()
+            # Interrompida, a chamada não chega a registrar o uso, mas a API cobra o que já
+            # recebeu e gerou: registra a estimativa no orçamento da requisição
+            tokens_entrada = estimate_tokens(self._prompt_usuario) + sum(estimate_tokens(t.get("content", "")) for t in self._tabelas)
+            RequestBudget.record_llm_call(tokens_entrada, estimate_tokens("".join(self._trechos)))
+        with SpeculativeFinal._lock:
+            SpeculativeFinal._stats["descartadas"] += 1
+
+    @staticmethod
+    def get_stats() -> Dict[str, Any]:
+        with SpeculativeFinal._lock:
+            stats = dict(SpeculativeFinal._stats)
+            stats["economia_estimada_ms"] = round(stats["economia_estimada_ms"], 3)
+            stats["taxa_2002"] = {grupo: round(taxa, 4) for grupo, taxa in SpeculativeFinal._taxa_2002.items()}
+        stats["politica"] = SpeculativeFinal.POLITICA
+        return stats
+
+    @staticmethod
+    def reset_stats() -> None:
+        with SpeculativeFinal._lock:
+            SpeculativeFinal._taxa_2002 = {"primeira": SpeculativeFinal._TAXA_INICIAL, "seguintes": SpeculativeFinal._TAXA_INICIAL}
+            SpeculativeFinal._stats = {"iniciadas": 0, "aproveitadas": 0, "descartadas": 0, "economia_estimada_ms": 0.0}
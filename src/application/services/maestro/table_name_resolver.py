@@ -0,0 +1,103 @@
+# src/application/services/maestro/table_name_resolver.py
+
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from infrastructure.persistence.schema_catalog import SchemaCatalog
+from config.core.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+class TableNameResolver:
+    """
+    Resolução exata de nomes de tabelas contra o catálogo, sem embeddings nem busca vetorial.
+
+    Mantém dois índices hash construídos a partir do SchemaCatalog:
+    'schema.tabela' -> chunk e 'tabela' -> chunks (um nome simples pode existir em vários schemas).
+    Os índices são reconstruídos apenas quando a versão do catálogo muda.
+    """
+    ENABLED = os.getenv("EXACT_NAME_RESOLUTION", "1") != "0"
+
+    _indice_qualificado: Dict[str, Dict[str, Any]] = {}
+    _indice_nome: Dict[str, List[Dict[str, Any]]] = {}
+    _versao_indexada: Optional[str] = None
+    _lock = threading.Lock()
+
+    @staticmethod
+    def _normalizar(nome: str) -> str:
+        return nome.strip().strip('"`\'').lower()
+
+    @staticmethod
+    def _garantir_indice() -> None:
+        tabelas = SchemaCatalog.get_tables()
+        versao = SchemaCatalog.get_version()
+        if versao == TableNameResolver._versao_indexada:
+            return
+
+        with TableNameResolver._lock:
+            if versao == TableNameResolver._versao_indexada:
+                return
+            indice_qualificado: Dict[str, Dict[str, Any]] = {}
+            indice_nome: Dict[str, List[Dict[str, Any]]] = {}
+            for tabela in tabelas:
+                nome_qualificado = TableNameResolver._normalizar(tabela.get("table_name", ""))
+                if not nome_qualificado:
+                    continue
+                indice_qualificado[nome_qualificado] = tabela
+                nome_simples = nome_qualificado.split(".", 1)[-1]
+                indice_nome.setdefault(nome_simples, []).append(tabela)
+
+            TableNameResolver._indice_qualificado = indice_qualificado
+            TableNameResolver._indice_nome = indice_nome
+            TableNameResolver._versao_indexada = versao
+            logger.info(f"\n[Table Name Resolver] Índice de nomes reconstruído: {len(indice_qualificado)} tabelas (versão {versao}).")
+
+    @staticmethod
+    def lookup(nome: str) -> List[Dict[str, Any]]:
+        """
+        Retorna os chunks do catálogo cujo nome corresponde exatamente a `nome`
+        ('schema.tabela' ou apenas 'tabela'). Lista vazia se não houver correspondência.
+        """
+        TableNameResolver._garantir_indice()
+        chave = TableNameResolver._normalizar(nome)
+        if "." in chave:
+            tabela = TableNameResolver._indice_qualificado.get(chave)
+            return [tabela] if tabela else []
+        return list(TableNameResolver._indice_nome.get(chave, []))
+
+    @staticmethod
+    def resolve(nomes_tabelas: List[str]) -> Tuple[List[Dict[str, Any]], List[str]]:
+        """
+        Separa os nomes em acertos exatos e nomes que ainda precisam da busca vetorial.
+
+        Returns:
+            (resultados, faltantes): `resultados` no mesmo formato do SearchService
+            ({"query_table", "matches"}), com similaridade 100%; `faltantes` com os nomes
+            sem correspondência exata, na ordem original.
+        """
+        if not TableNameResolver.ENABLED or not nomes_tabelas:
+            return [], list(nomes_tabelas)
+
+        try:
+            resultados: List[Dict[str, Any]] = []
+            faltantes: List[str] = []
+            for nome in nomes_tabelas:
+                encontrados = TableNameResolver.lookup(nome)
+                if encontrados:
+                    resultados.append({
+                        "query_table": nome,
+                        "matches": [
+                            {**tabela, "similarity_score": 1.0, "similarity_percentage": 100.0}
+                            for tabela in encontrados
+                        ]
+                    })
+                else:
+                    faltantes.append(nome)
+        except Exception as e:
+            logger.error(f"\n[Table Name Resolver] Falha na resolução exata, usando apenas a busca vetorial: {e}")
+            return [], list(nomes_tabelas)
+
+        if resultados:
+            logger.info(f"\n[Table Name Resolver] Resolvidas por nome exato: {[r['query_table'] for r in resultados]}. Para busca vetorial: {faltantes}")
+        return resultados, faltantes
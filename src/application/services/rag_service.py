@@ -1,10 +1,28 @@
 # src/application/services/rag_service.py
 
-from typing import Dict, Any, List
+import asyncio
+import os
+import threading
+import time
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+import numpy as np
 from application.services.maestro.extraction_manager import ExtractionManager
 from application.services.maestro.embedding_manager import EmbeddingManager
 from infrastructure.vector_database.search_service import SearchService
+from infrastructure.external_services.embedding_service import EmbeddingService
+from infrastructure.external_services.llm_rate_limiter import LLMUnavailableError
+from infrastructure.external_services.llm_service import LLMService
+from infrastructure.persistence.schema_catalog import SchemaCatalog
+from infrastructure.persistence.semantic_response_cache import SemanticResponseCache
 from application.services.maestro.filter_tables import FilterTables
+from application.services.maestro.table_name_resolver import TableNameResolver
+from application.services.maestro.join_path_finder import JoinPathFinder
+from application.services.maestro.prefetch_buffer import PrefetchBuffer
+from application.services.maestro.speculative_final import SpeculativeFinal
+from shared.utils.async_runner import AsyncRunner
+from shared.utils.tracing import Tracer
+from shared.utils.request_budget import RequestBudget, estimate_tokens
+from shared.utils.request_coalescer import CoalescingScope
 from config.core.logging_config import setup_logging, get_logger
 
 setup_logging(profile="api_server")
@@ -12,46 +30,387 @@ logger = get_logger(__name__)
 
 class RAGService:
 
+    # Cache semântico das respostas finais (ver SemanticResponseCache). Desabilite com SEMANTIC_CACHE_ENABLED=0.
+    _cache_semantico: Optional[SemanticResponseCache] = None
+    _cache_semantico_lock = threading.Lock()
+
+    # Lotes (/sql-gen/batch): pipelines simultâneos, tamanho máximo e janela de agrupamento
+    # dos embeddings e buscas vetoriais entre os prompts do lote
+    BATCH_CONCORRENCIA = int(os.getenv("RAG_BATCH_CONCURRENCY", "8"))
+    BATCH_MAX_PROMPTS = int(os.getenv("RAG_BATCH_MAX_PROMPTS", "500"))
+    BATCH_JANELA_SEGUNDOS = float(os.getenv("RAG_BATCH_WINDOW_MS", "50")) / 1000
+
+    @staticmethod
+    def get_semantic_cache() -> Optional[SemanticResponseCache]:
+        """
+        Retorna o cache semântico de respostas do processo, criando-o na primeira chamada.
+        """
+        if not SemanticResponseCache.ENABLED:
+            return None
+        if RAGService._cache_semantico is None:
+            with RAGService._cache_semantico_lock:
+                if RAGService._cache_semantico is None:
+                    RAGService._cache_semantico = SemanticResponseCache()
+        return RAGService._cache_semantico
+
+    @staticmethod
+    def get_semantic_cache_stats() -> Dict[str, Any]:
+        """
+        Retorna os contadores de acerto/falha do cache semântico de respostas.
+        """
+        cache = RAGService.get_semantic_cache()
+        if cache is None:
+            return {"habilitado": False}
+        return {"habilitado": True, **cache.get_stats()}
+
     @staticmethod
     def generate_sql_from_prompt(prompt_usuario: str) -> Dict[str, Any]:
-        max_iteracoes = 10
+        """
+        Ponto de entrada síncrono: executa o pipeline assíncrono no loop compartilhado do
+        processo (AsyncRunner) e bloqueia até o resultado.
+        """
+        return AsyncRunner.run(RAGService.generate_sql_from_prompt_async(prompt_usuario))
+
+    @staticmethod
+    def generate_sql_batch(prompts: List[str], concorrencia: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Ponto de entrada síncrono de `generate_sql_batch_async`: devolve os resultados na
+        ordem dos prompts (sem o resumo).
+        """
+        async def coletar() -> List[Dict[str, Any]]:
+            return [r async for r in RAGService.generate_sql_batch_async(prompts, concorrencia) if r["tipo"] == "resultado"]
+        return sorted(AsyncRunner.run(coletar()), key=lambda r: r["indice"])
+
+    @staticmethod
+    async def generate_sql_batch_async(
+        prompts: List[str],
+        concorrencia: Optional[int] = None,
+        incluir_timings: bool = False,
+        orcamento: Optional[Dict[str, Any]] = None,
+        usar_cache: bool = True
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Executa vários prompts com no máximo `concorrencia` pipelines simultâneos e produz os
+        resultados na ordem em que terminam: {"tipo": "resultado", "indice", "prompt", ...}
+        com o mesmo conteúdo de `generate_sql_from_prompt_async`.
+
+        Os prompts do lote compartilham trabalho: prompts repetidos (após normalização) rodam
+        uma vez; os embeddings ausentes do cache de todos os pipelines em andamento vão juntos,
+        deduplicados, para a API; e cada nome de tabela é buscado uma única vez no backend
+        vetorial (ver CoalescingScope). `orcamento` (mesmo formato do campo da requisição) vale
+        para cada prompt, contado a partir do início do seu pipeline.
+
+        Ao fim, produz {"tipo": "resumo"} com os totais e o compartilhamento do lote.
+        """
+        escopo = CoalescingScope(janela_segundos=RAGService.BATCH_JANELA_SEGUNDOS)
+        semaforo = asyncio.Semaphore(max(1, concorrencia or RAGService.BATCH_CONCORRENCIA))
+        grupos: Dict[str, List[int]] = {}
+        for indice, prompt in enumerate(prompts):
+            grupos.setdefault(SemanticResponseCache.normalizar_prompt(prompt), []).append(indice)
+
+        async def executar(indices: List[int]) -> Tuple[List[int], Dict[str, Any]]:
+            async with semaforo:
+                with escopo.ativar():
+                    try:
+                        resultado = await RAGService.generate_sql_from_prompt_async(
+                            prompts[indices[0]], incluir_timings=incluir_timings,
+                            orcamento=RequestBudget.from_dict(orcamento), usar_cache=usar_cache
+                        )
+                    except Exception as e:
+                        logger.error(f"\n[RAG SERVICE] Erro no prompt {indices[0]} do lote: {e}", exc_info=True)
+                        resultado = {"sucesso": False, "sql_gerado_final": None, "resposta_texto": None, "erro": f"Erro ao processar o prompt: {e}"}
+            return indices, resultado
+
+        logger.info(f"\n[RAG SERVICE] Lote recebido: {len(prompts)} prompts ({len(grupos)} distintos).")
+        inicio = time.monotonic()
+        sucessos = 0
+        tarefas = [asyncio.ensure_future(executar(indices)) for indices in grupos.values()]
+        try:
+            for proxima in asyncio.as_completed(tarefas):
+                indices, resultado = await proxima
+                for indice in indices:
+                    sucessos += 1 if resultado.get("sucesso") else 0
+                    yield {"tipo": "resultado", "indice": indice, "prompt": prompts[indice], **resultado}
+        finally:
+            # Consumidor encerrou antes do fim (ex.: cliente desconectou): descarta o restante
+            for tarefa in tarefas:
+                tarefa.cancel()
+
+        yield {
+            "tipo": "resumo",
+            "total": len(prompts),
+            "prompts_distintos": len(grupos),
+            "sucessos": sucessos,
+            "duracao_ms": round((time.monotonic() - inicio) * 1000, 3),
+            "compartilhamento": escopo.get_stats(),
+        }
+
+    @staticmethod
+    async def _buscar_tabelas_async(
+        tabelas_extraidas_nesta_iteracao: List[str],
+        colunas_extraidas: List[str],
+        iteracao_atual: int,
+        buffer_prefetch: PrefetchBuffer,
+        tarefa_prefetch: Optional[asyncio.Task] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Recupera os chunks das tabelas pedidas nesta iteração: buffer de prefetch, nomes exatos
+        do catálogo e, para o restante, embeddings + busca vetorial fundida aos índices locais.
+        """
+        resultados_busca_atual: List[Dict[str, Any]] = []
+        if tabelas_extraidas_nesta_iteracao and iteracao_atual > 0:
+            # Tabelas pedidas na resposta 1001 costumam ser vizinhas por FK das já mostradas
+            if tarefa_prefetch is not None and not tarefa_prefetch.done():
+                # O prefetch rodou junto com a verificação; espera o restante só até o limite
+                await asyncio.wait({tarefa_prefetch}, timeout=PrefetchBuffer.WAIT_SECONDS)
+            resultados_prefetch, tabelas_extraidas_nesta_iteracao = await asyncio.to_thread(buffer_prefetch.take, tabelas_extraidas_nesta_iteracao)
+            resultados_busca_atual.extend(resultados_prefetch)
+
+        if tabelas_extraidas_nesta_iteracao:
+            # Nomes reais (ex.: 'el_compras.cp_contrato_item') são resolvidos direto no catálogo
+            resultados_exatos, tabelas_para_busca_vetorial = await asyncio.to_thread(TableNameResolver.resolve, tabelas_extraidas_nesta_iteracao)
+            resultados_busca_atual.extend(resultados_exatos)
+
+            if tabelas_para_busca_vetorial:
+                logger.info(f"\n[RAG SERVICE] Gerando embeddings para: {tabelas_para_busca_vetorial}")
+                # Embeddings (rede) e índices locais léxico/BM25 (CPU) em paralelo
+                resultado_embeddings, rankings_locais = await asyncio.gather(
+                    EmbeddingManager.generate_embeddings_for_tables_async(tabelas_para_busca_vetorial),
+                    asyncio.to_thread(SearchService.compute_local_rankings, tabelas_para_busca_vetorial, 5, colunas_extraidas)
+                )
+                embeddings_gerados = resultado_embeddings.get("embeddings")
+
+                if embeddings_gerados is not None and embeddings_gerados.size > 0:
+                    logger.info(f"\n[RAG SERVICE] Buscando tabelas similares")
+                    resultados_busca_atual.extend(await SearchService.find_top_similar_tables_async(
+                        query_embeddings=embeddings_gerados,
+                        query_table_names=tabelas_para_busca_vetorial,
+                        k=5, # Ajuste o k conforme necessário
+                        query_context=colunas_extraidas, # Colunas do prompt também entram na busca BM25
+                        local_rankings=rankings_locais
+                    ))
+                else:
+                    logger.warning(f"\n[RAG SERVICE] Nenhum embedding gerado para {tabelas_para_busca_vetorial}. Usando apenas os índices locais.")
+                    resultados_busca_atual.extend(SearchService.merge_local_rankings([], tabelas_para_busca_vetorial, 5, rankings_locais))
+        elif iteracao_atual == 0 and colunas_extraidas:
+            # O prompt cita apenas colunas: procura as tabelas que as contêm direto no conteúdo dos chunks
+            logger.info(f"\n[RAG SERVICE] Nenhuma tabela extraída. Buscando pelas colunas no conteúdo dos chunks: {colunas_extraidas}")
+            matches_colunas = await asyncio.to_thread(SearchService.search_content, " ".join(colunas_extraidas), 5)
+            if matches_colunas:
+                resultados_busca_atual.append({"query_table": f"colunas: {', '.join(colunas_extraidas)}", "matches": matches_colunas})
+        elif not resultados_busca_atual:
+            logger.info(f"\n[RAG SERVICE] Nenhuma tabela para buscar nesta iteração.")
+
+        if iteracao_atual == 0 and resultados_busca_atual:
+            # Tabelas intermediárias do caminho de junção entram já na primeira verificação,
+            # em vez de serem descobertas uma a uma por respostas 1001
+            resultados_busca_atual.extend(await asyncio.to_thread(JoinPathFinder.bridging_results, resultados_busca_atual))
+        return resultados_busca_atual
+
+    @staticmethod
+    def _notificar(notificar: Optional[Callable[[Dict[str, Any]], None]], evento: Dict[str, Any]) -> None:
+        if notificar is None:
+            return
+        try:
+            notificar(evento)
+        except Exception as e:
+            # Um consumidor com problema (ex.: cliente SSE desconectado) não interrompe o pipeline
+            logger.warning(f"\n[RAG SERVICE] Falha ao notificar evento {evento.get('tipo')}: {e}")
+
+    @staticmethod
+    async def _gerar_resposta_final(
+        prompt_usuario: str,
+        tabelas_mantidas_acumuladas: List[Dict[str, Any]],
+        notificar: Optional[Callable[[Dict[str, Any]], None]] = None
+    ) -> str:
+        """
+        Gera a resposta final. Com `notificar`, usa a geração em streaming e repassa cada trecho
+        como evento {"tipo": "token"}; o texto completo é devolvido nos dois casos.
+        """
+        RAGService._notificar(notificar, {"tipo": "etapa", "etapa": "resposta_final", "tabelas": len(tabelas_mantidas_acumuladas)})
+        inicio = time.monotonic()
+        if notificar is None:
+            resposta_final = await ExtractionManager.final_response_async(
+                prompt_usuario=prompt_usuario,
+                resultados_similares=tabelas_mantidas_acumuladas,
+                nivel_modelo="forte"
+            )
+        else:
+            trechos: List[str] = []
+            async for trecho in ExtractionManager.final_response_stream_async(prompt_usuario, tabelas_mantidas_acumuladas, nivel_modelo="forte"):
+                trechos.append(trecho)
+                RAGService._notificar(notificar, {"tipo": "token", "texto": trecho})
+            resposta_final = "".join(trechos)
+        RequestBudget.record_stage_cost("resposta_final", time.monotonic() - inicio)
+        return resposta_final
+
+    @staticmethod
+    def _acumular_matches(tabelas_acumuladas: List[Dict[str, Any]], resultados_busca: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Adiciona à lista (e devolve) os matches dos resultados de busca ainda não presentes nela.
+        """
+        for resultado_busca in resultados_busca:
+            for match in resultado_busca.get("matches", []):
+                # Evitar duplicatas em tabelas_acumuladas
+                if not any(t.get("table_name") == match.get("table_name") for t in tabelas_acumuladas):
+                    tabelas_acumuladas.append(match)
+        return tabelas_acumuladas
+
+    @staticmethod
+    def _estimar_tokens_contexto(prompt_usuario: str, resultados_busca: List[Dict[str, Any]]) -> int:
+        return estimate_tokens(prompt_usuario) + sum(
+            estimate_tokens(match.get("content", "")) for resultado in resultados_busca for match in resultado.get("matches", [])
+        )
+
+    @staticmethod
+    async def generate_sql_from_prompt_async(
+        prompt_usuario: str,
+        notificar: Optional[Callable[[Dict[str, Any]], None]] = None,
+        incluir_timings: bool = False,
+        orcamento: Optional[RequestBudget] = None,
+        usar_cache: bool = True
+    ) -> Dict[str, Any]:
+        """
+        Pipeline RAG assíncrono: extração, busca e verificação iterativa, e resposta final.
+        Deve ser aguardado no loop do AsyncRunner (clientes assíncronos do Gemini e do Qdrant).
+
+        `notificar`, se informado, recebe eventos de progresso ({"tipo": "etapa", "etapa": ...})
+        e os trechos da resposta final ({"tipo": "token", "texto": ...}). É chamado a partir do
+        loop do AsyncRunner, então deve ser rápido e thread-safe (ex.: `queue.Queue.put`).
+
+        Cada etapa é medida por um span (ver Tracer); com `incluir_timings` os spans voltam
+        no campo `timings` da resposta.
+
+        `orcamento` limita tempo, chamadas à LLM e tokens de entrada (padrões do RequestBudget
+        se omitido). O prazo limita o timeout de cada chamada externa e, quando não cabe outra
+        verificação, o loop vai direto à resposta final. O consumo volta no campo `orcamento`.
+
+        Conforme a política do SpeculativeFinal, a resposta final começa em paralelo com a
+        verificação e só é aproveitada se a verificação devolver 2002.
+
+        Com `usar_cache` (e SEMANTIC_CACHE_ENABLED), um prompt equivalente a outro já respondido
+        no mesmo catálogo devolve a resposta armazenada, com o campo `cache_semantico`.
+
+        Se a LLM não puder atender (limite de taxa ou cota esgotada), devolve sucesso False com
+        `indisponivel` e `tentar_novamente_em` (segundos), para o cliente repetir mais tarde.
+        """
+        orcamento = orcamento or RequestBudget()
+        with Tracer.trace("rag.sql_gen", caracteres_prompt=len(prompt_usuario)) as trace, orcamento.ativar():
+            cache = RAGService.get_semantic_cache() if usar_cache else None
+            vetor_prompt, versao_catalogo, resultado = None, None, None
+            if cache is not None:
+                vetor_prompt, versao_catalogo, resultado = await RAGService._consultar_cache_semantico(cache, prompt_usuario, notificar)
+            if resultado is None:
+                try:
+                    resultado = await RAGService._executar_pipeline_async(prompt_usuario, notificar, orcamento)
+                except LLMUnavailableError as e:
+                    logger.warning(f"\n[RAG SERVICE] LLM indisponível para o prompt: {e}")
+                    resultado = RAGService._resultado_indisponivel(e)
+                if vetor_prompt is not None and RAGService._pode_armazenar(resultado, orcamento):
+                    cache.put(vetor_prompt, prompt_usuario, versao_catalogo, resultado["sql_gerado_final"], resultado["tabelas_utilizadas"])
+        resultado["orcamento"] = orcamento.to_dict()
+        if incluir_timings and trace is not None:
+            resultado["timings"] = trace.resumo()
+        return resultado
+
+    @staticmethod
+    async def _consultar_cache_semantico(
+        cache: SemanticResponseCache,
+        prompt_usuario: str,
+        notificar: Optional[Callable[[Dict[str, Any]], None]]
+    ) -> Tuple[Optional[np.ndarray], Optional[str], Optional[Dict[str, Any]]]:
+        """
+        Gera o embedding do prompt normalizado e consulta o cache semântico.
+
+        Returns:
+            (vetor do prompt ou None se o embedding falhou, versão do catálogo, resultado do cache ou None).
+        """
+        with Tracer.span("cache.semantico") as span:
+            vetores, versao_catalogo = await asyncio.gather(
+                EmbeddingService.embed_texts_async([SemanticResponseCache.normalizar_prompt(prompt_usuario)]),
+                asyncio.to_thread(SchemaCatalog.get_version)
+            )
+            if vetores is None or len(vetores) == 0:
+                span.set(acerto=False, erro="embedding")
+                return None, versao_catalogo, None
+            vetor_prompt = vetores[0]
+            acerto = cache.get(vetor_prompt, prompt_usuario, versao_catalogo)
+            span.set(acerto=acerto is not None, similaridade=acerto["similaridade"] if acerto else None)
+
+        if acerto is None:
+            return vetor_prompt, versao_catalogo, None
+
+        logger.info(f"\n[RAG SERVICE] Resposta servida pelo cache semântico (similaridade {acerto['similaridade']:.3f} com '{acerto['prompt_original']}').")
+        RAGService._notificar(notificar, {"tipo": "etapa", "etapa": "cache_semantico", "similaridade": acerto["similaridade"]})
+        RAGService._notificar(notificar, {"tipo": "token", "texto": acerto["sql_gerado_final"]})
+        return vetor_prompt, versao_catalogo, {
+            "sucesso": True,
+            "sql_gerado_final": acerto["sql_gerado_final"],
+            "resposta_texto": "Resposta recuperada do cache semântico.",
+            "erro": None,
+            "tabelas_utilizadas": acerto["tabelas"],
+            "cache_semantico": {"similaridade": acerto["similaridade"], "prompt_original": acerto["prompt_original"]},
+        }
+
+    @staticmethod
+    def _resultado_indisponivel(erro: LLMUnavailableError) -> Dict[str, Any]:
+        return {
+            "sucesso": False,
+            "sql_gerado_final": None,
+            "resposta_texto": None,
+            "erro": f"Modelo de linguagem temporariamente indisponível: {erro}",
+            "indisponivel": True,
+            "tentar_novamente_em": round(erro.retry_after, 3) if erro.retry_after is not None else None,
+        }
+
+    @staticmethod
+    def _pode_armazenar(resultado: Dict[str, Any], orcamento: RequestBudget) -> bool:
+        # Respostas sem tabelas (fallback) ou cortadas pelo orçamento não são reaproveitadas
+        return bool(
+            resultado.get("sucesso")
+            and resultado.get("sql_gerado_final")
+            and resultado.get("tabelas_utilizadas")
+            and orcamento.encerrado_por is None
+        )
+
+    @staticmethod
+    async def _executar_pipeline_async(
+        prompt_usuario: str,
+        notificar: Optional[Callable[[Dict[str, Any]], None]],
+        orcamento: RequestBudget
+    ) -> Dict[str, Any]:
+        max_iteracoes = RequestBudget.MAX_ITERACOES
         iteracao_atual = 0
         tabelas_mantidas_acumuladas: List[Dict[str, Any]] = []
         resposta_final = None
         tabelas_a_buscar: List[str] = []
+        colunas_extraidas: List[str] = []
+        buffer_prefetch = PrefetchBuffer() # Vizinhos por FK carregados a cada verificação
+        tarefa_prefetch: Optional[asyncio.Task] = None
 
         logger.info(f"\n[RAG SERVICE] Prompt recebido: '{prompt_usuario}'")
 
         while iteracao_atual <= max_iteracoes:
             logger.info(f"\n[RAG SERVICE] Iteração {iteracao_atual + 1}/{max_iteracoes + 1}")
+            Tracer.set_context(iteracao=iteracao_atual)
 
             tabelas_extraidas_nesta_iteracao: List[str]
             if iteracao_atual == 0:
                 logger.info(f"\n[RAG SERVICE] Extraindo entidades do prompt inicial")
-                resultado_extracao = ExtractionManager.extract_entities_from_prompt(prompt_usuario, nivel_modelo="medio")
+                RAGService._notificar(notificar, {"tipo": "etapa", "etapa": "extracao", "iteracao": iteracao_atual})
+                resultado_extracao = await ExtractionManager.extract_entities_from_prompt_async(prompt_usuario, nivel_modelo="medio")
                 tabelas_extraidas_nesta_iteracao = resultado_extracao.get("tabelas", [])
+                colunas_extraidas = resultado_extracao.get("colunas", [])
             else:
                 logger.info(f"\n[RAG SERVICE] Usando tabelas solicitadas da iteração anterior: {tabelas_a_buscar}")
                 tabelas_extraidas_nesta_iteracao = tabelas_a_buscar
 
-            resultados_busca_atual: List[Dict[str, Any]] = []
-            if tabelas_extraidas_nesta_iteracao:
-                logger.info(f"\n[RAG SERVICE] Gerando embeddings para: {tabelas_extraidas_nesta_iteracao}")
-                resultado_embeddings = EmbeddingManager.generate_embeddings_for_tables(tabelas_extraidas_nesta_iteracao)
-                embeddings_gerados = resultado_embeddings.get("embeddings")
-
-                if embeddings_gerados is not None and embeddings_gerados.size > 0:
-                    logger.info(f"\n[RAG SERVICE] Buscando tabelas similares")
-                    resultados_busca_atual = SearchService.find_top_similar_tables(
-                        query_embeddings=embeddings_gerados,
-                        query_table_names=tabelas_extraidas_nesta_iteracao,
-                        k=5 # Ajuste o k conforme necessário
-                    )
-                else:
-                    logger.warning(f"\n[RAG SERVICE] Nenhum embedding gerado para {tabelas_extraidas_nesta_iteracao}. Pulando busca.")
-            else:
-                logger.info(f"\n[RAG SERVICE] Nenhuma tabela para buscar nesta iteração.")
-
+            RAGService._notificar(notificar, {"tipo": "etapa", "etapa": "busca", "iteracao": iteracao_atual, "tabelas": list(tabelas_extraidas_nesta_iteracao)})
+            with Tracer.span("rag.busca", tabelas=len(tabelas_extraidas_nesta_iteracao)) as span:
+                resultados_busca_atual = await RAGService._buscar_tabelas_async(
+                    tabelas_extraidas_nesta_iteracao, colunas_extraidas, iteracao_atual, buffer_prefetch, tarefa_prefetch
+                )
+                span.set(resultados=len(resultados_busca_atual), matches=sum(len(r.get("matches", [])) for r in resultados_busca_atual))
 
             # Contexto para verificação: tabelas da busca atual + tabelas já mantidas
             # `verify_data_sufficiency` espera uma lista de resultados de busca,
@@ -65,28 +424,65 @@ class RAGService:
             # e `ExtractionManager.final_response` usa `tabelas_mantidas_acumuladas`.
             tabelas_para_verificacao = resultados_busca_atual
 
+            especular = SpeculativeFinal.should_speculate(iteracao_atual)
+            tokens_contexto = RAGService._estimar_tokens_contexto(prompt_usuario, tabelas_para_verificacao)
+            if especular:
+                # A resposta especulativa envia o contexto acumulado junto com a busca atual
+                tokens_contexto += RAGService._estimar_tokens_contexto(prompt_usuario, [{"matches": tabelas_mantidas_acumuladas}])
+            chamadas_verificacao = len(LLMService.niveis_cascata("verificacao", "medio"))
+            if not orcamento.pode_verificar(tokens_contexto, chamadas_verificacao=chamadas_verificacao, especulativa=especular):
+                # Outra verificação não cabe no orçamento: responde com o que já foi encontrado
+                logger.warning(f"\n[RAG SERVICE] Orçamento insuficiente para nova verificação ({orcamento.encerrado_por}; {orcamento.restante_segundos():.1f}s restantes). Gerando resposta final.")
+                RAGService._notificar(notificar, {"tipo": "etapa", "etapa": "orcamento_esgotado", "iteracao": iteracao_atual, "motivo": orcamento.encerrado_por})
+                RAGService._acumular_matches(tabelas_mantidas_acumuladas, resultados_busca_atual)
+                resposta_final = await RAGService._gerar_resposta_final(
+                    prompt_usuario, tabelas_mantidas_acumuladas, notificar
+                )
+                break
+
             logger.info(f"\n[RAG SERVICE] Verificando suficiência dos dados. Contexto para LLM (apenas busca atual): {len(tabelas_para_verificacao)} resultados.")
-            resultado_verificacao = ExtractionManager.verify_data_sufficiency(
-                prompt_usuario=prompt_usuario,
-                tabelas_similares=tabelas_para_verificacao # Passa os resultados da busca mais recente
-            )
+            # Vizinhos por FK carregados numa thread enquanto a verificação está em andamento
+            tarefa_prefetch = asyncio.create_task(asyncio.to_thread(buffer_prefetch.start, tabelas_para_verificacao))
+            RAGService._notificar(notificar, {"tipo": "etapa", "etapa": "verificacao", "iteracao": iteracao_atual, "resultados": len(tabelas_para_verificacao)})
+            especulacao = None
+            if especular:
+                # Resposta final sobre o contexto que valeria com 2002, em paralelo com a verificação
+                contexto_especulativo = RAGService._acumular_matches(list(tabelas_mantidas_acumuladas), resultados_busca_atual)
+                especulacao = SpeculativeFinal(
+                    prompt_usuario, contexto_especulativo,
+                    (lambda evento: RAGService._notificar(notificar, evento)) if notificar is not None else None
+                ).start()
+            inicio_verificacao = time.monotonic()
+            try:
+                resultado_verificacao = await ExtractionManager.verify_data_sufficiency_async(
+                    prompt_usuario=prompt_usuario,
+                    tabelas_similares=tabelas_para_verificacao # Passa os resultados da busca mais recente
+                )
+            except BaseException:
+                if especulacao is not None:
+                    especulacao.cancel()
+                raise
+            RequestBudget.record_stage_cost("verificacao", time.monotonic() - inicio_verificacao)
 
             codigo_verificacao = resultado_verificacao.get('codigo')
+            SpeculativeFinal.record_verification(iteracao_atual, codigo_verificacao)
+            if especulacao is not None and codigo_verificacao != '2002':
+                especulacao.cancel()
+            if codigo_verificacao != '1001':
+                # Sem nova iteração, o prefetch em andamento não seria usado
+                buffer_prefetch.cancel()
 
             if codigo_verificacao == '2002':
                 logger.info(f"\n[RAG SERVICE] Dados suficientes. Gerando resposta final.")
                 # Adiciona os "matches" da última busca às tabelas mantidas, se houver
-                for resultado_busca in resultados_busca_atual: # `resultados_busca_atual` é List[Dict]
-                    for match in resultado_busca.get("matches", []):
-                         # Evitar duplicatas em tabelas_mantidas_acumuladas
-                        if not any(t.get("table_name") == match.get("table_name") for t in tabelas_mantidas_acumuladas):
-                            tabelas_mantidas_acumuladas.append(match)
+                RAGService._acumular_matches(tabelas_mantidas_acumuladas, resultados_busca_atual)
 
-                resposta_final = ExtractionManager.final_response(
-                    prompt_usuario=prompt_usuario,
-                    resultados_similares=tabelas_mantidas_acumuladas, # Usa todas as tabelas acumuladas
-                    nivel_modelo="forte"
-                )
+                if especulacao is not None:
+                    resposta_final = await especulacao.commit()
+                else:
+                    resposta_final = await RAGService._gerar_resposta_final(
+                        prompt_usuario, tabelas_mantidas_acumuladas, notificar # Usa todas as tabelas acumuladas
+                    )
                 logger.info(f"\n[RAG SERVICE] Resposta final gerada.")
                 break
 
@@ -112,27 +508,21 @@ class RAGService:
 
                 if not tabelas_a_buscar: # LLM pediu para manter, mas não solicitou novas. Evita loop infinito.
                     logger.warning("\n[RAG SERVICE] LLM não solicitou novas tabelas, mas não retornou 2002. Forçando resposta final.")
-                    resposta_final = ExtractionManager.final_response(
-                        prompt_usuario=prompt_usuario,
-                        resultados_similares=tabelas_mantidas_acumuladas,
-                        nivel_modelo="forte"
+                    resposta_final = await RAGService._gerar_resposta_final(
+                        prompt_usuario, tabelas_mantidas_acumuladas, notificar
                     )
                     break
 
                 if iteracao_atual == max_iteracoes:
                     logger.warning(f"\n[RAG SERVICE] Máximo de iterações atingido. Gerando resposta com dados disponíveis.")
-                    resposta_final = ExtractionManager.final_response(
-                        prompt_usuario=prompt_usuario,
-                        resultados_similares=tabelas_mantidas_acumuladas,
-                        nivel_modelo="forte"
+                    resposta_final = await RAGService._gerar_resposta_final(
+                        prompt_usuario, tabelas_mantidas_acumuladas, notificar
                     )
                     break
             else: # Erro na verificação ou código desconhecido
                 logger.error(f"\n[RAG SERVICE] Erro na verificação da LLM ou código desconhecido: {resultado_verificacao.get('motivo', 'Resposta inválida')}")
-                resposta_final = ExtractionManager.final_response(
-                    prompt_usuario=prompt_usuario,
-                    resultados_similares=tabelas_mantidas_acumuladas, # Tenta com o que tem
-                    nivel_modelo="forte"
+                resposta_final = await RAGService._gerar_resposta_final(
+                    prompt_usuario, tabelas_mantidas_acumuladas, notificar # Tenta com o que tem
                 )
                 logger.info(f"\n[RAG SERVICE] Resposta final gerada após erro na verificação.")
                 break
@@ -144,10 +534,8 @@ class RAGService:
             # Fallback para uma resposta genérica de erro ou com o contexto que tiver
             if tabelas_mantidas_acumuladas:
                 logger.info("\n[RAG SERVICE] Tentando gerar resposta final com tabelas acumuladas como último recurso.")
-                resposta_final = ExtractionManager.final_response(
-                    prompt_usuario=prompt_usuario,
-                    resultados_similares=tabelas_mantidas_acumuladas,
-                    nivel_modelo="forte"
+                resposta_final = await RAGService._gerar_resposta_final(
+                    prompt_usuario, tabelas_mantidas_acumuladas, notificar
                 )
             else:
                 resposta_final = "Não foi possível gerar uma resposta para a sua pergunta com as informações disponíveis após múltiplas tentativas."
@@ -156,5 +544,6 @@ class RAGService:
             "sucesso": True, # O RAGService em si completou, a qualidade da resposta depende da LLM
             "sql_gerado_final": resposta_final, # Este campo deve conter a resposta final da LLM
             "resposta_texto": "Processamento RAG concluído.", # Mensagem genérica
-            "erro": None
+            "erro": None,
+            "tabelas_utilizadas": [t.get("table_name") for t in tabelas_mantidas_acumuladas]
         }
\ No newline at end of file
@@ -1,11 +1,18 @@
 # src/infrastructure/external_services/embedding_service.py
 
+import asyncio
 import google.generativeai as genai
 import numpy as np
-from typing import List, Optional
+from typing import List, Optional, Dict, Any, Tuple
 import logging
 import os
+import threading
 from config.api.api_config import GeminiConfig
+from infrastructure.persistence.embedding_cache import EmbeddingCache
+from shared.utils.tracing import Tracer
+from shared.utils.request_budget import RequestBudget
+from shared.utils.request_coalescer import CoalescingScope
+from shared.utils.request_hedger import RequestHedger
 
 logger = logging.getLogger(__name__)
 # Ensures basicConfig is called only if no handlers are already configured for this logger or root.
@@ -21,28 +28,202 @@ class EmbeddingService:
     
     _TASK_TYPE = "RETRIEVAL_QUERY" 
 
+    # Cache de embeddings (memória + disco). Desabilite com EMBEDDING_CACHE_ENABLED=0.
+    _CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "1") != "0"
+    _CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", os.path.join("cache", "embeddings.sqlite3"))
+    _CACHE_MEMORY_SIZE = int(os.getenv("EMBEDDING_CACHE_MEMORY_SIZE", "4096"))
+    # Timeout da chamada à API; dentro de uma requisição RAG é reduzido ao prazo restante do orçamento
+    _TIMEOUT_SECONDS = float(os.getenv("EMBEDDING_TIMEOUT_SECONDS", "20"))
+    # Máximo de textos por chamada em lote da API
+    _MAX_TEXTS_PER_CALL = 100
+    # Hedging das chamadas assíncronas à API (opt-in, EMBEDDING_HEDGING_ENABLED=1; ver RequestHedger)
+    HEDGING_ENABLED = os.getenv("EMBEDDING_HEDGING_ENABLED", "0") == "1"
+    _hedger = RequestHedger()
+
+    _cache: Optional[EmbeddingCache] = None
+    _cache_lock = threading.Lock()
+
+    @staticmethod
+    def get_cache() -> Optional[EmbeddingCache]:
+        """
+        Retorna o cache de embeddings do processo, criando-o na primeira chamada.
+        """
+        if not EmbeddingService._CACHE_ENABLED:
+            return None
+        if EmbeddingService._cache is None:
+            with EmbeddingService._cache_lock:
+                if EmbeddingService._cache is None:
+                    EmbeddingService._cache = EmbeddingCache(
+                        caminho_db=EmbeddingService._CACHE_PATH or None,
+                        capacidade_memoria=EmbeddingService._CACHE_MEMORY_SIZE
+                    )
+        return EmbeddingService._cache
+
+    @staticmethod
+    def get_cache_stats() -> Dict[str, Any]:
+        """
+        Retorna os contadores de hit/miss do cache de embeddings.
+        """
+        cache = EmbeddingService.get_cache()
+        if cache is None:
+            return {"habilitado": False}
+        return {"habilitado": True, **cache.get_stats()}
+
+    @staticmethod
+    def get_hedge_stats() -> Dict[str, Any]:
+        """
+        Cópias disparadas, vencedoras e negadas pelo orçamento das chamadas à API de embeddings.
+        """
+        return {"habilitado": EmbeddingService.HEDGING_ENABLED, **EmbeddingService._hedger.get_stats()}
+
+    @staticmethod
+    def _consultar_cache(texts: List[str]) -> Optional[Tuple[List[str], Dict[str, np.ndarray], List[str]]]:
+        """
+        Valida e normaliza os textos e consulta o cache.
+
+        Returns:
+            (textos normalizados na ordem original, vetores já conhecidos, textos a enviar à API),
+            ou None se não houver texto válido.
+        """
+        if not texts:
+            logger.warning("\n[Embedding Service]\nChamada a embed_texts com lista vazia.")
+            return None
+        valid_texts = [text for text in texts if text and text.strip()]
+        if not valid_texts:
+            logger.warning("\n[Embedding Service]\nNenhum texto válido encontrado após filtragem.")
+            return None
+
+        textos_normalizados = [EmbeddingCache.normalizar_texto(text) for text in valid_texts]
+        cache = EmbeddingService.get_cache()
+        vetores: Dict[str, np.ndarray] = {}
+        if cache is not None:
+            vetores = cache.get_many(EmbeddingService._MODEL_NAME, EmbeddingService._TASK_TYPE, textos_normalizados)
+
+        textos_faltantes = [t for t in dict.fromkeys(textos_normalizados) if t not in vetores]
+        servidos_pelo_cache = sum(1 for t in textos_normalizados if t in vetores)
+        logger.info(f"\n[Embedding Service]\n{len(valid_texts)} textos solicitados; {servidos_pelo_cache} servidos pelo cache, {len(textos_faltantes)} enviados à API.")
+        return textos_normalizados, vetores, textos_faltantes
+
+    @staticmethod
+    def _combinar(
+        textos_normalizados: List[str],
+        vetores: Dict[str, np.ndarray],
+        textos_faltantes: List[str],
+        novos_vetores: Optional[np.ndarray]
+    ) -> np.ndarray:
+        if textos_faltantes:
+            novos = dict(zip(textos_faltantes, novos_vetores))
+            vetores.update(novos)
+            cache = EmbeddingService.get_cache()
+            if cache is not None:
+                cache.put_many(EmbeddingService._MODEL_NAME, EmbeddingService._TASK_TYPE, novos)
+        return np.stack([vetores[t] for t in textos_normalizados]).astype(np.float32, copy=False)
+
     @staticmethod
     def embed_texts(texts: List[str]) -> Optional[np.ndarray]:
         """
         Gera embeddings L2-NORMALIZADOS para uma lista de textos.
         Usa o modelo e tipo de tarefa (_TASK_TYPE) definidos na classe.
+        Textos já conhecidos são servidos pelo cache; apenas os ausentes vão para a API.
         """
+        with Tracer.span("embedding.gerar", modo="sync", textos=len(texts or [])) as span:
+            consulta = EmbeddingService._consultar_cache(texts)
+            if consulta is None:
+                return None
+            textos_normalizados, vetores, textos_faltantes = consulta
+            span.set(servidos_pelo_cache=len(textos_normalizados) - len(textos_faltantes), enviados_api=len(textos_faltantes))
+
+            novos_vetores = None
+            if textos_faltantes:
+                novos_vetores = EmbeddingService._embed_via_api(textos_faltantes)
+                if novos_vetores is None:
+                    return None
+            embeddings = EmbeddingService._combinar(textos_normalizados, vetores, textos_faltantes, novos_vetores)
+            span.set(dimensao=int(embeddings.shape[1]))
+            return embeddings
+
+    @staticmethod
+    async def embed_texts_async(texts: List[str]) -> Optional[np.ndarray]:
+        """
+        Versão assíncrona de `embed_texts`: mesmo cache, com a chamada à API feita pelo cliente assíncrono.
+        As leituras e gravações do cache (SQLite) rodam numa thread, fora do event loop.
+        """
+        with Tracer.span("embedding.gerar", modo="async", textos=len(texts or [])) as span:
+            consulta = await asyncio.to_thread(EmbeddingService._consultar_cache, texts)
+            if consulta is None:
+                return None
+            textos_normalizados, vetores, textos_faltantes = consulta
+            span.set(servidos_pelo_cache=len(textos_normalizados) - len(textos_faltantes), enviados_api=len(textos_faltantes))
+
+            novos_vetores = None
+            if textos_faltantes:
+                novos_vetores = await EmbeddingService._embed_faltantes_async(textos_faltantes)
+                if novos_vetores is None:
+                    return None
+            embeddings = await asyncio.to_thread(EmbeddingService._combinar, textos_normalizados, vetores, textos_faltantes, novos_vetores)
+            span.set(dimensao=int(embeddings.shape[1]))
+            return embeddings
+
+    @staticmethod
+    async def _embed_faltantes_async(textos_faltantes: List[str]) -> Optional[np.ndarray]:
+        """
+        Envia à API os textos ausentes do cache. Dentro de um CoalescingScope (ex.: lote de
+        prompts), os pedidos concorrentes de todas as requisições do escopo são deduplicados e
+        agrupados na mesma chamada.
+        """
+        escopo = CoalescingScope.current()
+        if escopo is None:
+            return await EmbeddingService._embed_via_api_async(textos_faltantes)
+        coalescer = escopo.coalescer("embeddings", EmbeddingService._embed_lote_async, max_lote=EmbeddingService._MAX_TEXTS_PER_CALL)
+        vetores = await coalescer.get_many({texto: None for texto in textos_faltantes})
+        if any(vetor is None for vetor in vetores.values()):
+            return None
+        return np.stack([vetores[texto] for texto in textos_faltantes])
+
+    @staticmethod
+    async def _embed_lote_async(pedidos: Dict[str, None]) -> Dict[str, np.ndarray]:
+        textos = list(pedidos)
+        vetores = await EmbeddingService._embed_via_api_async(textos)
+        return {} if vetores is None else dict(zip(textos, vetores))
+
+    @staticmethod
+    def _inicializar_api() -> bool:
         try:
             GeminiConfig.initialize()
             logger.debug("\n[Embedding Service]\nAPI Gemini inicializada (ou já estava).")
+            return True
         except ValueError as e:
             logger.error(f"\n[Embedding Service]\nFalha ao inicializar config Gemini (chave API?): {e}")
-            return None
+            return False
         except Exception as e_init:
             logger.error(f"\n[Embedding Service]\nErro inesperado na config Gemini: {e_init}", exc_info=True)
-            return None
+            return False
 
-        if not texts:
-            logger.warning("\n[Embedding Service]\nChamada a embed_texts com lista vazia.")
-            return None
-        valid_texts = [text for text in texts if text and text.strip()]
-        if not valid_texts:
-            logger.warning("\n[Embedding Service]\nNenhum texto válido encontrado após filtragem.")
+    @staticmethod
+    def _normalizar_resposta(result: Dict[str, Any], valid_texts: List[str]) -> Optional[np.ndarray]:
+        raw_embeddings = np.array(result['embedding'], dtype='float32')
+
+        if len(raw_embeddings.shape) != 2 or raw_embeddings.shape[0] != len(valid_texts):
+            logger.error(f"\n[Embedding Service]\nForma inesperada dos embeddings. Esperado: ({len(valid_texts)}, N), Recebido: {raw_embeddings.shape}")
+            raise ValueError("Forma inconsistente retornada pela API.")
+        if raw_embeddings.size == 0:
+             logger.warning("\n[Embedding Service]\nAPI retornou array de embeddings vazio.")
+             return None
+
+        logger.info(f"\n[Embedding Service]\nNormalizando {raw_embeddings.shape[0]} vetores de embedding.")
+        norms = np.linalg.norm(raw_embeddings, axis=1, keepdims=True)
+        norms[norms == 0] = 1e-10
+        normalized_embeddings = raw_embeddings / norms
+
+        logger.info(f"\n[Embedding Service]\nGerados e normalizados {normalized_embeddings.shape[0]} embeddings de dimensão {normalized_embeddings.shape[1]}.")
+        return normalized_embeddings
+
+    @staticmethod
+    def _embed_via_api(valid_texts: List[str]) -> Optional[np.ndarray]:
+        """
+        Chama a API de embeddings para os textos informados e devolve os vetores L2-normalizados.
+        """
+        if not EmbeddingService._inicializar_api():
             return None
 
         logger.info(f"\n[Embedding Service]\nGerando embeddings para {len(valid_texts)} textos. Modelo: '{EmbeddingService._MODEL_NAME}', Tarefa: '{EmbeddingService._TASK_TYPE}'.")
@@ -51,24 +232,40 @@ class EmbeddingService:
             result = genai.embed_content(
                 model=EmbeddingService._MODEL_NAME,
                 content=valid_texts,
-                task_type=EmbeddingService._TASK_TYPE
+                task_type=EmbeddingService._TASK_TYPE,
+                request_options={"timeout": RequestBudget.timeout_for(EmbeddingService._TIMEOUT_SECONDS)}
             )
-            raw_embeddings = np.array(result['embedding'], dtype='float32')
-
-            if len(raw_embeddings.shape) != 2 or raw_embeddings.shape[0] != len(valid_texts):
-                logger.error(f"\n[Embedding Service]\nForma inesperada dos embeddings. Esperado: ({len(valid_texts)}, N), Recebido: {raw_embeddings.shape}")
-                raise ValueError("Forma inconsistente retornada pela API.")
-            if raw_embeddings.size == 0:
-                 logger.warning("\n[Embedding Service]\nAPI retornou array de embeddings vazio.")
-                 return None
-
-            logger.info(f"\n[Embedding Service]\nNormalizando {raw_embeddings.shape[0]} vetores de embedding.")
-            norms = np.linalg.norm(raw_embeddings, axis=1, keepdims=True)
-            norms[norms == 0] = 1e-10
-            normalized_embeddings = raw_embeddings / norms
-
-            logger.info(f"\n[Embedding Service]\nGerados e normalizados {normalized_embeddings.shape[0]} embeddings de dimensão {normalized_embeddings.shape[1]}.")
-            return normalized_embeddings
+            return EmbeddingService._normalizar_resposta(result, valid_texts)
+        except Exception as e:
+            logger.error(f"\n[Embedding Service]\nErro durante geração/normalização dos embeddings: {e}", exc_info=True)
+            return None
+
+    @staticmethod
+    async def _embed_via_api_async(valid_texts: List[str]) -> Optional[np.ndarray]:
+        """
+        Versão assíncrona de `_embed_via_api`.
+        """
+        if not EmbeddingService._inicializar_api():
+            return None
+
+        logger.info(f"\n[Embedding Service]\nGerando embeddings (async) para {len(valid_texts)} textos. Modelo: '{EmbeddingService._MODEL_NAME}', Tarefa: '{EmbeddingService._TASK_TYPE}'.")
+
+        try:
+            def chamar():
+                return genai.embed_content_async(
+                    model=EmbeddingService._MODEL_NAME,
+                    content=valid_texts,
+                    task_type=EmbeddingService._TASK_TYPE,
+                    request_options={"timeout": RequestBudget.timeout_for(EmbeddingService._TIMEOUT_SECONDS)}
+                )
+
+            if EmbeddingService.HEDGING_ENABLED:
+                # A latência cresce com o tamanho do lote: chamadas unitárias e em lote têm limites separados
+                chave = f"{EmbeddingService._MODEL_NAME}:{'unitario' if len(valid_texts) == 1 else 'lote'}"
+                result = await EmbeddingService._hedger.run(chave, chamar)
+            else:
+                result = await chamar()
+            return EmbeddingService._normalizar_resposta(result, valid_texts)
         except Exception as e:
             logger.error(f"\n[Embedding Service]\nErro durante geração/normalização dos embeddings: {e}", exc_info=True)
-            return None
\ No newline at end of file
+            return None
@@ -0,0 +1,287 @@
+# src/infrastructure/external_services/llm_rate_limiter.py
+
+"""
+Limite de taxa do lado do cliente para a API do Gemini (requisições e tokens por minuto, por modelo).
+"""
+
+import asyncio
+import random
+import re
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from config.core.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# "Please retry in 12.5s", "retryDelay": "12s", retry_delay { seconds: 12 }
+_PADRAO_RETRY = re.compile(r"retry(?:[ _]?delay)?\W{0,5}(?:in\s+|seconds:\s*)?(\d+(?:\.\d+)?)\s*s?", re.IGNORECASE)
+
+
+class LLMUnavailableError(Exception):
+    """
+    O modelo não pode atender dentro do prazo: a espera na fila do limite de taxa passaria do
+    disponível ou as retentativas em erros de cota (429/503) se esgotaram. `retry_after` é a
+    espera estimada (segundos) até o modelo voltar a aceitar chamadas, se conhecida.
+    """
+
+    def __init__(self, modelo: str, mensagem: str, retry_after: Optional[float] = None):
+        super().__init__(mensagem)
+        self.modelo = modelo
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """
+    Balde de fichas com reserva: quem não encontra fichas suficientes reserva mesmo assim (o
+    saldo fica negativo) e recebe o tempo de espera até a sua vez. Como cada reserva aprofunda
+    o saldo, os chamadores são atendidos na ordem de chegada, sem fila explícita.
+    """
+
+    def __init__(self, por_minuto: float):
+        self.capacidade = float(por_minuto)
+        self.taxa_por_segundo = self.capacidade / 60.0
+        self.saldo = self.capacidade
+        self._atualizado_em = time.monotonic()
+
+    def _repor(self, agora: float) -> None:
+        self.saldo = min(self.capacidade, self.saldo + (agora - self._atualizado_em) * self.taxa_por_segundo)
+        self._atualizado_em = agora
+
+    def reservar(self, quantidade: float, agora: float) -> float:
+        """
+        Debita `quantidade` (limitada à capacidade) e devolve os segundos até o saldo cobri-la.
+        """
+        self._repor(agora)
+        self.saldo -= min(quantidade, self.capacidade)
+        return max(0.0, -self.saldo / self.taxa_por_segundo)
+
+    def espera_para(self, quantidade: float, agora: float) -> float:
+        """
+        Segundos até o saldo cobrir `quantidade`, sem reservar nada.
+        """
+        self._repor(agora)
+        return max(0.0, (min(quantidade, self.capacidade) - self.saldo) / self.taxa_por_segundo)
+
+    def devolver(self, quantidade: float) -> None:
+        self.saldo = min(self.capacidade, self.saldo + min(quantidade, self.capacidade))
+
+
+class LLMRateLimiter:
+    """
+    Um par de baldes (RPM e TPM) por modelo. Cada chamada reserva uma requisição e os tokens
+    de entrada estimados e espera a sua vez em vez de ser disparada e rejeitada pela cota; o
+    uso real informado pela API corrige o balde de tokens depois da chamada.
+
+    Um erro de cota (429/503) pausa o modelo inteiro pelo tempo pedido pela API (retry-after),
+    para que as chamadas na fila esperem junto em vez de insistir. Limites 0 desligam o balde
+    correspondente.
+    """
+
+    def __init__(self, limites: Dict[str, Tuple[int, int]]):
+        self._lock = threading.Lock()
+        self._baldes: Dict[str, Tuple[Optional[TokenBucket], Optional[TokenBucket]]] = {
+            modelo: (TokenBucket(rpm) if rpm > 0 else None, TokenBucket(tpm) if tpm > 0 else None)
+            for modelo, (rpm, tpm) in limites.items()
+        }
+        self._pausado_ate: Dict[str, float] = {}
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+    def _contadores(self, modelo: str) -> Dict[str, float]:
+        return self._stats.setdefault(modelo, {
+            "chamadas": 0, "esperas": 0, "espera_total_ms": 0.0, "espera_max_ms": 0.0,
+            "fila": 0, "fila_max": 0, "erros_cota": 0, "retentativas": 0, "desistencias": 0,
+        })
+
+    def _reservar(self, modelo: str, tokens: int, espera_maxima: Optional[float]) -> Optional[float]:
+        """
+        Reserva uma requisição e `tokens` do modelo. Devolve a espera em segundos, ou None (sem
+        reservar nada) se ela passaria de `espera_maxima`.
+        """
+        with self._lock:
+            agora = time.monotonic()
+            balde_rpm, balde_tpm = self._baldes.get(modelo, (None, None))
+            esperas = [self._pausado_ate.get(modelo, agora) - agora]
+            if balde_rpm is not None:
+                esperas.append(balde_rpm.reservar(1, agora))
+            if balde_tpm is not None:
+                esperas.append(balde_tpm.reservar(tokens, agora))
+            espera = max(0.0, *esperas)
+
+            contadores = self._contadores(modelo)
+            if espera_maxima is not None and espera > espera_maxima:
+                if balde_rpm is not None:
+                    balde_rpm.devolver(1)
+                if balde_tpm is not None:
+                    balde_tpm.devolver(tokens)
+                contadores["desistencias"] += 1
+                return None
+            contadores["chamadas"] += 1
+            if espera > 0:
+                contadores["esperas"] += 1
+                contadores["espera_total_ms"] += espera * 1000
+                contadores["espera_max_ms"] = max(contadores["espera_max_ms"], espera * 1000)
+                contadores["fila"] += 1
+                contadores["fila_max"] = max(contadores["fila_max"], contadores["fila"])
+            return espera
+
+    def _sair_da_fila(self, modelo: str) -> None:
+        with self._lock:
+            self._contadores(modelo)["fila"] -= 1
+
+    def _devolver(self, modelo: str, tokens: int) -> None:
+        """
+        Devolve aos baldes a reserva de uma chamada que desistiu antes da sua vez, para que os
+        próximos da fila não esperem por ela.
+        """
+        with self._lock:
+            balde_rpm, balde_tpm = self._baldes.get(modelo, (None, None))
+            if balde_rpm is not None:
+                balde_rpm.devolver(1)
+            if balde_tpm is not None:
+                balde_tpm.devolver(tokens)
+
+    def acquire(self, modelo: str, tokens: int, espera_maxima: Optional[float] = None) -> bool:
+        """
+        Aguarda (bloqueando a thread) a vez da chamada. False se a espera passaria de `espera_maxima`.
+        """
+        espera = self._reservar(modelo, tokens, espera_maxima)
+        if espera is None:
+            return False
+        if espera > 0:
+            try:
+                time.sleep(espera)
+            except BaseException:
+                self._devolver(modelo, tokens)
+                raise
+            finally:
+                self._sair_da_fila(modelo)
+        return True
+
+    async def acquire_async(self, modelo: str, tokens: int, espera_maxima: Optional[float] = None) -> bool:
+        """
+        Versão assíncrona de `acquire`: a espera não bloqueia o loop.
+        """
+        espera = self._reservar(modelo, tokens, espera_maxima)
+        if espera is None:
+            return False
+        if espera > 0:
+            try:
+                await asyncio.sleep(espera)
+            except asyncio.CancelledError:
+                # Chamador cancelado na fila (ex.: cliente desconectou): a vez reservada volta aos baldes
+                self._devolver(modelo, tokens)
+                raise
+            finally:
+                self._sair_da_fila(modelo)
+        return True
+
+    def try_acquire(self, modelo: str, tokens: int) -> bool:
+        """
+        Reserva a vez só se ela estiver livre agora: False (sem reservar nada) com o modelo
+        pausado, chamadas na fila ou baldes sem saldo. Usado para chamadas opcionais (cópias de hedging).
+        """
+        with self._lock:
+            agora = time.monotonic()
+            contadores = self._contadores(modelo)
+            if contadores["fila"] > 0 or self._pausado_ate.get(modelo, agora) > agora:
+                return False
+            balde_rpm, balde_tpm = self._baldes.get(modelo, (None, None))
+            if (balde_rpm is not None and balde_rpm.espera_para(1, agora) > 0) or (balde_tpm is not None and balde_tpm.espera_para(tokens, agora) > 0):
+                return False
+            if balde_rpm is not None:
+                balde_rpm.reservar(1, agora)
+            if balde_tpm is not None:
+                balde_tpm.reservar(tokens, agora)
+            contadores["chamadas"] += 1
+            return True
+
+    def estimated_wait(self, modelo: str, tokens: int) -> float:
+        """
+        Espera (segundos) que uma chamada com `tokens` teria agora, sem reservar nada.
+        """
+        with self._lock:
+            agora = time.monotonic()
+            balde_rpm, balde_tpm = self._baldes.get(modelo, (None, None))
+            esperas = [self._pausado_ate.get(modelo, agora) - agora]
+            if balde_rpm is not None:
+                esperas.append(balde_rpm.espera_para(1, agora))
+            if balde_tpm is not None:
+                esperas.append(balde_tpm.espera_para(tokens, agora))
+            return max(0.0, *esperas)
+
+    def adjust_tokens(self, modelo: str, diferenca: int) -> None:
+        """
+        Corrige o balde de tokens com o uso real (diferença para a estimativa reservada).
+        """
+        with self._lock:
+            balde_tpm = self._baldes.get(modelo, (None, None))[1]
+            if balde_tpm is not None and diferenca:
+                balde_tpm.saldo = min(balde_tpm.capacidade, balde_tpm.saldo - diferenca)
+
+    def record_quota_error(self, modelo: str, pausa_segundos: Optional[float]) -> None:
+        """
+        Registra um erro de cota; com `pausa_segundos`, o modelo só libera chamadas depois dela.
+        """
+        with self._lock:
+            contadores = self._contadores(modelo)
+            contadores["erros_cota"] += 1
+            if pausa_segundos:
+                self._pausado_ate[modelo] = max(self._pausado_ate.get(modelo, 0.0), time.monotonic() + pausa_segundos)
+
+    def record_retry(self, modelo: str) -> None:
+        with self._lock:
+            self._contadores(modelo)["retentativas"] += 1
+
+    @staticmethod
+    def is_quota_error(erro: BaseException) -> bool:
+        """
+        429 (cota/limite de taxa) ou 503 (modelo sobrecarregado), nos erros do google.api_core.
+        """
+        return getattr(erro, "code", None) in (429, 503)
+
+    @staticmethod
+    def retry_after(erro: BaseException) -> Optional[float]:
+        """
+        Espera pedida pela API: RetryInfo nos detalhes do erro, cabeçalho Retry-After ou o texto da mensagem.
+        """
+        for detalhe in getattr(erro, "details", None) or ():
+            atraso = getattr(detalhe, "retry_delay", None)
+            if atraso is not None and hasattr(atraso, "seconds"):
+                return atraso.seconds + getattr(atraso, "nanos", 0) / 1e9
+        cabecalhos = getattr(getattr(erro, "response", None), "headers", None)
+        if cabecalhos:
+            try:
+                valor = cabecalhos.get("retry-after") or cabecalhos.get("Retry-After")
+                if valor is not None:
+                    return float(valor)
+            except (TypeError, ValueError):
+                pass
+        encontrado = _PADRAO_RETRY.search(str(erro))
+        return float(encontrado.group(1)) if encontrado else None
+
+    @staticmethod
+    def backoff(tentativa: int, base_segundos: float, maximo_segundos: float, sugerido: Optional[float] = None) -> float:
+        """
+        Espera antes da tentativa seguinte: exponencial com jitter total ("full jitter"), nunca
+        menor que a espera pedida pela API.
+        """
+        atraso = random.uniform(0, min(maximo_segundos, base_segundos * (2 ** tentativa)))
+        if sugerido is not None:
+            # Um pouco de jitter também aqui, para os chamadores pausados não voltarem juntos
+            atraso = sugerido + random.uniform(0, base_segundos)
+        return atraso
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            agora = time.monotonic()
+            stats = {}
+            for modelo, contadores in self._stats.items():
+                item = dict(contadores)
+                item["espera_media_ms"] = round(item["espera_total_ms"] / item["esperas"], 3) if item["esperas"] else 0.0
+                item["espera_total_ms"] = round(item["espera_total_ms"], 3)
+                item["espera_max_ms"] = round(item["espera_max_ms"], 3)
+                item["pausado_por_ms"] = round(max(0.0, self._pausado_ate.get(modelo, agora) - agora) * 1000, 3)
+                stats[modelo] = item
+            return stats
@@ -1,6 +1,16 @@
 # infrastructure/external_services/llm_service.py
+import asyncio
+import os
+import threading
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
 from config.api.api_config import GeminiConfig
 from config.core.logging_config import get_logger
+from infrastructure.persistence.llm_response_cache import LLMResponseCache
+from infrastructure.external_services.llm_rate_limiter import LLMRateLimiter, LLMUnavailableError
+from shared.utils.tracing import Tracer
+from shared.utils.request_hedger import RequestHedger
+from shared.utils.request_budget import RequestBudget, estimate_tokens
 
 logger = get_logger(__name__)
 
@@ -15,18 +25,561 @@ class LLMService:
         "forte": "gemini-2.5-flash-preview-04-17",
         "extremo": "gemini-2.5-pro-preview-05-06"
     }
+    # Timeout de cada chamada; dentro de uma requisição RAG é reduzido ao prazo restante do orçamento
+    TIMEOUT_SEGUNDOS = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+
+    # Cache de respostas (memória + disco) por etapa do pipeline. Desabilite com LLM_CACHE_ENABLED=0.
+    # A resposta final fica fora por padrão; inclua 'resposta_final' em LLM_CACHE_STAGES para memoizá-la.
+    _CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1") != "0"
+    _CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join("cache", "llm_responses.sqlite3"))
+    _CACHE_MEMORY_SIZE = int(os.getenv("LLM_CACHE_MEMORY_SIZE", "1024"))
+    # Validade das respostas em cache (0 = sem expiração) e limite de linhas do nível em disco
+    _CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+    _CACHE_MAX_ROWS = int(os.getenv("LLM_CACHE_MAX_ROWS", "100000"))
+    CACHE_ETAPAS = frozenset(e.strip() for e in os.getenv("LLM_CACHE_STAGES", "extracao,verificacao").split(",") if e.strip())
+
+    _cache: Optional[LLMResponseCache] = None
+    _cache_lock = threading.Lock()
+
+    # Cascata de modelos: a etapa começa no nível inicial e sobe um nível por vez, até o nível
+    # pedido pelo chamador, enquanto o validador rejeitar a resposta. Desabilite com LLM_CASCADE_ENABLED=0.
+    ORDEM_NIVEIS = ("fraco", "medio", "forte", "extremo")
+    CASCATA_ENABLED = os.getenv("LLM_CASCADE_ENABLED", "1") != "0"
+    CASCATA_NIVEL_INICIAL = {
+        "extracao": os.getenv("LLM_CASCADE_EXTRACTION_START", "fraco"),
+        "verificacao": os.getenv("LLM_CASCADE_VERIFICATION_START", "fraco"),
+    }
+
+    _stats_cascata: Dict[str, Dict[str, Any]] = {}
+    _stats_cascata_lock = threading.Lock()
+
+    # Limite de taxa por modelo (requisições e tokens de entrada por minuto; 0 desliga), via
+    # LLM_RPM_<NIVEL> e LLM_TPM_<NIVEL>. Desabilite com LLM_RATE_LIMIT_ENABLED=0.
+    _LIMITES_PADRAO = {"fraco": (4000, 4000000), "medio": (2000, 4000000), "forte": (1000, 1000000), "extremo": (150, 2000000)}
+    RATE_LIMIT_ENABLED = os.getenv("LLM_RATE_LIMIT_ENABLED", "1") != "0"
+    LIMITES_TAXA = {
+        nivel: (int(os.getenv(f"LLM_RPM_{nivel.upper()}", str(rpm))), int(os.getenv(f"LLM_TPM_{nivel.upper()}", str(tpm))))
+        for nivel, (rpm, tpm) in _LIMITES_PADRAO.items()
+    }
+    # Espera máxima na fila do limite (também limitada pelo prazo do orçamento da requisição)
+    ESPERA_MAXIMA_SEGUNDOS = float(os.getenv("LLM_RATE_MAX_WAIT_SECONDS", "30"))
+    # Retentativas em erros de cota (429/503), com backoff exponencial e jitter
+    MAX_RETENTATIVAS = int(os.getenv("LLM_MAX_RETRIES", "3"))
+    BACKOFF_BASE_SEGUNDOS = float(os.getenv("LLM_BACKOFF_BASE_SECONDS", "1"))
+    BACKOFF_MAX_SEGUNDOS = float(os.getenv("LLM_BACKOFF_MAX_SECONDS", "30"))
+
+    _limitador: Optional[LLMRateLimiter] = None
+    _limitador_lock = threading.Lock()
+
+    # Hedging (opt-in, LLM_HEDGING_ENABLED=1): uma chamada à API sem resposta até o p90 observado
+    # do modelo na etapa ganha uma cópia, dentro do orçamento de cópias (ver RequestHedger).
+    # Vale para as chamadas assíncronas sem streaming.
+    HEDGING_ENABLED = os.getenv("LLM_HEDGING_ENABLED", "0") == "1"
+    _hedger = RequestHedger()
+
+    @staticmethod
+    def get_cache() -> Optional[LLMResponseCache]:
+        """
+        Retorna o cache de respostas do processo, criando-o na primeira chamada.
+        """
+        if not LLMService._CACHE_ENABLED:
+            return None
+        if LLMService._cache is None:
+            with LLMService._cache_lock:
+                if LLMService._cache is None:
+                    LLMService._cache = LLMResponseCache(
+                        caminho_db=LLMService._CACHE_PATH or None,
+                        capacidade_memoria=LLMService._CACHE_MEMORY_SIZE,
+                        ttl_segundos=LLMService._CACHE_TTL_SECONDS,
+                        max_linhas=LLMService._CACHE_MAX_ROWS
+                    )
+        return LLMService._cache
+
+    @staticmethod
+    def set_cache(cache: Optional[LLMResponseCache]) -> None:
+        """
+        Substitui o cache do processo (ex.: outra implementação com a mesma interface get/put/get_stats).
+        """
+        with LLMService._cache_lock:
+            LLMService._cache = cache
+
+    @staticmethod
+    def get_cache_stats() -> Dict[str, Any]:
+        """
+        Retorna os contadores de hit/miss do cache de respostas, por etapa.
+        """
+        cache = LLMService.get_cache()
+        if cache is None:
+            return {"habilitado": False}
+        return {"habilitado": True, "etapas": sorted(LLMService.CACHE_ETAPAS), **cache.get_stats()}
+
+    @staticmethod
+    def _cache_para(etapa: Optional[str], modelo: str, prompt: str) -> Tuple[Optional[LLMResponseCache], Optional[str]]:
+        """
+        Cache e chave da chamada, ou (None, None) se a etapa não é memoizada.
+        """
+        if etapa not in LLMService.CACHE_ETAPAS:
+            return None, None
+        cache = LLMService.get_cache()
+        if cache is None:
+            return None, None
+        return cache, LLMResponseCache.chave(modelo, prompt)
+
+    @staticmethod
+    def _ler_cache(etapa: Optional[str], modelo: str, prompt: str) -> Optional[str]:
+        cache, chave = LLMService._cache_para(etapa, modelo, prompt)
+        return cache.get(chave, etapa) if cache is not None else None
+
+    @staticmethod
+    def _gravar_cache(etapa: Optional[str], modelo: str, prompt: str, texto: str) -> None:
+        cache, chave = LLMService._cache_para(etapa, modelo, prompt)
+        if cache is not None and texto:
+            cache.put(chave, texto, modelo, etapa)
+
+    @staticmethod
+    def get_rate_limiter() -> Optional[LLMRateLimiter]:
+        """
+        Retorna o limitador de taxa do processo, criando-o na primeira chamada.
+        """
+        if not LLMService.RATE_LIMIT_ENABLED:
+            return None
+        if LLMService._limitador is None:
+            with LLMService._limitador_lock:
+                if LLMService._limitador is None:
+                    LLMService._limitador = LLMRateLimiter({
+                        LLMService.MODELOS[nivel]: limites for nivel, limites in LLMService.LIMITES_TAXA.items()
+                    })
+        return LLMService._limitador
+
+    @staticmethod
+    def set_rate_limiter(limitador: Optional[LLMRateLimiter]) -> None:
+        with LLMService._limitador_lock:
+            LLMService._limitador = limitador
+
+    @staticmethod
+    def get_rate_limit_stats() -> Dict[str, Any]:
+        """
+        Fila, tempo de espera, erros de cota e retentativas por modelo.
+        """
+        limitador = LLMService.get_rate_limiter()
+        if limitador is None:
+            return {"habilitado": False}
+        return {"habilitado": True, "modelos": limitador.get_stats()}
+
+    @staticmethod
+    def get_hedge_stats() -> Dict[str, Any]:
+        """
+        Cópias disparadas, vencedoras e negadas pelo orçamento, por modelo e etapa.
+        """
+        return {"habilitado": LLMService.HEDGING_ENABLED, **LLMService._hedger.get_stats()}
+
+    @staticmethod
+    def _fila_excedida(limitador: LLMRateLimiter, modelo: str, tokens: int) -> LLMUnavailableError:
+        return LLMUnavailableError(
+            modelo, f"Limite de taxa do modelo {modelo}: a espera na fila passaria do prazo disponível.",
+            retry_after=limitador.estimated_wait(modelo, tokens)
+        )
+
+    @staticmethod
+    def _aguardar_vez(modelo: str, tokens: int) -> None:
+        limitador = LLMService.get_rate_limiter()
+        if limitador is not None and not limitador.acquire(modelo, tokens, RequestBudget.timeout_for(LLMService.ESPERA_MAXIMA_SEGUNDOS)):
+            raise LLMService._fila_excedida(limitador, modelo, tokens)
+
+    @staticmethod
+    async def _aguardar_vez_async(modelo: str, tokens: int) -> None:
+        limitador = LLMService.get_rate_limiter()
+        if limitador is not None and not await limitador.acquire_async(modelo, tokens, RequestBudget.timeout_for(LLMService.ESPERA_MAXIMA_SEGUNDOS)):
+            raise LLMService._fila_excedida(limitador, modelo, tokens)
+
+    @staticmethod
+    def _cota_esgotada(modelo: str, erro: Exception) -> LLMUnavailableError:
+        return LLMUnavailableError(
+            modelo, f"Cota do modelo {modelo} excedida e retentativas esgotadas: {erro}",
+            retry_after=LLMRateLimiter.retry_after(erro)
+        )
+
+    @staticmethod
+    def _atraso_retentativa(modelo: str, erro: Exception, tentativa: int) -> Optional[float]:
+        """
+        Espera antes de repetir a chamada que falhou, ou None se ela não deve ser repetida
+        (erro que não é de cota, tentativas esgotadas ou espera maior que o prazo restante).
+        """
+        if not LLMRateLimiter.is_quota_error(erro):
+            return None
+        sugerido = LLMRateLimiter.retry_after(erro)
+        limitador = LLMService.get_rate_limiter()
+        if limitador is not None:
+            limitador.record_quota_error(modelo, sugerido)
+        if tentativa >= LLMService.MAX_RETENTATIVAS:
+            return None
+        atraso = LLMRateLimiter.backoff(tentativa, LLMService.BACKOFF_BASE_SEGUNDOS, LLMService.BACKOFF_MAX_SEGUNDOS, sugerido)
+        disponivel = RequestBudget.timeout_for(None)
+        if disponivel is not None and atraso >= disponivel:
+            return None
+        if limitador is not None:
+            limitador.record_retry(modelo)
+        logger.warning(f"\n[LLM SERVICE] Cota do modelo {modelo} excedida ({erro}). Nova tentativa em {atraso:.2f}s.")
+        return atraso
+
+    @staticmethod
+    def _corrigir_tokens(modelo: str, tokens_reservados: int, resposta: Any) -> None:
+        tokens_reais = getattr(getattr(resposta, 'usage_metadata', None), 'prompt_token_count', None)
+        limitador = LLMService.get_rate_limiter()
+        if limitador is not None and isinstance(tokens_reais, int):
+            limitador.adjust_tokens(modelo, tokens_reais - tokens_reservados)
+
+    @staticmethod
+    def _chamar_com_limite(modelo: str, prompt: str, chamar: Callable[[], Any]) -> Any:
+        """
+        Executa a chamada à API na vez dela (limite de taxa do modelo), repetindo em erros de cota.
+        LLMUnavailableError se a vez não chega dentro do prazo ou as retentativas se esgotam.
+        """
+        tokens = estimate_tokens(prompt)
+        tentativa = 0
+        while True:
+            LLMService._aguardar_vez(modelo, tokens)
+            try:
+                resposta = chamar()
+            except Exception as e:
+                atraso = LLMService._atraso_retentativa(modelo, e, tentativa)
+                if atraso is None:
+                    if LLMRateLimiter.is_quota_error(e):
+                        raise LLMService._cota_esgotada(modelo, e) from e
+                    raise
+                time.sleep(atraso)
+                tentativa += 1
+                continue
+            LLMService._corrigir_tokens(modelo, tokens, resposta)
+            return resposta
 
     @staticmethod
-    def processar_prompt(prompt: str, nivel_modelo: str = "medio") -> str:
+    async def _chamar_com_limite_async(modelo: str, prompt: str, chamar: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Versão assíncrona de `_chamar_com_limite`.
+        """
+        tokens = estimate_tokens(prompt)
+        tentativa = 0
+        while True:
+            await LLMService._aguardar_vez_async(modelo, tokens)
+            try:
+                resposta = await chamar()
+            except Exception as e:
+                atraso = LLMService._atraso_retentativa(modelo, e, tentativa)
+                if atraso is None:
+                    if LLMRateLimiter.is_quota_error(e):
+                        raise LLMService._cota_esgotada(modelo, e) from e
+                    raise
+                await asyncio.sleep(atraso)
+                tentativa += 1
+                continue
+            LLMService._corrigir_tokens(modelo, tokens, resposta)
+            return resposta
+
+    @staticmethod
+    def _chamar_com_hedging(modelo: str, etapa: Optional[str], prompt: str, chamar_api: Callable[[], Awaitable[Any]]) -> Awaitable[Any]:
+        """
+        Chamada à API com hedging pela latência da própria API (sem a espera na fila). A cópia
+        precisa de uma vez livre no limite de taxa (nada de cópia com o modelo pausado ou com
+        fila) e de folga no orçamento da requisição; a tentativa descartada é cobrada dele.
+        """
+        tokens = estimate_tokens(prompt)
+        limitador = LLMService.get_rate_limiter()
+
+        def pode_copiar() -> bool:
+            if not RequestBudget.allows_extra_call():
+                return False
+            return limitador is None or limitador.try_acquire(modelo, tokens)
+
+        def descartar() -> None:
+            # A tentativa cancelada já foi enviada: conta como chamada, com os tokens de entrada estimados
+            RequestBudget.record_llm_call(tokens, 0)
+
+        return LLMService._hedger.run(f"{modelo}:{etapa or 'outras'}", chamar_api, pode_copiar=pode_copiar, ao_descartar=descartar)
+
+    @staticmethod
+    def _opcoes_requisicao() -> Dict[str, Any]:
+        return {"timeout": RequestBudget.timeout_for(LLMService.TIMEOUT_SEGUNDOS)}
+
+    @staticmethod
+    def _registrar_uso(prompt: str, resposta: Any, texto: str) -> Tuple[int, int]:
+        """
+        Contabiliza a chamada no orçamento ativo, com o uso informado pela API ou estimado.
+        """
+        uso = getattr(resposta, 'usage_metadata', None)
+        tokens_entrada = getattr(uso, 'prompt_token_count', 0) or estimate_tokens(prompt)
+        tokens_saida = getattr(uso, 'candidates_token_count', 0) or estimate_tokens(texto)
+        RequestBudget.record_llm_call(tokens_entrada, tokens_saida)
+        return tokens_entrada, tokens_saida
+
+    @staticmethod
+    def processar_prompt(
+        prompt: str,
+        nivel_modelo: str = "medio",
+        etapa: Optional[str] = None,
+        validar: Optional[Callable[[str], Optional[str]]] = None
+    ) -> str:
+        """
+        `etapa` ('extracao', 'verificacao', 'resposta_final') decide se a chamada passa pelo
+        cache de respostas (ver CACHE_ETAPAS). Com `validar`, só entra no cache a resposta que
+        ele aceitar (devolver None), como na cascata.
+
+        Outros erros da API devolvem "", mas LLMUnavailableError (limite de taxa ou cota) é
+        propagado: o chamador responde "tente mais tarde" em vez de seguir com uma resposta vazia.
+        """
+        nivel = nivel_modelo.lower()
+        modelo = LLMService.MODELOS.get(nivel, LLMService.MODELOS["medio"])
+
+        with Tracer.span("llm.gerar", modo="sync", nivel_modelo=nivel, modelo=modelo, caracteres_prompt=len(prompt), etapa=etapa) as span:
+            texto = LLMService._ler_cache(etapa, modelo, prompt)
+            if texto is not None:
+                logger.info(f"\n[LLM SERVICE] Resposta do cache para o modelo: {modelo} (etapa: {etapa})")
+                span.set(cache="acerto", caracteres_resposta=len(texto))
+                return texto
+
+            logger.info(f"\n[LLM SERVICE] Enviando prompt para o modelo: {modelo} (nível: {nivel})")
+            try:
+                genai = GeminiConfig.get_client()
+                resposta = LLMService._chamar_com_limite(
+                    modelo, prompt,
+                    lambda: genai.GenerativeModel(modelo).generate_content(prompt, request_options=LLMService._opcoes_requisicao())
+                )
+                texto = resposta.text if hasattr(resposta, 'text') else ""
+            except LLMUnavailableError as e:
+                logger.error(f"\n[LLM SERVICE] Modelo indisponível: {e}")
+                span.set(falha=str(e))
+                raise
+            except Exception as e:
+                logger.error(f"\n[LLM SERVICE] Erro ao processar prompt: {e}")
+                resposta, texto = None, ""
+                span.set(falha=str(e))
+            tokens_entrada, tokens_saida = LLMService._registrar_uso(prompt, resposta, texto)
+            span.set(caracteres_resposta=len(texto), tokens_entrada=tokens_entrada, tokens_saida=tokens_saida)
+            if texto and (validar is None or validar(texto) is None):
+                LLMService._gravar_cache(etapa, modelo, prompt, texto)
+            return texto
+
+    @staticmethod
+    async def processar_prompt_async(
+        prompt: str,
+        nivel_modelo: str = "medio",
+        etapa: Optional[str] = None,
+        validar: Optional[Callable[[str], Optional[str]]] = None
+    ) -> str:
+        """
+        Versão assíncrona de `processar_prompt` (cliente gRPC assíncrono do Gemini).
+        Deve ser aguardada sempre no loop do AsyncRunner, ao qual o cliente fica preso.
+        A leitura e a gravação do cache (SQLite) rodam em thread, fora do loop.
+        """
+        nivel = nivel_modelo.lower()
+        modelo = LLMService.MODELOS.get(nivel, LLMService.MODELOS["medio"])
+
+        with Tracer.span("llm.gerar", modo="async", nivel_modelo=nivel, modelo=modelo, caracteres_prompt=len(prompt), etapa=etapa) as span:
+            texto = await asyncio.to_thread(LLMService._ler_cache, etapa, modelo, prompt)
+            if texto is not None:
+                logger.info(f"\n[LLM SERVICE] Resposta do cache para o modelo: {modelo} (etapa: {etapa})")
+                span.set(cache="acerto", caracteres_resposta=len(texto))
+                return texto
+
+            logger.info(f"\n[LLM SERVICE] Enviando prompt (async) para o modelo: {modelo} (nível: {nivel})")
+            try:
+                genai = GeminiConfig.get_client()
+
+                def chamar_api():
+                    return genai.GenerativeModel(modelo).generate_content_async(prompt, request_options=LLMService._opcoes_requisicao())
+
+                def chamar():
+                    if LLMService.HEDGING_ENABLED:
+                        # Só a chamada à API é duplicada, depois que o limite de taxa liberou a vez
+                        return LLMService._chamar_com_hedging(modelo, etapa, prompt, chamar_api)
+                    return chamar_api()
+
+                resposta = await LLMService._chamar_com_limite_async(modelo, prompt, chamar)
+                texto = resposta.text if hasattr(resposta, 'text') else ""
+            except LLMUnavailableError as e:
+                logger.error(f"\n[LLM SERVICE] Modelo indisponível: {e}")
+                span.set(falha=str(e))
+                raise
+            except Exception as e:
+                logger.error(f"\n[LLM SERVICE] Erro ao processar prompt: {e}")
+                resposta, texto = None, ""
+                span.set(falha=str(e))
+            tokens_entrada, tokens_saida = LLMService._registrar_uso(prompt, resposta, texto)
+            span.set(caracteres_resposta=len(texto), tokens_entrada=tokens_entrada, tokens_saida=tokens_saida)
+            if texto and (validar is None or validar(texto) is None):
+                await asyncio.to_thread(LLMService._gravar_cache, etapa, modelo, prompt, texto)
+            return texto
+
+    @staticmethod
+    async def processar_prompt_stream_async(prompt: str, nivel_modelo: str = "medio", etapa: Optional[str] = None) -> AsyncIterator[str]:
+        """
+        Geração em streaming: produz os trechos de texto à medida que o modelo os gera.
+        Em caso de erro, encerra o stream (o que já foi produzido é mantido).
+        Um acerto do cache de respostas é produzido como um único trecho.
+        """
         nivel = nivel_modelo.lower()
         modelo = LLMService.MODELOS.get(nivel, LLMService.MODELOS["medio"])
-        
-        logger.info(f"\n[LLM SERVICE] Enviando prompt para o modelo: {modelo} (nível: {nivel})")
-        
-        try:
-            genai = GeminiConfig.get_client()
-            resposta = genai.GenerativeModel(modelo).generate_content(prompt)
-            return resposta.text if hasattr(resposta, 'text') else ""
-        except Exception as e:
-            logger.error(f"\n[LLM SERVICE] Erro ao processar prompt: {e}")
-            return ""
+
+        with Tracer.span("llm.gerar", modo="stream", nivel_modelo=nivel, modelo=modelo, caracteres_prompt=len(prompt), etapa=etapa) as span:
+            texto_cache = await asyncio.to_thread(LLMService._ler_cache, etapa, modelo, prompt)
+            if texto_cache is not None:
+                logger.info(f"\n[LLM SERVICE] Resposta do cache para o modelo: {modelo} (etapa: {etapa})")
+                span.set(cache="acerto", caracteres_resposta=len(texto_cache))
+                yield texto_cache
+                return
+
+            logger.info(f"\n[LLM SERVICE] Enviando prompt (stream) para o modelo: {modelo} (nível: {nivel})")
+            inicio = time.perf_counter()
+            trechos = []
+            resposta = None
+            completo = True
+            try:
+                genai = GeminiConfig.get_client()
+                # O SDK já recebe o primeiro trecho ao abrir o stream, então um erro de cota aparece
+                # aqui e a abertura é repetida; depois do primeiro trecho não há nova tentativa
+                resposta = await LLMService._chamar_com_limite_async(
+                    modelo, prompt,
+                    lambda: genai.GenerativeModel(modelo).generate_content_async(
+                        prompt, stream=True, request_options=LLMService._opcoes_requisicao()
+                    )
+                )
+                async for trecho in resposta:
+                    texto = getattr(trecho, 'text', "")
+                    if texto:
+                        if not trechos:
+                            span.set(ms_primeiro_trecho=round((time.perf_counter() - inicio) * 1000, 3))
+                        trechos.append(texto)
+                        yield texto
+            except LLMUnavailableError as e:
+                logger.error(f"\n[LLM SERVICE] Modelo indisponível: {e}")
+                span.set(falha=str(e))
+                raise
+            except Exception as e:
+                logger.error(f"\n[LLM SERVICE] Erro ao processar prompt em streaming: {e}")
+                span.set(falha=str(e))
+                # Resposta parcial não entra no cache
+                completo = False
+            texto_completo = "".join(trechos)
+            tokens_entrada, tokens_saida = LLMService._registrar_uso(prompt, resposta, texto_completo)
+            span.set(caracteres_resposta=len(texto_completo), tokens_entrada=tokens_entrada, tokens_saida=tokens_saida)
+            if completo and texto_completo:
+                await asyncio.to_thread(LLMService._gravar_cache, etapa, modelo, prompt, texto_completo)
+
+    @staticmethod
+    def niveis_cascata(etapa: str, nivel_maximo: str) -> List[str]:
+        """
+        Níveis tentados pela cascata da etapa, do inicial até `nivel_maximo` (inclusive).
+        Sem cascata (desabilitada ou etapa sem nível inicial), apenas `nivel_maximo`.
+        """
+        nivel_maximo = nivel_maximo.lower()
+        inicial = LLMService.CASCATA_NIVEL_INICIAL.get(etapa)
+        ordem = LLMService.ORDEM_NIVEIS
+        if not LLMService.CASCATA_ENABLED or inicial not in ordem or nivel_maximo not in ordem:
+            return [nivel_maximo]
+        inicio, fim = ordem.index(inicial), ordem.index(nivel_maximo)
+        return list(ordem[min(inicio, fim):fim + 1])
+
+    @staticmethod
+    def processar_prompt_cascata(
+        prompt: str,
+        validar: Callable[[str], Optional[str]],
+        etapa: str,
+        nivel_maximo: str = "medio"
+    ) -> Tuple[str, str]:
+        """
+        Processa o prompt subindo de nível enquanto `validar(texto)` devolver um motivo de
+        rejeição ('formato', 'erro', 'baixa_confianca'); None aceita a resposta. A resposta do
+        último nível é devolvida mesmo se rejeitada. Só a resposta aceita entra no cache de
+        respostas: uma rejeitada seria servida de novo (e escalaria de novo) a cada repetição.
+
+        Returns:
+            (texto da resposta, nível que a produziu).
+        """
+        niveis = LLMService.niveis_cascata(etapa, nivel_maximo)
+        inicio = time.perf_counter()
+        tentativas: List[Tuple[str, float, Optional[str]]] = []
+        for nivel in niveis:
+            inicio_nivel = time.perf_counter()
+            texto = LLMService.processar_prompt(prompt, nivel_modelo=nivel, etapa=etapa, validar=validar)
+            motivo = validar(texto)
+            tentativas.append((nivel, time.perf_counter() - inicio_nivel, motivo))
+            if motivo is None:
+                break
+        LLMService._registrar_cascata(etapa, niveis, tentativas, time.perf_counter() - inicio)
+        return texto, tentativas[-1][0]
+
+    @staticmethod
+    async def processar_prompt_cascata_async(
+        prompt: str,
+        validar: Callable[[str], Optional[str]],
+        etapa: str,
+        nivel_maximo: str = "medio"
+    ) -> Tuple[str, str]:
+        """
+        Versão assíncrona de `processar_prompt_cascata`.
+        """
+        niveis = LLMService.niveis_cascata(etapa, nivel_maximo)
+        inicio = time.perf_counter()
+        tentativas: List[Tuple[str, float, Optional[str]]] = []
+        for nivel in niveis:
+            inicio_nivel = time.perf_counter()
+            texto = await LLMService.processar_prompt_async(prompt, nivel_modelo=nivel, etapa=etapa, validar=validar)
+            motivo = validar(texto)
+            tentativas.append((nivel, time.perf_counter() - inicio_nivel, motivo))
+            if motivo is None:
+                break
+        LLMService._registrar_cascata(etapa, niveis, tentativas, time.perf_counter() - inicio)
+        return texto, tentativas[-1][0]
+
+    @staticmethod
+    def _registrar_cascata(etapa: str, niveis: List[str], tentativas: List[Tuple[str, float, Optional[str]]], duracao: float) -> None:
+        """
+        Acumula, por etapa, o nível que atendeu cada chamada, os motivos de escalonamento, a
+        latência por nível e a economia estimada: para chamadas resolvidas abaixo do nível
+        máximo, a latência média do nível máximo menos a duração total da cascata.
+        """
+        nivel_final = tentativas[-1][0]
+        escalonamentos = [motivo for _, _, motivo in tentativas[:-1]]
+        if escalonamentos:
+            logger.info(f"\n[LLM SERVICE] Cascata '{etapa}': {' -> '.join(n for n, _, _ in tentativas)} (motivos: {escalonamentos})")
+        with LLMService._stats_cascata_lock:
+            stats = LLMService._stats_cascata.setdefault(etapa, {
+                "chamadas": 0, "escalonadas": 0, "atendidas_por_nivel": {}, "motivos": {},
+                "latencia_por_nivel": {}, "economia_estimada_ms": 0.0,
+            })
+            stats["chamadas"] += 1
+            stats["escalonadas"] += 1 if escalonamentos else 0
+            stats["atendidas_por_nivel"][nivel_final] = stats["atendidas_por_nivel"].get(nivel_final, 0) + 1
+            for motivo in escalonamentos:
+                stats["motivos"][motivo] = stats["motivos"].get(motivo, 0) + 1
+            for nivel, segundos, _ in tentativas:
+                total, quantidade = stats["latencia_por_nivel"].get(nivel, (0.0, 0))
+                stats["latencia_por_nivel"][nivel] = (total + segundos, quantidade + 1)
+            maximo = stats["latencia_por_nivel"].get(niveis[-1])
+            if nivel_final != niveis[-1] and maximo:
+                stats["economia_estimada_ms"] += (maximo[0] / maximo[1] - duracao) * 1000
+
+    @staticmethod
+    def get_cascade_stats() -> Dict[str, Any]:
+        """
+        Taxa de escalonamento, motivos, latência média por nível e economia estimada, por etapa.
+        """
+        with LLMService._stats_cascata_lock:
+            resultado = {}
+            for etapa, stats in LLMService._stats_cascata.items():
+                resultado[etapa] = {
+                    "chamadas": stats["chamadas"],
+                    "taxa_escalonamento": round(stats["escalonadas"] / stats["chamadas"], 4),
+                    "atendidas_por_nivel": dict(stats["atendidas_por_nivel"]),
+                    "motivos": dict(stats["motivos"]),
+                    "latencia_media_ms_por_nivel": {
+                        nivel: round(total / quantidade * 1000, 3) for nivel, (total, quantidade) in stats["latencia_por_nivel"].items()
+                    },
+                    "economia_estimada_ms": round(stats["economia_estimada_ms"], 3),
+                }
+            return {"habilitada": LLMService.CASCATA_ENABLED, "niveis_iniciais": dict(LLMService.CASCATA_NIVEL_INICIAL), "etapas": resultado}
+
+    @staticmethod
+    def reset_cascade_stats() -> None:
+        with LLMService._stats_cascata_lock:
+            LLMService._stats_cascata = {}
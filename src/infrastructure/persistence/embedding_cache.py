@@ -0,0 +1,172 @@
+# src/infrastructure/persistence/embedding_cache.py
+
+"""
+Cache persistente de embeddings em dois níveis: LRU em memória e SQLite em disco.
+"""
+
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+
+from shared.utils.lru_cache import LRUCache
+from config.core.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+
+class EmbeddingCache:
+    """
+    Cache de embeddings chaveado por (nome do modelo, tipo de tarefa, texto normalizado).
+
+    O nível 1 é um LRU em memória do processo; o nível 2 é uma tabela SQLite em disco,
+    compartilhada entre processos/workers. Os vetores são armazenados já L2-normalizados
+    em float32, exatamente como o EmbeddingService os devolve.
+    """
+
+    def __init__(self, caminho_db: Optional[str] = None, capacidade_memoria: int = 4096):
+        self._memoria = LRUCache(capacidade_memoria)
+        self._caminho_db = caminho_db
+        self._conexao: Optional[sqlite3.Connection] = None
+        self._lock_db = threading.Lock()
+        self._lock_stats = threading.Lock()
+        self._stats = {"hits_memoria": 0, "hits_disco": 0, "misses": 0}
+
+        if caminho_db:
+            try:
+                diretorio = os.path.dirname(caminho_db)
+                if diretorio:
+                    os.makedirs(diretorio, exist_ok=True)
+                self._conexao = sqlite3.connect(caminho_db, check_same_thread=False, timeout=5.0)
+                self._conexao.execute("PRAGMA journal_mode=WAL")
+                self._conexao.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS embeddings (
+                        modelo TEXT NOT NULL,
+                        tarefa TEXT NOT NULL,
+                        texto TEXT NOT NULL,
+                        dimensao INTEGER NOT NULL,
+                        vetor BLOB NOT NULL,
+                        criado_em REAL NOT NULL,
+                        PRIMARY KEY (modelo, tarefa, texto)
+                    )
+                    """
+                )
+                self._conexao.commit()
+                logger.info(f"\n[Embedding Cache]\nNível em disco habilitado em '{caminho_db}'.")
+            except sqlite3.Error as e:
+                logger.error(f"\n[Embedding Cache]\nFalha ao abrir o cache em disco '{caminho_db}': {e}. Usando apenas memória.")
+                self._conexao = None
+
+    @staticmethod
+    def normalizar_texto(texto: str) -> str:
+        """
+        Normaliza o texto usado como chave: Unicode NFC, espaços colapsados e caixa baixa.
+        """
+        texto = unicodedata.normalize("NFC", texto)
+        texto = re.sub(r"\s+", " ", texto).strip()
+        return texto.casefold()
+
+    def get_many(self, modelo: str, tarefa: str, textos: List[str]) -> Dict[str, np.ndarray]:
+        """
+        Busca os vetores já conhecidos para os textos (já normalizados) informados.
+
+        Returns:
+            Dicionário texto -> vetor apenas para os textos encontrados em algum nível.
+        """
+        encontrados: Dict[str, np.ndarray] = {}
+        pendentes_disco: List[str] = []
+        hits_memoria = 0
+
+        for texto in dict.fromkeys(textos):
+            vetor = self._memoria.get((modelo, tarefa, texto))
+            if vetor is not None:
+                encontrados[texto] = vetor
+                hits_memoria += 1
+            else:
+                pendentes_disco.append(texto)
+
+        hits_disco = 0
+        if pendentes_disco and self._conexao is not None:
+            for texto, vetor in self._ler_do_disco(modelo, tarefa, pendentes_disco).items():
+                encontrados[texto] = vetor
+                self._memoria.put((modelo, tarefa, texto), vetor)
+                hits_disco += 1
+
+        with self._lock_stats:
+            self._stats["hits_memoria"] += hits_memoria
+            self._stats["hits_disco"] += hits_disco
+            self._stats["misses"] += len(pendentes_disco) - hits_disco
+
+        return encontrados
+
+    def put_many(self, modelo: str, tarefa: str, vetores: Dict[str, np.ndarray]) -> None:
+        """
+        Armazena vetores (texto normalizado -> vetor L2-normalizado) nos dois níveis.
+        """
+        if not vetores:
+            return
+
+        linhas: List[Tuple[str, str, str, int, bytes, float]] = []
+        agora = time.time()
+        for texto, vetor in vetores.items():
+            vetor = np.asarray(vetor, dtype=np.float32)
+            self._memoria.put((modelo, tarefa, texto), vetor)
+            linhas.append((modelo, tarefa, texto, int(vetor.shape[0]), vetor.tobytes(), agora))
+
+        if self._conexao is None:
+            return
+        try:
+            with self._lock_db:
+                self._conexao.executemany(
+                    "INSERT OR REPLACE INTO embeddings (modelo, tarefa, texto, dimensao, vetor, criado_em) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    linhas
+                )
+                self._conexao.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"\n[Embedding Cache]\nFalha ao gravar {len(linhas)} vetores no cache em disco: {e}")
+
+    def _ler_do_disco(self, modelo: str, tarefa: str, textos: List[str]) -> Dict[str, np.ndarray]:
+        resultado: Dict[str, np.ndarray] = {}
+        # Limite conservador de parâmetros por consulta do SQLite
+        tamanho_lote = 500
+        try:
+            with self._lock_db:
+                for inicio in range(0, len(textos), tamanho_lote):
+                    lote = textos[inicio:inicio + tamanho_lote]
+                    marcadores = ",".join("?" for _ in lote)
+                    cursor = self._conexao.execute(
+                        f"SELECT texto, dimensao, vetor FROM embeddings "
+                        f"WHERE modelo = ? AND tarefa = ? AND texto IN ({marcadores})",
+                        [modelo, tarefa, *lote]
+                    )
+                    for texto, dimensao, blob in cursor.fetchall():
+                        vetor = np.frombuffer(blob, dtype=np.float32)
+                        if vetor.shape[0] == dimensao:
+                            resultado[texto] = vetor
+        except sqlite3.Error as e:
+            logger.warning(f"\n[Embedding Cache]\nFalha ao ler o cache em disco: {e}")
+        return resultado
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock_stats:
+            stats = dict(self._stats)
+        stats["itens_memoria"] = len(self._memoria)
+        return stats
+
+    def limpar(self) -> None:
+        """
+        Esvazia os dois níveis do cache e zera os contadores.
+        """
+        self._memoria.clear()
+        if self._conexao is not None:
+            with self._lock_db:
+                self._conexao.execute("DELETE FROM embeddings")
+                self._conexao.commit()
+        with self._lock_stats:
+            self._stats = {"hits_memoria": 0, "hits_disco": 0, "misses": 0}
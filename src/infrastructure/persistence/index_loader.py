@@ -3,6 +3,7 @@ Serviço para carregamento de índices FAISS.
 """
 
 import os
+import sys
 import faiss
 import pickle
 from typing import Dict, Any, Tuple
@@ -12,24 +13,53 @@ class IndexLoader:
     Serviço para carregamento de índices FAISS e metadados associados.
     Responsável por carregar e fornecer acesso aos índices vetoriais e seus metadados.
     """
-    
-    # Caminho para os arquivos FAISS e PKL
-    FAISS_INDEX_PATH = os.path.join("vdb", "models_text-embedding-004", "table_name_index_norm_v2.index")
-    METADATA_PATH = os.path.join("vdb", "models_text-embedding-004", "table_metadata_for_name_index_v2.pkl")
-    
+
+    # Caminho para os arquivos FAISS e PKL (podem ser sobrescritos por variáveis de ambiente)
+    FAISS_INDEX_PATH = os.getenv(
+        "FAISS_INDEX_PATH",
+        os.path.join("vdb", "models_text-embedding-004", "table_name_index_norm_v2.index")
+    )
+    METADATA_PATH = os.getenv(
+        "FAISS_METADATA_PATH",
+        os.path.join("vdb", "models_text-embedding-004", "table_metadata_for_name_index_v2.pkl")
+    )
+
+    @staticmethod
+    def _resolver_caminho(caminho: str) -> str:
+        """
+        Resolve caminhos relativos também dentro do executável do PyInstaller,
+        onde o run_api.spec copia o diretório 'vdb/' para sys._MEIPASS.
+        """
+        if os.path.isabs(caminho) or os.path.exists(caminho):
+            return caminho
+        base_empacotada = getattr(sys, "_MEIPASS", None)
+        if base_empacotada and os.path.exists(os.path.join(base_empacotada, caminho)):
+            return os.path.join(base_empacotada, caminho)
+        return caminho
+
     @staticmethod
-    def load_index() -> Tuple[Any, Dict]:
+    def load_index(mmap: bool = False) -> Tuple[Any, Dict]:
         """
         Carrega o índice FAISS e os metadados.
-        
+
+        Args:
+            mmap: Se True, mapeia o índice em memória (somente leitura) em vez de
+                  copiá-lo inteiro para a RAM.
+
         Returns:
             Tuple contendo o índice FAISS e os metadados.
         """
+        caminho_indice = IndexLoader._resolver_caminho(IndexLoader.FAISS_INDEX_PATH)
+        caminho_metadados = IndexLoader._resolver_caminho(IndexLoader.METADATA_PATH)
+
         # Carrega o índice FAISS
-        index = faiss.read_index(IndexLoader.FAISS_INDEX_PATH)
-        
+        if mmap:
+            index = faiss.read_index(caminho_indice, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+        else:
+            index = faiss.read_index(caminho_indice)
+
         # Carrega os metadados
-        with open(IndexLoader.METADATA_PATH, 'rb') as f:
+        with open(caminho_metadados, 'rb') as f:
             metadata = pickle.load(f)
-        
-        return index, metadata
\ No newline at end of file
+
+        return index, metadata
@@ -0,0 +1,220 @@
+# src/infrastructure/persistence/job_store.py
+
+"""
+Armazenamento persistente (SQLite) dos jobs assíncronos de geração de SQL.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from config.core.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+STATUS_PENDENTE = "pendente"
+STATUS_EXECUTANDO = "executando"
+STATUS_CONCLUIDO = "concluido"
+STATUS_FALHOU = "falhou"
+STATUS_CANCELADO = "cancelado"
+STATUS_ATIVOS = (STATUS_PENDENTE, STATUS_EXECUTANDO)
+STATUS_FINAIS = (STATUS_CONCLUIDO, STATUS_FALHOU, STATUS_CANCELADO)
+
+
+class JobStore:
+    """
+    Tabela de jobs em SQLite, compartilhada entre processos/workers.
+
+    Cada job guarda o prompt, os parâmetros, o status, o resultado (JSON) e uma chave de
+    idempotência: enquanto um job com a mesma chave estiver ativo ou com resultado válido,
+    `create` devolve esse job em vez de criar outro. Jobs finalizados expiram após o TTL do
+    resultado; jobs ativos cujo processo parou de atualizar `atualizado_em` são marcados como
+    falhos por `mark_abandoned`.
+    """
+
+    def __init__(self, caminho_db: str):
+        diretorio = os.path.dirname(caminho_db)
+        if diretorio:
+            os.makedirs(diretorio, exist_ok=True)
+        self._caminho_db = caminho_db
+        self._lock = threading.Lock()
+        self._conexao = sqlite3.connect(caminho_db, check_same_thread=False, timeout=5.0)
+        self._conexao.row_factory = sqlite3.Row
+        self._conexao.execute("PRAGMA journal_mode=WAL")
+        self._conexao.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                chave TEXT NOT NULL,
+                prompt TEXT NOT NULL,
+                parametros TEXT NOT NULL,
+                status TEXT NOT NULL,
+                resultado TEXT,
+                erro TEXT,
+                cancelamento_solicitado INTEGER NOT NULL DEFAULT 0,
+                criado_em REAL NOT NULL,
+                iniciado_em REAL,
+                concluido_em REAL,
+                atualizado_em REAL NOT NULL,
+                expira_em REAL
+            )
+            """
+        )
+        self._conexao.execute("CREATE INDEX IF NOT EXISTS ix_jobs_chave ON jobs (chave, criado_em)")
+        self._conexao.execute("CREATE INDEX IF NOT EXISTS ix_jobs_status ON jobs (status, atualizado_em)")
+        self._conexao.commit()
+        logger.info(f"\n[Job Store]\nJobs persistidos em '{caminho_db}'.")
+
+    @staticmethod
+    def _para_dict(linha: Optional[sqlite3.Row]) -> Optional[Dict[str, Any]]:
+        if linha is None:
+            return None
+        job = dict(linha)
+        job["parametros"] = json.loads(job["parametros"])
+        job["resultado"] = json.loads(job["resultado"]) if job["resultado"] else None
+        job["cancelamento_solicitado"] = bool(job["cancelamento_solicitado"])
+        return job
+
+    def _buscar(self, job_id: str, agora: float) -> Optional[Dict[str, Any]]:
+        linha = self._conexao.execute(
+            "SELECT * FROM jobs WHERE id = ? AND (expira_em IS NULL OR expira_em > ?)", (job_id, agora)
+        ).fetchone()
+        return JobStore._para_dict(linha)
+
+    def _buscar_por_chave(self, chave: str, agora: float) -> Optional[Dict[str, Any]]:
+        linha = self._conexao.execute(
+            "SELECT * FROM jobs WHERE chave = ? AND status IN (?, ?, ?) AND (expira_em IS NULL OR expira_em > ?) "
+            "ORDER BY criado_em DESC LIMIT 1",
+            (chave, STATUS_PENDENTE, STATUS_EXECUTANDO, STATUS_CONCLUIDO, agora)
+        ).fetchone()
+        return {**JobStore._para_dict(linha), "reaproveitado": True} if linha is not None else None
+
+    def get_by_key(self, chave: str) -> Optional[Dict[str, Any]]:
+        """
+        Job reaproveitável com a chave: ativo, ou concluído com resultado ainda válido.
+        """
+        with self._lock:
+            return self._buscar_por_chave(chave, time.time())
+
+    def create(self, prompt: str, parametros: Dict[str, Any], chave: str) -> Dict[str, Any]:
+        """
+        Cria um job pendente, ou devolve o job reaproveitável com a mesma chave (ver
+        `get_by_key`). O campo 'reaproveitado' indica qual dos dois casos ocorreu.
+        """
+        agora = time.time()
+        with self._lock:
+            existente = self._buscar_por_chave(chave, agora)
+            if existente is not None:
+                return existente
+
+            job_id = uuid.uuid4().hex
+            self._conexao.execute(
+                "INSERT INTO jobs (id, chave, prompt, parametros, status, criado_em, atualizado_em) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, chave, prompt, json.dumps(parametros, ensure_ascii=False), STATUS_PENDENTE, agora, agora)
+            )
+            self._conexao.commit()
+            return {**self._buscar(job_id, agora), "reaproveitado": False}
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._buscar(job_id, time.time())
+
+    def mark_running(self, job_id: str) -> bool:
+        """
+        Passa o job de pendente para executando; False se ele não está mais pendente (ex.: cancelado).
+        """
+        agora = time.time()
+        with self._lock:
+            cursor = self._conexao.execute(
+                "UPDATE jobs SET status = ?, iniciado_em = ?, atualizado_em = ? WHERE id = ? AND status = ? AND cancelamento_solicitado = 0",
+                (STATUS_EXECUTANDO, agora, agora, job_id, STATUS_PENDENTE)
+            )
+            self._conexao.commit()
+            return cursor.rowcount == 1
+
+    def finish(self, job_id: str, status: str, ttl_segundos: float, resultado: Optional[Dict[str, Any]] = None, erro: Optional[str] = None) -> None:
+        """
+        Registra o fim do job (concluido, falhou ou cancelado); o registro expira após `ttl_segundos`.
+        """
+        agora = time.time()
+        with self._lock:
+            self._conexao.execute(
+                "UPDATE jobs SET status = ?, resultado = ?, erro = ?, concluido_em = ?, atualizado_em = ?, expira_em = ? "
+                "WHERE id = ? AND status IN (?, ?)",
+                (
+                    status, json.dumps(resultado, ensure_ascii=False, default=str) if resultado is not None else None, erro,
+                    agora, agora, agora + ttl_segundos, job_id, STATUS_PENDENTE, STATUS_EXECUTANDO
+                )
+            )
+            self._conexao.commit()
+
+    def request_cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Marca o pedido de cancelamento de um job ativo (qualquer processo pode pedir; o dono
+        do job o interrompe). Devolve o job atualizado, ou None se não existe.
+        """
+        agora = time.time()
+        with self._lock:
+            self._conexao.execute(
+                "UPDATE jobs SET cancelamento_solicitado = 1, atualizado_em = ? WHERE id = ? AND status IN (?, ?)",
+                (agora, job_id, STATUS_PENDENTE, STATUS_EXECUTANDO)
+            )
+            self._conexao.commit()
+            return self._buscar(job_id, agora)
+
+    def cancel_requested(self, job_ids: List[str]) -> List[str]:
+        """
+        Entre os jobs informados, os que tiveram cancelamento solicitado.
+        """
+        if not job_ids:
+            return []
+        marcadores = ",".join("?" for _ in job_ids)
+        with self._lock:
+            linhas = self._conexao.execute(
+                f"SELECT id FROM jobs WHERE id IN ({marcadores}) AND cancelamento_solicitado = 1", job_ids
+            ).fetchall()
+        return [linha["id"] for linha in linhas]
+
+    def heartbeat(self, job_ids: List[str]) -> None:
+        """
+        Atualiza `atualizado_em` dos jobs ativos deste processo.
+        """
+        if not job_ids:
+            return
+        marcadores = ",".join("?" for _ in job_ids)
+        with self._lock:
+            self._conexao.execute(
+                f"UPDATE jobs SET atualizado_em = ? WHERE id IN ({marcadores}) AND status IN (?, ?)",
+                [time.time(), *job_ids, STATUS_PENDENTE, STATUS_EXECUTANDO]
+            )
+            self._conexao.commit()
+
+    def mark_abandoned(self, limite_segundos: float, ttl_segundos: float) -> int:
+        """
+        Marca como falhos os jobs ativos sem atualização há mais de `limite_segundos`
+        (processo dono encerrado). Devolve quantos foram marcados.
+        """
+        agora = time.time()
+        with self._lock:
+            cursor = self._conexao.execute(
+                "UPDATE jobs SET status = ?, erro = ?, concluido_em = ?, expira_em = ? WHERE status IN (?, ?) AND atualizado_em < ?",
+                (STATUS_FALHOU, "Job interrompido: o processo que o executava foi encerrado.", agora, agora + ttl_segundos,
+                 STATUS_PENDENTE, STATUS_EXECUTANDO, agora - limite_segundos)
+            )
+            self._conexao.commit()
+            return cursor.rowcount
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            cursor = self._conexao.execute("DELETE FROM jobs WHERE expira_em IS NOT NULL AND expira_em <= ?", (time.time(),))
+            self._conexao.commit()
+            return cursor.rowcount
+
+    def count_by_status(self) -> Dict[str, int]:
+        with self._lock:
+            linhas = self._conexao.execute("SELECT status, COUNT(*) AS quantidade FROM jobs GROUP BY status").fetchall()
+        return {linha["status"]: linha["quantidade"] for linha in linhas}
@@ -0,0 +1,164 @@
+# src/infrastructure/persistence/llm_response_cache.py
+
+"""
+Cache de respostas da LLM endereçado pelo conteúdo: LRU em memória e SQLite em disco.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from shared.utils.lru_cache import LRUCache
+from config.core.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+
+class LLMResponseCache:
+    """
+    Memoização das chamadas à LLM chaveada pelo hash de (modelo, configuração de geração, prompt).
+
+    Os prompts de extração e verificação são funções determinísticas das instruções, do
+    prompt do usuário e dos chunks; a mesma chave devolve a mesma resposta já gerada. O nível 1
+    é um LRU em memória do processo; o nível 2, opcional, é uma tabela SQLite em disco
+    compartilhada entre processos/workers. As estatísticas são separadas por etapa.
+
+    Cada resposta expira após `ttl_segundos` (0 = nunca) nos dois níveis. A cada
+    PODA_A_CADA_GRAVACOES gravações, o nível em disco apaga as linhas expiradas e, acima de
+    `max_linhas` (0 = sem limite), as mais antigas.
+    """
+    PODA_A_CADA_GRAVACOES = 100
+
+    def __init__(self, caminho_db: Optional[str] = None, capacidade_memoria: int = 1024, ttl_segundos: float = 0, max_linhas: int = 0):
+        self._memoria = LRUCache(capacidade_memoria)
+        self._caminho_db = caminho_db
+        self._ttl_segundos = ttl_segundos
+        self._max_linhas = max_linhas
+        self._gravacoes = 0
+        self._conexao: Optional[sqlite3.Connection] = None
+        self._lock_db = threading.Lock()
+        self._lock_stats = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+        if caminho_db:
+            try:
+                diretorio = os.path.dirname(caminho_db)
+                if diretorio:
+                    os.makedirs(diretorio, exist_ok=True)
+                self._conexao = sqlite3.connect(caminho_db, check_same_thread=False, timeout=5.0)
+                self._conexao.execute("PRAGMA journal_mode=WAL")
+                self._conexao.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS respostas_llm (
+                        chave TEXT PRIMARY KEY,
+                        modelo TEXT NOT NULL,
+                        etapa TEXT,
+                        resposta TEXT NOT NULL,
+                        criado_em REAL NOT NULL,
+                        expira_em REAL
+                    )
+                    """
+                )
+                colunas = {linha[1] for linha in self._conexao.execute("PRAGMA table_info(respostas_llm)")}
+                if "expira_em" not in colunas:
+                    # Bancos criados antes do TTL: as linhas antigas ficam sem expiração até a poda por tamanho
+                    self._conexao.execute("ALTER TABLE respostas_llm ADD COLUMN expira_em REAL")
+                self._conexao.execute("CREATE INDEX IF NOT EXISTS ix_respostas_llm_criado_em ON respostas_llm (criado_em)")
+                self._conexao.commit()
+                logger.info(f"\n[LLM Cache]\nNível em disco habilitado em '{caminho_db}'.")
+            except sqlite3.Error as e:
+                logger.error(f"\n[LLM Cache]\nFalha ao abrir o cache em disco '{caminho_db}': {e}. Usando apenas memória.")
+                self._conexao = None
+
+    @staticmethod
+    def chave(modelo: str, prompt: str, config_geracao: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Hash SHA-256 de (modelo, configuração de geração, prompt).
+        """
+        conteudo = json.dumps([modelo, config_geracao or {}, prompt], ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(conteudo.encode("utf-8")).hexdigest()
+
+    def _contar(self, etapa: Optional[str], campo: str) -> None:
+        with self._lock_stats:
+            contadores = self._stats.setdefault(etapa or "outras", {"hits_memoria": 0, "hits_disco": 0, "misses": 0})
+            contadores[campo] += 1
+
+    def get(self, chave: str, etapa: Optional[str] = None) -> Optional[str]:
+        agora = time.time()
+        item = self._memoria.get(chave)
+        if item is not None:
+            resposta, expira_em = item
+            if expira_em is None or expira_em > agora:
+                self._contar(etapa, "hits_memoria")
+                return resposta
+
+        if self._conexao is not None:
+            try:
+                with self._lock_db:
+                    linha = self._conexao.execute(
+                        "SELECT resposta, expira_em FROM respostas_llm WHERE chave = ? AND (expira_em IS NULL OR expira_em > ?)",
+                        (chave, agora)
+                    ).fetchone()
+            except sqlite3.Error as e:
+                logger.warning(f"\n[LLM Cache]\nFalha ao ler o cache em disco: {e}")
+                linha = None
+            if linha is not None:
+                self._memoria.put(chave, (linha[0], linha[1]))
+                self._contar(etapa, "hits_disco")
+                return linha[0]
+
+        self._contar(etapa, "misses")
+        return None
+
+    def put(self, chave: str, resposta: str, modelo: str, etapa: Optional[str] = None) -> None:
+        agora = time.time()
+        expira_em = agora + self._ttl_segundos if self._ttl_segundos > 0 else None
+        self._memoria.put(chave, (resposta, expira_em))
+        if self._conexao is None:
+            return
+        try:
+            with self._lock_db:
+                self._conexao.execute(
+                    "INSERT OR REPLACE INTO respostas_llm (chave, modelo, etapa, resposta, criado_em, expira_em) VALUES (?, ?, ?, ?, ?, ?)",
+                    (chave, modelo, etapa, resposta, agora, expira_em)
+                )
+                self._gravacoes += 1
+                if self._gravacoes % LLMResponseCache.PODA_A_CADA_GRAVACOES == 0:
+                    self._podar(agora)
+                self._conexao.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"\n[LLM Cache]\nFalha ao gravar resposta no cache em disco: {e}")
+
+    def _podar(self, agora: float) -> None:
+        # Chamado com _lock_db adquirido, dentro da transação do put
+        removidas = self._conexao.execute("DELETE FROM respostas_llm WHERE expira_em IS NOT NULL AND expira_em <= ?", (agora,)).rowcount
+        if self._max_linhas > 0:
+            removidas += self._conexao.execute(
+                "DELETE FROM respostas_llm WHERE chave IN "
+                "(SELECT chave FROM respostas_llm ORDER BY criado_em DESC LIMIT -1 OFFSET ?)",
+                (self._max_linhas,)
+            ).rowcount
+        if removidas:
+            logger.info(f"\n[LLM Cache]\n{removidas} respostas expiradas ou excedentes removidas do cache em disco.")
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock_stats:
+            por_etapa = {etapa: dict(contadores) for etapa, contadores in self._stats.items()}
+        totais = {campo: sum(c[campo] for c in por_etapa.values()) for campo in ("hits_memoria", "hits_disco", "misses")}
+        return {**totais, "por_etapa": por_etapa, "itens_memoria": len(self._memoria)}
+
+    def limpar(self) -> None:
+        """
+        Esvazia os dois níveis do cache e zera os contadores.
+        """
+        self._memoria.clear()
+        if self._conexao is not None:
+            with self._lock_db:
+                self._conexao.execute("DELETE FROM respostas_llm")
+                self._conexao.commit()
+        with self._lock_stats:
+            self._stats = {}
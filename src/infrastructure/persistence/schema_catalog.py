@@ -0,0 +1,127 @@
+# src/infrastructure/persistence/schema_catalog.py
+
+"""
+Catálogo local com todas as tabelas (e seus chunks de schema) do backend de busca.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from config.core.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+
+class SchemaCatalog:
+    """
+    Cópia em memória de todas as tabelas indexadas, no mesmo formato de um 'match' da
+    busca vetorial (table_name, content, payload_completo...).
+
+    É carregado uma vez do backend configurado no SearchService e recarregado em segundo
+    plano a cada CATALOG_REFRESH_SECONDS. A `versao` (hash do conteúdo) muda apenas quando o
+    catálogo muda de fato, permitindo que índices derivados sejam reconstruídos só nesse caso.
+    """
+    REFRESH_SECONDS = float(os.getenv("CATALOG_REFRESH_SECONDS", "3600"))
+
+    _tabelas: Optional[List[Dict[str, Any]]] = None
+    _versao: Optional[str] = None
+    _carregado_em: float = 0.0
+    _lock = threading.Lock()
+    _recarregando: bool = False
+    _estado_lock = threading.Lock()
+
+    @staticmethod
+    def _calcular_versao(tabelas: List[Dict[str, Any]]) -> str:
+        hash_catalogo = hashlib.sha1()
+        for tabela in sorted(tabelas, key=lambda t: t.get("table_name", "")):
+            hash_catalogo.update(tabela.get("table_name", "").encode("utf-8"))
+            hash_catalogo.update(b"\0")
+            hash_catalogo.update(tabela.get("content", "").encode("utf-8"))
+            hash_catalogo.update(b"\0")
+        return hash_catalogo.hexdigest()[:16]
+
+    @staticmethod
+    def _carregar_do_backend() -> List[Dict[str, Any]]:
+        # Import tardio para evitar ciclo (o SearchService também consulta o catálogo)
+        from infrastructure.vector_database.search_service import SearchService
+        return SearchService.list_all_tables()
+
+    @staticmethod
+    def get_tables(force_refresh: bool = False) -> List[Dict[str, Any]]:
+        """
+        Retorna todas as tabelas do catálogo, carregando-as na primeira chamada. Quando o
+        intervalo de atualização expira, a recarga roda numa thread de fundo e a cópia
+        anterior continua sendo servida até a nova ser trocada. Em caso de falha mantém a
+        última versão válida.
+        """
+        tabelas = SchemaCatalog._tabelas
+        if tabelas is not None and not force_refresh:
+            if (time.monotonic() - SchemaCatalog._carregado_em) >= SchemaCatalog.REFRESH_SECONDS:
+                SchemaCatalog._agendar_recarga()
+            return tabelas
+
+        with SchemaCatalog._lock:
+            if SchemaCatalog._tabelas is not None and not force_refresh:
+                return SchemaCatalog._tabelas
+            SchemaCatalog._recarregar()
+            return SchemaCatalog._tabelas if SchemaCatalog._tabelas is not None else []
+
+    @staticmethod
+    def _recarregar() -> None:
+        try:
+            inicio = time.perf_counter()
+            tabelas = SchemaCatalog._carregar_do_backend()
+            SchemaCatalog.set_tables(tabelas)
+            logger.info(f"\n[Schema Catalog] {len(tabelas)} tabelas carregadas em {time.perf_counter() - inicio:.2f}s (versão {SchemaCatalog._versao}).")
+        except Exception as e:
+            logger.error(f"\n[Schema Catalog] Falha ao carregar o catálogo: {e}")
+            # Evita tentar recarregar a cada requisição enquanto o backend estiver fora
+            SchemaCatalog._carregado_em = time.monotonic()
+
+    @staticmethod
+    def _agendar_recarga() -> None:
+        """
+        Dispara (no máximo uma) recarga em segundo plano; quem chamou não espera por ela.
+        """
+        with SchemaCatalog._estado_lock:
+            if SchemaCatalog._recarregando:
+                return
+            SchemaCatalog._recarregando = True
+
+        def recarregar():
+            try:
+                with SchemaCatalog._lock:
+                    if (time.monotonic() - SchemaCatalog._carregado_em) >= SchemaCatalog.REFRESH_SECONDS:
+                        SchemaCatalog._recarregar()
+            finally:
+                with SchemaCatalog._estado_lock:
+                    SchemaCatalog._recarregando = False
+
+        threading.Thread(target=recarregar, name="schema-catalog-refresh", daemon=True).start()
+
+    @staticmethod
+    def set_tables(tabelas: List[Dict[str, Any]]) -> None:
+        """
+        Substitui o conteúdo do catálogo (usado no carregamento e em testes).
+        """
+        SchemaCatalog._tabelas = list(tabelas)
+        SchemaCatalog._versao = SchemaCatalog._calcular_versao(SchemaCatalog._tabelas)
+        SchemaCatalog._carregado_em = time.monotonic()
+
+    @staticmethod
+    def get_version() -> Optional[str]:
+        """
+        Versão (hash do conteúdo) do catálogo atualmente carregado, ou None se vazio.
+        """
+        SchemaCatalog.get_tables()
+        return SchemaCatalog._versao
+
+    @staticmethod
+    def reset() -> None:
+        with SchemaCatalog._lock:
+            SchemaCatalog._tabelas = None
+            SchemaCatalog._versao = None
+            SchemaCatalog._carregado_em = 0.0
@@ -0,0 +1,179 @@
+# src/infrastructure/persistence/semantic_response_cache.py
+
+"""
+Cache semântico das respostas finais do RAG, chaveado pelo embedding do prompt.
+"""
+
+import itertools
+import os
+import re
+import threading
+import time
+import numpy as np
+from typing import Any, Dict, FrozenSet, List, Optional
+
+from shared.utils.lru_cache import LRUCache
+from infrastructure.persistence.embedding_cache import EmbeddingCache
+from config.core.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# Números (anos, códigos, valores) e trechos entre aspas do prompt
+_PADRAO_LITERAIS = re.compile(r"\d+(?:[.,]\d+)*|'[^']*'|\"[^\"]*\"")
+
+
+class SemanticResponseCache:
+    """
+    Guarda a resposta final (`sql_gerado_final`) e as tabelas usadas por prompt já respondido,
+    e a reaproveita para prompts cujo embedding tenha similaridade de cosseno acima do limiar.
+
+    O índice é uma matriz em memória com uma linha por entrada (os vetores chegam
+    L2-normalizados do EmbeddingService, então o cosseno é o produto interno). As entradas
+    seguem LRU com TTL e são todas descartadas quando a versão do catálogo de schemas muda.
+
+    Prompts muito parecidos podem diferir só no ano ou em um código ("empenhado em 2023" e
+    "em 2024"); por isso um acerto também exige os mesmos literais (números e trechos entre
+    aspas) nos dois prompts.
+    """
+    ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "1") != "0"
+    LIMIAR = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+    CAPACIDADE = int(os.getenv("SEMANTIC_CACHE_CAPACITY", "512"))
+    TTL_SEGUNDOS = float(os.getenv("SEMANTIC_CACHE_TTL_SECONDS", "86400"))
+
+    def __init__(self, capacidade: Optional[int] = None, limiar: Optional[float] = None, ttl_segundos: Optional[float] = None):
+        self.capacidade = capacidade or SemanticResponseCache.CAPACIDADE
+        self.limiar = SemanticResponseCache.LIMIAR if limiar is None else limiar
+        ttl = SemanticResponseCache.TTL_SEGUNDOS if ttl_segundos is None else ttl_segundos
+        self._entradas = LRUCache(self.capacidade, ttl_segundos=ttl, ao_descartar=self._liberar_posicao)
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._versao_catalogo: Optional[str] = None
+        self._stats = {"acertos": 0, "falhas": 0, "armazenadas": 0, "invalidacoes": 0}
+        self._reiniciar_indice(None)
+
+    def _reiniciar_indice(self, dimensao: Optional[int]) -> None:
+        # Uma linha a mais que a capacidade: a nova entrada ocupa sua posição antes de o LRU descartar a antiga
+        linhas = self.capacidade + 1
+        self._matriz = np.zeros((linhas, dimensao), dtype=np.float32) if dimensao else None
+        self._ocupadas = np.zeros(linhas, dtype=bool)
+        self._id_por_posicao: List[Optional[int]] = [None] * linhas
+        self._livres = list(range(linhas - 1, -1, -1))
+
+    def _liberar_posicao(self, _id_entrada: int, entrada: Dict[str, Any]) -> None:
+        # Chamado pelo LRUCache (descarte por capacidade ou TTL), sempre sob self._lock
+        posicao = entrada["posicao"]
+        self._ocupadas[posicao] = False
+        self._id_por_posicao[posicao] = None
+        self._livres.append(posicao)
+
+    def _limpar(self) -> None:
+        self._entradas.clear()
+        self._reiniciar_indice(self._matriz.shape[1] if self._matriz is not None else None)
+
+    def _verificar_versao(self, versao_catalogo: Optional[str]) -> None:
+        if versao_catalogo == self._versao_catalogo:
+            return
+        if len(self._entradas):
+            logger.info(f"\n[Semantic Cache]\nCatálogo mudou ({self._versao_catalogo} -> {versao_catalogo}). {len(self._entradas)} respostas descartadas.")
+            self._stats["invalidacoes"] += 1
+        self._limpar()
+        self._versao_catalogo = versao_catalogo
+
+    @staticmethod
+    def normalizar_prompt(prompt: str) -> str:
+        """
+        Texto usado no embedding: normalização do EmbeddingCache sem a pontuação final.
+        """
+        return EmbeddingCache.normalizar_texto(prompt).rstrip(" ?!.;")
+
+    @staticmethod
+    def _literais(prompt: str) -> FrozenSet[str]:
+        return frozenset(literal.replace(",", ".") for literal in _PADRAO_LITERAIS.findall(EmbeddingCache.normalizar_texto(prompt)))
+
+    def get(self, vetor: np.ndarray, prompt: str, versao_catalogo: Optional[str]) -> Optional[Dict[str, Any]]:
+        """
+        Procura uma resposta para o prompt (vetor já normalizado).
+
+        Returns:
+            Dict com 'sql_gerado_final', 'tabelas', 'similaridade' e 'prompt_original', ou None.
+        """
+        vetor = np.asarray(vetor, dtype=np.float32).reshape(-1)
+        literais = SemanticResponseCache._literais(prompt)
+        with self._lock:
+            self._verificar_versao(versao_catalogo)
+            if self._matriz is None or self._matriz.shape[1] != vetor.shape[0] or not self._ocupadas.any():
+                self._stats["falhas"] += 1
+                return None
+
+            similaridades = self._matriz @ vetor
+            similaridades[~self._ocupadas] = -np.inf
+            for posicao in np.argsort(-similaridades):
+                similaridade = float(similaridades[posicao])
+                if similaridade < self.limiar:
+                    break
+                id_entrada = self._id_por_posicao[posicao]
+                entrada = self._entradas.get(id_entrada) if id_entrada is not None else None
+                if entrada is None or entrada["literais"] != literais:
+                    # Expirada (a posição é liberada pelo próprio LRU) ou com ano/código diferente
+                    continue
+                self._stats["acertos"] += 1
+                return {
+                    "sql_gerado_final": entrada["sql_gerado_final"],
+                    "tabelas": list(entrada["tabelas"]),
+                    "similaridade": similaridade,
+                    "prompt_original": entrada["prompt"],
+                }
+            self._stats["falhas"] += 1
+            return None
+
+    def put(self, vetor: np.ndarray, prompt: str, versao_catalogo: Optional[str], sql_gerado_final: str, tabelas: List[str]) -> None:
+        """
+        Armazena a resposta do prompt. Um prompt equivalente já armazenado (acima do limiar e
+        com os mesmos literais) é substituído.
+        """
+        vetor = np.asarray(vetor, dtype=np.float32).reshape(-1)
+        literais = SemanticResponseCache._literais(prompt)
+        with self._lock:
+            self._verificar_versao(versao_catalogo)
+            if self._matriz is None or self._matriz.shape[1] != vetor.shape[0]:
+                # Primeiro vetor ou troca do modelo de embedding
+                self._entradas.clear()
+                self._reiniciar_indice(vetor.shape[0])
+
+            self._entradas.purge_expired()
+            equivalentes = np.flatnonzero(self._ocupadas & (self._matriz @ vetor >= self.limiar))
+            for posicao in equivalentes:
+                id_entrada = self._id_por_posicao[posicao]
+                entrada = self._entradas.get(id_entrada)
+                if entrada is not None and entrada["literais"] == literais:
+                    self._entradas.pop(id_entrada)
+                    self._liberar_posicao(id_entrada, entrada)
+
+            posicao = self._livres.pop()
+            id_entrada = next(self._ids)
+            self._matriz[posicao] = vetor
+            self._ocupadas[posicao] = True
+            self._id_por_posicao[posicao] = id_entrada
+            self._entradas.put(id_entrada, {
+                "posicao": posicao,
+                "prompt": prompt,
+                "literais": literais,
+                "sql_gerado_final": sql_gerado_final,
+                "tabelas": list(tabelas),
+                "criado_em": time.time(),
+            })
+            self._stats["armazenadas"] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._limpar()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            consultas = self._stats["acertos"] + self._stats["falhas"]
+            return {
+                **self._stats,
+                "entradas": len(self._entradas),
+                "taxa_acerto": round(self._stats["acertos"] / consultas, 4) if consultas else 0.0,
+                "limiar": self.limiar,
+            }
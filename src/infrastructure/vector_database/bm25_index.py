@@ -0,0 +1,180 @@
+# src/infrastructure/vector_database/bm25_index.py
+
+"""
+Índice invertido com ranking BM25 sobre o conteúdo dos chunks de schema.
+"""
+
+import hashlib
+import math
+import re
+import threading
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+
+from infrastructure.vector_database.lexical_index import strip_accents
+
+
+def tokenize(texto: str) -> List[str]:
+    """
+    Tokeniza um chunk ou consulta. Identificadores compostos geram o token inteiro e suas
+    partes: 'vl_empenhado' -> ['vl_empenhado', 'vl', 'empenhado'], de modo que tanto o nome
+    exato da coluna quanto palavras soltas do prompt encontrem a tabela.
+    """
+    tokens: List[str] = []
+    for identificador in re.findall(r"[0-9a-z_]+", strip_accents(texto)):
+        partes = [parte for parte in identificador.split("_") if parte]
+        if len(partes) > 1:
+            tokens.append("_".join(partes))
+        tokens.extend(partes)
+    return tokens
+
+
+class BM25Index:
+    """
+    Índice BM25 (Okapi) incremental, com documentos identificados pelo table_name.
+
+    Os chunks têm o formato 'schema;tabela;desc;col1;...;FK:...;IDX:...', então colunas,
+    descrições e tabelas relacionadas tornam-se pesquisáveis diretamente. `sync()` aplica
+    apenas as diferenças em relação a uma nova versão do catálogo.
+
+    Cada documento ocupa um slot inteiro (reaproveitado após remoções). As postings ficam em
+    dicionários, baratos de atualizar, e são convertidas sob demanda em arrays numpy por termo,
+    de modo que a pontuação é vetorizada mesmo para termos presentes em milhares de chunks.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._tabelas: Dict[str, Dict[str, Any]] = {}
+        self._hashes: Dict[str, str] = {}
+        self._frequencias: Dict[str, Counter] = {}
+        self._slots: Dict[str, int] = {}
+        self._nomes: List[Optional[str]] = []
+        self._slots_livres: List[int] = []
+        self._tamanhos = np.zeros(0, dtype=np.float32)
+        self._postings: Dict[str, Dict[int, int]] = {}
+        self._arrays: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self._total_tokens = 0
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._tabelas)
+
+    @staticmethod
+    def _hash_conteudo(conteudo: str) -> str:
+        return hashlib.sha1(conteudo.encode("utf-8")).hexdigest()
+
+    def _alocar_slot(self, table_name: str) -> int:
+        if self._slots_livres:
+            slot = self._slots_livres.pop()
+            self._nomes[slot] = table_name
+        else:
+            slot = len(self._nomes)
+            self._nomes.append(table_name)
+            if slot >= self._tamanhos.size:
+                self._tamanhos = np.concatenate([self._tamanhos, np.zeros(max(1024, self._tamanhos.size), dtype=np.float32)])
+        self._slots[table_name] = slot
+        return slot
+
+    def upsert(self, tabela: Dict[str, Any]) -> None:
+        """
+        Adiciona ou atualiza o documento de uma tabela.
+        """
+        table_name = tabela.get("table_name")
+        if not table_name:
+            return
+        conteudo = tabela.get("content", "") or ""
+        with self._lock:
+            if table_name in self._tabelas:
+                self.remove(table_name)
+            frequencias = Counter(tokenize(f"{table_name} {conteudo}"))
+            slot = self._alocar_slot(table_name)
+            self._tabelas[table_name] = tabela
+            self._hashes[table_name] = self._hash_conteudo(conteudo)
+            self._frequencias[table_name] = frequencias
+            self._tamanhos[slot] = sum(frequencias.values())
+            self._total_tokens += int(self._tamanhos[slot])
+            for termo, frequencia in frequencias.items():
+                self._postings.setdefault(termo, {})[slot] = frequencia
+                self._arrays.pop(termo, None)
+
+    def remove(self, table_name: str) -> None:
+        with self._lock:
+            frequencias = self._frequencias.pop(table_name, None)
+            if frequencias is None:
+                return
+            slot = self._slots.pop(table_name)
+            self._tabelas.pop(table_name, None)
+            self._hashes.pop(table_name, None)
+            self._total_tokens -= int(self._tamanhos[slot])
+            self._tamanhos[slot] = 0
+            self._nomes[slot] = None
+            self._slots_livres.append(slot)
+            for termo in frequencias:
+                self._arrays.pop(termo, None)
+                documentos = self._postings.get(termo)
+                if documentos is not None:
+                    documentos.pop(slot, None)
+                    if not documentos:
+                        del self._postings[termo]
+
+    def sync(self, tabelas: List[Dict[str, Any]]) -> Tuple[int, int]:
+        """
+        Atualiza o índice para refletir exatamente `tabelas`, reindexando apenas o que mudou.
+
+        Returns:
+            (documentos adicionados/atualizados, documentos removidos)
+        """
+        with self._lock:
+            novas = {t.get("table_name"): t for t in tabelas if t.get("table_name")}
+            removidas = [nome for nome in self._tabelas if nome not in novas]
+            for nome in removidas:
+                self.remove(nome)
+            atualizadas = 0
+            for nome, tabela in novas.items():
+                if self._hashes.get(nome) != self._hash_conteudo(tabela.get("content", "") or ""):
+                    self.upsert(tabela)
+                    atualizadas += 1
+                else:
+                    self._tabelas[nome] = tabela
+            return atualizadas, len(removidas)
+
+    def _arrays_do_termo(self, termo: str) -> Tuple[np.ndarray, np.ndarray]:
+        arrays = self._arrays.get(termo)
+        if arrays is None:
+            documentos = self._postings[termo]
+            arrays = (
+                np.fromiter(documentos.keys(), dtype=np.intp, count=len(documentos)),
+                np.fromiter(documentos.values(), dtype=np.float32, count=len(documentos)),
+            )
+            self._arrays[termo] = arrays
+        return arrays
+
+    def search(self, consulta: str, k: int = 5, min_idf: float = 0.2) -> List[Tuple[Dict[str, Any], float]]:
+        """
+        Retorna até `k` pares (tabela, score BM25) em ordem decrescente de score.
+        Termos presentes em quase todos os chunks (idf < min_idf, ex.: 'id', em mais de ~80% deles) são ignorados.
+        """
+        with self._lock:
+            total_documentos = len(self._tabelas)
+            if total_documentos == 0:
+                return []
+            tamanho_medio = max(self._total_tokens / total_documentos, 1.0)
+            normalizacao = self.k1 * (1 - self.b + self.b * self._tamanhos[:len(self._nomes)] / tamanho_medio)
+            scores = np.zeros(len(self._nomes), dtype=np.float32)
+
+            for termo in set(tokenize(consulta)):
+                if termo not in self._postings:
+                    continue
+                slots, frequencias = self._arrays_do_termo(termo)
+                idf = math.log(1 + (total_documentos - slots.size + 0.5) / (slots.size + 0.5))
+                if idf < min_idf:
+                    continue
+                scores[slots] += idf * frequencias * (self.k1 + 1) / (frequencias + normalizacao[slots])
+
+            candidatos = np.flatnonzero(scores > 0)
+            if candidatos.size > k:
+                candidatos = candidatos[np.argpartition(-scores[candidatos], k - 1)[:k]]
+            candidatos = candidatos[np.argsort(-scores[candidatos], kind="stable")]
+            return [(self._tabelas[self._nomes[slot]], float(scores[slot])) for slot in candidatos]
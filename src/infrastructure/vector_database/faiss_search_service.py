@@ -0,0 +1,133 @@
+# src/infrastructure/vector_database/faiss_search_service.py
+
+import numpy as np
+from typing import List, Dict, Any, Optional
+import faiss
+import traceback
+from infrastructure.persistence.index_loader import IndexLoader
+
+class FaissSearchService:
+    """
+    Busca vetorial de tabelas em um índice FAISS local (carregado pelo IndexLoader).
+
+    Mesma interface e mesmo formato de retorno do QdrantSearchService, mas sem salto
+    de rede: todas as consultas são resolvidas em uma única chamada a `index.search`.
+    """
+    def __init__(self, index: Optional[Any] = None, metadata: Optional[Any] = None, mmap: bool = False):
+        if index is None:
+            print(f"FaissSearchService: Carregando índice FAISS (mmap={mmap}) de '{IndexLoader.FAISS_INDEX_PATH}'...")
+            index, metadata = IndexLoader.load_index(mmap=mmap)
+        self.index = index
+        self.metadata = self._normalize_metadata(metadata)
+        self.vector_size = index.d
+        print(f"FaissSearchService: Índice carregado com {index.ntotal} vetores de dimensão {self.vector_size}.")
+
+    @staticmethod
+    def _normalize_metadata(metadata: Any) -> Any:
+        """
+        Aceita os formatos de metadados já usados nos .pkl: lista de dicionários na ordem
+        dos vetores, ou dicionário id -> dicionário (opcionalmente sob a chave 'metadata').
+        """
+        if isinstance(metadata, dict) and "metadata" in metadata and len(metadata) <= 3:
+            metadata = metadata["metadata"]
+        return metadata if metadata is not None else []
+
+    def _payload_for(self, vector_id: int) -> Dict[str, Any]:
+        try:
+            payload = self.metadata[vector_id]
+        except (KeyError, IndexError, TypeError):
+            payload = None
+        if isinstance(payload, dict):
+            return payload
+        if isinstance(payload, str):
+            return {"name": payload}
+        return {}
+
+    @staticmethod
+    def _payload_to_match(payload: Dict[str, Any], score: float) -> Dict[str, Any]:
+        table_name_from_db = payload.get("name") or payload.get("table_name") or "unknown_table_in_payload"
+        schema_from_db = payload.get("schema", "")
+        if schema_from_db and "." not in table_name_from_db:
+            full_table_name = f"{schema_from_db}.{table_name_from_db}"
+        else:
+            full_table_name = table_name_from_db
+        return {
+            "table_name": full_table_name,
+            "similarity_score": score,
+            "similarity_percentage": score * 100,
+            "content": payload.get("content", ""),
+            "payload_completo": payload
+        }
+
+    def list_tables(self) -> List[Dict[str, Any]]:
+        """
+        Devolve todas as tabelas dos metadados no formato de um 'match' da busca, com similaridade 1.0.
+        """
+        if isinstance(self.metadata, dict):
+            payloads = list(self.metadata.values())
+        else:
+            payloads = list(self.metadata)
+        return [
+            self._payload_to_match(payload if isinstance(payload, dict) else {"name": str(payload)}, 1.0)
+            for payload in payloads
+        ]
+
+    def _ensure_l2_normalized(self, embeddings: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        norms[norms == 0] = 1e-10
+        return embeddings / norms
+
+    def _to_similarity(self, distance: float) -> float:
+        # Índices L2 sobre vetores normalizados: ||a-b||² = 2 - 2·cos
+        if self.index.metric_type == faiss.METRIC_L2:
+            return 1.0 - float(distance) / 2.0
+        return float(distance)
+
+    def find_top_similar_tables(
+        self,
+        query_embeddings: np.ndarray,
+        query_table_names: List[str],
+        k: int = 3,
+        score_threshold: Optional[float] = None,
+        batch: bool = True
+    ) -> List[Dict[str, Any]]:
+        """
+        Busca as 'k' tabelas mais similares para cada embedding de consulta.
+        O parâmetro `batch` existe por compatibilidade: a busca FAISS é sempre em lote.
+        """
+        if query_embeddings.size == 0 or len(query_table_names) == 0:
+            print("FaissSearchService: Embeddings de consulta ou nomes de tabelas vazios.")
+            return []
+        if query_embeddings.shape[0] != len(query_table_names):
+            print(f"FaissSearchService ERROR: Inconsistência - {query_embeddings.shape[0]} embeddings vs {len(query_table_names)} nomes.")
+            return []
+        if query_embeddings.shape[1] != self.vector_size:
+            print(f"FaissSearchService ERROR: Dimensão do embedding da consulta ({query_embeddings.shape[1]}) não corresponde à do índice ({self.vector_size}).")
+            return []
+
+        normalized_query_embeddings = np.ascontiguousarray(
+            self._ensure_l2_normalized(query_embeddings), dtype=np.float32
+        )
+
+        try:
+            distances, ids = self.index.search(normalized_query_embeddings, k)
+        except Exception as e:
+            print(f"FaissSearchService CRITICAL ERROR: Erro inesperado durante a busca: {e}")
+            traceback.print_exc()
+            return [{"query_table": name, "matches": [], "error": str(e)} for name in query_table_names]
+
+        all_results = []
+        for i, query_table_name in enumerate(query_table_names):
+            matches_for_query = []
+            for distance, vector_id in zip(distances[i], ids[i]):
+                if vector_id < 0:
+                    continue  # FAISS devolve -1 quando há menos de k vetores
+                score = self._to_similarity(distance)
+                if score_threshold is not None and score < score_threshold:
+                    continue
+                matches_for_query.append(self._payload_to_match(self._payload_for(int(vector_id)), score))
+            all_results.append({
+                "query_table": query_table_name,
+                "matches": matches_for_query
+            })
+        return all_results
@@ -0,0 +1,210 @@
+# src/infrastructure/vector_database/qdrant_connection.py
+
+"""
+Conexão com o Qdrant compartilhada por todo o processo.
+"""
+
+import os
+import threading
+import time
+import traceback
+import httpx
+from typing import Any, Dict, Optional, Tuple
+from qdrant_client import AsyncQdrantClient, QdrantClient
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class QdrantConnection:
+    """
+    Mantém um único QdrantClient por processo, seguro para threads, com pool de conexões
+    HTTP keep-alive. Também guarda em cache as informações das coleções (ex.: tamanho do vetor)
+    por QDRANT_COLLECTION_INFO_TTL segundos.
+
+    Quando uma operação falha, o chamador usa `mark_unhealthy()`; na próxima chamada a
+    `get_client()` é feito um health check e, se necessário, a reconexão — sem recriar
+    nada mais do serviço.
+    """
+    COLLECTION_NAME = os.getenv("QDRANT_COLLECTION_NAME", "sql_metadados")
+    TIMEOUT = int(os.getenv("QDRANT_TIMEOUT", "10"))
+    POOL_SIZE = int(os.getenv("QDRANT_POOL_SIZE", "16"))
+    KEEPALIVE_SECONDS = float(os.getenv("QDRANT_KEEPALIVE_SECONDS", "60"))
+    COLLECTION_INFO_TTL = float(os.getenv("QDRANT_COLLECTION_INFO_TTL", "300"))
+
+    _client: Optional[QdrantClient] = None
+    _async_client: Optional[AsyncQdrantClient] = None
+    _async_reconectar: bool = False
+    _lock = threading.RLock()
+    _verificar_saude: bool = False
+    _collection_info: Dict[str, Tuple[float, Any]] = {}
+
+    @classmethod
+    def _parametros_cliente(cls) -> Dict[str, Any]:
+        qdrant_url = os.getenv("QDRANT_URL")
+        qdrant_api_key = os.getenv("QDRANT_API_KEY")
+        if not qdrant_url:
+            raise ValueError("QDRANT_URL não está definido no ambiente.")
+        return {
+            "url": qdrant_url,
+            "api_key": qdrant_api_key,
+            "timeout": cls.TIMEOUT,
+            "limits": httpx.Limits(
+                max_connections=cls.POOL_SIZE,
+                max_keepalive_connections=cls.POOL_SIZE,
+                keepalive_expiry=cls.KEEPALIVE_SECONDS
+            )
+        }
+
+    @classmethod
+    def _criar_cliente(cls) -> QdrantClient:
+        parametros = cls._parametros_cliente()
+        print(f"QdrantConnection: Criando cliente para {parametros['url']} (pool={cls.POOL_SIZE}, keep-alive={cls.KEEPALIVE_SECONDS}s)...")
+        return QdrantClient(**parametros)
+
+    @staticmethod
+    def _health_check(client: QdrantClient) -> bool:
+        try:
+            client.get_collections()
+            return True
+        except Exception as e:
+            print(f"QdrantConnection: Health check falhou: {e}")
+            return False
+
+    @staticmethod
+    def _fechar(client: Optional[QdrantClient]) -> None:
+        if client is None:
+            return
+        try:
+            client.close()
+        except Exception:
+            pass
+
+    @classmethod
+    def get_client(cls) -> QdrantClient:
+        """
+        Retorna o cliente compartilhado, criando-o na primeira chamada. Se uma falha foi
+        sinalizada, faz um health check e reconecta apenas se o cliente atual não responder.
+
+        O health check e a criação do novo cliente acontecem fora do lock (só uma thread faz a
+        verificação; as demais seguem com o cliente atual); o lock protege apenas a troca.
+        """
+        with cls._lock:
+            cliente = cls._client
+            verificar = cls._verificar_saude
+            if cliente is not None and not verificar:
+                return cliente
+            cls._verificar_saude = False
+
+        if cliente is None:
+            novo_cliente = cls._criar_cliente()
+            with cls._lock:
+                if cls._client is None:
+                    cls._client = novo_cliente
+                    return novo_cliente
+                vencedor = cls._client
+            # Outra thread criou o cliente primeiro
+            cls._fechar(novo_cliente)
+            return vencedor
+
+        if cls._health_check(cliente):
+            return cliente
+
+        print("QdrantConnection: Reconectando ao Qdrant...")
+        novo_cliente = cls._criar_cliente()
+        if not cls._health_check(novo_cliente):
+            cls._fechar(novo_cliente)
+            with cls._lock:
+                cls._verificar_saude = True
+            raise ValueError("Não foi possível reconectar ao Qdrant.")
+
+        with cls._lock:
+            if cls._client is cliente:
+                cls._client = novo_cliente
+                cls._collection_info.clear()
+                antigo, atual = cliente, novo_cliente
+            else:
+                # Outra thread já trocou o cliente
+                antigo, atual = novo_cliente, cls._client
+        cls._fechar(antigo)
+        return atual
+
+    @classmethod
+    async def get_async_client(cls) -> AsyncQdrantClient:
+        """
+        Retorna o AsyncQdrantClient compartilhado. Como o cliente fica preso ao event loop
+        em que foi criado, deve ser usado apenas a partir do loop do AsyncRunner.
+        Após uma falha sinalizada, o cliente é recriado na próxima chamada.
+        """
+        with cls._lock:
+            cliente_antigo = None
+            if cls._async_client is not None and cls._async_reconectar:
+                cliente_antigo, cls._async_client = cls._async_client, None
+            if cls._async_client is None:
+                parametros = cls._parametros_cliente()
+                print(f"QdrantConnection: Criando cliente assíncrono para {parametros['url']} (pool={cls.POOL_SIZE})...")
+                cls._async_client = AsyncQdrantClient(**parametros)
+            cls._async_reconectar = False
+            cliente = cls._async_client
+        if cliente_antigo is not None:
+            try:
+                await cliente_antigo.close()
+            except Exception:
+                pass
+        return cliente
+
+    @classmethod
+    def mark_unhealthy(cls) -> None:
+        """
+        Sinaliza que uma operação falhou; o próximo get_client() verifica a conexão
+        e o próximo get_async_client() recria o cliente assíncrono.
+        """
+        with cls._lock:
+            cls._verificar_saude = True
+            cls._async_reconectar = True
+
+    @classmethod
+    def get_collection_info(cls, collection_name: Optional[str] = None, force_refresh: bool = False) -> Any:
+        """
+        Retorna as informações da coleção, consultando o Qdrant apenas quando o cache expirou.
+        """
+        collection_name = collection_name or cls.COLLECTION_NAME
+        with cls._lock:
+            em_cache = cls._collection_info.get(collection_name)
+            if em_cache and not force_refresh and (time.monotonic() - em_cache[0]) < cls.COLLECTION_INFO_TTL:
+                return em_cache[1]
+
+        client = cls.get_client()
+        try:
+            collection_info = client.get_collection(collection_name=collection_name)
+        except Exception as e:
+            cls.mark_unhealthy()
+            detailed_error = f"Coleção '{collection_name}' não encontrada ou erro ao acessá-la: {e}"
+            print(f"QdrantConnection CRITICAL ERROR: {detailed_error}")
+            traceback.print_exc()
+            raise ValueError(detailed_error)
+
+        if not collection_info.config.params.vectors:
+            raise ValueError(f"A coleção '{collection_name}' não parece ter uma configuração de vetor definida.")
+
+        with cls._lock:
+            cls._collection_info[collection_name] = (time.monotonic(), collection_info)
+        return collection_info
+
+    @classmethod
+    def get_vector_size(cls, collection_name: Optional[str] = None, force_refresh: bool = False) -> int:
+        return cls.get_collection_info(collection_name, force_refresh=force_refresh).config.params.vectors.size
+
+    @classmethod
+    def reset(cls) -> None:
+        """
+        Fecha o cliente e descarta o cache de coleções (útil em testes e após fork).
+        """
+        with cls._lock:
+            cls._fechar(cls._client)
+            cls._client = None
+            cls._verificar_saude = False
+            # O cliente assíncrono é apenas descartado: fechá-lo exige o loop em que foi criado
+            cls._async_client = None
+            cls._async_reconectar = False
+            cls._collection_info.clear()
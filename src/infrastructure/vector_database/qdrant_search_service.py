@@ -1,50 +1,75 @@
 # src/infrastructure/vector_database/qdrant_search_service.py
 
-import os
+import asyncio
 import numpy as np
 from typing import List, Dict, Any, Optional
-from qdrant_client import QdrantClient, models
-from dotenv import load_dotenv
+from qdrant_client import AsyncQdrantClient, QdrantClient, models
 import traceback
+from infrastructure.vector_database.qdrant_connection import QdrantConnection
+from shared.utils.tracing import Tracer
+from shared.utils.request_budget import RequestBudget
 
 class QdrantSearchService:
-    def __init__(self, collection_name: str = "sql_metadados"):
-        load_dotenv()
-        qdrant_url = os.getenv("QDRANT_URL")
-        qdrant_api_key = os.getenv("QDRANT_API_KEY")
+    """
+    Busca vetorial de tabelas no Qdrant.
 
-        if not qdrant_url:
-            raise ValueError("QDRANT_URL não está definido no ambiente.")
+    Por padrão usa o cliente compartilhado do processo (QdrantConnection), de modo que
+    criar uma instância não faz nenhuma chamada de rede; as informações da coleção vêm
+    do cache da conexão. Um cliente explícito pode ser injetado (benchmarks, Qdrant local),
+    assim como um AsyncQdrantClient para `find_top_similar_tables_async`.
+    """
+    def __init__(
+        self,
+        collection_name: Optional[str] = None,
+        client: Optional[QdrantClient] = None,
+        async_client: Optional[AsyncQdrantClient] = None
+    ):
+        self.collection_name = collection_name or QdrantConnection.COLLECTION_NAME
+        self._injected_client = client
+        self._injected_async_client = async_client
+        self._injected_vector_size: Optional[int] = None
 
-        print(f"QdrantSearchService: Conectando ao Qdrant em {qdrant_url}...")
-        try:
-            self.client = QdrantClient(url=qdrant_url, api_key=qdrant_api_key)
-            self.client.get_collections()
-            print(f"QdrantSearchService: Conectado com sucesso. Usando coleção '{collection_name}'.")
-        except Exception as e:
-            print(f"QdrantSearchService CRITICAL ERROR: Falha ao conectar ao Qdrant: {e}")
-            traceback.print_exc()
-            raise ValueError(f"Não foi possível conectar ao Qdrant: {e}")
+        if client is not None:
+            try:
+                collection_info = client.get_collection(collection_name=self.collection_name)
+            except Exception as e:
+                detailed_error = f"Coleção '{self.collection_name}' não encontrada ou erro ao acessá-la: {e}"
+                print(f"QdrantSearchService CRITICAL ERROR: {detailed_error}")
+                traceback.print_exc()
+                raise ValueError(detailed_error)
+            if not collection_info.config.params.vectors:
+                detailed_error = f"A coleção '{self.collection_name}' não parece ter uma configuração de vetor definida."
+                print(f"QdrantSearchService CRITICAL ERROR: {detailed_error}")
+                raise ValueError(detailed_error)
+            self._injected_vector_size = collection_info.config.params.vectors.size
+            print(f"QdrantSearchService: Tamanho do vetor da coleção '{self.collection_name}' é {self._injected_vector_size}.")
 
-        self.collection_name = collection_name
-        try:
-            self.client.get_collection(collection_name=self.collection_name)
-            print(f"QdrantSearchService: Coleção '{self.collection_name}' encontrada.")
-        except Exception as e:
-            detailed_error = f"Coleção '{self.collection_name}' não encontrada ou erro ao acessá-la: {e}"
-            print(f"QdrantSearchService CRITICAL ERROR: {detailed_error}")
-            traceback.print_exc()
-            raise ValueError(detailed_error)
+    @property
+    def client(self) -> QdrantClient:
+        if self._injected_client is not None:
+            return self._injected_client
+        return QdrantConnection.get_client()
+
+    @property
+    def vector_size(self) -> int:
+        if self._injected_vector_size is not None:
+            return self._injected_vector_size
+        return QdrantConnection.get_vector_size(self.collection_name)
 
-        collection_info = self.client.get_collection(collection_name=self.collection_name)
-        if not collection_info.config.params.vectors:
-             detailed_error = f"A coleção '{self.collection_name}' não parece ter uma configuração de vetor definida."
-             print(f"QdrantSearchService CRITICAL ERROR: {detailed_error}")
-             raise ValueError(detailed_error)
+    async def _get_async_client(self) -> AsyncQdrantClient:
+        if self._injected_async_client is not None:
+            return self._injected_async_client
+        return await QdrantConnection.get_async_client()
 
-        self.vector_size = collection_info.config.params.vectors.size
-        print(f"QdrantSearchService: Tamanho do vetor da coleção '{self.collection_name}' é {self.vector_size}.")
+    def _on_search_error(self) -> None:
+        if self._injected_client is None:
+            QdrantConnection.mark_unhealthy()
 
+    @staticmethod
+    def _timeout() -> Optional[int]:
+        # Timeout (segundos inteiros, como a API do Qdrant espera) limitado ao prazo da requisição RAG
+        timeout = RequestBudget.timeout_for(None)
+        return None if timeout is None else max(1, int(timeout))
 
     def _ensure_l2_normalized(self, embeddings: np.ndarray) -> np.ndarray:
         norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
@@ -56,64 +81,257 @@ class QdrantSearchService:
         query_embeddings: np.ndarray,
         query_table_names: List[str],
         k: int = 3,
-        score_threshold: Optional[float] = None
+        score_threshold: Optional[float] = None,
+        batch: bool = True
+    ) -> List[Dict[str, Any]]:
+        """
+        Busca as 'k' tabelas mais similares para cada embedding de consulta.
+        Com batch=True (padrão) todas as consultas vão em uma única requisição ao Qdrant.
+        """
+        with Tracer.span("qdrant.busca", modo="sync", consultas=len(query_table_names), k=k, lote=batch) as span:
+            resultados = self._find_top_similar_tables(query_embeddings, query_table_names, k, score_threshold, batch)
+            span.set(matches=sum(len(r.get("matches", [])) for r in resultados))
+            return resultados
+
+    def _find_top_similar_tables(
+        self,
+        query_embeddings: np.ndarray,
+        query_table_names: List[str],
+        k: int,
+        score_threshold: Optional[float],
+        batch: bool
+    ) -> List[Dict[str, Any]]:
+        normalized_query_embeddings = self._prepare_queries(query_embeddings, query_table_names)
+        if normalized_query_embeddings is None:
+            return []
+
+        if batch:
+            return self._search_batch(normalized_query_embeddings, query_table_names, k, score_threshold)
+        return self._search_per_query(normalized_query_embeddings, query_table_names, k, score_threshold)
+
+    async def find_top_similar_tables_async(
+        self,
+        query_embeddings: np.ndarray,
+        query_table_names: List[str],
+        k: int = 3,
+        score_threshold: Optional[float] = None,
+        batch: bool = True
     ) -> List[Dict[str, Any]]:
+        """
+        Versão assíncrona de `find_top_similar_tables`, com o AsyncQdrantClient. Sem lote
+        (ou se o lote falhar), as consultas individuais são feitas concorrentemente.
+        """
+        with Tracer.span("qdrant.busca", modo="async", consultas=len(query_table_names), k=k, lote=batch) as span:
+            resultados = await self._find_top_similar_tables_async(query_embeddings, query_table_names, k, score_threshold, batch)
+            span.set(matches=sum(len(r.get("matches", [])) for r in resultados))
+            return resultados
+
+    async def _find_top_similar_tables_async(
+        self,
+        query_embeddings: np.ndarray,
+        query_table_names: List[str],
+        k: int,
+        score_threshold: Optional[float],
+        batch: bool
+    ) -> List[Dict[str, Any]]:
+        if self._injected_async_client is not None and self._injected_client is None and self._injected_vector_size is None:
+            collection_info = await self._injected_async_client.get_collection(collection_name=self.collection_name)
+            self._injected_vector_size = collection_info.config.params.vectors.size
+        # A validação pode consultar as informações da coleção (chamada bloqueante, em cache)
+        normalized_query_embeddings = await asyncio.to_thread(self._prepare_queries, query_embeddings, query_table_names)
+        if normalized_query_embeddings is None:
+            return []
+
+        client = await self._get_async_client()
+        if batch:
+            print(f"QdrantSearchService: Buscando no Qdrant (async) em lote {len(query_table_names)} consultas (top {k})...")
+            try:
+                batch_responses = await client.query_batch_points(
+                    collection_name=self.collection_name,
+                    requests=self._batch_requests(normalized_query_embeddings, k, score_threshold),
+                    timeout=self._timeout()
+                )
+                return [
+                    {"query_table": query_table_name, "matches": self._hits_to_matches(response.points)}
+                    for query_table_name, response in zip(query_table_names, batch_responses)
+                ]
+            except Exception as e:
+                print(f"QdrantSearchService ERROR: Falha na busca em lote ({e}). Repetindo consultas individualmente...")
+                self._on_search_error()
+
+        return list(await asyncio.gather(*(
+            self._search_one_async(client, query_embedding, query_table_name, k, score_threshold)
+            for query_embedding, query_table_name in zip(normalized_query_embeddings, query_table_names)
+        )))
+
+    async def _search_one_async(
+        self,
+        client: AsyncQdrantClient,
+        query_embedding: np.ndarray,
+        query_table_name: str,
+        k: int,
+        score_threshold: Optional[float]
+    ) -> Dict[str, Any]:
+        try:
+            search_result = await client.query_points(
+                collection_name=self.collection_name,
+                query=query_embedding.tolist(),
+                limit=k,
+                score_threshold=score_threshold,
+                with_payload=True,
+                with_vectors=False,
+                timeout=self._timeout()
+            )
+            return {"query_table": query_table_name, "matches": self._hits_to_matches(search_result.points)}
+        except Exception as e:
+            print(f"QdrantSearchService CRITICAL ERROR: Erro inesperado durante a busca para '{query_table_name}': {e}")
+            traceback.print_exc()
+            self._on_search_error()
+            return {"query_table": query_table_name, "matches": [], "error": str(e)}
+
+    def _prepare_queries(self, query_embeddings: np.ndarray, query_table_names: List[str]) -> Optional[np.ndarray]:
+        """
+        Valida as consultas e devolve os embeddings L2-normalizados, ou None se forem inválidas.
+        """
         if query_embeddings.size == 0 or len(query_table_names) == 0:
             print("QdrantSearchService: Embeddings de consulta ou nomes de tabelas vazios.")
-            return []
+            return None
         if query_embeddings.shape[0] != len(query_table_names):
             print(f"QdrantSearchService ERROR: Inconsistência - {query_embeddings.shape[0]} embeddings vs {len(query_table_names)} nomes.")
-            return []
+            return None
+        if query_embeddings.shape[1] != self.vector_size and self._injected_client is None and self._injected_async_client is None:
+            # A informação em cache pode estar desatualizada (coleção recriada): recarrega uma vez
+            QdrantConnection.get_collection_info(self.collection_name, force_refresh=True)
         if query_embeddings.shape[1] != self.vector_size:
             print(f"QdrantSearchService ERROR: Dimensão do embedding da consulta ({query_embeddings.shape[1]}) não corresponde à da coleção ({self.vector_size}).")
-            return []
+            return None
 
         print("QdrantSearchService: Verificando/Garantindo normalização dos embeddings de consulta (L2 norm)...")
         normalized_query_embeddings = self._ensure_l2_normalized(query_embeddings)
         print("QdrantSearchService: Normalização concluída/verificada.")
+        return normalized_query_embeddings
+
+    @staticmethod
+    def _batch_requests(normalized_query_embeddings: np.ndarray, k: int, score_threshold: Optional[float]) -> List[models.QueryRequest]:
+        return [
+            models.QueryRequest(
+                query=query_embedding.tolist(),
+                limit=k,
+                score_threshold=score_threshold,
+                with_payload=True,
+                with_vector=False
+            )
+            for query_embedding in normalized_query_embeddings
+        ]
+
+    @staticmethod
+    def _payload_to_match(payload: Dict[str, Any], score: float) -> Dict[str, Any]:
+        table_name_from_db = payload.get("name", "unknown_table_in_payload")
+        schema_from_db = payload.get("schema", "") # Adicionado para nome qualificado
+        full_table_name = f"{schema_from_db}.{table_name_from_db}" if schema_from_db else table_name_from_db
+        return {
+            "table_name": full_table_name,
+            "similarity_score": score,
+            "similarity_percentage": score * 100, # Para métrica de similaridade cosseno normalizada
+            "content": payload.get("content", ""),
+            "payload_completo": payload
+        }
 
+    def _hits_to_matches(self, hits) -> List[Dict[str, Any]]:
+        return [self._payload_to_match(hit.payload if hit.payload else {}, hit.score) for hit in hits]
+
+    def list_tables(self, page_size: int = 1000) -> List[Dict[str, Any]]:
+        """
+        Percorre toda a coleção (scroll, sem vetores) e devolve todas as tabelas no
+        mesmo formato de um 'match' da busca, com similaridade 1.0.
+        """
+        tables: List[Dict[str, Any]] = []
+        offset = None
+        try:
+            while True:
+                points, offset = self.client.scroll(
+                    collection_name=self.collection_name,
+                    limit=page_size,
+                    offset=offset,
+                    with_payload=True,
+                    with_vectors=False
+                )
+                tables.extend(self._payload_to_match(point.payload or {}, 1.0) for point in points)
+                if offset is None:
+                    break
+        except Exception as e:
+            print(f"QdrantSearchService CRITICAL ERROR: Erro ao listar as tabelas da coleção '{self.collection_name}': {e}")
+            traceback.print_exc()
+            self._on_search_error()
+            raise
+        print(f"QdrantSearchService: {len(tables)} tabelas listadas da coleção '{self.collection_name}'.")
+        return tables
+
+    def _search_batch(
+        self,
+        normalized_query_embeddings: np.ndarray,
+        query_table_names: List[str],
+        k: int,
+        score_threshold: Optional[float]
+    ) -> List[Dict[str, Any]]:
+        """
+        Envia todos os vetores de consulta em uma única requisição (API de busca em lote).
+        Se o lote inteiro falhar, refaz as consultas individualmente para que apenas
+        as entradas com problema recebam o campo 'error'.
+        """
+        print(f"QdrantSearchService: Buscando no Qdrant em lote {len(query_table_names)} consultas (top {k})...")
+        try:
+            batch_responses = self.client.query_batch_points(
+                collection_name=self.collection_name,
+                requests=self._batch_requests(normalized_query_embeddings, k, score_threshold),
+                timeout=self._timeout()
+            )
+        except Exception as e:
+            print(f"QdrantSearchService ERROR: Falha na busca em lote ({e}). Repetindo consultas individualmente...")
+            self._on_search_error()
+            return self._search_per_query(normalized_query_embeddings, query_table_names, k, score_threshold)
+
+        all_results = []
+        for query_table_name, response in zip(query_table_names, batch_responses):
+            all_results.append({
+                "query_table": query_table_name,
+                "matches": self._hits_to_matches(response.points)
+            })
+        return all_results
+
+    def _search_per_query(
+        self,
+        normalized_query_embeddings: np.ndarray,
+        query_table_names: List[str],
+        k: int,
+        score_threshold: Optional[float]
+    ) -> List[Dict[str, Any]]:
         all_results = []
 
         for i, query_table_name in enumerate(query_table_names):
             query_embedding = normalized_query_embeddings[i]
             print(f"QdrantSearchService: Buscando no Qdrant por '{query_table_name}' (top {k})...")
             try:
-                # ****** PONTO CRÍTICO: REMOVIDO O PARÂMETRO `filter` DAQUI ******
-                # Se você tinha um filtro aqui que causava o erro 403,
-                # esta é a principal mudança.
-                search_result = self.client.search(
+                search_result = self.client.query_points(
                     collection_name=self.collection_name,
-                    query_vector=query_embedding.tolist(),
+                    query=query_embedding.tolist(),
                     limit=k,
-                    # score_threshold=score_threshold, # Descomente se quiser usar threshold
+                    score_threshold=score_threshold,
                     with_payload=True,
-                    with_vectors=False # Geralmente não precisamos dos vetores dos resultados
+                    with_vectors=False, # Geralmente não precisamos dos vetores dos resultados
+                    timeout=self._timeout()
                 )
-
-                matches_for_query = []
-                for hit in search_result:
-                    payload = hit.payload if hit.payload else {}
-                    table_name_from_db = payload.get("name", "unknown_table_in_payload")
-                    schema_from_db = payload.get("schema", "") # Adicionado para nome qualificado
-                    full_table_name = f"{schema_from_db}.{table_name_from_db}" if schema_from_db else table_name_from_db
-
-                    matches_for_query.append({
-                        "table_name": full_table_name,
-                        "similarity_score": hit.score,
-                        "similarity_percentage": hit.score * 100, # Para métrica de similaridade cosseno normalizada
-                        "content": payload.get("content", ""),
-                        "payload_completo": payload
-                    })
                 all_results.append({
                     "query_table": query_table_name,
-                    "matches": matches_for_query
+                    "matches": self._hits_to_matches(search_result.points)
                 })
             except Exception as e:
                 print(f"QdrantSearchService CRITICAL ERROR: Erro inesperado durante a busca para '{query_table_name}': {e}")
                 traceback.print_exc()
+                self._on_search_error()
                 all_results.append({
                     "query_table": query_table_name,
                     "matches": [],
                     "error": str(e)
                 })
-        return all_results
\ No newline at end of file
+        return all_results
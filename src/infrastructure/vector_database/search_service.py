@@ -1,68 +1,148 @@
 # src/infrastructure/vector_database/search_service.py
 
+import os
+import asyncio
 import numpy as np
-from typing import List, Dict, Any
-from src.infrastructure.vector_database.qdrant_search_service import QdrantSearchService
+from typing import List, Dict, Any, Optional, Union
+import threading
+from infrastructure.vector_database.qdrant_search_service import QdrantSearchService
+from infrastructure.vector_database.lexical_index import LexicalIndex
+from infrastructure.vector_database.bm25_index import BM25Index
+from infrastructure.persistence.schema_catalog import SchemaCatalog
+from infrastructure.persistence.embedding_cache import EmbeddingCache
+from shared.utils.request_coalescer import CoalescingScope
 import traceback # Mantido para log de erros inesperados
 
 class SearchService:
     """
     Serviço de fachada para buscar TABELAS similares.
-    Delega a busca real para o serviço Qdrant configurado.
+    Delega a busca real para o backend configurado em SEARCH_BACKEND:
+    'qdrant' (padrão, remoto) ou 'faiss' (índice local carregado pelo IndexLoader).
     """
 
-    # A instância do QdrantSearchService pode ser criada a cada chamada (simples)
-    # ou gerenciada de forma mais sofisticada se necessário (e.g., injeção de dependência)
+    BACKEND = os.getenv("SEARCH_BACKEND", "qdrant").strip().lower()
+    FAISS_MMAP = os.getenv("FAISS_MMAP", "0") == "1"
+
+    # Busca léxica (trigramas sobre os nomes do catálogo) fundida à vetorial por RRF
+    LEXICAL_ENABLED = os.getenv("LEXICAL_SEARCH", "1") != "0"
+    RRF_K = int(os.getenv("RRF_K", "60"))
+
+    # Busca BM25 sobre o conteúdo dos chunks (colunas, descrições, FKs), também fundida por RRF
+    BM25_ENABLED = os.getenv("BM25_SEARCH", "1") != "0"
+
+    # Instância única por processo. O QdrantSearchService usa o cliente compartilhado
+    # (QdrantConnection), com pool de conexões e cache das informações da coleção,
+    # então não há custo de conexão/metadados a cada busca.
     _qdrant_searcher_instance = None
+    _faiss_searcher_instance = None
+    _lexical_index: Optional[LexicalIndex] = None
+    _lexical_index_version: Optional[str] = None
+    _bm25_index: Optional[BM25Index] = None
+    _bm25_index_version: Optional[str] = None
+    _instance_lock = threading.Lock()
 
     @staticmethod
     def _get_qdrant_service() -> QdrantSearchService:
         """
-        Obtém ou cria uma instância do QdrantSearchService.
+        Obtém ou cria a instância compartilhada do QdrantSearchService.
         Lida com a inicialização e possíveis erros de conexão/configuração.
         """
-        # Implementação simples: cria uma nova instância a cada vez.
-        # Isso garante que as credenciais mais recentes do .env sejam usadas
-        # e evita gerenciar o ciclo de vida da conexão no nível do SearchService.
+        if SearchService._qdrant_searcher_instance is not None:
+            return SearchService._qdrant_searcher_instance
+
+        with SearchService._instance_lock:
+            if SearchService._qdrant_searcher_instance is None:
+                try:
+                    print("SearchService: Inicializando QdrantSearchService...")
+                    SearchService._qdrant_searcher_instance = QdrantSearchService()
+                    print("SearchService: QdrantSearchService inicializado com sucesso.")
+                except ValueError as ve:
+                    print(f"SearchService CRITICAL ERROR: Falha na configuração do QdrantSearchService: {ve}")
+                    traceback.print_exc()
+                    raise # Re-lança o erro de configuração para indicar falha
+                except Exception as e:
+                    print(f"SearchService CRITICAL ERROR: Falha ao inicializar QdrantSearchService: {e}")
+                    traceback.print_exc()
+                    raise # Re-lança outros erros de inicialização
+        return SearchService._qdrant_searcher_instance
+
+    @staticmethod
+    def _get_faiss_service():
+        """
+        Obtém ou carrega (uma única vez por processo) o FaissSearchService.
+        """
+        if SearchService._faiss_searcher_instance is not None:
+            return SearchService._faiss_searcher_instance
+
+        with SearchService._instance_lock:
+            if SearchService._faiss_searcher_instance is None:
+                # Import tardio: o FAISS só é necessário quando este backend está ativo
+                from infrastructure.vector_database.faiss_search_service import FaissSearchService
+                try:
+                    print("SearchService: Inicializando FaissSearchService...")
+                    SearchService._faiss_searcher_instance = FaissSearchService(mmap=SearchService.FAISS_MMAP)
+                except Exception as e:
+                    print(f"SearchService CRITICAL ERROR: Falha ao carregar o índice FAISS: {e}")
+                    traceback.print_exc()
+                    raise
+        return SearchService._faiss_searcher_instance
+
+    @staticmethod
+    def _get_search_backend() -> Union[QdrantSearchService, Any]:
+        if SearchService.BACKEND == "faiss":
+            return SearchService._get_faiss_service()
+        if SearchService.BACKEND != "qdrant":
+            print(f"SearchService WARNING: SEARCH_BACKEND '{SearchService.BACKEND}' desconhecido. Usando 'qdrant'.")
+        return SearchService._get_qdrant_service()
+
+    @staticmethod
+    def warmup() -> None:
+        """
+        Inicializa o backend de busca na subida do servidor (carrega o índice FAISS ou
+        aquece a conexão/metadados do Qdrant), para que a primeira requisição não pague esse custo.
+        """
         try:
-            print("SearchService: Inicializando QdrantSearchService...")
-            qdrant_service = QdrantSearchService()
-            print("SearchService: QdrantSearchService inicializado com sucesso.")
-            return qdrant_service
-        except ValueError as ve:
-            print(f"SearchService CRITICAL ERROR: Falha na configuração do QdrantSearchService: {ve}")
-            traceback.print_exc()
-            raise # Re-lança o erro de configuração para indicar falha
+            backend = SearchService._get_search_backend()
+            print(f"SearchService: Backend '{SearchService.BACKEND}' pronto (dimensão {backend.vector_size}).")
         except Exception as e:
-            print(f"SearchService CRITICAL ERROR: Falha ao inicializar QdrantSearchService: {e}")
-            traceback.print_exc()
-            raise # Re-lança outros erros de inicialização
+            print(f"SearchService WARNING: Falha no aquecimento do backend de busca: {e}")
+
+    @staticmethod
+    def list_all_tables() -> List[Dict[str, Any]]:
+        """
+        Lista todas as tabelas do backend configurado (usado para montar o catálogo local).
+        Cada item tem o mesmo formato de um 'match' da busca.
+        """
+        return SearchService._get_search_backend().list_tables()
 
     @staticmethod
     def find_top_similar_tables(
         query_embeddings: np.ndarray,
         query_table_names: List[str],
-        k: int = 3
+        k: int = 3,
+        query_context: Optional[List[str]] = None
     ) -> List[Dict[str, Any]]:
         """
-        Busca as 'k' tabelas mais similares usando o QdrantSearchService.
+        Busca as 'k' tabelas mais similares usando o backend configurado.
 
         Args:
             query_embeddings: Um array NumPy (N, D) contendo os embeddings
-                              (idealmente L2 NORMALIZADOS, pois o QdrantService fará isso de qualquer forma)
+                              (idealmente L2 NORMALIZADOS, pois o backend fará isso de qualquer forma)
                               para N nomes de tabelas extraídos da consulta do usuário.
             query_table_names: Uma lista de strings (N) com os nomes originais das tabelas
                                correspondentes aos query_embeddings.
             k: O número de vizinhos mais próximos a serem retornados para cada consulta.
+            query_context: Termos extras do prompt (ex.: colunas extraídas) somados ao nome
+                           da tabela na consulta BM25 sobre o conteúdo dos chunks.
 
         Returns:
             Uma lista de dicionários. Cada dicionário representa uma tabela de consulta
-            e contém uma lista das tabelas mais similares encontradas via Qdrant.
-            Retorna uma lista vazia em caso de erro durante a inicialização do serviço Qdrant
-            ou durante a busca.
+            e contém uma lista das tabelas mais similares encontradas pelo backend,
+            fundida por RRF com o ranking léxico dos nomes e o ranking BM25 do conteúdo
+            (se habilitados). Em caso de erro no backend, restam apenas os resultados locais (ou lista vazia).
         """
         # Validação de entrada (mantida para falha rápida)
-        print(f"SearchService: Recebido {len(query_table_names)} tabelas de consulta para busca via Qdrant.")
+        print(f"SearchService: Recebido {len(query_table_names)} tabelas de consulta para busca via {SearchService.BACKEND}.")
         if query_embeddings.size == 0 or len(query_table_names) == 0:
              print("SearchService: Embeddings de consulta ou nomes de tabelas vazios. Retornando lista vazia.")
              return []
@@ -70,29 +150,268 @@ class SearchService:
              print(f"SearchService ERROR: Inconsistência - {query_embeddings.shape[0]} embeddings vs {len(query_table_names)} nomes.")
              return []
 
+        results: List[Dict[str, Any]] = []
         try:
-            # 1. Obter (ou criar) a instância do serviço Qdrant
-            qdrant_searcher = SearchService._get_qdrant_service()
+            # 1. Obter (ou criar) a instância do backend de busca
+            searcher = SearchService._get_search_backend()
 
-            # 2. Delegar a busca para o serviço Qdrant
-            # A normalização e a verificação de dimensão são tratadas dentro do QdrantSearchService
-            print(f"SearchService: Delegando busca para QdrantSearchService (k={k})...")
-            results = qdrant_searcher.find_top_similar_tables(
+            # 2. Delegar a busca para o backend
+            # A normalização e a verificação de dimensão são tratadas dentro do backend
+            print(f"SearchService: Delegando busca para {type(searcher).__name__} (k={k})...")
+            results = searcher.find_top_similar_tables(
                 query_embeddings=query_embeddings,
                 query_table_names=query_table_names,
                 k=k
             )
-            print(f"SearchService: Busca delegada concluída. Retornando {len(results)} resultados.")
-            return results
+            print(f"SearchService: Busca delegada concluída. {len(results)} resultados.")
 
         # Captura erros que podem ocorrer na inicialização do _get_qdrant_service
         # ou dentro da chamada find_top_similar_tables do qdrant_searcher
         except (ValueError, Exception) as e:
-            print(f"SearchService CRITICAL ERROR: Erro durante a operação de busca via Qdrant: {e}")
+            print(f"SearchService CRITICAL ERROR: Erro durante a operação de busca via {SearchService.BACKEND}: {e}")
             # O traceback já foi impresso em _get_qdrant_service ou será impresso
             # se o erro ocorrer na chamada find_top_similar_tables do qdrant_searcher
             if not isinstance(e, ValueError): # Evita duplicar o traceback para ValueErrors já tratados
                  traceback.print_exc()
-            return [] # Retorna lista vazia em caso de erro
+            results = [] # Sem busca vetorial; os índices locais ainda podem responder
+
+        # 3. Funde com os rankings léxico (trigramas) e BM25 via reciprocal-rank fusion
+        local_rankings = SearchService.compute_local_rankings(query_table_names, k, query_context)
+        return SearchService.merge_local_rankings(results, query_table_names, k, local_rankings)
+
+    @staticmethod
+    async def find_top_similar_tables_async(
+        query_embeddings: np.ndarray,
+        query_table_names: List[str],
+        k: int = 3,
+        query_context: Optional[List[str]] = None,
+        local_rankings: Optional[Dict[str, Dict[str, List[Dict[str, Any]]]]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Versão assíncrona de `find_top_similar_tables`. O Qdrant é consultado pelo cliente
+        assíncrono; o FAISS (busca local, CPU) roda em uma thread. Os rankings locais podem
+        ser passados já calculados (ex.: em paralelo com a geração dos embeddings).
+        """
+        print(f"SearchService: Recebido {len(query_table_names)} tabelas de consulta para busca (async) via {SearchService.BACKEND}.")
+        if query_embeddings.size == 0 or len(query_table_names) == 0:
+             print("SearchService: Embeddings de consulta ou nomes de tabelas vazios. Retornando lista vazia.")
+             return []
+        if query_embeddings.shape[0] != len(query_table_names):
+             print(f"SearchService ERROR: Inconsistência - {query_embeddings.shape[0]} embeddings vs {len(query_table_names)} nomes.")
+             return []
+
+        # Os índices locais rodam em uma thread enquanto a busca vetorial aguarda a rede
+        local_rankings_task = None
+        if local_rankings is None:
+            local_rankings_task = asyncio.ensure_future(
+                asyncio.to_thread(SearchService.compute_local_rankings, query_table_names, k, query_context)
+            )
+
+        results: List[Dict[str, Any]] = []
+        try:
+            searcher = await asyncio.to_thread(SearchService._get_search_backend)
+            escopo = CoalescingScope.current()
+            if escopo is not None:
+                vector_task = SearchService._busca_vetorial_compartilhada(escopo, searcher, query_embeddings, query_table_names, k)
+            else:
+                vector_task = SearchService._busca_vetorial(searcher, query_embeddings, query_table_names, k)
+            results = await vector_task
+            print(f"SearchService: Busca (async) concluída. {len(results)} resultados.")
+        except Exception as e:
+            print(f"SearchService CRITICAL ERROR: Erro durante a operação de busca (async) via {SearchService.BACKEND}: {e}")
+            if not isinstance(e, ValueError):
+                 traceback.print_exc()
+            results = []
+
+        if local_rankings_task is not None:
+            local_rankings = await local_rankings_task
+        return SearchService.merge_local_rankings(results, query_table_names, k, local_rankings)
+
+    @staticmethod
+    async def _busca_vetorial(searcher: Any, query_embeddings: np.ndarray, query_table_names: List[str], k: int) -> List[Dict[str, Any]]:
+        if hasattr(searcher, "find_top_similar_tables_async"):
+            return await searcher.find_top_similar_tables_async(query_embeddings=query_embeddings, query_table_names=query_table_names, k=k)
+        return await asyncio.to_thread(searcher.find_top_similar_tables, query_embeddings=query_embeddings, query_table_names=query_table_names, k=k)
+
+    @staticmethod
+    async def _busca_vetorial_compartilhada(
+        escopo: CoalescingScope,
+        searcher: Any,
+        query_embeddings: np.ndarray,
+        query_table_names: List[str],
+        k: int
+    ) -> List[Dict[str, Any]]:
+        """
+        Busca vetorial dentro de um CoalescingScope: cada nome normalizado é buscado uma única
+        vez no escopo (o vetor do mesmo nome é sempre o mesmo), e os nomes pedidos ao mesmo
+        tempo por requisições diferentes vão juntos para o backend.
+        """
+        async def buscar_lote(pedidos: Dict[str, np.ndarray]) -> Dict[str, Dict[str, Any]]:
+            nomes = list(pedidos)
+            resultados = await SearchService._busca_vetorial(searcher, np.stack([pedidos[n] for n in nomes]), nomes, k)
+            return {resultado.get("query_table"): resultado for resultado in resultados}
+
+        chaves = [EmbeddingCache.normalizar_texto(nome) for nome in query_table_names]
+        pedidos = {}
+        for chave, vetor in zip(chaves, query_embeddings):
+            pedidos.setdefault(chave, vetor)
+        coalescer = escopo.coalescer(f"busca_vetorial_k{k}", buscar_lote)
+        resultados = await coalescer.get_many(pedidos)
+        return [
+            {**resultados[chave], "query_table": nome}
+            for chave, nome in zip(chaves, query_table_names) if resultados.get(chave) is not None
+        ]
+
+    @staticmethod
+    def _get_lexical_index() -> Optional[LexicalIndex]:
+        """
+        Retorna o índice léxico do catálogo, reconstruindo-o apenas quando a versão do catálogo muda.
+        """
+        tabelas = SchemaCatalog.get_tables()
+        if not tabelas:
+            return None
+        versao = SchemaCatalog.get_version()
+        if SearchService._lexical_index is None or SearchService._lexical_index_version != versao:
+            with SearchService._instance_lock:
+                if SearchService._lexical_index is None or SearchService._lexical_index_version != versao:
+                    SearchService._lexical_index = LexicalIndex(tabelas)
+                    SearchService._lexical_index_version = versao
+                    print(f"SearchService: Índice léxico construído com {len(tabelas)} tabelas (catálogo {versao}).")
+        return SearchService._lexical_index
+
+    @staticmethod
+    def _get_bm25_index() -> Optional[BM25Index]:
+        """
+        Retorna o índice BM25 do catálogo. Quando a versão do catálogo muda, apenas os chunks
+        novos, alterados ou removidos são reindexados.
+        """
+        tabelas = SchemaCatalog.get_tables()
+        if not tabelas:
+            return None
+        versao = SchemaCatalog.get_version()
+        if SearchService._bm25_index is None or SearchService._bm25_index_version != versao:
+            with SearchService._instance_lock:
+                if SearchService._bm25_index is None:
+                    SearchService._bm25_index = BM25Index()
+                if SearchService._bm25_index_version != versao:
+                    atualizados, removidos = SearchService._bm25_index.sync(tabelas)
+                    SearchService._bm25_index_version = versao
+                    print(f"SearchService: Índice BM25 sincronizado com o catálogo {versao} ({atualizados} chunks indexados, {removidos} removidos).")
+        return SearchService._bm25_index
+
+    @staticmethod
+    def search_content(consulta: str, k: int = 5) -> List[Dict[str, Any]]:
+        """
+        Busca BM25 no conteúdo dos chunks (nomes de colunas, descrições...), sem embeddings.
+        Retorna matches no formato da busca vetorial, com 'bm25_score'. Lista vazia se desabilitada.
+        """
+        if not SearchService.BM25_ENABLED or not consulta.strip():
+            return []
+        try:
+            bm25_index = SearchService._get_bm25_index()
+        except Exception as e:
+            print(f"SearchService WARNING: Índice BM25 indisponível: {e}")
+            return []
+        if bm25_index is None:
+            return []
+        # O score BM25 não é limitado; a similaridade exibida é relativa ao melhor resultado
+        resultados = bm25_index.search(consulta, k=k)
+        melhor_score = resultados[0][1] if resultados else 1.0
+        return [
+            {
+                **tabela,
+                "similarity_score": score / melhor_score,
+                "similarity_percentage": score / melhor_score * 100,
+                "bm25_score": score
+            }
+            for tabela, score in resultados
+        ]
+
+    @staticmethod
+    def fuse_rankings(rankings: Dict[str, List[Dict[str, Any]]], k: int) -> List[Dict[str, Any]]:
+        """
+        Reciprocal-rank fusion: score(t) = soma sobre os rankings de 1 / (RRF_K + posição).
+
+        Args:
+            rankings: nome da fonte (ex.: 'vetorial', 'lexical') -> lista de matches ordenada.
+            k: quantidade de matches a manter após a fusão.
+
+        Returns:
+            Lista de matches deduplicada por table_name, ordenada por 'rrf_score', com o campo
+            'fontes' indicando quais rankings encontraram cada tabela. O primeiro ranking que
+            contém a tabela define os campos do match (similaridade, conteúdo...).
+        """
+        fundidos: Dict[str, Dict[str, Any]] = {}
+        for fonte, matches in rankings.items():
+            for posicao, match in enumerate(matches, start=1):
+                table_name = match.get("table_name")
+                if not table_name:
+                    continue
+                if table_name not in fundidos:
+                    fundidos[table_name] = {**match, "rrf_score": 0.0, "fontes": []}
+                fundido = fundidos[table_name]
+                fundido["rrf_score"] += 1.0 / (SearchService.RRF_K + posicao)
+                fundido["fontes"].append(fonte)
+                for campo, valor in match.items():
+                    if campo.endswith("_score") and campo not in fundido:
+                        fundido[campo] = valor
+        return sorted(fundidos.values(), key=lambda m: m["rrf_score"], reverse=True)[:k]
+
+    @staticmethod
+    def compute_local_rankings(
+        query_table_names: List[str],
+        k: int,
+        query_context: Optional[List[str]] = None
+    ) -> Dict[str, Dict[str, List[Dict[str, Any]]]]:
+        """
+        Rankings dos índices locais (léxico dos nomes e BM25 do conteúdo) para cada consulta,
+        sem nenhuma chamada de rede. Retorna nome consultado -> {fonte: matches}.
+        """
+        if not SearchService.LEXICAL_ENABLED and not SearchService.BM25_ENABLED:
+            return {}
+        lexical_index = None
+        if SearchService.LEXICAL_ENABLED:
+            try:
+                lexical_index = SearchService._get_lexical_index()
+            except Exception as e:
+                print(f"SearchService WARNING: Índice léxico indisponível: {e}")
+        contexto = " ".join(query_context or [])
+
+        local_rankings: Dict[str, Dict[str, List[Dict[str, Any]]]] = {}
+        for query_table_name in query_table_names:
+            rankings: Dict[str, List[Dict[str, Any]]] = {}
+            if lexical_index is not None:
+                rankings["lexical"] = [
+                    {**tabela, "similarity_score": score, "similarity_percentage": score * 100, "lexical_score": score}
+                    for tabela, score in lexical_index.search(query_table_name, k=k)
+                ]
+            rankings["bm25"] = SearchService.search_content(f"{query_table_name} {contexto}", k=k)
+            local_rankings[query_table_name] = rankings
+        return local_rankings
+
+    @staticmethod
+    def merge_local_rankings(
+        results: List[Dict[str, Any]],
+        query_table_names: List[str],
+        k: int,
+        local_rankings: Dict[str, Dict[str, List[Dict[str, Any]]]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Funde por RRF os resultados vetoriais com os rankings locais de `compute_local_rankings`.
+        Sem rankings locais, devolve os resultados vetoriais inalterados.
+        """
+        if not local_rankings:
+            return results
+
+        results_by_query = {r.get("query_table"): r for r in results}
+        fused_results = []
+        for query_table_name in query_table_names:
+            vector_result = results_by_query.get(query_table_name, {"query_table": query_table_name, "matches": []})
+            rankings = {"vetorial": vector_result.get("matches", []), **local_rankings.get(query_table_name, {})}
+            fused_results.append({
+                **vector_result,
+                "matches": SearchService.fuse_rankings(rankings, k)
+            })
+        return fused_results
 
 #
\ No newline at end of file
@@ -0,0 +1,107 @@
+# src/interfaces/api/asgi_app.py
+
+"""
+Ponto de entrada ASGI da API (ex.: `uvicorn interfaces.api.asgi_app:app`).
+"""
+
+import asyncio
+import json
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+from asgiref.wsgi import WsgiToAsgi
+
+from config.core.logging_config import get_logger
+from interfaces.api.llm_controller import app as flask_app, aquecer_servicos, preparar_sql_gen, responder_sql_gen
+from shared.utils.async_runner import AsyncRunner
+
+logger = get_logger(__name__)
+
+
+class AsgiApp:
+    """
+    Aplicação ASGI: POST /sql-gen é atendido por uma view assíncrona, que aguarda o pipeline no
+    loop do AsyncRunner sem ocupar uma thread, então um processo mantém centenas de requisições
+    em andamento. As demais rotas (stream, lote, jobs, health, métricas, frontend) seguem para o
+    Flask através do WsgiToAsgi, que as executa num pool de threads.
+
+    No evento 'startup' do lifespan roda `aquecer_servicos`, como o hook dos workers do gunicorn.
+    """
+    MAX_CORPO_BYTES = 1024 * 1024
+
+    def __init__(self, wsgi_app: Any):
+        self._wsgi = WsgiToAsgi(wsgi_app)
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable[[], Awaitable[Dict[str, Any]]], send: Callable[[Dict[str, Any]], Awaitable[None]]) -> None:
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+        elif scope["type"] == "http" and scope["path"] == "/sql-gen" and scope["method"] == "POST":
+            await self._sql_gen(receive, send)
+        else:
+            await self._wsgi(scope, receive, send)
+
+    @staticmethod
+    async def _lifespan(receive, send) -> None:
+        while True:
+            mensagem = await receive()
+            if mensagem["type"] == "lifespan.startup":
+                # Etapas com falha são repetidas em segundo plano; /ready responde 503 até lá
+                await asyncio.to_thread(aquecer_servicos)
+                await send({"type": "lifespan.startup.complete"})
+            elif mensagem["type"] == "lifespan.shutdown":
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    @staticmethod
+    async def _ler_corpo(receive) -> bytes:
+        partes: List[bytes] = []
+        tamanho = 0
+        while True:
+            mensagem = await receive()
+            if mensagem["type"] == "http.disconnect":
+                raise ConnectionError("cliente desconectou antes de enviar o corpo")
+            parte = mensagem.get("body", b"")
+            tamanho += len(parte)
+            if tamanho > AsgiApp.MAX_CORPO_BYTES:
+                raise ValueError("Corpo da requisição grande demais")
+            partes.append(parte)
+            if not mensagem.get("more_body", False):
+                return b"".join(partes)
+
+    @staticmethod
+    async def _responder(send, corpo: Dict[str, Any], status: int, cabecalhos: Dict[str, str]) -> None:
+        conteudo = json.dumps(corpo, ensure_ascii=False, default=str).encode("utf-8")
+        lista_cabecalhos: List[Tuple[bytes, bytes]] = [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(conteudo)).encode("latin-1")),
+            # Mesmo CORS aberto que o flask_cors aplica às rotas do Flask
+            (b"access-control-allow-origin", b"*"),
+        ]
+        lista_cabecalhos.extend((nome.lower().encode("latin-1"), valor.encode("latin-1")) for nome, valor in cabecalhos.items())
+        await send({"type": "http.response.start", "status": status, "headers": lista_cabecalhos})
+        await send({"type": "http.response.body", "body": conteudo})
+
+    @staticmethod
+    async def _sql_gen(receive, send) -> None:
+        logger.info("\n[ASGI APP] Recebida requisição em /sql-gen")
+        try:
+            try:
+                corpo = await AsgiApp._ler_corpo(receive)
+                pipeline = preparar_sql_gen(json.loads(corpo or b"null"))
+            except ConnectionError:
+                return
+            except ValueError as e:
+                # json.JSONDecodeError também é ValueError
+                mensagem = str(e) if not isinstance(e, json.JSONDecodeError) else "Corpo JSON inválido"
+                await AsgiApp._responder(send, {"erro": mensagem}, 400, {})
+                return
+
+            # O pipeline roda no loop do AsyncRunner (limitadores e coalescedores vivem lá);
+            # esta corrotina só aguarda o resultado, sem thread dedicada
+            resultado = await asyncio.wrap_future(AsyncRunner.submit(pipeline))
+            await AsgiApp._responder(send, *responder_sql_gen(resultado))
+        except Exception as e:
+            logger.critical(f"\n[ASGI APP] Erro inesperado no endpoint /sql-gen: {str(e)}", exc_info=True)
+            await AsgiApp._responder(send, {"sucesso": False, "erro": "Erro interno grave no servidor."}, 500, {})
+
+
+app = AsgiApp(flask_app)
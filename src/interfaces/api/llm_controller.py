@@ -4,15 +4,33 @@
 Define e inicia a API Flask para geração de SQL via RAG.
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 # Ajuste os caminhos de importação se necessário, baseado em como você roda o run_api.py
 # Se run_api.py está na raiz e chama 'from .llm_controller', então os imports dentro
 # de llm_controller devem ser relativos à raiz do projeto 'src'.
 from config.core.logging_config import setup_logging, get_logger # Caminho relativo a 'src'
 from application.services.rag_service import RAGService # Caminho relativo a 'src'
+from application.services.job_service import JobService
+from infrastructure.vector_database.search_service import SearchService
+from infrastructure.persistence.schema_catalog import SchemaCatalog
+from infrastructure.persistence.job_store import STATUS_EXECUTANDO, STATUS_PENDENTE
+from infrastructure.external_services.embedding_service import EmbeddingService
+from infrastructure.external_services.llm_service import LLMService
+from config.api.api_config import GeminiConfig
+from application.services.maestro.prefetch_buffer import PrefetchBuffer
+from application.services.maestro.speculative_final import SpeculativeFinal
+from shared.utils.async_runner import AsyncRunner
+from shared.utils.request_budget import RequestBudget
+from shared.utils.tracing import Tracer
 from flask_cors import CORS
 from flask import send_from_directory
+import json
+import math
 import os
+import queue
+import threading
+import time
+from typing import Any, Awaitable, Dict, Tuple
 
 # Inicializa Logs (considerar fazer isso apenas uma vez na inicialização do app, não no import)
 # setup_logging(profile="api_server") # Mover para dentro de iniciar_servidor ou if __name__ == "__main__"
@@ -30,44 +48,404 @@ def serve_frontend():
 def serve_static(path):
     return send_from_directory('frontend/build', path)
 
+def preparar_sql_gen(dados) -> Awaitable[Dict[str, Any]]:
+    """
+    Valida o corpo de /sql-gen e devolve a corrotina do pipeline (ainda não agendada).
+    Compartilhada pela view WSGI abaixo e pela view assíncrona do asgi_app.
+
+    Raises:
+        ValueError: corpo inválido; a mensagem vai para o cliente com status 400.
+    """
+    if not isinstance(dados, dict) or 'prompt' not in dados:
+        logger.warning("\n[LLM CONTROLLER] Requisição inválida: campo 'prompt' ausente.")
+        raise ValueError("O campo 'prompt' é obrigatório")
+
+    prompt = dados['prompt']
+    logger.info(f"\n[LLM CONTROLLER] Processando prompt: '{prompt[:100]}...'")
+    try:
+        orcamento = RequestBudget.from_dict(dados.get('orcamento'))
+    except (AttributeError, TypeError, ValueError):
+        raise ValueError("O campo 'orcamento' é inválido")
+
+    return RAGService.generate_sql_from_prompt_async(
+        prompt, incluir_timings=bool(dados.get('timings')), orcamento=orcamento,
+        usar_cache=dados.get('cache', True) is not False
+    )
+
+def responder_sql_gen(rag_service_result: Dict[str, Any]) -> Tuple[Dict[str, Any], int, Dict[str, str]]:
+    """
+    Converte o resultado do RAGService em (corpo, status HTTP, cabeçalhos) da resposta de /sql-gen.
+    """
+    if rag_service_result.get("sucesso"):
+        logger.info("\n[LLM CONTROLLER] Processamento RAG concluído com sucesso. Retornando resultado do RAGService para o frontend.")
+        # Envia o payload completo do RAGService que já contém 'sql_gerado_final' formatado e 'sucesso', etc.
+        return rag_service_result, 200, {}
+    elif rag_service_result.get("indisponivel"):
+        # Limite de taxa/cota da LLM: o cliente pode repetir a requisição depois do Retry-After
+        logger.warning(f"\n[LLM CONTROLLER] LLM indisponível: {rag_service_result.get('erro')}")
+        espera = rag_service_result.get("tentar_novamente_em")
+        return rag_service_result, 503, {"Retry-After": str(max(1, math.ceil(espera))) if espera else "5"}
+    else:
+        error_msg = rag_service_result.get("erro", "Erro desconhecido no processamento RAG.")
+        logger.error(f"\n[LLM CONTROLLER] Erro retornado pelo RAGService: {error_msg}")
+        logger.debug(f"\n[LLM CONTROLLER] Logs intermediários do RAGService em falha: {rag_service_result.get('logs_intermediarios')}")
+        # O corpo mantém 'sucesso: false' e 'erro'; o status HTTP indica o erro
+        return rag_service_result, 500, {}
+
 @app.route('/sql-gen', methods=['POST']) 
 def processar_rag_sql_gen():
     logger.info("\n[LLM CONTROLLER] Recebida requisição em /sql-gen")
     try:
-        dados = request.json
-        if not dados or 'prompt' not in dados:
-            logger.warning("\n[LLM CONTROLLER] Requisição inválida: campo 'prompt' ausente.")
-            return jsonify({"erro": "O campo 'prompt' é obrigatório"}), 400
-
-        prompt = dados['prompt']
-        logger.info(f"\n[LLM CONTROLLER] Processando prompt: '{prompt[:100]}...'")
-        
-        rag_service_result = RAGService.generate_sql_from_prompt(prompt)
-
-        if rag_service_result.get("sucesso"):
-            logger.info("\n[LLM CONTROLLER] Processamento RAG concluído com sucesso. Retornando resultado do RAGService para o frontend.")
-            # Envia o payload completo do RAGService que já contém 'sql_gerado_final' formatado e 'sucesso', etc.
-            return jsonify(rag_service_result), 200
-        else:
-            error_msg = rag_service_result.get("erro", "Erro desconhecido no processamento RAG.")
-            logger.error(f"\n[LLM CONTROLLER] Erro retornado pelo RAGService: {error_msg}")
-            logger.debug(f"\n[LLM CONTROLLER] Logs intermediários do RAGService em falha: {rag_service_result.get('logs_intermediarios')}")
-            # Você pode enviar o rag_service_result mesmo em caso de falha,
-            # pois ele contém 'sucesso: false' e 'erro'.
-            # Ou construir um JSON de erro mais simples se preferir.
-            # Por consistência, enviar rag_service_result é bom:
-            return jsonify(rag_service_result), 500 # O status HTTP indica o erro
+        try:
+            pipeline = preparar_sql_gen(request.json)
+        except ValueError as e:
+            return jsonify({"erro": str(e)}), 400
+
+        # O pipeline roda no loop compartilhado do processo (as chamadas de rede de várias
+        # requisições se sobrepõem ali), mas sob WSGI esta view segura uma thread do servidor até
+        # o resultado: as requisições simultâneas ficam limitadas a threads x workers. O servidor
+        # ASGI (API_SERVER=uvicorn, ver asgi_app) atende /sql-gen sem ocupar uma thread por requisição.
+        corpo, status, cabecalhos = responder_sql_gen(AsyncRunner.run(pipeline))
+        return jsonify(corpo), status, cabecalhos
 
     except Exception as e:
         logger.critical(f"\n[LLM CONTROLLER] Erro inesperado no endpoint /sql-gen: {str(e)}", exc_info=True)
         return jsonify({"sucesso": False, "erro": f"Erro interno grave no servidor."}), 500
 
+def _evento_sse(tipo: str, dados) -> str:
+    return f"event: {tipo}\ndata: {json.dumps(dados, ensure_ascii=False, default=str)}\n\n"
+
+@app.route('/sql-gen/stream', methods=['GET', 'POST'])
+def processar_rag_sql_gen_stream():
+    """
+    Mesma geração de /sql-gen, mas respondida como Server-Sent Events:
+    'etapa' (extracao, busca, verificacao com a iteração, resposta_final), 'token' (trechos
+    da resposta final à medida que o modelo os gera) e, ao fim, 'resultado' (mesmo JSON de
+    /sql-gen) ou 'erro'. Aceita POST com JSON {"prompt", "timings", "orcamento", "cache"} ou
+    GET ?prompt=&timings=1&cache=0 (para EventSource). Um acerto do cache semântico emite a etapa
+    'cache_semantico' e a resposta inteira em um único 'token'.
+    """
+    logger.info("\n[LLM CONTROLLER] Recebida requisição em /sql-gen/stream")
+    dados = request.get_json(silent=True) if request.method == 'POST' else {
+        "prompt": request.args.get('prompt'),
+        "timings": request.args.get('timings') in ('1', 'true'),
+        "cache": request.args.get('cache') not in ('0', 'false')
+    }
+    if not dados or not dados.get('prompt'):
+        logger.warning("\n[LLM CONTROLLER] Requisição inválida: campo 'prompt' ausente.")
+        return jsonify({"erro": "O campo 'prompt' é obrigatório"}), 400
+
+    prompt = dados['prompt']
+    logger.info(f"\n[LLM CONTROLLER] Processando prompt (stream): '{prompt[:100]}...'")
+    try:
+        orcamento = RequestBudget.from_dict(dados.get('orcamento'))
+    except (AttributeError, TypeError, ValueError):
+        return jsonify({"erro": "O campo 'orcamento' é inválido"}), 400
+
+    eventos: "queue.Queue" = queue.Queue()
+    fim = object()
+    futuro = AsyncRunner.submit(RAGService.generate_sql_from_prompt_async(
+        prompt, notificar=eventos.put, incluir_timings=bool(dados.get('timings')), orcamento=orcamento,
+        usar_cache=dados.get('cache', True) is not False
+    ))
+    futuro.add_done_callback(lambda _: eventos.put(fim))
+
+    def gerar():
+        try:
+            while True:
+                evento = eventos.get()
+                if evento is fim:
+                    break
+                yield _evento_sse(evento.get("tipo", "etapa"), evento)
+            try:
+                yield _evento_sse("resultado", futuro.result())
+            except Exception as e:
+                logger.critical(f"\n[LLM CONTROLLER] Erro inesperado no endpoint /sql-gen/stream: {str(e)}", exc_info=True)
+                yield _evento_sse("erro", {"sucesso": False, "erro": "Erro interno grave no servidor."})
+        except GeneratorExit:
+            # Cliente desconectou: cancela o pipeline no loop do AsyncRunner (e as chamadas à LLM em andamento)
+            logger.info("\n[LLM CONTROLLER] Cliente desconectou do stream.")
+            futuro.cancel()
+            raise
+
+    return Response(
+        stream_with_context(gerar()),
+        mimetype='text/event-stream',
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.route('/sql-gen/batch', methods=['POST'])
+def processar_rag_sql_gen_batch():
+    """
+    Gera SQL para vários prompts: JSON {"prompts": [...], "concorrencia", "timings", "orcamento",
+    "cache"}. A resposta é NDJSON (uma linha por objeto) na ordem em que os prompts terminam:
+    {"tipo": "resultado", "indice", "prompt", ...mesmo JSON de /sql-gen} e, ao fim,
+    {"tipo": "resumo"} ou {"tipo": "erro"}.
+    """
+    logger.info("\n[LLM CONTROLLER] Recebida requisição em /sql-gen/batch")
+    dados = request.get_json(silent=True) or {}
+    prompts = dados.get('prompts')
+    if not isinstance(prompts, list) or not prompts or not all(isinstance(p, str) and p.strip() for p in prompts):
+        logger.warning("\n[LLM CONTROLLER] Requisição inválida: campo 'prompts' ausente ou inválido.")
+        return jsonify({"erro": "O campo 'prompts' deve ser uma lista não vazia de textos"}), 400
+    if len(prompts) > RAGService.BATCH_MAX_PROMPTS:
+        return jsonify({"erro": f"O lote aceita no máximo {RAGService.BATCH_MAX_PROMPTS} prompts"}), 400
+    try:
+        RequestBudget.from_dict(dados.get('orcamento'))
+        concorrencia = int(dados['concorrencia']) if dados.get('concorrencia') is not None else None
+    except (AttributeError, TypeError, ValueError):
+        return jsonify({"erro": "Os campos 'orcamento' ou 'concorrencia' são inválidos"}), 400
+
+    logger.info(f"\n[LLM CONTROLLER] Processando lote de {len(prompts)} prompts")
+    linhas: "queue.Queue" = queue.Queue()
+    fim = object()
+
+    async def consumir():
+        async for resultado in RAGService.generate_sql_batch_async(
+            prompts, concorrencia=concorrencia, incluir_timings=bool(dados.get('timings')),
+            orcamento=dados.get('orcamento'), usar_cache=dados.get('cache', True) is not False
+        ):
+            linhas.put(resultado)
+
+    futuro = AsyncRunner.submit(consumir())
+    futuro.add_done_callback(lambda _: linhas.put(fim))
+
+    def gerar():
+        try:
+            while True:
+                linha = linhas.get()
+                if linha is fim:
+                    break
+                yield json.dumps(linha, ensure_ascii=False, default=str) + "\n"
+            try:
+                futuro.result()
+            except Exception as e:
+                logger.critical(f"\n[LLM CONTROLLER] Erro inesperado no endpoint /sql-gen/batch: {str(e)}", exc_info=True)
+                yield json.dumps({"tipo": "erro", "sucesso": False, "erro": "Erro interno grave no servidor."}) + "\n"
+        except GeneratorExit:
+            # Cliente desconectou: cancela os prompts que ainda não terminaram
+            logger.info("\n[LLM CONTROLLER] Cliente desconectou do lote.")
+            futuro.cancel()
+            raise
+
+    return Response(
+        stream_with_context(gerar()),
+        mimetype='application/x-ndjson',
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.route('/jobs', methods=['POST'])
+def submeter_job():
+    """
+    Submete um prompt para geração em segundo plano: JSON {"prompt", "timings", "orcamento",
+    "cache"}. Responde 202 com o job ({"id", "status", ...}) sem esperar o pipeline; acompanhe
+    em GET /jobs/<id> ou /jobs/<id>/stream. O mesmo prompt com os mesmos parâmetros (ou o mesmo
+    cabeçalho Idempotency-Key) enquanto o job está ativo ou com resultado válido devolve o job
+    existente ('reaproveitado': true).
+    """
+    logger.info("\n[LLM CONTROLLER] Recebida requisição em /jobs")
+    dados = request.get_json(silent=True)
+    if not dados or not isinstance(dados.get('prompt'), str) or not dados['prompt'].strip():
+        logger.warning("\n[LLM CONTROLLER] Requisição inválida: campo 'prompt' ausente.")
+        return jsonify({"erro": "O campo 'prompt' é obrigatório"}), 400
+    try:
+        RequestBudget.from_dict(dados.get('orcamento'))
+    except (AttributeError, TypeError, ValueError):
+        return jsonify({"erro": "O campo 'orcamento' é inválido"}), 400
+
+    parametros = {
+        "incluir_timings": bool(dados.get('timings')),
+        "orcamento": dados.get('orcamento'),
+        "usar_cache": dados.get('cache', True) is not False
+    }
+    resultado = JobService.submit(dados['prompt'], parametros, chave=request.headers.get('Idempotency-Key'))
+    if not resultado.get("sucesso"):
+        return jsonify(resultado), 503, {"Retry-After": "5"}
+    return jsonify(resultado), 202, {"Location": f"/jobs/{resultado['job']['id']}"}
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def consultar_job(job_id):
+    """
+    Status do job; com status 'concluido' ou 'falhou', o campo 'resultado' traz o mesmo JSON de /sql-gen.
+    """
+    job = JobService.get(job_id)
+    if job is None:
+        return jsonify({"erro": "Job não encontrado ou expirado"}), 404
+    return jsonify(job), 200
+
+@app.route('/jobs/<job_id>', methods=['DELETE'])
+def cancelar_job(job_id):
+    """
+    Cancela um job pendente ou em execução (409 se ele já terminou).
+    """
+    job = JobService.get(job_id)
+    if job is None:
+        return jsonify({"erro": "Job não encontrado ou expirado"}), 404
+    if job["status"] not in (STATUS_PENDENTE, STATUS_EXECUTANDO):
+        return jsonify({"erro": f"O job já terminou ({job['status']})", "job": job}), 409
+    return jsonify(JobService.cancel(job_id)), 202
+
+_INTERVALO_KEEPALIVE_SEGUNDOS = 15.0
+_INTERVALO_CONSULTA_JOB_SEGUNDOS = 1.0
+
+@app.route('/jobs/<job_id>/stream', methods=['GET'])
+def acompanhar_job(job_id):
+    """
+    Eventos do job como Server-Sent Events: os já emitidos e os seguintes ('status', 'etapa',
+    'token', como em /sql-gen/stream) e, ao fim, 'resultado' com o job. Pode ser aberto a
+    qualquer momento, inclusive por um cliente que se reconecta. Um job executado por outro
+    processo é acompanhado pelo armazenamento de jobs (apenas eventos 'status').
+    """
+    if JobService.get(job_id) is None:
+        return jsonify({"erro": "Job não encontrado ou expirado"}), 404
+    assinatura = JobService.subscribe(job_id)
+
+    def eventos_locais():
+        historico, eventos = assinatura
+        try:
+            for evento in historico:
+                yield _evento_sse(evento.get("tipo", "etapa"), evento)
+            while True:
+                try:
+                    evento = eventos.get(timeout=_INTERVALO_KEEPALIVE_SEGUNDOS)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                if evento.get("tipo") == "fim":
+                    break
+                yield _evento_sse(evento.get("tipo", "etapa"), evento)
+        finally:
+            JobService.unsubscribe(job_id, eventos)
+
+    def eventos_armazenados():
+        status_anterior, ultimo_envio = None, time.monotonic()
+        while True:
+            job = JobService.get(job_id)
+            if job is None or job["status"] not in (STATUS_PENDENTE, STATUS_EXECUTANDO):
+                return
+            if job["status"] != status_anterior:
+                status_anterior, ultimo_envio = job["status"], time.monotonic()
+                yield _evento_sse("status", {"tipo": "status", "status": job["status"]})
+            elif time.monotonic() - ultimo_envio >= _INTERVALO_KEEPALIVE_SEGUNDOS:
+                ultimo_envio = time.monotonic()
+                yield ": keep-alive\n\n"
+            time.sleep(_INTERVALO_CONSULTA_JOB_SEGUNDOS)
+
+    def gerar():
+        try:
+            yield from (eventos_locais() if assinatura is not None else eventos_armazenados())
+            job = JobService.get(job_id)
+            if job is None:
+                yield _evento_sse("erro", {"sucesso": False, "erro": "Job não encontrado ou expirado"})
+            else:
+                yield _evento_sse("resultado", job)
+        except GeneratorExit:
+            # Cliente desconectou: o job continua; basta abrir o stream de novo
+            logger.info(f"\n[LLM CONTROLLER] Cliente desconectou do stream do job {job_id}.")
+            raise
+
+    return Response(
+        stream_with_context(gerar()),
+        mimetype='text/event-stream',
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+_aquecimento_lock = threading.Lock()
+_estado_aquecimento = {"pronto": False, "etapas_ms": {}, "erros": {}}
+# Etapas que falharam são repetidas em segundo plano, com espera exponencial entre as tentativas
+_AQUECIMENTO_ESPERA_BASE = float(os.getenv("WARMUP_RETRY_BASE_SECONDS", "1"))
+_AQUECIMENTO_ESPERA_MAXIMA = float(os.getenv("WARMUP_RETRY_MAX_SECONDS", "60"))
+_timer_aquecimento = None
+
+def aquecer_servicos():
+    """
+    Prepara o processo para atender: configura o Gemini, inicia o loop do AsyncRunner, carrega
+    o backend de busca (índice FAISS / conexão Qdrant) e o catálogo de tabelas. Deve rodar uma
+    vez por processo servidor (em cada worker, depois do fork), antes da primeira requisição;
+    /ready só responde 200 depois disso. Chamadas seguintes devolvem o estado já calculado.
+
+    Se alguma etapa falhar (ex.: Qdrant ainda subindo), só as etapas com falha são repetidas
+    por um timer em segundo plano, com espera exponencial (WARMUP_RETRY_BASE_SECONDS até
+    WARMUP_RETRY_MAX_SECONDS), até o processo ficar pronto.
+    """
+    global _timer_aquecimento
+    with _aquecimento_lock:
+        if _estado_aquecimento["pronto"]:
+            return dict(_estado_aquecimento)
+        etapas = {
+            "gemini": GeminiConfig.initialize,
+            "async_runner": AsyncRunner.get_loop,
+            "busca": SearchService.warmup,
+            "catalogo": SchemaCatalog.get_tables,
+        }
+        etapas_ms, erros = dict(_estado_aquecimento["etapas_ms"]), {}
+        for nome, etapa in etapas.items():
+            if nome in etapas_ms and nome not in _estado_aquecimento["erros"]:
+                continue
+            inicio = time.perf_counter()
+            try:
+                etapa()
+            except Exception as e:
+                logger.error(f"\n[LLM CONTROLLER] Falha no aquecimento ({nome}): {e}")
+                erros[nome] = str(e)
+            etapas_ms[nome] = round((time.perf_counter() - inicio) * 1000, 3)
+        tentativas = _estado_aquecimento.get("tentativas", 0) + 1
+        _estado_aquecimento.update({"pronto": not erros, "etapas_ms": etapas_ms, "erros": erros, "pid": os.getpid(), "tentativas": tentativas})
+        _estado_aquecimento.pop("proxima_tentativa_segundos", None)
+        if erros:
+            espera = min(_AQUECIMENTO_ESPERA_MAXIMA, _AQUECIMENTO_ESPERA_BASE * 2 ** (tentativas - 1))
+            _estado_aquecimento["proxima_tentativa_segundos"] = espera
+            _timer_aquecimento = threading.Timer(espera, aquecer_servicos)
+            _timer_aquecimento.daemon = True
+            _timer_aquecimento.start()
+            logger.warning(f"\n[LLM CONTROLLER] Aquecimento incompleto ({sorted(erros)}); nova tentativa em {espera:.1f}s.")
+        else:
+            logger.info(f"\n[LLM CONTROLLER] Aquecimento do processo {os.getpid()} concluído (tentativas: {tentativas}, etapas: {etapas_ms}).")
+        return dict(_estado_aquecimento)
+
+@app.route('/health', methods=['GET'])
+def verificar_saude():
+    """
+    Liveness: o processo responde.
+    """
+    return jsonify({"status": "ok", "pid": os.getpid()}), 200
+
+@app.route('/ready', methods=['GET'])
+def verificar_prontidao():
+    """
+    Readiness: 200 somente depois do aquecimento do processo (ver `aquecer_servicos`), 503 antes
+    disso ou enquanto etapas com falha aguardam nova tentativa.
+    """
+    estado = dict(_estado_aquecimento)
+    return jsonify(estado), 200 if estado["pronto"] else 503
+
+@app.route('/metrics', methods=['GET'])
+def obter_metricas():
+    """
+    Métricas agregadas do processo (caches, prefetch e custo das etapas), para acompanhamento de desempenho.
+    """
+    return jsonify({
+        "prefetch_fk": PrefetchBuffer.get_stats(),
+        "cache_embeddings": EmbeddingService.get_cache_stats(),
+        "cache_semantico": RAGService.get_semantic_cache_stats(),
+        "cache_llm": LLMService.get_cache_stats(),
+        "cascata_modelos": LLMService.get_cascade_stats(),
+        "limite_taxa_llm": LLMService.get_rate_limit_stats(),
+        "hedging": {"llm": LLMService.get_hedge_stats(), "embeddings": EmbeddingService.get_hedge_stats()},
+        "resposta_especulativa": SpeculativeFinal.get_stats(),
+        "jobs": JobService.get_stats(),
+        "exportacao_traces": Tracer.get_stats(),
+        "orcamento": RequestBudget.get_stats()
+    }), 200
+
 def iniciar_servidor(host='0.0.0.0', porta=5000, modo_debug=False):
     """
     Inicia o servidor Flask.
     """
     # Configurar o logging aqui, uma vez na inicialização, é melhor
     setup_logging(profile="api_server") 
+    # Carrega o backend de busca (índice FAISS / conexão Qdrant) e o catálogo de tabelas uma vez, antes da primeira requisição
+    aquecer_servicos()
     logger.info(f"\n[LLM CONTROLLER] Iniciando servidor Flask em {host}:{porta} (Debug: {modo_debug})")
     app.run(host=host, port=porta, debug=modo_debug)
 
@@ -0,0 +1,148 @@
+# src/interfaces/api/production_server.py
+
+"""
+Modo de produção da API: servidor ASGI (uvicorn), em que /sql-gen não ocupa uma thread por
+requisição, ou servidor WSGI com vários processos (gunicorn) ou, onde o gunicorn não está
+disponível (Windows), vários threads em um processo (waitress).
+"""
+
+import os
+from typing import Any, Dict
+
+from config.core.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+
+class ProductionServer:
+    """
+    Sobe a API em um servidor de produção, no lugar do servidor de desenvolvimento do Flask.
+
+    Com o uvicorn, cada um dos API_WORKERS processos importa `asgi_app` e aquece os serviços no
+    lifespan; /sql-gen é aguardado de forma assíncrona, e as requisições simultâneas por processo
+    ficam limitadas só por API_MAX_CONCURRENCY (0 = sem limite), não por threads.
+
+    Com o gunicorn, o processo mestre não importa a aplicação (sem preload): cada worker a
+    carrega depois do fork e executa `aquecer_servicos` antes de aceitar conexões, então
+    clientes gRPC, a thread do AsyncRunner e conexões SQLite nunca atravessam um fork.
+    SIGHUP no mestre recarrega a configuração e troca os workers de forma gradual (os antigos
+    terminam as requisições em andamento dentro de API_GRACEFUL_TIMEOUT_SECONDS); SIGTERM
+    encerra com o mesmo prazo.
+
+    API_SERVER escolhe o servidor: 'auto' (padrão: uvicorn, depois gunicorn, depois waitress,
+    depois o servidor do Flask), 'uvicorn', 'gunicorn', 'waitress' ou 'flask'.
+    """
+    SERVIDOR = os.getenv("API_SERVER", "auto")
+    WORKERS = int(os.getenv("API_WORKERS", str(max(2, os.cpu_count() or 1))))
+    THREADS = int(os.getenv("API_THREADS", "8"))
+    TIMEOUT_SEGUNDOS = int(os.getenv("API_TIMEOUT_SECONDS", "120"))
+    GRACEFUL_TIMEOUT_SEGUNDOS = int(os.getenv("API_GRACEFUL_TIMEOUT_SECONDS", "30"))
+    # Recicla cada worker após N requisições (0 desliga), com variação para não reciclar todos juntos
+    MAX_REQUESTS = int(os.getenv("API_MAX_REQUESTS", "0"))
+    MAX_CONCORRENCIA = int(os.getenv("API_MAX_CONCURRENCY", "0"))
+
+    @staticmethod
+    def _disponivel(modulo: str) -> bool:
+        try:
+            __import__(modulo)
+            return True
+        except ImportError:
+            return False
+
+    @staticmethod
+    def escolher_servidor() -> str:
+        if ProductionServer.SERVIDOR != "auto":
+            return ProductionServer.SERVIDOR
+        if ProductionServer._disponivel("uvicorn"):
+            return "uvicorn"
+        # gunicorn depende de fork e não roda no Windows
+        if os.name != "nt" and ProductionServer._disponivel("gunicorn"):
+            return "gunicorn"
+        if ProductionServer._disponivel("waitress"):
+            return "waitress"
+        return "flask"
+
+    @staticmethod
+    def opcoes_gunicorn(host: str, porta: int) -> Dict[str, Any]:
+        return {
+            "bind": f"{host}:{porta}",
+            "workers": max(1, ProductionServer.WORKERS),
+            "worker_class": "gthread",
+            "threads": max(1, ProductionServer.THREADS),
+            "timeout": ProductionServer.TIMEOUT_SEGUNDOS,
+            "graceful_timeout": ProductionServer.GRACEFUL_TIMEOUT_SEGUNDOS,
+            "max_requests": ProductionServer.MAX_REQUESTS,
+            "max_requests_jitter": ProductionServer.MAX_REQUESTS // 10,
+            "preload_app": False,
+            "post_worker_init": ProductionServer._aquecer_worker,
+        }
+
+    @staticmethod
+    def _aquecer_worker(worker: Any) -> None:
+        # Hook do gunicorn: roda em cada worker, depois do fork e antes da primeira requisição.
+        # Etapas com falha são repetidas em segundo plano; /ready responde 503 até lá
+        from interfaces.api.llm_controller import aquecer_servicos
+        aquecer_servicos()
+
+    @staticmethod
+    def iniciar(host: str = "0.0.0.0", porta: int = 5000) -> None:
+        servidor = ProductionServer.escolher_servidor()
+        logger.info(
+            f"\n[Production Server] Servidor '{servidor}' em {host}:{porta} "
+            f"(workers: {ProductionServer.WORKERS if servidor in ('gunicorn', 'uvicorn') else 1}, threads: {ProductionServer.THREADS})"
+        )
+        if servidor == "uvicorn":
+            ProductionServer._iniciar_uvicorn(host, porta)
+        elif servidor == "gunicorn":
+            ProductionServer._iniciar_gunicorn(host, porta)
+        elif servidor == "waitress":
+            ProductionServer._iniciar_waitress(host, porta)
+        elif servidor == "flask":
+            logger.warning("\n[Production Server] Nem uvicorn, gunicorn ou waitress instalados; usando o servidor do Flask (um processo).")
+            from interfaces.api.llm_controller import iniciar_servidor
+            iniciar_servidor(host=host, porta=porta, modo_debug=False)
+        else:
+            raise ValueError(f"API_SERVER inválido: '{servidor}'. Use auto, uvicorn, gunicorn, waitress ou flask.")
+
+    @staticmethod
+    def opcoes_uvicorn(host: str, porta: int) -> Dict[str, Any]:
+        return {
+            "host": host,
+            "port": porta,
+            "workers": max(1, ProductionServer.WORKERS),
+            "lifespan": "on",
+            "limit_concurrency": ProductionServer.MAX_CONCORRENCIA or None,
+            "limit_max_requests": ProductionServer.MAX_REQUESTS or None,
+            "timeout_graceful_shutdown": ProductionServer.GRACEFUL_TIMEOUT_SEGUNDOS,
+        }
+
+    @staticmethod
+    def _iniciar_uvicorn(host: str, porta: int) -> None:
+        import uvicorn
+
+        # Pela string de importação: cada worker carrega a aplicação no próprio processo
+        uvicorn.run("interfaces.api.asgi_app:app", **ProductionServer.opcoes_uvicorn(host, porta))
+
+    @staticmethod
+    def _iniciar_gunicorn(host: str, porta: int) -> None:
+        from gunicorn.app.base import BaseApplication
+
+        class _Aplicacao(BaseApplication):
+            def load_config(self):
+                for chave, valor in ProductionServer.opcoes_gunicorn(host, porta).items():
+                    self.cfg.set(chave, valor)
+
+            def load(self):
+                # Importada no worker (depois do fork), não no mestre
+                from interfaces.api.llm_controller import app
+                return app
+
+        _Aplicacao().run()
+
+    @staticmethod
+    def _iniciar_waitress(host: str, porta: int) -> None:
+        from waitress import serve
+        from interfaces.api.llm_controller import app, aquecer_servicos
+
+        aquecer_servicos()
+        serve(app, host=host, port=porta, threads=max(1, ProductionServer.THREADS), channel_timeout=ProductionServer.TIMEOUT_SEGUNDOS)
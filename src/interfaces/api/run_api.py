@@ -2,9 +2,13 @@
 
 """
 Script para iniciar o servidor da API.
+
+ENVIRONMENT=production usa o servidor de produção (ver ProductionServer); nos demais
+ambientes, o servidor de desenvolvimento do Flask.
 """
 
-from .llm_controller import iniciar_servidor
+# Import absoluto: o script também é o ponto de entrada do executável do PyInstaller (run_api.spec)
+from interfaces.api.production_server import ProductionServer
 from config.core.logging_config import setup_logging, get_logger
 import os
 
@@ -20,7 +24,11 @@ if __name__ == "__main__":
     
     try:
         # Inicia o servidor
-        iniciar_servidor(porta=porta, modo_debug=(env == "development"))
+        if env == "production":
+            ProductionServer.iniciar(porta=porta)
+        else:
+            from interfaces.api.llm_controller import iniciar_servidor
+            iniciar_servidor(porta=porta, modo_debug=(env == "development"))
     except Exception as e:
         logger.critical(f"Falha ao iniciar o servidor: {str(e)}")
-        raise
\ No newline at end of file
+        raise
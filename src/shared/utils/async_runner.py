@@ -0,0 +1,53 @@
+# --- Arquivo: async_runner.py ---
+
+import asyncio
+import concurrent.futures
+import threading
+from typing import Any, Awaitable, Optional
+
+
+class AsyncRunner:
+    """
+    Event loop único do processo, executado em uma thread própria.
+
+    Os clientes assíncronos (gRPC do Gemini, AsyncQdrantClient) ficam presos ao loop em que
+    foram criados. Como cada view assíncrona do Flask roda em um loop novo, todas as corrotinas
+    do pipeline são executadas neste loop compartilhado, e quem chama apenas aguarda o resultado.
+    """
+
+    _loop: Optional[asyncio.AbstractEventLoop] = None
+    _thread: Optional[threading.Thread] = None
+    _lock = threading.Lock()
+
+    @staticmethod
+    def get_loop() -> asyncio.AbstractEventLoop:
+        """
+        Retorna o loop compartilhado, iniciando a thread na primeira chamada.
+        """
+        if AsyncRunner._loop is not None:
+            return AsyncRunner._loop
+        with AsyncRunner._lock:
+            if AsyncRunner._loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name="async-runner", daemon=True)
+                thread.start()
+                AsyncRunner._thread = thread
+                AsyncRunner._loop = loop
+        return AsyncRunner._loop
+
+    @staticmethod
+    def submit(coro: Awaitable[Any]) -> concurrent.futures.Future:
+        """
+        Agenda a corrotina no loop compartilhado e devolve um Future thread-safe.
+        Em código assíncrono (outro loop), aguarde com `await asyncio.wrap_future(...)`.
+        """
+        return asyncio.run_coroutine_threadsafe(coro, AsyncRunner.get_loop())
+
+    @staticmethod
+    def run(coro: Awaitable[Any], timeout: Optional[float] = None) -> Any:
+        """
+        Executa a corrotina no loop compartilhado e bloqueia a thread atual até o resultado.
+        """
+        if threading.current_thread() is AsyncRunner._thread:
+            raise RuntimeError("AsyncRunner.run() chamado de dentro do próprio loop; use 'await'.")
+        return AsyncRunner.submit(coro).result(timeout=timeout)
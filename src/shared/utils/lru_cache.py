@@ -0,0 +1,102 @@
+# src/shared/utils/lru_cache.py
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, List, Optional, Tuple
+
+
+class LRUCache:
+    """
+    Cache em memória com política LRU (Least Recently Used), seguro para threads.
+    Quando a capacidade é atingida, o item acessado há mais tempo é descartado.
+
+    Com `ttl_segundos`, cada item expira esse tempo após o último `put` e deixa de ser
+    devolvido. `ao_descartar(chave, valor)`, se informado, é chamado (fora do lock) para os
+    itens descartados por capacidade ou expiração; `pop` e `clear` não o acionam.
+    """
+
+    def __init__(
+        self,
+        capacidade: int = 1024,
+        ttl_segundos: Optional[float] = None,
+        ao_descartar: Optional[Callable[[Hashable, Any], None]] = None
+    ):
+        if capacidade <= 0:
+            raise ValueError("A capacidade do LRUCache deve ser maior que zero.")
+        self.capacidade = capacidade
+        self.ttl_segundos = ttl_segundos
+        self._ao_descartar = ao_descartar
+        # chave -> (valor, instante de expiração ou None)
+        self._itens: "OrderedDict[Hashable, Tuple[Any, Optional[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _expirado(self, expira_em: Optional[float]) -> bool:
+        return expira_em is not None and time.monotonic() >= expira_em
+
+    def _notificar_descartes(self, descartados: List[Tuple[Hashable, Any]]) -> None:
+        if self._ao_descartar is None:
+            return
+        for chave, valor in descartados:
+            self._ao_descartar(chave, valor)
+
+    def get(self, chave: Hashable, padrao: Optional[Any] = None) -> Any:
+        descartados = []
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is None:
+                return padrao
+            valor, expira_em = item
+            if self._expirado(expira_em):
+                del self._itens[chave]
+                descartados.append((chave, valor))
+            else:
+                self._itens.move_to_end(chave)
+                return valor
+        self._notificar_descartes(descartados)
+        return padrao
+
+    def put(self, chave: Hashable, valor: Any) -> None:
+        expira_em = time.monotonic() + self.ttl_segundos if self.ttl_segundos is not None else None
+        descartados = []
+        with self._lock:
+            if chave in self._itens:
+                self._itens.move_to_end(chave)
+            self._itens[chave] = (valor, expira_em)
+            while len(self._itens) > self.capacidade:
+                chave_antiga, (valor_antigo, _) = self._itens.popitem(last=False)
+                descartados.append((chave_antiga, valor_antigo))
+        self._notificar_descartes(descartados)
+
+    def pop(self, chave: Hashable, padrao: Optional[Any] = None) -> Any:
+        with self._lock:
+            item = self._itens.pop(chave, None)
+        if item is None or self._expirado(item[1]):
+            return padrao
+        return item[0]
+
+    def purge_expired(self) -> int:
+        """
+        Remove todos os itens expirados e devolve quantos foram removidos.
+        """
+        if self.ttl_segundos is None:
+            return 0
+        with self._lock:
+            descartados = [(chave, valor) for chave, (valor, expira_em) in self._itens.items() if self._expirado(expira_em)]
+            for chave, _ in descartados:
+                del self._itens[chave]
+        self._notificar_descartes(descartados)
+        return len(descartados)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._itens.clear()
+
+    def __contains__(self, chave: Hashable) -> bool:
+        with self._lock:
+            item = self._itens.get(chave)
+            return item is not None and not self._expirado(item[1])
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._itens)
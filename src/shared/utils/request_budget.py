@@ -0,0 +1,214 @@
+# --- Arquivo: request_budget.py ---
+
+"""
+Orçamento por requisição (tempo de parede, chamadas à LLM e tokens de entrada) do pipeline RAG.
+"""
+
+import contextvars
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+
+def estimate_tokens(texto: str) -> int:
+    """
+    Estimativa barata de tokens (~4 caracteres por token), usada quando a API não informa o uso.
+    """
+    return max(1, len(texto) // 4) if texto else 0
+
+
+class RequestBudget:
+    """
+    Limites de uma requisição e o quanto já foi consumido.
+
+    O orçamento ativo fica em um ContextVar (como o trace do Tracer), então LLMService,
+    EmbeddingService e QdrantSearchService limitam seus timeouts ao prazo restante e registram
+    o consumo sem receber nada pela assinatura. O custo esperado de cada etapa (verificação e
+    resposta final) é uma média móvel exponencial do processo, usada por `pode_verificar` para
+    decidir se ainda cabe outra rodada de verificação antes da resposta final.
+    """
+    TEMPO_PADRAO = float(os.getenv("RAG_BUDGET_SECONDS", "90"))
+    CHAMADAS_LLM_PADRAO = int(os.getenv("RAG_BUDGET_LLM_CALLS", "12"))
+    TOKENS_ENTRADA_PADRAO = int(os.getenv("RAG_BUDGET_INPUT_TOKENS", "400000"))
+    # Teto de iterações mantido como salvaguarda; normalmente o orçamento encerra o loop antes
+    MAX_ITERACOES = int(os.getenv("RAG_MAX_ITERATIONS", "10"))
+    # Prazo mínimo dado a uma chamada mesmo com o orçamento esgotado (a resposta final sempre é gerada)
+    TIMEOUT_MINIMO = float(os.getenv("RAG_BUDGET_MIN_TIMEOUT_SECONDS", "5"))
+
+    # Custos iniciais estimados por etapa (segundos), refinados pela média móvel
+    _ALFA_EWMA = 0.3
+    _CUSTO_INICIAL: Dict[str, float] = {"verificacao": 6.0, "resposta_final": 12.0}
+    _custo_etapa: Dict[str, float] = dict(_CUSTO_INICIAL)
+    _lock_custos = threading.Lock()
+
+    _atual: contextvars.ContextVar = contextvars.ContextVar("orcamento_atual", default=None)
+
+    def __init__(
+        self,
+        tempo_segundos: Optional[float] = None,
+        max_chamadas_llm: Optional[int] = None,
+        max_tokens_entrada: Optional[int] = None
+    ):
+        self.tempo_segundos = float(tempo_segundos if tempo_segundos is not None else RequestBudget.TEMPO_PADRAO)
+        self.max_chamadas_llm = int(max_chamadas_llm if max_chamadas_llm is not None else RequestBudget.CHAMADAS_LLM_PADRAO)
+        self.max_tokens_entrada = int(max_tokens_entrada if max_tokens_entrada is not None else RequestBudget.TOKENS_ENTRADA_PADRAO)
+        self._inicio = time.monotonic()
+        self.deadline = self._inicio + self.tempo_segundos
+        self.chamadas_llm = 0
+        self.tokens_entrada = 0
+        self.tokens_saida = 0
+        self.encerrado_por: Optional[str] = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def from_dict(dados: Optional[Dict[str, Any]]) -> "RequestBudget":
+        """
+        Cria o orçamento a partir do campo `orcamento` da requisição; chaves ausentes usam o padrão.
+        Limites não numéricos, booleanos, zero ou negativos levantam ValueError.
+        """
+        dados = dados or {}
+        return RequestBudget(
+            tempo_segundos=RequestBudget._limite(dados, "tempo_segundos", float),
+            max_chamadas_llm=RequestBudget._limite(dados, "max_chamadas_llm", int),
+            max_tokens_entrada=RequestBudget._limite(dados, "max_tokens_entrada", int)
+        )
+
+    @staticmethod
+    def _limite(dados: Dict[str, Any], chave: str, tipo: type) -> Optional[Any]:
+        valor = dados.get(chave)
+        if valor is None:
+            return None
+        if isinstance(valor, bool):
+            raise ValueError(f"'{chave}' deve ser um número positivo")
+        numero = float(valor)
+        # Infinity/1e999 estourariam o int() e NaN passaria pela comparação abaixo
+        if not math.isfinite(numero):
+            raise ValueError(f"'{chave}' deve ser um número positivo")
+        convertido = tipo(numero)
+        if convertido <= 0:
+            raise ValueError(f"'{chave}' deve ser um número positivo")
+        return convertido
+
+    @staticmethod
+    def current() -> Optional["RequestBudget"]:
+        return RequestBudget._atual.get()
+
+    @contextmanager
+    def ativar(self) -> Iterator["RequestBudget"]:
+        token = RequestBudget._atual.set(self)
+        try:
+            yield self
+        finally:
+            try:
+                RequestBudget._atual.reset(token)
+            except ValueError:
+                pass
+
+    @staticmethod
+    def timeout_for(padrao: Optional[float]) -> Optional[float]:
+        """
+        Timeout de uma chamada externa: o menor entre `padrao` e o prazo restante do orçamento
+        ativo (com piso TIMEOUT_MINIMO). Sem orçamento ativo, devolve `padrao`.
+        """
+        orcamento = RequestBudget.current()
+        if orcamento is None:
+            return padrao
+        restante = max(RequestBudget.TIMEOUT_MINIMO, orcamento.restante_segundos())
+        return restante if padrao is None else min(padrao, restante)
+
+    @staticmethod
+    def record_llm_call(tokens_entrada: int, tokens_saida: int) -> None:
+        """
+        Registra uma chamada à LLM no orçamento ativo (se houver).
+        """
+        orcamento = RequestBudget.current()
+        if orcamento is None:
+            return
+        with orcamento._lock:
+            orcamento.chamadas_llm += 1
+            orcamento.tokens_entrada += tokens_entrada
+            orcamento.tokens_saida += tokens_saida
+
+    @staticmethod
+    def allows_extra_call() -> bool:
+        """
+        Indica se o orçamento ativo comporta uma chamada opcional à LLM (ex.: cópia de hedging)
+        além da chamada em andamento e da resposta final que `pode_verificar` reservou.
+        """
+        orcamento = RequestBudget.current()
+        if orcamento is None:
+            return True
+        with orcamento._lock:
+            return orcamento.max_chamadas_llm - orcamento.chamadas_llm >= 3
+
+    @staticmethod
+    def record_stage_cost(etapa: str, segundos: float) -> None:
+        with RequestBudget._lock_custos:
+            anterior = RequestBudget._custo_etapa.get(etapa, segundos)
+            RequestBudget._custo_etapa[etapa] = (1 - RequestBudget._ALFA_EWMA) * anterior + RequestBudget._ALFA_EWMA * segundos
+
+    @staticmethod
+    def expected_stage_cost(etapa: str) -> float:
+        return RequestBudget._custo_etapa.get(etapa, 0.0)
+
+    @staticmethod
+    def get_stats() -> Dict[str, Any]:
+        """
+        Custo esperado (segundos, média móvel) de cada etapa, usado nas decisões do loop.
+        """
+        with RequestBudget._lock_custos:
+            return {"custo_esperado_segundos": {etapa: round(custo, 3) for etapa, custo in RequestBudget._custo_etapa.items()}}
+
+    @staticmethod
+    def reset_stats() -> None:
+        with RequestBudget._lock_custos:
+            RequestBudget._custo_etapa = dict(RequestBudget._CUSTO_INICIAL)
+
+    def restante_segundos(self) -> float:
+        return self.deadline - time.monotonic()
+
+    def pode_verificar(self, tokens_contexto: int, chamadas_verificacao: int = 1, especulativa: bool = False) -> bool:
+        """
+        Indica se ainda cabe uma rodada de verificação e, depois dela, a resposta final.
+        Se não couber, registra o motivo em `encerrado_por`.
+
+        `chamadas_verificacao` é o pior caso da verificação (um chamado por nível da cascata).
+        Com `especulativa`, a resposta final especulativa entra como mais uma chamada (mesmo
+        cancelada, ela é cobrada) e no tempo: ela começa junto com a verificação, então a rodada
+        leva o maior dos dois, seguido de uma resposta final caso a especulação seja descartada.
+        """
+        custo_verificacao = RequestBudget.expected_stage_cost("verificacao")
+        custo_final = RequestBudget.expected_stage_cost("resposta_final")
+        custo_segundos = (max(custo_verificacao, custo_final) if especulativa else custo_verificacao) + custo_final
+        chamadas_reservadas = max(1, chamadas_verificacao) + 1 + (1 if especulativa else 0)
+        if self.restante_segundos() < custo_segundos:
+            self.encerrado_por = "tempo"
+        elif self.max_chamadas_llm - self.chamadas_llm < chamadas_reservadas:
+            self.encerrado_por = "chamadas_llm"
+        elif self.max_tokens_entrada - self.tokens_entrada < tokens_contexto:
+            self.encerrado_por = "tokens_entrada"
+        else:
+            return True
+        return False
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Bloco `orcamento` da resposta: limites, consumo e o motivo do encerramento antecipado.
+        """
+        return {
+            "limites": {
+                "tempo_segundos": self.tempo_segundos,
+                "max_chamadas_llm": self.max_chamadas_llm,
+                "max_tokens_entrada": self.max_tokens_entrada,
+            },
+            "consumido": {
+                "tempo_segundos": round(time.monotonic() - self._inicio, 3),
+                "chamadas_llm": self.chamadas_llm,
+                "tokens_entrada": self.tokens_entrada,
+                "tokens_saida": self.tokens_saida,
+            },
+            "encerrado_por": self.encerrado_por,
+        }
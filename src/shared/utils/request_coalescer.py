@@ -0,0 +1,154 @@
+# src/shared/utils/request_coalescer.py
+
+import asyncio
+import contextvars
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterator, List, Optional
+
+from shared.utils.request_budget import RequestBudget
+from shared.utils.tracing import Tracer
+
+
+class RequestCoalescer:
+    """
+    Agrupa pedidos concorrentes por chave em chamadas em lote (single-flight com micro-lotes).
+
+    Os pedidos que chegam dentro de `janela_segundos` são deduplicados e enviados juntos a
+    `executar({chave: argumento}) -> {chave: valor}`, em partes de até `max_lote` chaves. Uma
+    chave já em andamento é aguardada em vez de pedida de novo; com `lembrar`, o valor também
+    fica disponível para pedidos posteriores (o escopo do coalescer limita essa memória).
+    Chaves sem valor (ausentes no retorno ou com falha) não são lembradas.
+
+    Deve ser usado em um único loop de eventos. O lote roda num contexto limpo (sem o trace e
+    o orçamento de nenhum pedido): o prazo das chamadas é o maior restante entre os orçamentos
+    dos pedidos do lote (sem prazo se algum pedido não tiver orçamento), e cada pedido registra
+    no próprio trace o span `coalescer.<nome>` com a espera e as chaves que enviou ou compartilhou.
+    """
+
+    def __init__(
+        self,
+        executar: Callable[[Dict[Hashable, Any]], Awaitable[Dict[Hashable, Any]]],
+        janela_segundos: float = 0.005,
+        max_lote: int = 100,
+        lembrar: bool = True,
+        nome: str = "lote"
+    ):
+        self._executar = executar
+        self.nome = nome
+        self.janela_segundos = janela_segundos
+        self.max_lote = max_lote
+        self.lembrar = lembrar
+        self._futuros: Dict[Hashable, asyncio.Future] = {}
+        self._pendentes: Dict[Hashable, Any] = {}
+        # Orçamentos dos pedidos que aguardam o próximo lote
+        self._orcamentos: List[Optional[RequestBudget]] = []
+        self._despacho: Optional[asyncio.Task] = None
+        self._stats = {"pedidos": 0, "compartilhados": 0, "chamadas": 0, "chaves_enviadas": 0}
+
+    async def get_many(self, argumentos: Dict[Hashable, Any]) -> Dict[Hashable, Any]:
+        """
+        Devolve {chave: valor} para as chaves pedidas (None para as que falharam).
+        """
+        loop = asyncio.get_running_loop()
+        aguardar: Dict[Hashable, asyncio.Future] = {}
+        enviadas = compartilhadas = 0
+        for chave, argumento in argumentos.items():
+            self._stats["pedidos"] += 1
+            futuro = self._futuros.get(chave)
+            if futuro is None:
+                futuro = loop.create_future()
+                self._futuros[chave] = futuro
+                self._pendentes[chave] = argumento
+                enviadas += 1
+            else:
+                self._stats["compartilhados"] += 1
+                compartilhadas += 1
+            aguardar[chave] = futuro
+        if any(chave in self._pendentes for chave in aguardar):
+            self._orcamentos.append(RequestBudget.current())
+        if self._pendentes and self._despacho is None:
+            # Contexto vazio: o lote não herda o trace nem o orçamento de quem o disparou
+            self._despacho = loop.create_task(self._despachar(), context=contextvars.Context())
+        with Tracer.span(f"coalescer.{self.nome}", chaves=len(aguardar), enviadas=enviadas, compartilhadas=compartilhadas):
+            # shield: o cancelamento de um chamador não cancela o valor que outros aguardam
+            return {chave: await asyncio.shield(futuro) for chave, futuro in aguardar.items()}
+
+    async def _despachar(self) -> None:
+        await asyncio.sleep(self.janela_segundos)
+        lote, self._pendentes = self._pendentes, {}
+        orcamentos, self._orcamentos = self._orcamentos, []
+        self._despacho = None
+        chaves = list(lote)
+        partes = [{chave: lote[chave] for chave in chaves[inicio:inicio + self.max_lote]} for inicio in range(0, len(chaves), self.max_lote)]
+        if not orcamentos or any(orcamento is None for orcamento in orcamentos):
+            await asyncio.gather(*(self._executar_parte(parte) for parte in partes))
+            return
+        # Orçamento só de prazo, descartado ao fim: nenhum pedido paga sozinho pelas chamadas do lote
+        prazo = max(orcamento.restante_segundos() for orcamento in orcamentos)
+        with RequestBudget(tempo_segundos=prazo).ativar():
+            await asyncio.gather(*(self._executar_parte(parte) for parte in partes))
+
+    async def _executar_parte(self, parte: Dict[Hashable, Any]) -> None:
+        self._stats["chamadas"] += 1
+        self._stats["chaves_enviadas"] += len(parte)
+        try:
+            valores = await self._executar(parte) or {}
+            falha = None
+        except Exception as e:
+            valores, falha = {}, e
+        for chave in parte:
+            futuro = self._futuros[chave]
+            valor = valores.get(chave)
+            if valor is None or not self.lembrar:
+                self._futuros.pop(chave, None)
+            if futuro.done():
+                continue
+            if falha is not None:
+                futuro.set_exception(falha)
+            else:
+                futuro.set_result(valor)
+
+    def get_stats(self) -> Dict[str, int]:
+        return dict(self._stats)
+
+
+class CoalescingScope:
+    """
+    Escopo (por contexto, como o RequestBudget) dos coalescers compartilhados por um conjunto
+    de requisições, ex.: os prompts de um lote de /sql-gen/batch. Fora de um escopo ativo as
+    chamadas seguem individuais.
+    """
+    _atual: "contextvars.ContextVar[Optional[CoalescingScope]]" = contextvars.ContextVar("coalescing_scope", default=None)
+
+    def __init__(self, janela_segundos: float = 0.005):
+        self.janela_segundos = janela_segundos
+        self._coalescers: Dict[str, RequestCoalescer] = {}
+
+    @staticmethod
+    def current() -> Optional["CoalescingScope"]:
+        return CoalescingScope._atual.get()
+
+    @contextmanager
+    def ativar(self) -> Iterator["CoalescingScope"]:
+        token = CoalescingScope._atual.set(self)
+        try:
+            yield self
+        finally:
+            try:
+                CoalescingScope._atual.reset(token)
+            except ValueError:
+                pass
+
+    def coalescer(self, nome: str, executar: Callable[[Dict[Hashable, Any]], Awaitable[Dict[Hashable, Any]]], **opcoes: Any) -> RequestCoalescer:
+        """
+        Coalescer `nome` do escopo, criado na primeira chamada com `executar` e `opcoes`
+        (a janela padrão é a do escopo).
+        """
+        if nome not in self._coalescers:
+            opcoes.setdefault("janela_segundos", self.janela_segundos)
+            opcoes.setdefault("nome", nome)
+            self._coalescers[nome] = RequestCoalescer(executar, **opcoes)
+        return self._coalescers[nome]
+
+    def get_stats(self) -> Dict[str, Dict[str, int]]:
+        return {nome: coalescer.get_stats() for nome, coalescer in self._coalescers.items()}
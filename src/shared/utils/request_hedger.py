@@ -0,0 +1,149 @@
+# src/shared/utils/request_hedger.py
+
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class RequestHedger:
+    """
+    Requisições "hedged": se a chamada não respondeu até o percentil observado (p90 por
+    padrão) da sua chave, dispara uma cópia e fica com a que terminar primeiro (a outra é
+    cancelada). Uma tentativa que falha não encerra a chamada enquanto a outra estiver em andamento.
+
+    As latências são mantidas por chave (ex.: modelo e etapa) em uma janela das últimas
+    chamadas; sem MIN_AMOSTRAS não há cópia. As cópias são limitadas por um orçamento: cada
+    chamada acumula `fracao_orcamento` de crédito (até `credito_maximo`) e cada cópia gasta 1,
+    então no longo prazo no máximo essa fração das chamadas é duplicada.
+
+    Quem chama pode vetar a cópia no momento do disparo (`pode_copiar`, ex.: limite de taxa sem
+    vez livre) e é avisado de cada tentativa descartada (`ao_descartar`), que também foi enviada
+    e precisa ser contabilizada.
+
+    Deve ser usado em um único loop de eventos (o do AsyncRunner).
+    """
+    PERCENTIL = float(os.getenv("HEDGE_PERCENTILE", "90"))
+    FRACAO_ORCAMENTO = float(os.getenv("HEDGE_BUDGET_RATIO", "0.05"))
+    MIN_AMOSTRAS = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+
+    def __init__(
+        self,
+        percentil: Optional[float] = None,
+        fracao_orcamento: Optional[float] = None,
+        min_amostras: Optional[int] = None,
+        janela: int = 200,
+        credito_maximo: float = 10.0,
+        atraso_minimo_segundos: float = 0.05
+    ):
+        self.percentil = RequestHedger.PERCENTIL if percentil is None else percentil
+        self.fracao_orcamento = RequestHedger.FRACAO_ORCAMENTO if fracao_orcamento is None else fracao_orcamento
+        self.min_amostras = RequestHedger.MIN_AMOSTRAS if min_amostras is None else min_amostras
+        self.janela = janela
+        self.credito_maximo = credito_maximo
+        self.atraso_minimo_segundos = atraso_minimo_segundos
+        self._lock = threading.Lock()
+        self._latencias: Dict[str, Deque[float]] = {}
+        self._credito = 0.0
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def _contadores(self, chave: str) -> Dict[str, int]:
+        return self._stats.setdefault(chave, {"chamadas": 0, "copias": 0, "copias_vencedoras": 0, "negadas_orcamento": 0, "negadas_chamador": 0})
+
+    def limit_for(self, chave: str) -> Optional[float]:
+        """
+        Espera (segundos) antes de disparar a cópia, ou None com poucas amostras.
+        """
+        with self._lock:
+            latencias = self._latencias.get(chave)
+            if latencias is None or len(latencias) < self.min_amostras:
+                return None
+            ordenadas = sorted(latencias)
+        posicao = min(len(ordenadas) - 1, int(len(ordenadas) * self.percentil / 100))
+        return max(self.atraso_minimo_segundos, ordenadas[posicao])
+
+    def record_latency(self, chave: str, segundos: float) -> None:
+        with self._lock:
+            self._latencias.setdefault(chave, deque(maxlen=self.janela)).append(segundos)
+
+    def _iniciar_chamada(self, chave: str) -> None:
+        with self._lock:
+            self._contadores(chave)["chamadas"] += 1
+            self._credito = min(self.credito_maximo, self._credito + self.fracao_orcamento)
+
+    def _consumir_credito(self, chave: str) -> bool:
+        with self._lock:
+            if self._credito < 1.0:
+                self._contadores(chave)["negadas_orcamento"] += 1
+                return False
+            self._credito -= 1.0
+            self._contadores(chave)["copias"] += 1
+            return True
+
+    def _copia_vetada(self, chave: str, pode_copiar: Optional[Callable[[], bool]]) -> bool:
+        if pode_copiar is None or pode_copiar():
+            return False
+        with self._lock:
+            self._contadores(chave)["negadas_chamador"] += 1
+        return True
+
+    async def run(
+        self,
+        chave: str,
+        fabrica: Callable[[], Awaitable[T]],
+        pode_copiar: Optional[Callable[[], bool]] = None,
+        ao_descartar: Optional[Callable[[], None]] = None
+    ) -> T:
+        """
+        Executa `fabrica()` (chamada de novo para a cópia) com hedging pela latência de `chave`.
+        `pode_copiar()` é consultado antes de gastar crédito com uma cópia; `ao_descartar()` é
+        chamado para cada tentativa cujo resultado não foi devolvido (cancelada ou com falha).
+        """
+        self._iniciar_chamada(chave)
+        limite = self.limit_for(chave)
+        inicio = time.monotonic()
+        primaria = asyncio.ensure_future(fabrica())
+        tentativas = [primaria]
+        devolvida = primaria
+        try:
+            concluidas, _ = await asyncio.wait(tentativas, timeout=limite)
+            if concluidas or self._copia_vetada(chave, pode_copiar) or not self._consumir_credito(chave):
+                resultado = await primaria
+                self.record_latency(chave, time.monotonic() - inicio)
+                return resultado
+
+            inicio_copia = time.monotonic()
+            tentativas.append(asyncio.ensure_future(fabrica()))
+            pendentes = set(tentativas)
+            while pendentes:
+                concluidas, pendentes = await asyncio.wait(pendentes, return_when=asyncio.FIRST_COMPLETED)
+                vencedora = next((t for t in tentativas if t in concluidas and not t.cancelled() and t.exception() is None), None)
+                if vencedora is not None:
+                    devolvida = vencedora
+                    copia_venceu = vencedora is not primaria
+                    self.record_latency(chave, time.monotonic() - (inicio_copia if copia_venceu else inicio))
+                    if copia_venceu:
+                        with self._lock:
+                            self._contadores(chave)["copias_vencedoras"] += 1
+                    return vencedora.result()
+            # As duas falharam: propaga o erro da primária
+            return primaria.result()
+        finally:
+            for tentativa in tentativas:
+                if not tentativa.done():
+                    tentativa.cancel()
+                if tentativa is not devolvida and ao_descartar is not None:
+                    ao_descartar()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            chaves = {chave: dict(contadores) for chave, contadores in self._stats.items()}
+            credito = self._credito
+        for chave, contadores in chaves.items():
+            limite = self.limit_for(chave)
+            contadores["limite_ms"] = round(limite * 1000, 3) if limite is not None else None
+        return {"percentil": self.percentil, "fracao_orcamento": self.fracao_orcamento, "credito": round(credito, 3), "chaves": chaves}
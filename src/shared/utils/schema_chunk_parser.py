@@ -0,0 +1,88 @@
+# --- Arquivo: schema_chunk_parser.py ---
+
+import re
+from typing import List, NamedTuple, Optional
+
+# Chunks de schema: 'schema;tabela;desc;col1;col2;PK:col;FK:def1;FK:def2;IDX:idx'
+# FK de saída:   'FK:id_tipo>el_cpe_base.ct_documento_tipo(id)[DIR:OUTGOING]'
+# FK de entrada: 'FK:id<el_cpe_ex.ct_liquidacao(id_documento)[DIR:INCOMING]'
+_FK_PATTERN = re.compile(r"^([^<>]*)([<>])(\w[\w\.]*)\(([^)]*)\)(?:\[DIR:(\w+)\])?")
+
+
+class ForeignKey(NamedTuple):
+    """
+    Uma definição de FK de um chunk. `direcao` é 'OUTGOING' (a tabela do chunk referencia
+    `tabela_relacionada`) ou 'INCOMING' (`tabela_relacionada` referencia a tabela do chunk).
+    """
+    coluna_local: str
+    tabela_relacionada: str
+    coluna_relacionada: str
+    direcao: str
+
+
+def parse_foreign_key(definicao: str) -> Optional[ForeignKey]:
+    """
+    Interpreta uma parte 'FK:...' (com ou sem o prefixo). Retorna None se o formato for inválido.
+    """
+    definicao = definicao.strip()
+    if definicao.startswith("FK:"):
+        definicao = definicao[len("FK:"):]
+    match = _FK_PATTERN.match(definicao)
+    if not match:
+        return None
+    coluna_local, seta, tabela, coluna_relacionada, direcao = match.groups()
+    # Sem o sufixo [DIR:...], a seta define a direção
+    direcao = (direcao or ("OUTGOING" if seta == ">" else "INCOMING")).upper()
+    return ForeignKey(coluna_local.strip(), tabela, coluna_relacionada.strip(), direcao)
+
+
+def extract_foreign_keys(chunk_content: str) -> List[ForeignKey]:
+    """
+    Extrai todas as FKs válidas de um chunk de schema, na ordem em que aparecem.
+    """
+    foreign_keys = []
+    for parte in chunk_content.strip().split(";"):
+        parte = parte.strip()
+        if parte.startswith("FK:"):
+            foreign_key = parse_foreign_key(parte)
+            if foreign_key is not None:
+                foreign_keys.append(foreign_key)
+    return foreign_keys
+
+
+class ParsedChunk(NamedTuple):
+    """
+    Um chunk de schema separado em partes: colunas sem prefixo, PK, FKs e índices.
+    """
+    schema: str
+    tabela: str
+    descricao: str
+    colunas: List[str]
+    chave_primaria: List[str]
+    foreign_keys: List[ForeignKey]
+    indices: List[str]
+
+
+def parse_chunk(chunk_content: str) -> Optional[ParsedChunk]:
+    """
+    Interpreta um chunk 'schema;tabela;desc;col...;PK:..;FK:..;IDX:..'.
+    Retorna None se o chunk não tiver ao menos schema, tabela e descrição.
+    """
+    partes = [parte.strip() for parte in chunk_content.strip().split(";")]
+    if len(partes) < 3 or not partes[0] or not partes[1]:
+        return None
+    colunas, chave_primaria, foreign_keys, indices = [], [], [], []
+    for parte in partes[3:]:
+        if not parte:
+            continue
+        if parte.startswith("PK:"):
+            chave_primaria.extend(c.strip() for c in parte[len("PK:"):].split(",") if c.strip())
+        elif parte.startswith("FK:"):
+            foreign_key = parse_foreign_key(parte)
+            if foreign_key is not None:
+                foreign_keys.append(foreign_key)
+        elif parte.startswith("IDX:"):
+            indices.append(parte[len("IDX:"):].strip())
+        else:
+            colunas.append(parte)
+    return ParsedChunk(partes[0], partes[1], partes[2], colunas, chave_primaria, foreign_keys, indices)
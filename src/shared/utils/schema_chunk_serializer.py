@@ -0,0 +1,64 @@
+# --- Arquivo: schema_chunk_serializer.py ---
+
+from typing import Dict, List, Optional
+
+from shared.utils.schema_chunk_parser import ForeignKey, parse_chunk
+
+# Explicação do formato, incluída uma vez por prompt antes dos chunks
+LEGENDA_FORMATO_COMPACTO = (
+    "Formato das tabelas: 'schema.tabela (similaridade): descrição', seguido das linhas "
+    "'colunas:' (todas as colunas), 'pk:' (chave primária), "
+    "'fk: coluna>tabela.coluna' (esta tabela referencia a outra), "
+    "'ref: coluna<tabela.coluna' (a outra tabela referencia esta pela coluna indicada) e 'idx:' (índices). "
+    "Tabelas sem schema em 'fk'/'ref' estão no mesmo schema da tabela do bloco.\n"
+)
+
+
+def _tabela_relativa(tabela_relacionada: str, schema: str) -> str:
+    # 'el_compras.cp_contrato' dentro de el_compras vira 'cp_contrato'
+    prefixo = f"{schema}."
+    return tabela_relacionada[len(prefixo):] if tabela_relacionada.startswith(prefixo) else tabela_relacionada
+
+
+def _agrupar_entrada(foreign_keys: List[ForeignKey], schema: str) -> List[str]:
+    """
+    Agrupa as FKs de entrada pela coluna local: 'id<t1.id_x,t2.id_y'.
+    """
+    por_coluna: Dict[str, List[str]] = {}
+    for foreign_key in foreign_keys:
+        referencia = f"{_tabela_relativa(foreign_key.tabela_relacionada, schema)}.{foreign_key.coluna_relacionada}"
+        por_coluna.setdefault(foreign_key.coluna_local, []).append(referencia)
+    return [f"{coluna}<{','.join(referencias)}" for coluna, referencias in por_coluna.items()]
+
+
+def compact_schema(chunk_content: str, nome: Optional[str] = None, anotacao: str = "") -> str:
+    """
+    Converte um chunk bruto para o formato compacto (ver LEGENDA_FORMATO_COMPACTO):
+    uma linha de cabeçalho e uma linha por tipo de informação, sem o schema repetido nas FKs
+    do mesmo schema e com as FKs de entrada agrupadas por coluna.
+    Chunks fora do formato esperado são devolvidos sem alteração.
+    """
+    chunk = parse_chunk(chunk_content)
+    if chunk is None:
+        return chunk_content
+
+    cabecalho = nome or f"{chunk.schema}.{chunk.tabela}"
+    if anotacao:
+        cabecalho = f"{cabecalho} {anotacao}"
+    linhas = [f"{cabecalho}: {chunk.descricao}" if chunk.descricao else cabecalho]
+    if chunk.colunas:
+        linhas.append(f"colunas: {','.join(chunk.colunas)}")
+    if chunk.chave_primaria:
+        linhas.append(f"pk: {','.join(chunk.chave_primaria)}")
+
+    saida = [fk for fk in chunk.foreign_keys if fk.direcao != "INCOMING"]
+    entrada = [fk for fk in chunk.foreign_keys if fk.direcao == "INCOMING"]
+    if saida:
+        linhas.append("fk: " + " ".join(
+            f"{fk.coluna_local}>{_tabela_relativa(fk.tabela_relacionada, chunk.schema)}.{fk.coluna_relacionada}" for fk in saida
+        ))
+    if entrada:
+        linhas.append("ref: " + " ".join(_agrupar_entrada(entrada, chunk.schema)))
+    if chunk.indices:
+        linhas.append(f"idx: {' '.join(chunk.indices)}")
+    return "\n".join(linhas) + "\n"
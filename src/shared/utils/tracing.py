@@ -0,0 +1,318 @@
+# --- Arquivo: tracing.py ---
+
+"""
+Spans leves de latência por etapa do pipeline, propagados por contextvars.
+
+O trace ativo e o span corrente vivem em ContextVars, então atravessam `await`,
+`asyncio.gather` e `asyncio.to_thread` sem precisar passar nada pelas assinaturas.
+Fora de um trace (`Tracer.trace`), `Tracer.span` não faz nada além de um lookup.
+"""
+
+import atexit
+import contextvars
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from config.core.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+
+class Span:
+    """
+    Um intervalo de tempo com nome, pai e atributos (nível do modelo, tamanhos etc.).
+    """
+    __slots__ = ("nome", "trace_id", "span_id", "parent_id", "inicio_unix_ns", "_inicio_perf_ns", "duracao_ns", "atributos", "erro")
+
+    def __init__(self, nome: str, trace_id: str, parent_id: Optional[str], atributos: Dict[str, Any]):
+        self.nome = nome
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.inicio_unix_ns = time.time_ns()
+        self._inicio_perf_ns = time.perf_counter_ns()
+        self.duracao_ns = 0
+        self.atributos = atributos
+        self.erro: Optional[str] = None
+
+    def set(self, **atributos: Any) -> "Span":
+        self.atributos.update(atributos)
+        return self
+
+    def _finalizar(self) -> None:
+        self.duracao_ns = time.perf_counter_ns() - self._inicio_perf_ns
+
+    @property
+    def duracao_ms(self) -> float:
+        return self.duracao_ns / 1e6
+
+    def to_dict(self, origem_unix_ns: int) -> Dict[str, Any]:
+        resultado = {
+            "nome": self.nome,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "inicio_ms": round((self.inicio_unix_ns - origem_unix_ns) / 1e6, 3),
+            "duracao_ms": round(self.duracao_ms, 3),
+            "atributos": self.atributos,
+        }
+        if self.erro:
+            resultado["erro"] = self.erro
+        return resultado
+
+
+class _SpanInativo:
+    """
+    Devolvido por `Tracer.span` fora de um trace: aceita `set` e não registra nada.
+    """
+    __slots__ = ()
+
+    def set(self, **atributos: Any) -> "_SpanInativo":
+        return self
+
+
+_SPAN_INATIVO = _SpanInativo()
+
+
+class Trace:
+    """
+    Conjunto de spans de uma requisição. Spans podem terminar em threads diferentes (to_thread).
+    """
+
+    def __init__(self, nome: str):
+        self.nome = nome
+        self.trace_id = uuid.uuid4().hex
+        self.inicio_unix_ns = time.time_ns()
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def adicionar(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    def resumo(self) -> Dict[str, Any]:
+        """
+        Bloco `timings` da resposta: spans em ordem de início e o tempo total por nome de etapa.
+        """
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s.inicio_unix_ns)
+        raiz = next((s for s in spans if s.parent_id is None), None)
+        por_etapa: Dict[str, float] = {}
+        for span in spans:
+            por_etapa[span.nome] = round(por_etapa.get(span.nome, 0.0) + span.duracao_ms, 3)
+        return {
+            "trace_id": self.trace_id,
+            "total_ms": round(raiz.duracao_ms, 3) if raiz else None,
+            "por_etapa": por_etapa,
+            "spans": [s.to_dict(self.inicio_unix_ns) for s in spans],
+        }
+
+
+class Tracer:
+    """
+    Ponto de entrada da instrumentação.
+
+    Uso:
+        with Tracer.trace("rag.sql_gen") as trace:
+            with Tracer.span("llm.gerar", nivel_modelo="medio") as span:
+                ...
+                span.set(caracteres_resposta=len(texto))
+        trace.resumo()
+
+    Ao fim de cada trace os spans são gravados em TRACE_LOG_FILE como uma linha OTLP/JSON
+    (ExportTraceServiceRequest), formato lido pelo receiver `otlpjsonfile` do OpenTelemetry
+    Collector. Defina TRACE_LOG_FILE vazio para não gravar e TRACE_ENABLED=0 para desligar.
+
+    A gravação não acontece no fim do trace (que costuma estar no loop do AsyncRunner): o
+    trace entra em uma fila limitada (TRACE_QUEUE_SIZE) e uma thread própria converte e grava
+    em lotes. Com a fila cheia o trace é descartado e contado em `get_stats()`.
+    """
+    ENABLED = os.getenv("TRACE_ENABLED", "1") != "0"
+    LOG_FILE = os.getenv("TRACE_LOG_FILE", os.path.join("logs", "trace.jsonl"))
+    SERVICE_NAME = os.getenv("TRACE_SERVICE_NAME", "sql-gen")
+    TAMANHO_FILA = int(os.getenv("TRACE_QUEUE_SIZE", "1000"))
+
+    _trace_atual: contextvars.ContextVar = contextvars.ContextVar("trace_atual", default=None)
+    _span_atual: contextvars.ContextVar = contextvars.ContextVar("span_atual", default=None)
+    _atributos_contexto: contextvars.ContextVar = contextvars.ContextVar("atributos_contexto", default={})
+    _fila: "queue.Queue" = queue.Queue(maxsize=TAMANHO_FILA)
+    _thread_gravacao: Optional[threading.Thread] = None
+    _lock_thread = threading.Lock()
+    _descartados = 0
+
+    @staticmethod
+    def current_trace() -> Optional[Trace]:
+        return Tracer._trace_atual.get()
+
+    @staticmethod
+    @contextmanager
+    def trace(nome: str, **atributos: Any) -> Iterator[Optional[Trace]]:
+        """
+        Abre um trace com um span raiz `nome`. Devolve None (e não instrumenta nada) se desligado.
+        """
+        if not Tracer.ENABLED:
+            yield None
+            return
+
+        trace = Trace(nome)
+        token_trace = Tracer._trace_atual.set(trace)
+        token_span = Tracer._span_atual.set(None)
+        token_atributos = Tracer._atributos_contexto.set({})
+        try:
+            with Tracer.span(nome, **atributos):
+                yield trace
+        finally:
+            Tracer._resetar(Tracer._atributos_contexto, token_atributos)
+            Tracer._resetar(Tracer._span_atual, token_span)
+            Tracer._resetar(Tracer._trace_atual, token_trace)
+            Tracer._exportar(trace)
+
+    @staticmethod
+    def set_context(**atributos: Any) -> None:
+        """
+        Atributos gravados em todos os spans abertos daqui em diante no contexto atual
+        (e nas tarefas/threads criadas a partir dele), ex.: a iteração do loop de verificação.
+        """
+        if Tracer._trace_atual.get() is not None:
+            Tracer._atributos_contexto.set({**Tracer._atributos_contexto.get(), **atributos})
+
+    @staticmethod
+    @contextmanager
+    def span(nome: str, **atributos: Any) -> Iterator[Any]:
+        """
+        Mede o bloco como filho do span corrente. Exceções são registradas no span e propagadas.
+        """
+        trace: Optional[Trace] = Tracer._trace_atual.get()
+        if trace is None:
+            yield _SPAN_INATIVO
+            return
+
+        pai: Optional[Span] = Tracer._span_atual.get()
+        span = Span(nome, trace.trace_id, pai.span_id if pai else None, {**Tracer._atributos_contexto.get(), **atributos})
+        token = Tracer._span_atual.set(span)
+        try:
+            yield span
+        except Exception as e:
+            span.erro = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            span._finalizar()
+            Tracer._resetar(Tracer._span_atual, token)
+            trace.adicionar(span)
+
+    @staticmethod
+    def _resetar(variavel: contextvars.ContextVar, token: contextvars.Token) -> None:
+        try:
+            variavel.reset(token)
+        except ValueError:
+            # Gerador assíncrono finalizado em outro contexto (ex.: cliente SSE desconectou)
+            pass
+
+    @staticmethod
+    def _valor_otlp(valor: Any) -> Dict[str, Any]:
+        if isinstance(valor, bool):
+            return {"boolValue": valor}
+        if isinstance(valor, int):
+            return {"intValue": str(valor)}
+        if isinstance(valor, float):
+            return {"doubleValue": valor}
+        if isinstance(valor, str):
+            return {"stringValue": valor}
+        return {"stringValue": json.dumps(valor, ensure_ascii=False, default=str)}
+
+    @staticmethod
+    def to_otlp(trace: Trace) -> Dict[str, Any]:
+        """
+        Converte o trace para o JSON do OTLP (um ExportTraceServiceRequest).
+        """
+        with trace._lock:
+            spans = list(trace.spans)
+        spans_otlp = []
+        for span in spans:
+            span_otlp = {
+                "traceId": span.trace_id,
+                "spanId": span.span_id,
+                "name": span.nome,
+                "kind": 1,  # SPAN_KIND_INTERNAL
+                "startTimeUnixNano": str(span.inicio_unix_ns),
+                "endTimeUnixNano": str(span.inicio_unix_ns + span.duracao_ns),
+                "attributes": [{"key": chave, "value": Tracer._valor_otlp(valor)} for chave, valor in span.atributos.items()],
+                "status": {"code": 2, "message": span.erro} if span.erro else {"code": 1},
+            }
+            if span.parent_id:
+                span_otlp["parentSpanId"] = span.parent_id
+            spans_otlp.append(span_otlp)
+        return {"resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": Tracer.SERVICE_NAME}}]},
+            "scopeSpans": [{"scope": {"name": "sql-gen.rag"}, "spans": spans_otlp}],
+        }]}
+
+    @staticmethod
+    def _exportar(trace: Trace) -> None:
+        caminho = Tracer.LOG_FILE
+        if not caminho:
+            return
+        Tracer._iniciar_gravacao()
+        try:
+            Tracer._fila.put_nowait((caminho, trace))
+        except queue.Full:
+            Tracer._descartados += 1
+
+    @staticmethod
+    def _iniciar_gravacao() -> None:
+        if Tracer._thread_gravacao is not None:
+            return
+        with Tracer._lock_thread:
+            if Tracer._thread_gravacao is None:
+                thread = threading.Thread(target=Tracer._gravar, name="trace-export", daemon=True)
+                thread.start()
+                Tracer._thread_gravacao = thread
+                atexit.register(Tracer.flush)
+
+    @staticmethod
+    def _gravar() -> None:
+        while True:
+            lote = [Tracer._fila.get()]
+            while True:
+                try:
+                    lote.append(Tracer._fila.get_nowait())
+                except queue.Empty:
+                    break
+            por_arquivo: Dict[str, List[str]] = {}
+            for caminho, trace in lote:
+                try:
+                    por_arquivo.setdefault(caminho, []).append(json.dumps(Tracer.to_otlp(trace), ensure_ascii=False, default=str))
+                except Exception as e:
+                    logger.warning(f"\n[Tracer] Falha ao converter o trace {trace.trace_id}: {e}")
+            for caminho, linhas in por_arquivo.items():
+                try:
+                    diretorio = os.path.dirname(caminho)
+                    if diretorio:
+                        os.makedirs(diretorio, exist_ok=True)
+                    with open(caminho, "a", encoding="utf-8") as arquivo:
+                        arquivo.write("".join(linha + "\n" for linha in linhas))
+                except Exception as e:
+                    logger.warning(f"\n[Tracer] Falha ao gravar {len(linhas)} traces em '{caminho}': {e}")
+            for _ in lote:
+                Tracer._fila.task_done()
+
+    @staticmethod
+    def flush(timeout: float = 5.0) -> bool:
+        """
+        Aguarda a gravação dos traces já enfileirados (testes e encerramento). False se o prazo acabar.
+        """
+        limite = time.monotonic() + timeout
+        while Tracer._fila.unfinished_tasks:
+            if time.monotonic() >= limite:
+                return False
+            time.sleep(0.01)
+        return True
+
+    @staticmethod
+    def get_stats() -> Dict[str, int]:
+        return {"fila": Tracer._fila.qsize(), "descartados": Tracer._descartados}
@@ -0,0 +1,69 @@
+"""
+Testes da cascata de modelos na extração e na verificação.
+"""
+
+import os
+import sys
+import unittest
+from unittest.mock import AsyncMock, patch
+
+# Adiciona o diretório 'src' ao PYTHONPATH, como no start_backend
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../../src')))
+
+from application.services.maestro.extraction_manager import ExtractionManager
+from infrastructure.external_services.llm_service import LLMService
+from shared.utils.async_runner import AsyncRunner
+
+CHUNKS = [{"query_table": "empenho", "matches": [{"table_name": "el_cpe_ex.ct_empenho", "content": "el_cpe_ex;ct_empenho;Empenhos;id;PK:id", "similarity_percentage": 90.0}]}]
+
+
+class TesteCascataModelos(unittest.TestCase):
+
+    def setUp(self):
+        LLMService.reset_cascade_stats()
+
+    def tearDown(self):
+        LLMService.reset_cascade_stats()
+
+    def test_niveis_da_cascata(self):
+        self.assertEqual(LLMService.niveis_cascata("extracao", "medio"), ["fraco", "medio"])
+        self.assertEqual(LLMService.niveis_cascata("verificacao", "forte"), ["fraco", "medio", "forte"])
+        self.assertEqual(LLMService.niveis_cascata("resposta_final", "forte"), ["forte"])
+        with patch.object(LLMService, "CASCATA_ENABLED", False):
+            self.assertEqual(LLMService.niveis_cascata("extracao", "medio"), ["medio"])
+
+    def test_extracao_aceita_no_nivel_fraco(self):
+        with patch.object(LLMService, "processar_prompt_async", AsyncMock(return_value="'el_cpe_ex','ct_empenho',' '")) as llm:
+            resultado = AsyncRunner.run(ExtractionManager.extract_entities_from_prompt_async("empenhos", nivel_modelo="medio"))
+        self.assertEqual(resultado["tabelas"], ["ct_empenho"])
+        self.assertEqual(llm.await_args.kwargs["nivel_modelo"], "fraco")
+        stats = LLMService.get_cascade_stats()["etapas"]["extracao"]
+        self.assertEqual((stats["chamadas"], stats["taxa_escalonamento"]), (1, 0.0))
+        self.assertEqual(stats["atendidas_por_nivel"], {"fraco": 1})
+
+    def test_sobe_de_nivel_em_falha_de_formato_e_baixa_confianca(self):
+        extracao = ["Claro! As tabelas são ct_empenho.", "'el_cpe_ex','ct_empenho',' '"]
+        verificacao = ["1001;ct_empenho;;faltam dados", "2002"]
+        with patch.object(LLMService, "processar_prompt_async", AsyncMock(side_effect=extracao + verificacao)) as llm:
+            resultado = AsyncRunner.run(ExtractionManager.extract_entities_from_prompt_async("empenhos", nivel_modelo="medio"))
+            verificado = AsyncRunner.run(ExtractionManager.verify_data_sufficiency_async("empenhos", CHUNKS))
+
+        self.assertEqual(resultado["tabelas"], ["ct_empenho"])
+        self.assertEqual(verificado["codigo"], "2002")
+        self.assertEqual([c.kwargs["nivel_modelo"] for c in llm.await_args_list], ["fraco", "medio", "fraco", "medio"])
+        self.assertEqual([c.kwargs["etapa"] for c in llm.await_args_list], ["extracao", "extracao", "verificacao", "verificacao"])
+        etapas = LLMService.get_cascade_stats()["etapas"]
+        self.assertEqual(etapas["extracao"]["motivos"], {"formato": 1})
+        self.assertEqual(etapas["verificacao"]["motivos"], {"baixa_confianca": 1})
+        self.assertEqual(etapas["verificacao"]["taxa_escalonamento"], 1.0)
+        self.assertEqual(set(etapas["verificacao"]["latencia_media_ms_por_nivel"]), {"fraco", "medio"})
+
+    def test_ultimo_nivel_e_devolvido_mesmo_rejeitado(self):
+        with patch.object(LLMService, "processar_prompt_async", AsyncMock(side_effect=["???", "ainda inválido"])):
+            resultado = AsyncRunner.run(ExtractionManager.verify_data_sufficiency_async("empenhos", CHUNKS))
+        self.assertEqual(resultado["codigo"], "erro")
+        self.assertEqual(LLMService.get_cascade_stats()["etapas"]["verificacao"]["atendidas_por_nivel"], {"medio": 1})
+
+
+if __name__ == '__main__':
+    unittest.main()
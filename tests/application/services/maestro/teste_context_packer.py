@@ -0,0 +1,94 @@
+"""
+Testes para o empacotamento de chunks nos prompts de verificação e resposta final.
+"""
+
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+# Adiciona o diretório 'src' ao PYTHONPATH, como no start_backend
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../../src')))
+
+from application.services.maestro.context_packer import ContextPacker, NIVEL_FKS_INTERNAS, NIVEL_MINIMO, NIVEL_SEM_INDICES
+from application.services.maestro.extraction_manager import ExtractionManager
+from shared.utils.request_budget import estimate_tokens
+from shared.utils.schema_chunk_serializer import LEGENDA_FORMATO_COMPACTO
+
+CONTRATO = "el_compras;cp_contrato;Contratos;id;nr_contrato;dt_assinatura;PK:id;FK:id<el_compras.cp_contrato_item(id_contrato)[DIR:INCOMING];FK:id<el_compras.cp_aditivo(id_contrato)[DIR:INCOMING];IDX:ix_contrato_nr(nr_contrato)"
+ITEM = "el_compras;cp_contrato_item;Itens;id;id_contrato;vl_item;PK:id;FK:id_contrato>el_compras.cp_contrato(id)[DIR:OUTGOING];IDX:ix_item_contrato(id_contrato);IDX:ix_item_valor(vl_item)"
+EMPENHO = "el_cpe_ex;ct_empenho;Empenhos;id;vl_empenho;PK:id;IDX:ix_empenho_valor(vl_empenho)"
+
+
+def match(nome, conteudo, similaridade):
+    return {"table_name": nome, "content": conteudo, "similarity_score": similaridade, "similarity_percentage": similaridade * 100}
+
+
+class TesteContextPacker(unittest.TestCase):
+
+    def setUp(self):
+        self.resultados = [
+            {"query_table": "contrato", "matches": [match("el_compras.cp_contrato", CONTRATO, 0.80), match("el_cpe_ex.ct_empenho", EMPENHO, 0.85)]},
+            {"query_table": "item", "matches": [match("el_compras.cp_contrato_item", ITEM, 0.70), match("el_compras.cp_contrato", CONTRATO, 0.90)]},
+        ]
+
+    def test_deduplica_e_ordena_por_similaridade_e_centralidade(self):
+        contexto = ContextPacker.pack(self.resultados, 100000)
+        self.assertEqual(contexto["tabelas"][0], "el_compras.cp_contrato")
+        self.assertEqual(contexto["texto"].count("el_compras.cp_contrato ("), 1)
+        # Maior similaridade entre as duplicatas é a que vale
+        self.assertIn("el_compras.cp_contrato (90%): Contratos", contexto["texto"])
+        # cp_contrato_item (0.70, ligada por FK) passa à frente de ct_empenho (0.85, isolada)
+        self.assertEqual(contexto["tabelas"], ["el_compras.cp_contrato", "el_compras.cp_contrato_item", "el_cpe_ex.ct_empenho"])
+        self.assertEqual((contexto["compactadas"], contexto["omitidas"]), ([], []))
+
+    def test_niveis_de_compactacao(self):
+        contexto = {"el_compras.cp_contrato", "el_compras.cp_contrato_item"}
+        sem_indices = ContextPacker.compact_chunk(CONTRATO, NIVEL_SEM_INDICES, contexto)
+        self.assertNotIn("IDX:", sem_indices)
+        self.assertIn("cp_aditivo", sem_indices)
+        fks_internas = ContextPacker.compact_chunk(CONTRATO, NIVEL_FKS_INTERNAS, contexto)
+        self.assertNotIn("cp_aditivo", fks_internas)
+        self.assertIn("cp_contrato_item", fks_internas)
+        self.assertEqual(
+            ContextPacker.compact_chunk(CONTRATO, NIVEL_MINIMO, contexto),
+            "el_compras;cp_contrato;Contratos;PK:id;FK:id<el_compras.cp_contrato_item(id_contrato)[DIR:INCOMING]"
+        )
+
+    def test_orcamento_compacta_os_menos_valiosos_primeiro_e_omite_em_ultimo_caso(self):
+        completo = ContextPacker.pack(self.resultados, 100000)["tokens_estimados"]
+        apertado = ContextPacker.pack(self.resultados, completo - 5)
+        self.assertLessEqual(apertado["tokens_estimados"], completo - 5)
+        self.assertEqual(apertado["compactadas"], ["el_cpe_ex.ct_empenho"])
+        self.assertNotIn("ix_empenho_valor", apertado["texto"])
+        self.assertIn("ix_contrato_nr", apertado["texto"])
+
+        limite = estimate_tokens(LEGENDA_FORMATO_COMPACTO) + 40
+        minimo = ContextPacker.pack(self.resultados, limite)
+        self.assertEqual(minimo["tabelas"][0], "el_compras.cp_contrato")
+        self.assertTrue(minimo["omitidas"])
+        self.assertLessEqual(minimo["tokens_estimados"], limite)
+
+    def test_prompt_final_nao_repete_chunks(self):
+        acumuladas = [match("el_compras.cp_contrato", CONTRATO, 0.9), match("el_compras.cp_contrato", CONTRATO, 0.9)]
+        prompt = ExtractionManager._montar_prompt_resposta_final("contratos", acumuladas)
+        self.assertEqual(prompt.count("el_compras.cp_contrato ("), 1)
+        prompt = ExtractionManager._montar_prompt_resposta_final("contratos", self.resultados)
+        self.assertEqual(prompt.count("el_compras.cp_contrato ("), 1)
+
+    def test_formato_bruto(self):
+        with patch.object(ContextPacker, "FORMATO", "bruto"):
+            contexto = ContextPacker.pack(self.resultados, 100000)
+        self.assertTrue(contexto["texto"].startswith("Tabela: el_compras.cp_contrato (Similaridade: 90.00%)\nConteúdo: " + CONTRATO))
+        self.assertEqual(contexto["texto"].count("Tabela: "), 3)
+
+    def test_formato_compacto_usa_menos_tokens(self):
+        compacto = ContextPacker.pack(self.resultados, 100000)
+        with patch.object(ContextPacker, "FORMATO", "bruto"):
+            bruto = ContextPacker.pack(self.resultados, 100000)
+        self.assertTrue(compacto["texto"].startswith("Formato das tabelas:"))
+        self.assertLess(compacto["tokens_estimados"] - estimate_tokens(LEGENDA_FORMATO_COMPACTO), bruto["tokens_estimados"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+"""
+Testes para o grafo de FKs pré-compilado e seu uso no ForeignKeyManager.
+"""
+
+import os
+import sys
+import unittest
+
+# Adiciona o diretório 'src' ao PYTHONPATH, como no start_backend
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../../src')))
+
+from infrastructure.persistence.schema_catalog import SchemaCatalog
+from application.services.maestro.foreign_key_graph import ForeignKeyGraph
+from application.services.maestro.foreign_key_manager import ForeignKeyManager
+from shared.utils.schema_chunk_parser import parse_foreign_key
+
+CATALOGO = [
+    {"table_name": "el_cpe_ex.ct_documento", "content": "el_cpe_ex;ct_documento;Documentos;id;id_tipo;PK:id;FK:id_tipo>el_cpe_base.ct_documento_tipo(id)[DIR:OUTGOING];FK:id<el_cpe_ex.ct_liquidacao(id_documento)[DIR:INCOMING]"},
+    {"table_name": "el_cpe_ex.ct_liquidacao", "content": "el_cpe_ex;ct_liquidacao;Liquidações;id;id_documento;id_empenho;PK:id;FK:id_documento>el_cpe_ex.ct_documento(id)[DIR:OUTGOING];FK:id_empenho>el_cpe_ex.ct_empenho(id)[DIR:OUTGOING]"},
+    {"table_name": "el_cpe_ex.ct_empenho", "content": "el_cpe_ex;ct_empenho;Empenhos;id;PK:id;FK:id<el_cpe_ex.ct_liquidacao(id_empenho)[DIR:INCOMING]"},
+    {"table_name": "el_cpe_base.ct_documento_tipo", "content": "el_cpe_base;ct_documento_tipo;Tipos;id;PK:id"},
+]
+
+
+class TesteForeignKeyGraph(unittest.TestCase):
+    """Testes do ForeignKeyGraph."""
+
+    def setUp(self):
+        SchemaCatalog.set_tables(CATALOGO)
+        ForeignKeyGraph.reset()
+
+    def tearDown(self):
+        SchemaCatalog.reset()
+        ForeignKeyGraph.reset()
+
+    def test_parse_de_fk_de_entrada(self):
+        foreign_key = parse_foreign_key("FK:id<el_cpe_ex.ct_liquidacao(id_documento)[DIR:INCOMING]")
+
+        self.assertEqual(foreign_key.tabela_relacionada, "el_cpe_ex.ct_liquidacao")
+        self.assertEqual(foreign_key.coluna_relacionada, "id_documento")
+        self.assertEqual(foreign_key.direcao, "INCOMING")
+
+    def test_fk_descrita_nas_duas_pontas_vira_uma_aresta(self):
+        grafo = ForeignKeyGraph.get_current()
+
+        self.assertEqual(len(grafo), 4)
+        self.assertEqual(grafo.num_edges, 3)
+        self.assertEqual(grafo.join_columns("el_cpe_ex.ct_documento", "el_cpe_ex.ct_liquidacao"), [("id", "id_documento")])
+
+    def test_expansao_k_saltos(self):
+        grafo = ForeignKeyGraph.get_current()
+
+        self.assertEqual(grafo.expand(["ct_documento"], hops=1), {
+            "el_cpe_ex.ct_documento": 0,
+            "el_cpe_ex.ct_liquidacao": 1,
+            "el_cpe_base.ct_documento_tipo": 1,
+        })
+        self.assertEqual(grafo.expand(["el_cpe_ex.ct_documento"], hops=2)["el_cpe_ex.ct_empenho"], 2)
+        self.assertEqual(set(grafo.expand(["el_cpe_ex.ct_documento"], hops=3, direcao="saida")), {
+            "el_cpe_ex.ct_documento", "el_cpe_base.ct_documento_tipo"
+        })
+
+    def test_busca_reversa(self):
+        grafo = ForeignKeyGraph.get_current()
+
+        self.assertEqual(grafo.referencing("el_cpe_ex.ct_empenho"), ["el_cpe_ex.ct_liquidacao"])
+        self.assertEqual(grafo.referencing("ct_documento_tipo"), ["el_cpe_ex.ct_documento"])
+
+    def test_grafo_reconstruido_apenas_quando_o_catalogo_muda(self):
+        grafo = ForeignKeyGraph.get_current()
+        self.assertIs(ForeignKeyGraph.get_current(), grafo)
+
+        SchemaCatalog.set_tables(CATALOGO[:1])
+        self.assertIsNot(ForeignKeyGraph.get_current(), grafo)
+
+    def test_manager_usa_o_grafo_e_parseia_chunks_fora_do_catalogo(self):
+        resultado = ForeignKeyManager.extract_related_tables_from_chunks(
+            {
+                "el_cpe_ex.ct_empenho": "ignorado: a tabela está no catálogo",
+                "el_compras.cp_contrato": "el_compras;cp_contrato;Contratos;id;PK:id;FK:id<el_compras.cp_contrato_item(id_contrato)[DIR:INCOMING]",
+            },
+            ["el_cpe_ex.ct_empenho"]
+        )
+
+        self.assertTrue(resultado["sucesso"])
+        self.assertEqual(resultado["all_identified_tables"], ["cp_contrato", "cp_contrato_item", "ct_empenho", "ct_liquidacao"])
+
+
+if __name__ == '__main__':
+    unittest.main()
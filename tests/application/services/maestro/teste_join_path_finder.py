@@ -0,0 +1,80 @@
+"""
+Testes para o cálculo de caminhos de junção (tabelas-ponte) sobre o grafo de FKs.
+"""
+
+import os
+import sys
+import unittest
+
+# Adiciona o diretório 'src' ao PYTHONPATH, como no start_backend
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../../src')))
+
+from infrastructure.persistence.schema_catalog import SchemaCatalog
+from application.services.maestro.foreign_key_graph import ForeignKeyGraph
+from application.services.maestro.join_path_finder import JoinPathFinder
+
+# contrato <- contrato_item <- empenho_item -> empenho ; fornecedor isolado
+CATALOGO = [
+    {"table_name": "el_compras.cp_contrato", "content": "el_compras;cp_contrato;Contratos;id;PK:id"},
+    {"table_name": "el_compras.cp_contrato_item", "content": "el_compras;cp_contrato_item;Itens;id;id_contrato;PK:id;FK:id_contrato>el_compras.cp_contrato(id)[DIR:OUTGOING]"},
+    {"table_name": "el_cpe_ex.ct_empenho_item", "content": "el_cpe_ex;ct_empenho_item;Itens do empenho;id;id_empenho;id_contrato_item;PK:id;FK:id_empenho>el_cpe_ex.ct_empenho(id)[DIR:OUTGOING];FK:id_contrato_item>el_compras.cp_contrato_item(id)[DIR:OUTGOING]"},
+    {"table_name": "el_cpe_ex.ct_empenho", "content": "el_cpe_ex;ct_empenho;Empenhos;id;PK:id"},
+    {"table_name": "el_compras.cp_fornecedor", "content": "el_compras;cp_fornecedor;Fornecedores;id;PK:id"},
+]
+
+
+class TesteJoinPathFinder(unittest.TestCase):
+    """Testes do JoinPathFinder."""
+
+    def setUp(self):
+        SchemaCatalog.set_tables(CATALOGO)
+        ForeignKeyGraph.reset()
+
+    def tearDown(self):
+        SchemaCatalog.reset()
+        ForeignKeyGraph.reset()
+
+    def test_pontes_entre_tabelas_a_tres_saltos(self):
+        arvore = JoinPathFinder.find_join_tree(["el_compras.cp_contrato", "el_cpe_ex.ct_empenho"])
+
+        self.assertEqual(set(arvore["tabelas_ponte"]), {"el_compras.cp_contrato_item", "el_cpe_ex.ct_empenho_item"})
+        self.assertEqual(len(arvore["arestas"]), 3)
+        self.assertEqual(arvore["desconectadas"], [])
+
+    def test_limite_de_saltos_e_tabela_sem_ligacao(self):
+        arvore = JoinPathFinder.find_join_tree(
+            ["el_compras.cp_contrato", "el_cpe_ex.ct_empenho", "el_compras.cp_fornecedor"], max_saltos=2
+        )
+
+        self.assertEqual(arvore["tabelas_ponte"], [])
+        self.assertEqual(set(arvore["desconectadas"]), {"el_compras.cp_contrato", "el_cpe_ex.ct_empenho", "el_compras.cp_fornecedor"})
+
+    def test_resultados_com_os_chunks_das_pontes(self):
+        resultados_busca = [
+            {"query_table": "contrato", "matches": [{"table_name": "el_compras.cp_contrato", "content": "..."}]},
+            {"query_table": "empenho", "matches": [{"table_name": "el_cpe_ex.ct_empenho", "content": "..."}]},
+        ]
+
+        pontes = JoinPathFinder.bridging_results(resultados_busca)
+
+        nomes = {r["matches"][0]["table_name"] for r in pontes}
+        self.assertEqual(nomes, {"el_compras.cp_contrato_item", "el_cpe_ex.ct_empenho_item"})
+        self.assertTrue(all(r["matches"][0]["content"] for r in pontes))
+        self.assertEqual(pontes[0]["matches"][0]["fontes"], ["join_path"])
+
+    def test_pontes_com_a_menor_similaridade_entre_as_tabelas_ligadas(self):
+        resultados_busca = [
+            {"query_table": "contrato", "matches": [{"table_name": "el_compras.cp_contrato", "similarity_score": 0.9, "similarity_percentage": 100.0}]},
+            {"query_table": "empenho", "matches": [{"table_name": "el_cpe_ex.ct_empenho", "similarity_score": 0.7, "similarity_percentage": 77.8}]},
+        ]
+
+        pontes = JoinPathFinder.bridging_results(resultados_busca)
+
+        self.assertEqual(len(pontes), 2)
+        for resultado in pontes:
+            self.assertEqual(resultado["matches"][0]["similarity_score"], 0.7)
+            self.assertEqual(resultado["matches"][0]["similarity_percentage"], 77.8)
+
+
+if __name__ == '__main__':
+    unittest.main()
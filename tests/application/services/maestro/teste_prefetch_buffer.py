@@ -0,0 +1,78 @@
+"""
+Testes para o prefetch dos vizinhos por FK durante a verificação.
+"""
+
+import os
+import sys
+import unittest
+
+# Adiciona o diretório 'src' ao PYTHONPATH, como no start_backend
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../../src')))
+
+from infrastructure.persistence.schema_catalog import SchemaCatalog
+from application.services.maestro.foreign_key_graph import ForeignKeyGraph
+from application.services.maestro.prefetch_buffer import PrefetchBuffer
+
+CATALOGO = [
+    {"table_name": "el_compras.cp_contrato", "content": "el_compras;cp_contrato;Contratos;id;PK:id"},
+    {"table_name": "el_compras.cp_contrato_item", "content": "el_compras;cp_contrato_item;Itens;id;id_contrato;PK:id;FK:id_contrato>el_compras.cp_contrato(id)[DIR:OUTGOING]"},
+    {"table_name": "el_compras.cp_fornecedor", "content": "el_compras;cp_fornecedor;Fornecedores;id;PK:id"},
+    {"table_name": "el_cpe_ex.ct_contrato_item", "content": "el_cpe_ex;ct_contrato_item;Itens do contrato (execução);id;id_contrato;PK:id;FK:id_contrato>el_compras.cp_contrato(id)[DIR:OUTGOING]"},
+]
+
+
+class TestePrefetchBuffer(unittest.TestCase):
+    """Testes do PrefetchBuffer."""
+
+    def setUp(self):
+        SchemaCatalog.set_tables(CATALOGO)
+        ForeignKeyGraph.reset()
+        PrefetchBuffer.reset_stats()
+
+    def tearDown(self):
+        SchemaCatalog.reset()
+        ForeignKeyGraph.reset()
+        PrefetchBuffer.reset_stats()
+
+    def test_vizinho_por_fk_atendido_pelo_buffer(self):
+        buffer = PrefetchBuffer()
+        buffer.start([{"query_table": "contrato", "matches": [{"table_name": "el_compras.cp_contrato"}]}])
+
+        resultados, faltantes = buffer.take(["cp_contrato_item", "fornecedor"])
+
+        self.assertEqual(faltantes, ["fornecedor"])
+        self.assertEqual(resultados[0]["query_table"], "cp_contrato_item")
+        match = resultados[0]["matches"][0]
+        self.assertEqual(match["table_name"], "el_compras.cp_contrato_item")
+        self.assertEqual(match["fontes"], ["prefetch_fk"])
+        self.assertEqual(PrefetchBuffer.get_stats()["taxa_acerto"], 0.5)
+
+    def test_nome_sem_prefixo_ambiguo_vai_para_a_busca(self):
+        buffer = PrefetchBuffer()
+        buffer.start([{"query_table": "contrato", "matches": [{"table_name": "el_compras.cp_contrato"}]}])
+
+        resultados, faltantes = buffer.take(["contrato_item", "el_cpe_ex.ct_contrato_item"])
+
+        self.assertEqual(faltantes, ["contrato_item"])
+        self.assertEqual(resultados[0]["matches"][0]["table_name"], "el_cpe_ex.ct_contrato_item")
+
+    def test_prefetch_cancelado_nao_carrega(self):
+        buffer = PrefetchBuffer()
+        buffer.cancel()
+        buffer.start([{"query_table": "contrato", "matches": [{"table_name": "el_compras.cp_contrato"}]}])
+
+        resultados, faltantes = buffer.take(["cp_contrato_item"])
+
+        self.assertEqual((resultados, faltantes), ([], ["cp_contrato_item"]))
+        self.assertEqual(PrefetchBuffer.get_stats()["chunks_prefetch"], 0)
+
+    def test_buffer_vazio_sem_prefetch(self):
+        resultados, faltantes = PrefetchBuffer().take(["el_compras.cp_contrato_item"])
+
+        self.assertEqual(resultados, [])
+        self.assertEqual(faltantes, ["el_compras.cp_contrato_item"])
+        self.assertEqual(PrefetchBuffer.get_stats()["acertos"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
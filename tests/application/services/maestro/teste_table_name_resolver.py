@@ -0,0 +1,59 @@
+"""
+Testes para a resolução exata de nomes de tabelas pelo catálogo.
+"""
+
+import os
+import sys
+import unittest
+
+# Adiciona o diretório 'src' ao PYTHONPATH, como no start_backend
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../../src')))
+
+from infrastructure.persistence.schema_catalog import SchemaCatalog
+from application.services.maestro.table_name_resolver import TableNameResolver
+
+CATALOGO = [
+    {"table_name": "el_compras.cp_contrato_item", "content": "el_compras;cp_contrato_item;Itens do contrato", "similarity_score": 1.0},
+    {"table_name": "el_compras.cp_contrato", "content": "el_compras;cp_contrato;Contratos", "similarity_score": 1.0},
+    {"table_name": "el_cpe_ex.ct_documento", "content": "el_cpe_ex;ct_documento;Documentos", "similarity_score": 1.0},
+    {"table_name": "el_cpe_base.ct_documento", "content": "el_cpe_base;ct_documento;Documentos base", "similarity_score": 1.0},
+]
+
+
+class TesteTableNameResolver(unittest.TestCase):
+    """Testes do TableNameResolver."""
+
+    def setUp(self):
+        SchemaCatalog.set_tables(CATALOGO)
+
+    def tearDown(self):
+        SchemaCatalog.reset()
+
+    def test_nome_qualificado_resolve_direto(self):
+        resultados, faltantes = TableNameResolver.resolve(["el_compras.cp_contrato_item", "empenho"])
+
+        self.assertEqual(faltantes, ["empenho"])
+        self.assertEqual(resultados[0]["query_table"], "el_compras.cp_contrato_item")
+        match = resultados[0]["matches"][0]
+        self.assertEqual(match["content"], "el_compras;cp_contrato_item;Itens do contrato")
+        self.assertEqual(match["similarity_percentage"], 100.0)
+
+    def test_nome_simples_retorna_todos_os_schemas(self):
+        resultados, faltantes = TableNameResolver.resolve(["CT_DOCUMENTO"])
+
+        self.assertEqual(faltantes, [])
+        self.assertEqual(
+            sorted(m["table_name"] for m in resultados[0]["matches"]),
+            ["el_cpe_base.ct_documento", "el_cpe_ex.ct_documento"]
+        )
+
+    def test_indice_reconstruido_quando_o_catalogo_muda(self):
+        self.assertEqual(TableNameResolver.lookup("cp_orgao"), [])
+
+        SchemaCatalog.set_tables(CATALOGO + [{"table_name": "el_compras.cp_orgao", "content": "el_compras;cp_orgao"}])
+
+        self.assertEqual(len(TableNameResolver.lookup("cp_orgao")), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
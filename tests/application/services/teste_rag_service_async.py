@@ -0,0 +1,285 @@
+"""
+Testes do pipeline assíncrono do RAGService, com LLM e embeddings simulados.
+"""
+
+import asyncio
+import os
+import sys
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+import numpy as np
+
+# Adiciona o diretório 'src' ao PYTHONPATH, como no start_backend
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../src')))
+
+from application.services.rag_service import RAGService
+from application.services.maestro.foreign_key_graph import ForeignKeyGraph
+from application.services.maestro.prefetch_buffer import PrefetchBuffer
+from application.services.maestro.speculative_final import SpeculativeFinal
+from config.api.api_config import GeminiConfig
+from infrastructure.external_services.llm_rate_limiter import LLMRateLimiter
+from infrastructure.external_services.llm_service import LLMService
+from infrastructure.external_services.embedding_service import EmbeddingService
+from infrastructure.persistence.schema_catalog import SchemaCatalog
+from infrastructure.persistence.semantic_response_cache import SemanticResponseCache
+from infrastructure.vector_database.search_service import SearchService
+from shared.utils.async_runner import AsyncRunner
+from shared.utils.tracing import Tracer
+from shared.utils.request_budget import RequestBudget
+
+CATALOGO = [
+    {"table_name": "el_compras.cp_contrato", "content": "el_compras;cp_contrato;Contratos;id;PK:id"},
+    {"table_name": "el_compras.cp_contrato_item", "content": "el_compras;cp_contrato_item;Itens;id;id_contrato;PK:id;FK:id_contrato>el_compras.cp_contrato(id)[DIR:OUTGOING]"},
+    {"table_name": "el_cpe_ex.ct_empenho", "content": "el_cpe_ex;ct_empenho;Empenhos;id;PK:id"},
+]
+
+
+class TesteRAGServiceAsync(unittest.TestCase):
+    """Fluxo extração -> busca -> 1001 -> prefetch -> 2002 -> resposta final."""
+
+    def setUp(self):
+        self.patch_trace = patch.object(Tracer, "LOG_FILE", "")
+        self.patch_trace.start()
+        self.patch_cache = patch.object(SemanticResponseCache, "ENABLED", False)
+        self.patch_cache.start()
+        self.patch_especulacao = patch.object(SpeculativeFinal, "POLITICA", "nunca")
+        self.patch_especulacao.start()
+        SpeculativeFinal.reset_stats()
+        SchemaCatalog.set_tables(CATALOGO)
+        ForeignKeyGraph.reset()
+        PrefetchBuffer.reset_stats()
+
+    def tearDown(self):
+        self.patch_trace.stop()
+        self.patch_cache.stop()
+        self.patch_especulacao.stop()
+        SpeculativeFinal.reset_stats()
+        RAGService._cache_semantico = None
+        SchemaCatalog.reset()
+        ForeignKeyGraph.reset()
+        PrefetchBuffer.reset_stats()
+
+    def test_pipeline_assincrono_pelo_ponto_de_entrada_sincrono(self):
+        respostas_llm = [
+            "'el_cpe_ex','el_cpe_ex.ct_empenho;contratos',' '",
+            "1001;ct_empenho,cp_contrato;contrato_item;faltam os itens",
+            "2002",
+            "SELECT 1",
+        ]
+        backend = MagicMock(spec=["find_top_similar_tables"])
+        backend.find_top_similar_tables.return_value = [{
+            "query_table": "contratos",
+            "matches": [{"table_name": "el_compras.cp_contrato", "content": CATALOGO[0]["content"], "similarity_score": 0.9, "similarity_percentage": 90.0}]
+        }]
+
+        with patch.object(LLMService, "processar_prompt_async", AsyncMock(side_effect=respostas_llm)) as llm, \
+             patch.object(EmbeddingService, "embed_texts_async", AsyncMock(return_value=np.ones((1, 3), dtype=np.float32))) as embeddings, \
+             patch.object(SearchService, "_get_search_backend", return_value=backend):
+            resultado = RAGService.generate_sql_from_prompt("valor dos itens de contrato empenhados")
+
+        self.assertTrue(resultado["sucesso"])
+        self.assertEqual(resultado["sql_gerado_final"], "SELECT 1")
+        self.assertEqual(llm.await_count, 4)
+        # 'el_cpe_ex.ct_empenho' resolvida pelo nome exato; 'contrato_item' atendida pelo prefetch
+        embeddings.assert_awaited_once_with(["contratos"])
+        self.assertEqual(PrefetchBuffer.get_stats()["acertos"], 1)
+        self.assertIn("el_compras.cp_contrato_item", llm.await_args_list[3].args[0])
+
+    def test_streaming_notifica_etapas_e_tokens(self):
+        respostas_llm = ["'el_cpe_ex','el_cpe_ex.ct_empenho',' '", "2002"]
+
+        async def stream(prompt, nivel_modelo="medio", etapa=None):
+            for trecho in ["SELECT ", "1"]:
+                yield trecho
+
+        eventos = []
+        with patch.object(LLMService, "processar_prompt_async", AsyncMock(side_effect=respostas_llm)), \
+             patch.object(LLMService, "processar_prompt_stream_async", side_effect=stream), \
+             patch.object(SearchService, "_get_search_backend", return_value=MagicMock(spec=["find_top_similar_tables"])):
+            resultado = AsyncRunner.run(RAGService.generate_sql_from_prompt_async("empenhos", notificar=eventos.append, incluir_timings=True))
+
+        self.assertEqual(resultado["sql_gerado_final"], "SELECT 1")
+        etapas = [e["etapa"] for e in eventos if e["tipo"] == "etapa"]
+        self.assertEqual(etapas, ["extracao", "busca", "verificacao", "resposta_final"])
+        self.assertEqual([e["texto"] for e in eventos if e["tipo"] == "token"], ["SELECT ", "1"])
+
+        # Spans de cada etapa, com a iteração e o nível do modelo
+        spans = resultado["timings"]["spans"]
+        self.assertEqual(spans[0]["nome"], "rag.sql_gen")
+        verificacao = next(s for s in spans if s["nome"] == "extracao.verificacao")
+        self.assertEqual(verificacao["atributos"]["iteracao"], 0)
+        self.assertEqual(verificacao["atributos"]["codigo"], "2002")
+        self.assertEqual(next(s for s in spans if s["nome"] == "extracao.resposta_final")["atributos"]["nivel_modelo"], "forte")
+        self.assertIn("rag.busca", resultado["timings"]["por_etapa"])
+
+    def test_orcamento_esgotado_vai_direto_para_a_resposta_final(self):
+        respostas_llm = ["'el_cpe_ex','el_cpe_ex.ct_empenho',' '", "SELECT 1"]
+        with patch.object(LLMService, "processar_prompt_async", AsyncMock(side_effect=respostas_llm)) as llm, \
+             patch.object(SearchService, "_get_search_backend", return_value=MagicMock(spec=["find_top_similar_tables"])):
+            resultado = AsyncRunner.run(
+                RAGService.generate_sql_from_prompt_async("empenhos", orcamento=RequestBudget(tempo_segundos=0))
+            )
+
+        # Sem tempo para a verificação: extração + resposta final com a tabela encontrada
+        self.assertEqual(llm.await_count, 2)
+        self.assertEqual(resultado["sql_gerado_final"], "SELECT 1")
+        self.assertIn("el_cpe_ex.ct_empenho", llm.await_args_list[1].args[0])
+        self.assertEqual(resultado["orcamento"]["encerrado_por"], "tempo")
+        self.assertEqual(resultado["orcamento"]["limites"]["tempo_segundos"], 0.0)
+
+    def test_cache_semantico_reaproveita_resposta_ate_o_catalogo_mudar(self):
+        respostas_llm = [
+            "'el_cpe_ex','el_cpe_ex.ct_empenho',' '", "2002", "SELECT 2024",
+            "'el_cpe_ex','el_cpe_ex.ct_empenho',' '", "2002", "SELECT 2023",
+            "'el_cpe_ex','el_cpe_ex.ct_empenho',' '", "2002", "SELECT 2024 v2",
+        ]
+        self.patch_cache.stop()
+        self.patch_cache = patch.object(SemanticResponseCache, "ENABLED", True)
+        self.patch_cache.start()
+        RAGService._cache_semantico = None
+
+        with patch.object(LLMService, "processar_prompt_async", AsyncMock(side_effect=respostas_llm)) as llm, \
+             patch.object(EmbeddingService, "embed_texts_async", AsyncMock(return_value=np.array([[1.0, 0.0, 0.0]], dtype=np.float32))) as embeddings, \
+             patch.object(SearchService, "_get_search_backend", return_value=MagicMock(spec=["find_top_similar_tables"])):
+            primeiro = RAGService.generate_sql_from_prompt("Total empenhado em 2024")
+            eventos = []
+            repetido = AsyncRunner.run(RAGService.generate_sql_from_prompt_async("total empenhado em 2024?", notificar=eventos.append))
+            self.assertEqual(llm.await_count, 3)
+            outro_ano = RAGService.generate_sql_from_prompt("Total empenhado em 2023")
+            SchemaCatalog.set_tables(CATALOGO[:2] + [{"table_name": "el_cpe_ex.ct_empenho", "content": "el_cpe_ex;ct_empenho;Empenhos;id;vl_empenho;PK:id"}])
+            apos_mudanca = RAGService.generate_sql_from_prompt("Total empenhado em 2024")
+
+        self.assertEqual(primeiro["tabelas_utilizadas"], ["el_cpe_ex.ct_empenho"])
+        self.assertNotIn("cache_semantico", primeiro)
+        self.assertEqual(repetido["sql_gerado_final"], "SELECT 2024")
+        self.assertEqual(repetido["tabelas_utilizadas"], ["el_cpe_ex.ct_empenho"])
+        self.assertEqual(repetido["cache_semantico"]["prompt_original"], "Total empenhado em 2024")
+        self.assertEqual([e.get("etapa") for e in eventos if e["tipo"] == "etapa"], ["cache_semantico"])
+        self.assertEqual([e["texto"] for e in eventos if e["tipo"] == "token"], ["SELECT 2024"])
+        embeddings.assert_any_await(["total empenhado em 2024"])
+        # Ano diferente não reaproveita; catálogo novo invalida o cache
+        self.assertEqual(outro_ano["sql_gerado_final"], "SELECT 2023")
+        self.assertEqual(apos_mudanca["sql_gerado_final"], "SELECT 2024 v2")
+        self.assertEqual(RAGService.get_semantic_cache_stats()["acertos"], 1)
+
+    def _llm_por_etapa(self, verificacoes, atraso_final=0.0):
+        # Respostas pela etapa, já que a resposta especulativa corre em paralelo com a verificação
+        verificacoes = list(verificacoes)
+        finais = []
+
+        async def responder(prompt, nivel_modelo="medio", etapa=None, validar=None):
+            if etapa == "extracao":
+                return "'el_cpe_ex','el_cpe_ex.ct_empenho',' '"
+            if etapa == "verificacao":
+                await asyncio.sleep(0.02)
+                return verificacoes.pop(0)
+            finais.append(prompt)
+            await asyncio.sleep(atraso_final)
+            return f"SELECT {len(finais)}"
+        return responder, finais
+
+    def test_resposta_especulativa_confirmada_com_2002(self):
+        responder, finais = self._llm_por_etapa(["2002"])
+        with patch.object(SpeculativeFinal, "POLITICA", "sempre"), \
+             patch.object(LLMService, "processar_prompt_async", AsyncMock(side_effect=responder)) as llm, \
+             patch.object(SearchService, "_get_search_backend", return_value=MagicMock(spec=["find_top_similar_tables"])):
+            resultado = AsyncRunner.run(RAGService.generate_sql_from_prompt_async("empenhos"))
+
+        self.assertEqual(resultado["sql_gerado_final"], "SELECT 1")
+        self.assertEqual(llm.await_count, 3)
+        self.assertIn("el_cpe_ex.ct_empenho", finais[0])
+        stats = SpeculativeFinal.get_stats()
+        self.assertEqual((stats["iniciadas"], stats["aproveitadas"], stats["descartadas"]), (1, 1, 0))
+        self.assertGreater(stats["economia_estimada_ms"], 0)
+
+    def test_resposta_especulativa_descartada_com_1001(self):
+        responder, finais = self._llm_por_etapa(["1001;ct_empenho;cp_contrato;faltam contratos", "2002"], atraso_final=0.05)
+        eventos = []
+
+        async def stream(prompt, nivel_modelo="medio", etapa=None):
+            finais.append(prompt)
+            for trecho in ["SELECT ", str(len(finais))]:
+                await asyncio.sleep(0.01)
+                yield trecho
+
+        with patch.object(SpeculativeFinal, "POLITICA", "sempre"), \
+             patch.object(LLMService, "processar_prompt_async", AsyncMock(side_effect=responder)), \
+             patch.object(LLMService, "processar_prompt_stream_async", side_effect=stream), \
+             patch.object(SearchService, "_get_search_backend", return_value=MagicMock(spec=["find_top_similar_tables"])):
+            resultado = AsyncRunner.run(RAGService.generate_sql_from_prompt_async("empenhos", notificar=eventos.append))
+
+        # A primeira especulação (sem cp_contrato) é descartada; a segunda é confirmada
+        self.assertEqual(resultado["sql_gerado_final"], "SELECT 2")
+        self.assertNotIn("el_compras.cp_contrato (", finais[0])
+        self.assertIn("el_compras.cp_contrato (", finais[1])
+        self.assertEqual([e["texto"] for e in eventos if e["tipo"] == "token"], ["SELECT ", "2"])
+        etapas = [e["etapa"] for e in eventos if e["tipo"] == "etapa"]
+        self.assertEqual(etapas[-2:], ["verificacao", "resposta_final"])
+        stats = SpeculativeFinal.get_stats()
+        self.assertEqual((stats["iniciadas"], stats["aproveitadas"], stats["descartadas"]), (2, 1, 1))
+        # A LLM é simulada e não registra uso: só a especulação cancelada foi cobrada
+        self.assertEqual(resultado["orcamento"]["consumido"]["chamadas_llm"], 1)
+        self.assertGreater(resultado["orcamento"]["consumido"]["tokens_entrada"], 0)
+
+    def test_limite_de_taxa_esgotado_vira_resposta_indisponivel(self):
+        # Extração sem vez na fila dentro do prazo (1 requisição/min, já usada): nenhuma chamada chega à API
+        modelos = [LLMService.MODELOS["fraco"], LLMService.MODELOS["medio"]]
+        limitador = LLMRateLimiter({modelo: (1, 0) for modelo in modelos})
+        for modelo in modelos:
+            self.assertTrue(limitador.acquire(modelo, 1))
+        LLMService.set_rate_limiter(limitador)
+        cliente = MagicMock()
+        try:
+            with patch.object(LLMService, "ESPERA_MAXIMA_SEGUNDOS", 0.1), \
+                 patch.object(LLMService, "_CACHE_ENABLED", False), \
+                 patch.object(GeminiConfig, "get_client", return_value=cliente):
+                resultado = RAGService.generate_sql_from_prompt("empenhos de 2024")
+        finally:
+            LLMService.set_rate_limiter(None)
+
+        self.assertFalse(resultado["sucesso"])
+        self.assertTrue(resultado["indisponivel"])
+        self.assertGreater(resultado["tentar_novamente_em"], 30)
+        cliente.GenerativeModel.return_value.generate_content_async.assert_not_called()
+
+    def test_politica_auto_segue_a_taxa_de_2002(self):
+        with patch.object(SpeculativeFinal, "POLITICA", "auto"):
+            # Sem histórico não especula
+            self.assertFalse(SpeculativeFinal.should_speculate(0))
+            for _ in range(5):
+                SpeculativeFinal.record_verification(0, "2002")
+            self.assertTrue(SpeculativeFinal.should_speculate(0))
+            self.assertFalse(SpeculativeFinal.should_speculate(1))
+            for _ in range(10):
+                SpeculativeFinal.record_verification(0, "1001")
+            self.assertFalse(SpeculativeFinal.should_speculate(0))
+
+    def test_lote_compartilha_embeddings_e_buscas_entre_prompts(self):
+        async def responder(prompt, nivel_modelo="medio", etapa=None, validar=None):
+            if etapa == "extracao":
+                return "'el_compras','contratos;itens de contrato',' '"
+            return "2002" if etapa == "verificacao" else "SELECT 1"
+
+        backend = MagicMock(spec=["find_top_similar_tables"])
+        backend.find_top_similar_tables.side_effect = lambda query_embeddings, query_table_names, k: [
+            {"query_table": nome, "matches": [{"table_name": "el_compras.cp_contrato", "content": CATALOGO[0]["content"], "similarity_score": 0.9, "similarity_percentage": 90.0}]}
+            for nome in query_table_names
+        ]
+        api_embeddings = AsyncMock(side_effect=lambda textos: np.ones((len(textos), 3), dtype=np.float32))
+
+        with patch.object(LLMService, "processar_prompt_async", AsyncMock(side_effect=responder)), \
+             patch.object(EmbeddingService, "_CACHE_ENABLED", False), \
+             patch.object(EmbeddingService, "_embed_via_api_async", api_embeddings), \
+             patch.object(SearchService, "_get_search_backend", return_value=backend):
+            resultados = RAGService.generate_sql_batch(["contratos e itens", "itens dos contratos", "valor dos contratos"])
+
+        self.assertEqual([r["indice"] for r in resultados], [0, 1, 2])
+        self.assertTrue(all(r["sucesso"] and r["sql_gerado_final"] == "SELECT 1" for r in resultados))
+        # Três pipelines, uma chamada de embeddings e uma busca vetorial com os nomes deduplicados
+        api_embeddings.assert_awaited_once_with(["contratos", "itens de contrato"])
+        backend.find_top_similar_tables.assert_called_once()
+        self.assertEqual(backend.find_top_similar_tables.call_args.kwargs["query_table_names"], ["contratos", "itens de contrato"])
+
+
+if __name__ == '__main__':
+    unittest.main()
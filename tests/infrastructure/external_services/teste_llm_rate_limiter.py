@@ -0,0 +1,143 @@
+"""
+Testes do limite de taxa por modelo (baldes RPM/TPM) e das retentativas em erros de cota do LLMService.
+"""
+
+import asyncio
+import os
+import sys
+import time
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from google.api_core import exceptions as google_exceptions
+
+# Adiciona o diretório 'src' ao PYTHONPATH, como no start_backend
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../src')))
+
+from infrastructure.external_services.llm_rate_limiter import LLMRateLimiter, LLMUnavailableError, TokenBucket
+from infrastructure.external_services.llm_service import LLMService
+from config.api.api_config import GeminiConfig
+from shared.utils.async_runner import AsyncRunner
+
+
+class TesteLLMRateLimiter(unittest.TestCase):
+
+    def test_reservas_excedentes_esperam_em_ordem_de_chegada(self):
+        balde = TokenBucket(60)  # 1 ficha por segundo
+        agora = time.monotonic()
+        esperas = [balde.reservar(30, agora) for _ in range(4)]
+        self.assertEqual(esperas[:2], [0.0, 0.0])
+        self.assertAlmostEqual(esperas[2], 30.0, delta=0.1)
+        self.assertAlmostEqual(esperas[3], 60.0, delta=0.1)
+
+    def test_espera_acima_do_maximo_desiste_sem_consumir(self):
+        limitador = LLMRateLimiter({"m": (60, 0)})
+        for _ in range(60):
+            self.assertTrue(limitador.acquire("m", 10, espera_maxima=0))
+        self.assertFalse(limitador.acquire("m", 10, espera_maxima=0.5))
+        # A desistência devolveu a ficha: a próxima espera continua ~1s, não ~2s
+        self.assertTrue(limitador.acquire("m", 10, espera_maxima=1.5))
+
+        stats = limitador.get_stats()["m"]
+        self.assertEqual((stats["chamadas"], stats["desistencias"], stats["esperas"], stats["fila"]), (61, 1, 1, 0))
+        self.assertGreater(stats["espera_max_ms"], 500)
+
+    def test_chamador_cancelado_devolve_a_vez(self):
+        limitador = LLMRateLimiter({"m": (2, 0)})
+        self.assertTrue(limitador.acquire("m", 10))
+        self.assertTrue(limitador.acquire("m", 10))
+
+        async def cancelar_na_fila():
+            tarefa = asyncio.ensure_future(limitador.acquire_async("m", 10))
+            await asyncio.sleep(0.01)
+            tarefa.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await tarefa
+
+        asyncio.run(cancelar_na_fila())
+        # Sem a devolução o saldo ficaria em -1 e o próximo esperaria ~60s em vez de ~30s
+        self.assertAlmostEqual(limitador.estimated_wait("m", 10), 30.0, delta=0.5)
+        self.assertEqual(limitador.get_stats()["m"]["fila"], 0)
+
+        with patch.object(time, "sleep", side_effect=KeyboardInterrupt):
+            with self.assertRaises(KeyboardInterrupt):
+                limitador.acquire("m", 10)
+        self.assertAlmostEqual(limitador.estimated_wait("m", 10), 30.0, delta=0.5)
+
+    def test_erro_de_cota_pausa_o_modelo(self):
+        limitador = LLMRateLimiter({"m": (0, 0)})
+        limitador.record_quota_error("m", 0.2)
+        inicio = time.monotonic()
+        self.assertTrue(AsyncRunner.run(limitador.acquire_async("m", 1)))
+        self.assertGreaterEqual(time.monotonic() - inicio, 0.15)
+        self.assertEqual(limitador.get_stats()["m"]["erros_cota"], 1)
+
+    def test_retry_after_dos_detalhes_cabecalho_ou_mensagem(self):
+        detalhe = MagicMock(retry_delay=MagicMock(seconds=7, nanos=500000000))
+        self.assertEqual(LLMRateLimiter.retry_after(google_exceptions.ResourceExhausted("cota", details=[detalhe])), 7.5)
+        resposta = MagicMock(headers={"retry-after": "3"})
+        self.assertEqual(LLMRateLimiter.retry_after(google_exceptions.TooManyRequests("cota", response=resposta)), 3.0)
+        self.assertEqual(LLMRateLimiter.retry_after(RuntimeError("Quota exceeded. Please retry in 12.5s.")), 12.5)
+        self.assertIsNone(LLMRateLimiter.retry_after(RuntimeError("falhou")))
+
+        self.assertTrue(LLMRateLimiter.is_quota_error(google_exceptions.ServiceUnavailable("sobrecarga")))
+        self.assertFalse(LLMRateLimiter.is_quota_error(google_exceptions.InvalidArgument("prompt")))
+
+
+class TesteRetentativasLLMService(unittest.TestCase):
+
+    def setUp(self):
+        LLMService.set_rate_limiter(LLMRateLimiter({"gemini-2.0-flash": (1000, 0)}))
+        self.patches = [
+            patch.object(LLMService, "_CACHE_ENABLED", False),
+            patch.object(LLMService, "BACKOFF_BASE_SEGUNDOS", 0.01),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        LLMService.set_rate_limiter(None)
+
+    def cliente(self, modelo):
+        cliente = MagicMock()
+        cliente.GenerativeModel.return_value = modelo
+        return patch.object(GeminiConfig, "get_client", return_value=cliente)
+
+    def test_erro_de_cota_e_repetido_ate_funcionar(self):
+        modelo = MagicMock()
+        modelo.generate_content_async = AsyncMock(side_effect=[
+            google_exceptions.ResourceExhausted("cota"),
+            google_exceptions.ServiceUnavailable("sobrecarga"),
+            MagicMock(text="2002", usage_metadata=None),
+        ])
+        with self.cliente(modelo):
+            self.assertEqual(AsyncRunner.run(LLMService.processar_prompt_async("verifique")), "2002")
+
+        stats = LLMService.get_rate_limit_stats()["modelos"]["gemini-2.0-flash"]
+        self.assertEqual((stats["chamadas"], stats["erros_cota"], stats["retentativas"]), (3, 2, 2))
+
+    def test_tentativas_esgotadas_indisponivel_e_outro_erro_devolve_vazio(self):
+        modelo = MagicMock()
+        modelo.generate_content.side_effect = google_exceptions.ResourceExhausted("cota")
+        with self.cliente(modelo), patch.object(LLMService, "MAX_RETENTATIVAS", 2):
+            self.assertRaises(LLMUnavailableError, LLMService.processar_prompt, "extraia")
+        self.assertEqual(modelo.generate_content.call_count, 3)
+
+        modelo.generate_content.reset_mock()
+        modelo.generate_content.side_effect = google_exceptions.InvalidArgument("prompt inválido")
+        with self.cliente(modelo):
+            self.assertEqual(LLMService.processar_prompt("extraia"), "")
+        self.assertEqual(modelo.generate_content.call_count, 1)
+
+        # Sem retentativas, a espera pedida pela API vai para o chamador
+        modelo.generate_content.side_effect = google_exceptions.ResourceExhausted("cota. Please retry in 4s.")
+        with self.cliente(modelo), patch.object(LLMService, "MAX_RETENTATIVAS", 0):
+            with self.assertRaises(LLMUnavailableError) as contexto:
+                LLMService.processar_prompt("extraia")
+        self.assertEqual(contexto.exception.retry_after, 4.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+"""
+Testes para o cache de embeddings em dois níveis (memória + SQLite).
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+import numpy as np
+
+# Adiciona o diretório 'src' ao PYTHONPATH, como no start_backend
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../src')))
+
+from infrastructure.persistence.embedding_cache import EmbeddingCache
+from infrastructure.external_services.embedding_service import EmbeddingService
+
+
+def _vetor_unitario(*valores):
+    vetor = np.array(valores, dtype=np.float32)
+    return vetor / np.linalg.norm(vetor)
+
+
+class TesteEmbeddingCache(unittest.TestCase):
+    """Testes do EmbeddingCache."""
+
+    def setUp(self):
+        self.diretorio = tempfile.TemporaryDirectory()
+        self.caminho_db = os.path.join(self.diretorio.name, "embeddings.sqlite3")
+
+    def tearDown(self):
+        self.diretorio.cleanup()
+
+    def test_normalizacao_do_texto(self):
+        self.assertEqual(EmbeddingCache.normalizar_texto("  Empenho   Anual "), "empenho anual")
+
+    def test_hit_em_memoria_e_miss(self):
+        cache = EmbeddingCache(caminho_db=None, capacidade_memoria=10)
+        cache.put_many("modelo", "tarefa", {"empenho": _vetor_unitario(1, 0, 0)})
+
+        encontrados = cache.get_many("modelo", "tarefa", ["empenho", "contrato"])
+
+        self.assertEqual(list(encontrados.keys()), ["empenho"])
+        stats = cache.get_stats()
+        self.assertEqual(stats["hits_memoria"], 1)
+        self.assertEqual(stats["misses"], 1)
+
+    def test_chave_inclui_modelo_e_tarefa(self):
+        cache = EmbeddingCache(caminho_db=None)
+        cache.put_many("modelo_a", "RETRIEVAL_QUERY", {"empenho": _vetor_unitario(1, 0)})
+
+        self.assertEqual(cache.get_many("modelo_b", "RETRIEVAL_QUERY", ["empenho"]), {})
+        self.assertEqual(cache.get_many("modelo_a", "RETRIEVAL_DOCUMENT", ["empenho"]), {})
+
+    def test_nivel_em_disco_persiste_entre_instancias(self):
+        vetor = _vetor_unitario(0.3, 0.4, 0.5)
+        EmbeddingCache(caminho_db=self.caminho_db).put_many("modelo", "tarefa", {"contrato": vetor})
+
+        novo_cache = EmbeddingCache(caminho_db=self.caminho_db)
+        encontrados = novo_cache.get_many("modelo", "tarefa", ["contrato"])
+
+        np.testing.assert_allclose(encontrados["contrato"], vetor)
+        self.assertEqual(encontrados["contrato"].dtype, np.float32)
+        self.assertEqual(novo_cache.get_stats()["hits_disco"], 1)
+
+
+class TesteEmbeddingServiceComCache(unittest.TestCase):
+    """Testes do EmbeddingService usando o cache."""
+
+    def setUp(self):
+        self.cache_original = EmbeddingService._cache
+        EmbeddingService._cache = EmbeddingCache(caminho_db=None)
+
+    def tearDown(self):
+        EmbeddingService._cache = self.cache_original
+
+    @patch.object(EmbeddingService, "_embed_via_api")
+    def test_apenas_textos_ausentes_vao_para_a_api(self, mock_api):
+        mock_api.side_effect = lambda textos: np.stack([_vetor_unitario(i + 1, 1) for i in range(len(textos))])
+
+        primeiro = EmbeddingService.embed_texts(["empenho", "contrato"])
+        segundo = EmbeddingService.embed_texts(["Contrato", "liquidacao", "empenho"])
+
+        self.assertEqual(mock_api.call_args_list[0].args[0], ["empenho", "contrato"])
+        self.assertEqual(mock_api.call_args_list[1].args[0], ["liquidacao"])
+        self.assertEqual(segundo.shape, (3, 2))
+        np.testing.assert_allclose(segundo[0], primeiro[1])
+        np.testing.assert_allclose(segundo[2], primeiro[0])
+
+    @patch.object(EmbeddingService, "_embed_via_api")
+    def test_todos_em_cache_nao_chama_api(self, mock_api):
+        EmbeddingService._cache.put_many(
+            EmbeddingService._MODEL_NAME, EmbeddingService._TASK_TYPE, {"empenho": _vetor_unitario(1, 2)}
+        )
+
+        resultado = EmbeddingService.embed_texts(["empenho"])
+
+        mock_api.assert_not_called()
+        self.assertEqual(resultado.shape, (1, 2))
+
+
+if __name__ == '__main__':
+    unittest.main()
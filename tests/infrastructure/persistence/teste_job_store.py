@@ -0,0 +1,75 @@
+"""
+Testes para o armazenamento de jobs em SQLite (reaproveitamento por chave, ciclo de vida e expiração).
+"""
+
+import os
+import sys
+import tempfile
+import time
+import unittest
+
+# Adiciona o diretório 'src' ao PYTHONPATH, como no start_backend
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../src')))
+
+from infrastructure.persistence.job_store import JobStore
+
+
+class TesteJobStore(unittest.TestCase):
+
+    def setUp(self):
+        self.diretorio = tempfile.TemporaryDirectory()
+        self.caminho_db = os.path.join(self.diretorio.name, "jobs.sqlite3")
+        self.store = JobStore(self.caminho_db)
+
+    def tearDown(self):
+        self.diretorio.cleanup()
+
+    def test_mesma_chave_reaproveita_job_ativo_ou_concluido(self):
+        job = self.store.create("empenhos de 2024", {"usar_cache": True}, "chave")
+        self.assertFalse(job["reaproveitado"])
+        self.assertEqual(job["status"], "pendente")
+        self.assertEqual(job["parametros"], {"usar_cache": True})
+
+        # Outro processo (outra conexão) vê o mesmo job
+        self.assertEqual(JobStore(self.caminho_db).create("empenhos de 2024", {}, "chave")["id"], job["id"])
+
+        self.assertTrue(self.store.mark_running(job["id"]))
+        self.store.finish(job["id"], "concluido", 60, resultado={"sucesso": True, "sql_gerado_final": "SELECT 1"})
+        reaproveitado = self.store.create("empenhos de 2024", {}, "chave")
+        self.assertTrue(reaproveitado["reaproveitado"])
+        self.assertEqual(reaproveitado["resultado"]["sql_gerado_final"], "SELECT 1")
+
+    def test_job_falho_nao_e_reaproveitado(self):
+        job = self.store.create("p", {}, "chave")
+        self.store.finish(job["id"], "falhou", 60, erro="erro")
+        self.assertNotEqual(self.store.create("p", {}, "chave")["id"], job["id"])
+
+    def test_cancelamento_impede_inicio_e_finalizacao_e_unica(self):
+        job = self.store.create("p", {}, "chave")
+        self.assertTrue(self.store.request_cancel(job["id"])["cancelamento_solicitado"])
+        self.assertEqual(self.store.cancel_requested([job["id"], "outro"]), [job["id"]])
+        self.assertFalse(self.store.mark_running(job["id"]))
+
+        self.store.finish(job["id"], "cancelado", 60, erro="Job cancelado.")
+        self.store.finish(job["id"], "concluido", 60, resultado={"sucesso": True})
+        self.assertEqual(self.store.get(job["id"])["status"], "cancelado")
+        self.assertIsNone(self.store.request_cancel("inexistente"))
+
+    def test_resultado_expira_e_abandonados_falham(self):
+        expirado = self.store.create("p1", {}, "c1")
+        self.store.finish(expirado["id"], "concluido", 0, resultado={"sucesso": True})
+        self.assertIsNone(self.store.get(expirado["id"]))
+        self.assertEqual(self.store.purge_expired(), 1)
+
+        abandonado = self.store.create("p2", {}, "c2")
+        ativo = self.store.create("p3", {}, "c3")
+        time.sleep(0.05)
+        self.store.heartbeat([ativo["id"]])
+        self.assertEqual(self.store.mark_abandoned(0.03, 60), 1)
+        self.assertEqual(self.store.get(abandonado["id"])["status"], "falhou")
+        self.assertEqual(self.store.get(ativo["id"])["status"], "pendente")
+        self.assertEqual(self.store.count_by_status(), {"falhou": 1, "pendente": 1})
+
+
+if __name__ == '__main__':
+    unittest.main()
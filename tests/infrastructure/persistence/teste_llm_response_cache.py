@@ -0,0 +1,135 @@
+"""
+Testes para o cache de respostas da LLM (memória + SQLite) e a política por etapa do LLMService.
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+# Adiciona o diretório 'src' ao PYTHONPATH, como no start_backend
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../src')))
+
+from infrastructure.persistence.llm_response_cache import LLMResponseCache
+from infrastructure.external_services.llm_service import LLMService
+from config.api.api_config import GeminiConfig
+from shared.utils.async_runner import AsyncRunner
+
+
+class TesteLLMResponseCache(unittest.TestCase):
+    """Testes do LLMResponseCache e da integração com o LLMService."""
+
+    def setUp(self):
+        self.diretorio = tempfile.TemporaryDirectory()
+        self.caminho_db = os.path.join(self.diretorio.name, "llm.sqlite3")
+
+    def tearDown(self):
+        LLMService.set_cache(None)
+        self.diretorio.cleanup()
+
+    def test_chave_depende_de_modelo_configuracao_e_prompt(self):
+        base = LLMResponseCache.chave("gemini-2.0-flash", "prompt")
+        self.assertEqual(base, LLMResponseCache.chave("gemini-2.0-flash", "prompt", {}))
+        self.assertNotEqual(base, LLMResponseCache.chave("gemini-2.0-flash-lite", "prompt"))
+        self.assertNotEqual(base, LLMResponseCache.chave("gemini-2.0-flash", "prompt", {"temperature": 0.2}))
+        self.assertNotEqual(base, LLMResponseCache.chave("gemini-2.0-flash", "prompt "))
+
+    def test_nivel_em_disco_compartilhado_entre_instancias(self):
+        chave = LLMResponseCache.chave("m", "p")
+        LLMResponseCache(caminho_db=self.caminho_db).put(chave, "2002", "m", "verificacao")
+
+        outro_worker = LLMResponseCache(caminho_db=self.caminho_db)
+        self.assertEqual(outro_worker.get(chave, "verificacao"), "2002")
+        self.assertEqual(outro_worker.get(chave, "verificacao"), "2002")
+        self.assertIsNone(outro_worker.get(LLMResponseCache.chave("m", "outro"), "extracao"))
+
+        stats = outro_worker.get_stats()
+        self.assertEqual((stats["hits_disco"], stats["hits_memoria"], stats["misses"]), (1, 1, 1))
+        self.assertEqual(stats["por_etapa"]["extracao"]["misses"], 1)
+
+    def test_respostas_expiram_nos_dois_niveis(self):
+        cache = LLMResponseCache(caminho_db=self.caminho_db, ttl_segundos=60)
+        chave = LLMResponseCache.chave("m", "p")
+        with patch("infrastructure.persistence.llm_response_cache.time.time", return_value=1000.0):
+            cache.put(chave, "2002", "m", "verificacao")
+            self.assertEqual(cache.get(chave), "2002")
+        with patch("infrastructure.persistence.llm_response_cache.time.time", return_value=1061.0):
+            self.assertIsNone(cache.get(chave))
+            self.assertIsNone(LLMResponseCache(caminho_db=self.caminho_db).get(chave))
+
+    def test_poda_mantem_as_linhas_mais_recentes(self):
+        cache = LLMResponseCache(caminho_db=self.caminho_db, capacidade_memoria=1, max_linhas=3)
+        with patch.object(LLMResponseCache, "PODA_A_CADA_GRAVACOES", 5):
+            for i in range(5):
+                with patch("infrastructure.persistence.llm_response_cache.time.time", return_value=1000.0 + i):
+                    cache.put(LLMResponseCache.chave("m", f"p{i}"), f"r{i}", "m")
+
+        linhas = cache._conexao.execute("SELECT resposta FROM respostas_llm ORDER BY criado_em").fetchall()
+        self.assertEqual([linha[0] for linha in linhas], ["r2", "r3", "r4"])
+
+    def test_banco_anterior_ao_ttl_ganha_a_coluna(self):
+        conexao = sqlite3.connect(self.caminho_db)
+        conexao.execute("CREATE TABLE respostas_llm (chave TEXT PRIMARY KEY, modelo TEXT NOT NULL, etapa TEXT, resposta TEXT NOT NULL, criado_em REAL NOT NULL)")
+        conexao.execute("INSERT INTO respostas_llm VALUES ('antiga', 'm', NULL, '2002', 1.0)")
+        conexao.commit()
+        conexao.close()
+
+        cache = LLMResponseCache(caminho_db=self.caminho_db, ttl_segundos=60)
+        self.assertEqual(cache.get("antiga"), "2002")
+        cache.put("nova", "SELECT 1", "m")
+        self.assertEqual(LLMResponseCache(caminho_db=self.caminho_db).get("nova"), "SELECT 1")
+
+    def test_politica_por_etapa_no_llm_service(self):
+        LLMService.set_cache(LLMResponseCache())
+        modelo = MagicMock()
+        modelo.generate_content_async = AsyncMock(return_value=MagicMock(text="resposta", usage_metadata=None))
+        cliente = MagicMock()
+        cliente.GenerativeModel.return_value = modelo
+
+        with patch.object(GeminiConfig, "get_client", return_value=cliente), \
+             patch.object(LLMService, "CACHE_ETAPAS", frozenset({"extracao", "verificacao"})):
+            for _ in range(2):
+                AsyncRunner.run(LLMService.processar_prompt_async("extraia", etapa="extracao"))
+                AsyncRunner.run(LLMService.processar_prompt_async("responda", nivel_modelo="forte", etapa="resposta_final"))
+            self.assertEqual(AsyncRunner.run(LLMService.processar_prompt_async("extraia", etapa="extracao")), "resposta")
+
+        # Extração chamou a API uma vez; a resposta final, nas duas vezes
+        self.assertEqual(modelo.generate_content_async.await_count, 3)
+        stats = LLMService.get_cache_stats()
+        self.assertEqual(stats["por_etapa"]["extracao"], {"hits_memoria": 2, "hits_disco": 0, "misses": 1})
+        self.assertNotIn("resposta_final", stats["por_etapa"])
+
+    def test_cascata_armazena_so_a_resposta_aceita(self):
+        LLMService.set_cache(LLMResponseCache())
+        modelos = {}
+
+        def modelo_para(nome):
+            texto = "ruim" if nome == LLMService.MODELOS["fraco"] else "bom"
+            return modelos.setdefault(nome, MagicMock(generate_content_async=AsyncMock(return_value=MagicMock(text=texto, usage_metadata=None))))
+
+        cliente = MagicMock()
+        cliente.GenerativeModel.side_effect = modelo_para
+        validar = lambda texto: None if texto == "bom" else "formato"
+
+        with patch.object(GeminiConfig, "get_client", return_value=cliente), \
+             patch.object(LLMService, "CACHE_ETAPAS", frozenset({"extracao"})), \
+             patch.object(LLMService, "CASCATA_ENABLED", True), \
+             patch.dict(LLMService.CASCATA_NIVEL_INICIAL, {"extracao": "fraco"}):
+            for _ in range(2):
+                self.assertEqual(AsyncRunner.run(LLMService.processar_prompt_cascata_async("extraia", validar, etapa="extracao")), ("bom", "medio"))
+
+        # A resposta rejeitada do nível fraco não foi guardada; a aceita do médio veio do cache
+        self.assertEqual(modelos[LLMService.MODELOS["fraco"]].generate_content_async.await_count, 2)
+        self.assertEqual(modelos[LLMService.MODELOS["medio"]].generate_content_async.await_count, 1)
+
+    def test_resposta_vazia_nao_e_armazenada(self):
+        LLMService.set_cache(LLMResponseCache())
+        with patch.object(GeminiConfig, "get_client", side_effect=RuntimeError("sem rede")):
+            self.assertEqual(LLMService.processar_prompt("extraia", etapa="extracao"), "")
+        self.assertEqual(LLMService.get_cache_stats()["itens_memoria"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+"""
+Testes para o SchemaCatalog: carga inicial e recarga em segundo plano.
+"""
+
+import os
+import sys
+import threading
+import unittest
+from unittest.mock import patch
+
+# Adiciona o diretório 'src' ao PYTHONPATH, como no start_backend
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../src')))
+
+from infrastructure.persistence.schema_catalog import SchemaCatalog
+
+
+class TesteSchemaCatalog(unittest.TestCase):
+    """Testes do SchemaCatalog."""
+
+    def setUp(self):
+        SchemaCatalog.reset()
+
+    def tearDown(self):
+        SchemaCatalog.reset()
+
+    def test_primeira_carga_e_sincrona(self):
+        with patch.object(SchemaCatalog, "_carregar_do_backend", return_value=[{"table_name": "a", "content": "x"}]):
+            self.assertEqual([t["table_name"] for t in SchemaCatalog.get_tables()], ["a"])
+        self.assertIsNotNone(SchemaCatalog.get_version())
+
+    def test_expiracao_serve_copia_antiga_enquanto_recarrega(self):
+        SchemaCatalog.set_tables([{"table_name": "antiga", "content": "x"}])
+        SchemaCatalog._carregado_em -= SchemaCatalog.REFRESH_SECONDS + 1
+        liberar = threading.Event()
+        recarregado = threading.Event()
+
+        def carregar_lento():
+            liberar.wait(5)
+            return [{"table_name": "nova", "content": "y"}]
+
+        original_set = SchemaCatalog.set_tables
+
+        def set_tables(tabelas):
+            original_set(tabelas)
+            recarregado.set()
+
+        with patch.object(SchemaCatalog, "_carregar_do_backend", side_effect=carregar_lento) as carregar, \
+             patch.object(SchemaCatalog, "set_tables", side_effect=set_tables):
+            # Enquanto o backend não responde, as requisições recebem a cópia antiga sem esperar
+            self.assertEqual(SchemaCatalog.get_tables()[0]["table_name"], "antiga")
+            self.assertEqual(SchemaCatalog.get_tables()[0]["table_name"], "antiga")
+            liberar.set()
+            self.assertTrue(recarregado.wait(5))
+            self.assertEqual(carregar.call_count, 1)
+
+        self.assertEqual(SchemaCatalog.get_tables()[0]["table_name"], "nova")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+"""
+Testes para o cache semântico de respostas finais e o TTL do LRUCache.
+"""
+
+import os
+import sys
+import unittest
+from unittest.mock import patch
+import numpy as np
+
+# Adiciona o diretório 'src' ao PYTHONPATH, como no start_backend
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../src')))
+
+from infrastructure.persistence.semantic_response_cache import SemanticResponseCache
+from shared.utils.lru_cache import LRUCache
+
+
+def _vetor_unitario(*valores):
+    vetor = np.array(valores, dtype=np.float32)
+    return vetor / np.linalg.norm(vetor)
+
+
+class TesteSemanticResponseCache(unittest.TestCase):
+    """Testes do SemanticResponseCache."""
+
+    def setUp(self):
+        self.cache = SemanticResponseCache(capacidade=2, limiar=0.95, ttl_segundos=60)
+        self.cache.put(_vetor_unitario(1, 0, 0), "Total empenhado por órgão em 2024", "v1", "SELECT 2024", ["el_cpe_ex.ct_empenho"])
+
+    def test_acerto_acima_do_limiar(self):
+        acerto = self.cache.get(_vetor_unitario(1, 0.1, 0), "total empenhado por orgão em 2024?", "v1")
+        self.assertEqual(acerto["sql_gerado_final"], "SELECT 2024")
+        self.assertEqual(acerto["tabelas"], ["el_cpe_ex.ct_empenho"])
+        self.assertGreater(acerto["similaridade"], 0.95)
+        self.assertIsNone(self.cache.get(_vetor_unitario(1, 1, 0), "total empenhado por órgão em 2024", "v1"))
+        self.assertEqual(self.cache.get_stats()["acertos"], 1)
+
+    def test_literais_diferentes_nao_acertam(self):
+        # Mesmo vetor, ano diferente
+        self.assertIsNone(self.cache.get(_vetor_unitario(1, 0, 0), "total empenhado por órgão em 2023", "v1"))
+
+    def test_mudanca_de_versao_do_catalogo_invalida(self):
+        self.assertIsNone(self.cache.get(_vetor_unitario(1, 0, 0), "Total empenhado por órgão em 2024", "v2"))
+        self.assertEqual(self.cache.get_stats()["invalidacoes"], 1)
+        self.assertIsNone(self.cache.get(_vetor_unitario(1, 0, 0), "Total empenhado por órgão em 2024", "v1"))
+
+    def test_lru_descarta_a_menos_usada_e_substitui_equivalente(self):
+        self.cache.put(_vetor_unitario(0, 1, 0), "contratos vigentes", "v1", "SELECT c", ["el_compras.cp_contrato"])
+        self.cache.get(_vetor_unitario(1, 0, 0), "Total empenhado por órgão em 2024", "v1")
+        self.cache.put(_vetor_unitario(0, 0, 1), "itens de contrato", "v1", "SELECT i", ["el_compras.cp_contrato_item"])
+        self.assertIsNone(self.cache.get(_vetor_unitario(0, 1, 0), "contratos vigentes", "v1"))
+        self.assertEqual(self.cache.get(_vetor_unitario(1, 0, 0), "Total empenhado por órgão em 2024", "v1")["sql_gerado_final"], "SELECT 2024")
+
+        # Prompt equivalente ocupa o lugar do anterior em vez de duplicá-lo
+        self.cache.put(_vetor_unitario(0, 0.05, 1), "itens de contrato!", "v1", "SELECT i2", ["el_compras.cp_contrato_item"])
+        self.assertEqual(self.cache.get_stats()["entradas"], 2)
+        self.assertEqual(self.cache.get(_vetor_unitario(0, 0, 1), "itens de contrato", "v1")["sql_gerado_final"], "SELECT i2")
+
+    def test_ttl_expira_entradas(self):
+        with patch("shared.utils.lru_cache.time.monotonic", return_value=1e12):
+            self.assertIsNone(self.cache.get(_vetor_unitario(1, 0, 0), "Total empenhado por órgão em 2024", "v1"))
+        self.assertEqual(self.cache.get_stats()["entradas"], 0)
+
+    def test_lru_cache_com_ttl_e_callback(self):
+        descartados = []
+        lru = LRUCache(2, ttl_segundos=10, ao_descartar=lambda chave, valor: descartados.append(chave))
+        with patch("shared.utils.lru_cache.time.monotonic", return_value=100.0):
+            lru.put("a", 1)
+            lru.put("b", 2)
+            lru.put("c", 3)
+        self.assertEqual(descartados, ["a"])
+        with patch("shared.utils.lru_cache.time.monotonic", return_value=105.0):
+            self.assertEqual(lru.get("b"), 2)
+        with patch("shared.utils.lru_cache.time.monotonic", return_value=111.0):
+            self.assertNotIn("c", lru)
+            self.assertEqual(lru.purge_expired(), 2)
+        self.assertEqual(descartados, ["a", "c", "b"])
+        self.assertEqual(len(lru), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
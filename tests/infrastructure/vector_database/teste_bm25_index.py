@@ -0,0 +1,104 @@
+"""
+Testes para o índice BM25 sobre o conteúdo dos chunks e sua fusão no SearchService.
+"""
+
+import os
+import sys
+import unittest
+from unittest.mock import patch
+import numpy as np
+
+# Adiciona o diretório 'src' ao PYTHONPATH, como no start_backend
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../src')))
+
+from infrastructure.vector_database.bm25_index import BM25Index, tokenize
+from infrastructure.vector_database.search_service import SearchService
+from infrastructure.persistence.schema_catalog import SchemaCatalog
+
+CATALOGO = [
+    {"table_name": "el_cpe_ex.ct_empenho", "content": "el_cpe_ex;ct_empenho;Empenhos da despesa;id;vl_empenhado;dt_emissao;PK:id;FK:id_credor>el_cpe_base.ct_credor(id)[DIR:OUTGOING]"},
+    {"table_name": "el_cpe_ex.ct_liquidacao", "content": "el_cpe_ex;ct_liquidacao;Liquidações de empenhos;id;id_empenho;vl_liquidado;PK:id"},
+    {"table_name": "el_compras.cp_contrato", "content": "el_compras;cp_contrato;Contratos firmados;id;nr_contrato;dt_assinatura;PK:id"},
+    {"table_name": "el_cpe_base.ct_credor", "content": "el_cpe_base;ct_credor;Credores;id;nm_credor;nr_cpf_cnpj;PK:id"},
+]
+
+
+class TesteBM25Index(unittest.TestCase):
+    """Testes do BM25Index."""
+
+    def test_tokeniza_identificadores_compostos(self):
+        self.assertEqual(tokenize("Dt_Assinatura;Órgão"), ["dt_assinatura", "dt", "assinatura", "orgao"])
+
+    def test_coluna_do_prompt_encontra_a_tabela(self):
+        indice = BM25Index()
+        indice.sync(CATALOGO)
+
+        resultados = indice.search("data de assinatura", k=2)
+
+        self.assertEqual(resultados[0][0]["table_name"], "el_compras.cp_contrato")
+
+    def test_nome_exato_da_coluna_pontua_mais(self):
+        indice = BM25Index()
+        indice.sync(CATALOGO)
+
+        resultados = dict((t["table_name"], s) for t, s in indice.search("vl_empenhado", k=4))
+
+        self.assertGreater(resultados["el_cpe_ex.ct_empenho"], resultados.get("el_cpe_ex.ct_liquidacao", 0.0))
+
+    def test_termo_presente_em_todos_os_chunks_e_ignorado(self):
+        indice = BM25Index()
+        indice.sync(CATALOGO)
+
+        self.assertEqual(indice.search("id", k=3), [])
+
+    def test_sync_reindexa_apenas_o_que_mudou(self):
+        indice = BM25Index()
+        self.assertEqual(indice.sync(CATALOGO), (4, 0))
+
+        alterado = dict(CATALOGO[2], content=CATALOGO[2]["content"] + ";vl_global")
+        self.assertEqual(indice.sync([CATALOGO[0], CATALOGO[1], alterado]), (1, 1))
+
+        self.assertEqual(len(indice), 3)
+        self.assertEqual(indice.search("vl_global", k=1)[0][0]["table_name"], "el_compras.cp_contrato")
+        self.assertEqual(indice.search("cnpj", k=1), [])
+
+
+class TesteFusaoBM25(unittest.TestCase):
+    """Testes da fonte BM25 na fusão RRF do SearchService."""
+
+    def setUp(self):
+        SchemaCatalog.set_tables(CATALOGO)
+        lexical = patch.object(SearchService, "LEXICAL_ENABLED", False)
+        lexical.start()
+        self.addCleanup(lexical.stop)
+
+    def tearDown(self):
+        SchemaCatalog.reset()
+
+    def test_colunas_do_prompt_entram_na_fusao(self):
+        ranking_vetorial = {
+            "query_table": "contratos",
+            "matches": [{"table_name": "el_cpe_ex.ct_empenho", "similarity_score": 0.7}]
+        }
+
+        with patch.object(SearchService, "_get_search_backend") as backend:
+            backend.return_value.find_top_similar_tables.return_value = [ranking_vetorial]
+            resultados = SearchService.find_top_similar_tables(
+                np.ones((1, 3), dtype=np.float32), ["contratos"], k=2, query_context=["dt_assinatura"]
+            )
+
+        matches = resultados[0]["matches"]
+        self.assertEqual({m["table_name"] for m in matches}, {"el_cpe_ex.ct_empenho", "el_compras.cp_contrato"})
+        contrato = next(m for m in matches if m["table_name"] == "el_compras.cp_contrato")
+        self.assertEqual(contrato["fontes"], ["bm25"])
+        self.assertIn("bm25_score", contrato)
+
+    def test_busca_por_conteudo_sem_embeddings(self):
+        matches = SearchService.search_content("nr_cpf_cnpj", k=1)
+
+        self.assertEqual(matches[0]["table_name"], "el_cpe_base.ct_credor")
+        self.assertAlmostEqual(matches[0]["similarity_score"], 1.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+"""
+Testes para o backend de busca FAISS local.
+"""
+
+import os
+import pickle
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+import faiss
+import numpy as np
+
+# Adiciona o diretório 'src' ao PYTHONPATH, como no start_backend
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../src')))
+
+from infrastructure.persistence.index_loader import IndexLoader
+from infrastructure.vector_database.faiss_search_service import FaissSearchService
+
+METADADOS = [
+    {"schema": "el_cpe_ex", "name": "ct_empenho", "content": "el_cpe_ex;ct_empenho;Empenhos"},
+    {"schema": "el_compras", "name": "cp_contrato", "content": "el_compras;cp_contrato;Contratos"},
+    {"schema": "el_cpe_base", "name": "ct_orgao", "content": "el_cpe_base;ct_orgao;Órgãos"},
+]
+
+
+class TesteFaissSearchService(unittest.TestCase):
+    """Testes do FaissSearchService."""
+
+    def setUp(self):
+        self.vetores = np.eye(3, dtype=np.float32)
+        self.indice = faiss.IndexFlatIP(3)
+        self.indice.add(self.vetores)
+
+    def test_formato_igual_ao_do_qdrant(self):
+        servico = FaissSearchService(index=self.indice, metadata=METADADOS)
+
+        resultados = servico.find_top_similar_tables(self.vetores[[1, 0]], ["contrato", "empenho"], k=2)
+
+        self.assertEqual([r["query_table"] for r in resultados], ["contrato", "empenho"])
+        melhor = resultados[0]["matches"][0]
+        self.assertEqual(melhor["table_name"], "el_compras.cp_contrato")
+        self.assertAlmostEqual(melhor["similarity_percentage"], 100.0, places=4)
+        self.assertEqual(melhor["content"], "el_compras;cp_contrato;Contratos")
+        self.assertEqual(len(resultados[1]["matches"]), 2)
+
+    def test_k_maior_que_o_indice_ignora_posicoes_vazias(self):
+        servico = FaissSearchService(index=self.indice, metadata=METADADOS)
+
+        resultados = servico.find_top_similar_tables(self.vetores[:1], ["empenho"], k=10)
+
+        self.assertEqual(len(resultados[0]["matches"]), 3)
+
+    def test_carrega_do_disco_com_mmap(self):
+        with tempfile.TemporaryDirectory() as diretorio:
+            caminho_indice = os.path.join(diretorio, "tabelas.index")
+            caminho_metadados = os.path.join(diretorio, "tabelas.pkl")
+            faiss.write_index(self.indice, caminho_indice)
+            with open(caminho_metadados, "wb") as f:
+                pickle.dump(METADADOS, f)
+
+            with patch.object(IndexLoader, "FAISS_INDEX_PATH", caminho_indice), \
+                 patch.object(IndexLoader, "METADATA_PATH", caminho_metadados):
+                servico = FaissSearchService(mmap=True)
+                resultados = servico.find_top_similar_tables(self.vetores[2:], ["orgao"], k=1)
+
+        self.assertEqual(resultados[0]["matches"][0]["table_name"], "el_cpe_base.ct_orgao")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+"""
+Testes para o índice léxico de trigramas e a fusão RRF no SearchService.
+"""
+
+import os
+import sys
+import unittest
+from unittest.mock import patch
+import numpy as np
+
+# Adiciona o diretório 'src' ao PYTHONPATH, como no start_backend
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../src')))
+
+from infrastructure.vector_database.lexical_index import LexicalIndex, fold_text
+from infrastructure.vector_database.search_service import SearchService
+from infrastructure.persistence.schema_catalog import SchemaCatalog
+
+CATALOGO = [
+    {"table_name": "el_cpe_ex.ct_empenho", "content": "el_cpe_ex;ct_empenho"},
+    {"table_name": "el_cpe_ex.ct_empenho_item", "content": "el_cpe_ex;ct_empenho_item"},
+    {"table_name": "el_compras.cp_contrato", "content": "el_compras;cp_contrato"},
+    {"table_name": "el_cpe_base.ct_orgao", "content": "el_cpe_base;ct_orgao"},
+    {"table_name": "el_cpe_ex.ct_liquidacao", "content": "el_cpe_ex;ct_liquidacao"},
+]
+
+
+class TesteLexicalIndex(unittest.TestCase):
+    """Testes do LexicalIndex."""
+
+    def test_remove_acentos_e_separadores(self):
+        self.assertEqual(fold_text("el_cpe_ex.CT_Órgão"), "el cpe ex ct orgao")
+
+    def test_nome_com_prefixo_e_encontrado_primeiro(self):
+        indice = LexicalIndex(CATALOGO)
+
+        resultados = indice.search("empenho", k=2)
+
+        self.assertEqual([t["table_name"] for t, _ in resultados], ["el_cpe_ex.ct_empenho", "el_cpe_ex.ct_empenho_item"])
+        self.assertGreater(resultados[0][1], resultados[1][1])
+
+    def test_acentos_na_consulta(self):
+        resultados = LexicalIndex(CATALOGO).search("órgão", k=1)
+
+        self.assertEqual(resultados[0][0]["table_name"], "el_cpe_base.ct_orgao")
+
+    def test_sem_correspondencia(self):
+        self.assertEqual(LexicalIndex(CATALOGO).search("xyz", k=3), [])
+
+
+class TesteFusaoRRF(unittest.TestCase):
+    """Testes da fusão entre ranking vetorial e léxico."""
+
+    def setUp(self):
+        SchemaCatalog.set_tables(CATALOGO)
+        # Isola a fusão vetorial x léxica; a fonte BM25 é testada em teste_bm25_index
+        bm25 = patch.object(SearchService, "BM25_ENABLED", False)
+        bm25.start()
+        self.addCleanup(bm25.stop)
+
+    def tearDown(self):
+        SchemaCatalog.reset()
+
+    def test_fusao_sobe_o_match_literal(self):
+        ranking_vetorial = {
+            "query_table": "empenho",
+            "matches": [
+                {"table_name": "el_cpe_ex.ct_liquidacao", "similarity_score": 0.81},
+                {"table_name": "el_cpe_ex.ct_empenho", "similarity_score": 0.80},
+            ]
+        }
+
+        with patch.object(SearchService, "_get_search_backend") as backend:
+            backend.return_value.find_top_similar_tables.return_value = [ranking_vetorial]
+            resultados = SearchService.find_top_similar_tables(np.ones((1, 3), dtype=np.float32), ["empenho"], k=3)
+
+        matches = resultados[0]["matches"]
+        self.assertEqual(matches[0]["table_name"], "el_cpe_ex.ct_empenho")
+        self.assertEqual(matches[0]["fontes"], ["vetorial", "lexical"])
+        self.assertAlmostEqual(matches[0]["similarity_score"], 0.80)
+        self.assertIn("lexical_score", matches[0])
+        self.assertEqual(len(matches), 3)
+
+    def test_falha_no_backend_mantem_resultados_lexicos(self):
+        with patch.object(SearchService, "_get_search_backend", side_effect=ValueError("Qdrant fora do ar")):
+            resultados = SearchService.find_top_similar_tables(np.ones((1, 3), dtype=np.float32), ["contrato"], k=2)
+
+        self.assertEqual(resultados[0]["matches"][0]["table_name"], "el_compras.cp_contrato")
+        self.assertEqual(resultados[0]["matches"][0]["fontes"], ["lexical"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+"""
+Testes para a conexão compartilhada com o Qdrant.
+"""
+
+import os
+import sys
+import threading
+import unittest
+from unittest.mock import patch, MagicMock
+
+# Adiciona o diretório 'src' ao PYTHONPATH, como no start_backend
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../src')))
+
+from infrastructure.vector_database.qdrant_connection import QdrantConnection
+
+
+def _cliente_falso(tamanho_vetor=768):
+    cliente = MagicMock()
+    cliente.get_collection.return_value.config.params.vectors.size = tamanho_vetor
+    return cliente
+
+
+class TesteQdrantConnection(unittest.TestCase):
+    """Testes do QdrantConnection."""
+
+    def setUp(self):
+        QdrantConnection.reset()
+
+    def tearDown(self):
+        QdrantConnection.reset()
+
+    def test_cliente_e_reutilizado(self):
+        cliente = _cliente_falso()
+        with patch.object(QdrantConnection, "_criar_cliente", return_value=cliente) as criar:
+            self.assertIs(QdrantConnection.get_client(), cliente)
+            self.assertIs(QdrantConnection.get_client(), cliente)
+        criar.assert_called_once()
+        cliente.get_collections.assert_not_called()
+
+    def test_informacoes_da_colecao_ficam_em_cache(self):
+        cliente = _cliente_falso(tamanho_vetor=768)
+        with patch.object(QdrantConnection, "_criar_cliente", return_value=cliente):
+            self.assertEqual(QdrantConnection.get_vector_size("sql_metadados"), 768)
+            self.assertEqual(QdrantConnection.get_vector_size("sql_metadados"), 768)
+            self.assertEqual(cliente.get_collection.call_count, 1)
+
+            with patch.object(QdrantConnection, "COLLECTION_INFO_TTL", 0):
+                QdrantConnection.get_vector_size("sql_metadados")
+            self.assertEqual(cliente.get_collection.call_count, 2)
+
+    def test_falha_dispara_health_check_sem_reconectar_se_saudavel(self):
+        cliente = _cliente_falso()
+        with patch.object(QdrantConnection, "_criar_cliente", return_value=cliente) as criar:
+            QdrantConnection.get_client()
+            QdrantConnection.mark_unhealthy()
+            self.assertIs(QdrantConnection.get_client(), cliente)
+        cliente.get_collections.assert_called_once()
+        criar.assert_called_once()
+
+    def test_reconecta_quando_health_check_falha(self):
+        antigo, novo = _cliente_falso(), _cliente_falso()
+        antigo.get_collections.side_effect = ConnectionError("conexão perdida")
+        with patch.object(QdrantConnection, "_criar_cliente", side_effect=[antigo, novo]):
+            QdrantConnection.get_client()
+            QdrantConnection.mark_unhealthy()
+            self.assertIs(QdrantConnection.get_client(), novo)
+        antigo.close.assert_called_once()
+
+    def test_health_check_nao_segura_o_lock(self):
+        cliente = _cliente_falso()
+        outras_threads = []
+
+        def sondar():
+            # Durante a sondagem, outra thread consegue o lock (e o cliente atual) sem esperar
+            def tentar_lock():
+                conseguiu = QdrantConnection._lock.acquire(timeout=0.5)
+                if conseguiu:
+                    QdrantConnection._lock.release()
+                outras_threads.append(conseguiu)
+
+            thread = threading.Thread(target=tentar_lock)
+            thread.start()
+            thread.join()
+            return {}
+
+        cliente.get_collections.side_effect = sondar
+        with patch.object(QdrantConnection, "_criar_cliente", return_value=cliente):
+            QdrantConnection.get_client()
+            QdrantConnection.mark_unhealthy()
+            self.assertIs(QdrantConnection.get_client(), cliente)
+        self.assertEqual(outras_threads, [True])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+"""
+Testes para a busca em lote do QdrantSearchService usando um Qdrant em memória.
+"""
+
+import asyncio
+import os
+import sys
+import unittest
+from unittest.mock import patch
+import numpy as np
+
+# Adiciona o diretório 'src' ao PYTHONPATH, como no start_backend
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../src')))
+
+from qdrant_client import AsyncQdrantClient, QdrantClient, models
+from infrastructure.vector_database.qdrant_search_service import QdrantSearchService
+
+
+class TesteQdrantSearchService(unittest.TestCase):
+    """Testes do QdrantSearchService com o modo local (':memory:') do qdrant-client."""
+
+    def setUp(self):
+        self.client = QdrantClient(location=":memory:")
+        self.client.create_collection(
+            collection_name="sql_metadados",
+            vectors_config=models.VectorParams(size=3, distance=models.Distance.COSINE)
+        )
+        self.vetores = np.eye(3, dtype=np.float32)
+        self.client.upsert(
+            collection_name="sql_metadados",
+            points=[
+                models.PointStruct(id=1, vector=self.vetores[0].tolist(), payload={"schema": "el_cpe_ex", "name": "ct_empenho", "content": "el_cpe_ex;ct_empenho"}),
+                models.PointStruct(id=2, vector=self.vetores[1].tolist(), payload={"schema": "el_compras", "name": "cp_contrato", "content": "el_compras;cp_contrato"}),
+                models.PointStruct(id=3, vector=self.vetores[2].tolist(), payload={"name": "orgao", "content": "orgao"}),
+            ]
+        )
+        self.servico = QdrantSearchService(client=self.client)
+
+    def test_lote_e_por_consulta_retornam_o_mesmo_formato(self):
+        nomes = ["empenho", "contrato"]
+        consultas = self.vetores[:2]
+
+        em_lote = self.servico.find_top_similar_tables(consultas, nomes, k=2, batch=True)
+        por_consulta = self.servico.find_top_similar_tables(consultas, nomes, k=2, batch=False)
+
+        self.assertEqual([r["query_table"] for r in em_lote], nomes)
+        self.assertEqual(em_lote[0]["matches"][0]["table_name"], "el_cpe_ex.ct_empenho")
+        self.assertEqual(em_lote[1]["matches"][0]["table_name"], "el_compras.cp_contrato")
+        self.assertEqual(
+            [[m["table_name"] for m in r["matches"]] for r in em_lote],
+            [[m["table_name"] for m in r["matches"]] for r in por_consulta]
+        )
+
+    def test_falha_no_lote_marca_erro_apenas_na_consulta_com_problema(self):
+        original = self.client.query_points
+
+        def query_points_falhando_no_contrato(*args, **kwargs):
+            if kwargs["query"] == self.vetores[1].tolist():
+                raise RuntimeError("timeout")
+            return original(*args, **kwargs)
+
+        with patch.object(self.client, "query_batch_points", side_effect=RuntimeError("lote indisponível")), \
+             patch.object(self.client, "query_points", side_effect=query_points_falhando_no_contrato):
+            resultados = self.servico.find_top_similar_tables(self.vetores, ["empenho", "contrato", "orgao"], k=1)
+
+        self.assertNotIn("error", resultados[0])
+        self.assertEqual(resultados[1]["matches"], [])
+        self.assertIn("timeout", resultados[1]["error"])
+        self.assertEqual(resultados[2]["matches"][0]["table_name"], "orgao")
+
+
+class TesteQdrantSearchServiceAsync(unittest.IsolatedAsyncioTestCase):
+    """Testes da busca assíncrona com o AsyncQdrantClient em memória."""
+
+    async def asyncSetUp(self):
+        self.client = AsyncQdrantClient(location=":memory:")
+        await self.client.create_collection(
+            collection_name="sql_metadados",
+            vectors_config=models.VectorParams(size=3, distance=models.Distance.COSINE)
+        )
+        self.vetores = np.eye(3, dtype=np.float32)
+        await self.client.upsert(
+            collection_name="sql_metadados",
+            points=[
+                models.PointStruct(id=1, vector=self.vetores[0].tolist(), payload={"schema": "el_cpe_ex", "name": "ct_empenho", "content": "el_cpe_ex;ct_empenho"}),
+                models.PointStruct(id=2, vector=self.vetores[1].tolist(), payload={"schema": "el_compras", "name": "cp_contrato", "content": "el_compras;cp_contrato"}),
+            ]
+        )
+        self.servico = QdrantSearchService(async_client=self.client)
+
+    async def test_busca_assincrona_em_lote_e_concorrente(self):
+        nomes = ["empenho", "contrato"]
+
+        em_lote, concorrente = await asyncio.gather(
+            self.servico.find_top_similar_tables_async(self.vetores[:2], nomes, k=1, batch=True),
+            self.servico.find_top_similar_tables_async(self.vetores[:2], nomes, k=1, batch=False),
+        )
+
+        self.assertEqual(em_lote, concorrente)
+        self.assertEqual([r["matches"][0]["table_name"] for r in em_lote], ["el_cpe_ex.ct_empenho", "el_compras.cp_contrato"])
+
+
+if __name__ == '__main__':
+    unittest.main()
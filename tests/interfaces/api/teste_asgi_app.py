@@ -0,0 +1,109 @@
+"""
+Testes do ponto de entrada ASGI: /sql-gen assíncrono e demais rotas pelo Flask, com o pipeline RAG simulado.
+"""
+
+import asyncio
+import json
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+# Adiciona o diretório 'src' ao PYTHONPATH, como no start_backend
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../src')))
+
+from interfaces.api import asgi_app
+from interfaces.api.asgi_app import app
+from application.services.rag_service import RAGService
+
+
+async def requisitar(metodo: str, caminho: str, corpo: bytes = b""):
+    """Executa uma requisição HTTP na aplicação ASGI e devolve (status, cabeçalhos, corpo)."""
+    escopo = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": metodo,
+        "scheme": "http", "path": caminho, "raw_path": caminho.encode(), "query_string": b"", "root_path": "",
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(corpo)).encode())],
+        "client": ("127.0.0.1", 1234), "server": ("127.0.0.1", 8000),
+    }
+    mensagens = [{"type": "http.request", "body": corpo, "more_body": False}]
+    enviadas = []
+
+    async def receive():
+        if mensagens:
+            return mensagens.pop(0)
+        await asyncio.sleep(3600)
+
+    async def send(mensagem):
+        enviadas.append(mensagem)
+
+    await app(escopo, receive, send)
+    inicio = next(m for m in enviadas if m["type"] == "http.response.start")
+    conteudo = b"".join(m.get("body", b"") for m in enviadas if m["type"] == "http.response.body")
+    return inicio["status"], dict(inicio["headers"]), conteudo
+
+
+class TesteAsgiApp(unittest.TestCase):
+
+    def test_requisicoes_simultaneas_sem_thread_por_requisicao(self):
+        em_andamento = []
+        liberar = asyncio.Event()
+
+        async def pipeline(prompt, **kwargs):
+            em_andamento.append(prompt)
+            if len(em_andamento) == 50:
+                liberar.set()
+            await liberar.wait()
+            return {"sucesso": True, "sql_gerado_final": f"SELECT '{prompt}'", "erro": None}
+
+        async def disparar():
+            return await asyncio.gather(*(
+                requisitar("POST", "/sql-gen", json.dumps({"prompt": f"p{i}"}).encode()) for i in range(50)
+            ))
+
+        # As 50 requisições ficam abertas ao mesmo tempo no mesmo loop do servidor
+        with patch.object(RAGService, "generate_sql_from_prompt_async", side_effect=pipeline):
+            respostas = asyncio.run(asyncio.wait_for(disparar(), timeout=10))
+
+        self.assertEqual(len(em_andamento), 50)
+        self.assertTrue(all(status == 200 for status, _, _ in respostas))
+        status, cabecalhos, corpo = respostas[7]
+        self.assertEqual(json.loads(corpo)["sql_gerado_final"], "SELECT 'p7'")
+        self.assertEqual(cabecalhos[b"access-control-allow-origin"], b"*")
+
+    def test_llm_indisponivel_e_corpo_invalido(self):
+        async def pipeline(prompt, **kwargs):
+            return {"sucesso": False, "erro": "indisponível", "indisponivel": True, "tentar_novamente_em": 12.3}
+
+        with patch.object(RAGService, "generate_sql_from_prompt_async", side_effect=pipeline):
+            status, cabecalhos, _ = asyncio.run(requisitar("POST", "/sql-gen", b'{"prompt": "empenhos"}'))
+        self.assertEqual((status, cabecalhos[b"retry-after"]), (503, b"13"))
+
+        status, _, corpo = asyncio.run(requisitar("POST", "/sql-gen", b'{"prompt"'))
+        self.assertEqual(status, 400)
+        status, _, corpo = asyncio.run(requisitar("POST", "/sql-gen", b'{"orcamento": {}}'))
+        self.assertEqual((status, json.loads(corpo)["erro"]), (400, "O campo 'prompt' é obrigatório"))
+
+    def test_demais_rotas_vao_para_o_flask(self):
+        status, _, corpo = asyncio.run(requisitar("GET", "/health"))
+        self.assertEqual(status, 200)
+        self.assertTrue(json.loads(corpo))
+
+    def test_lifespan_aquece_os_servicos(self):
+        mensagens = [{"type": "lifespan.startup"}, {"type": "lifespan.shutdown"}]
+        enviadas = []
+
+        async def receive():
+            return mensagens.pop(0)
+
+        async def send(mensagem):
+            enviadas.append(mensagem["type"])
+
+        with patch.object(asgi_app, "aquecer_servicos") as aquecer:
+            asyncio.run(app({"type": "lifespan"}, receive, send))
+
+        aquecer.assert_called_once()
+        self.assertEqual(enviadas, ["lifespan.startup.complete", "lifespan.shutdown.complete"])
+
+
+if __name__ == '__main__':
+    unittest.main()
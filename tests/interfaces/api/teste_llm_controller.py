@@ -0,0 +1,292 @@
+"""
+Testes dos endpoints de streaming (SSE), de lote (NDJSON), de jobs e de prontidão da API, com o pipeline RAG simulado.
+"""
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+# Adiciona o diretório 'src' ao PYTHONPATH, como no start_backend
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../src')))
+
+from interfaces.api import llm_controller
+from interfaces.api.llm_controller import app
+from application.services.rag_service import RAGService
+from application.services.job_service import JobService
+from infrastructure.persistence.job_store import JobStore
+from shared.utils.async_runner import AsyncRunner
+
+
+def ler_eventos(corpo: str):
+    eventos = []
+    for bloco in corpo.strip().split("\n\n"):
+        linhas = dict(linha.split(": ", 1) for linha in bloco.splitlines())
+        eventos.append((linhas["event"], json.loads(linhas["data"])))
+    return eventos
+
+
+class TesteSqlGenStream(unittest.TestCase):
+
+    def setUp(self):
+        self.cliente = app.test_client()
+
+    def test_eventos_de_etapa_tokens_e_resultado(self):
+        async def pipeline(prompt, notificar=None, **kwargs):
+            notificar({"tipo": "etapa", "etapa": "extracao", "iteracao": 0})
+            notificar({"tipo": "token", "texto": "SELECT 1"})
+            return {"sucesso": True, "sql_gerado_final": "SELECT 1", "erro": None}
+
+        with patch.object(RAGService, "generate_sql_from_prompt_async", side_effect=pipeline):
+            resposta = self.cliente.post('/sql-gen/stream', json={"prompt": "empenhos"})
+            corpo = resposta.get_data(as_text=True)
+
+        self.assertEqual(resposta.status_code, 200)
+        self.assertTrue(resposta.mimetype.startswith("text/event-stream"))
+        eventos = ler_eventos(corpo)
+        self.assertEqual([tipo for tipo, _ in eventos], ["etapa", "token", "resultado"])
+        self.assertEqual(eventos[-1][1]["sql_gerado_final"], "SELECT 1")
+
+    def test_erro_no_pipeline_vira_evento_erro(self):
+        async def pipeline(prompt, notificar=None, **kwargs):
+            raise RuntimeError("falhou")
+
+        with patch.object(RAGService, "generate_sql_from_prompt_async", side_effect=pipeline):
+            corpo = self.cliente.get('/sql-gen/stream?prompt=empenhos').get_data(as_text=True)
+
+        self.assertEqual(ler_eventos(corpo)[-1][0], "erro")
+
+    def test_prompt_ausente(self):
+        self.assertEqual(self.cliente.post('/sql-gen/stream', json={}).status_code, 400)
+
+    def test_desconexao_cancela_o_pipeline(self):
+        cancelado = threading.Event()
+
+        async def pipeline(prompt, notificar=None, **kwargs):
+            notificar({"tipo": "etapa", "etapa": "extracao", "iteracao": 0})
+            try:
+                await asyncio.sleep(30)
+            except asyncio.CancelledError:
+                cancelado.set()
+                raise
+
+        with patch.object(RAGService, "generate_sql_from_prompt_async", side_effect=pipeline):
+            resposta = self.cliente.post('/sql-gen/stream', json={"prompt": "empenhos"}, buffered=False)
+            self.assertIn("extracao", next(iter(resposta.response)).decode())
+            resposta.close()
+
+        self.assertTrue(cancelado.wait(5))
+
+    def test_llm_indisponivel_responde_503_com_retry_after(self):
+        async def pipeline(prompt, **kwargs):
+            return {"sucesso": False, "erro": "Modelo de linguagem temporariamente indisponível", "indisponivel": True, "tentar_novamente_em": 12.3}
+
+        with patch.object(RAGService, "generate_sql_from_prompt_async", side_effect=pipeline):
+            resposta = self.cliente.post('/sql-gen', json={"prompt": "empenhos"})
+
+        self.assertEqual(resposta.status_code, 503)
+        self.assertEqual(resposta.headers["Retry-After"], "13")
+        self.assertTrue(resposta.get_json()["indisponivel"])
+
+
+class TesteSqlGenBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.cliente = app.test_client()
+
+    def test_ndjson_na_ordem_de_conclusao(self):
+        executados = []
+
+        async def pipeline(prompt, **kwargs):
+            executados.append(prompt)
+            await asyncio.sleep(0.05 if prompt.startswith("lento") else 0)
+            return {"sucesso": True, "sql_gerado_final": f"SELECT '{prompt}'", "erro": None}
+
+        with patch.object(RAGService, "generate_sql_from_prompt_async", side_effect=pipeline):
+            resposta = self.cliente.post('/sql-gen/batch', json={"prompts": ["lento", "rapido", "Rapido?"], "concorrencia": 2})
+            linhas = [json.loads(linha) for linha in resposta.get_data(as_text=True).splitlines()]
+
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.mimetype, "application/x-ndjson")
+        # 'rapido' e 'Rapido?' são o mesmo prompt normalizado: executado uma vez, respondido duas
+        self.assertEqual(sorted(executados), ["lento", "rapido"])
+        self.assertEqual([(l["tipo"], l.get("indice")) for l in linhas], [("resultado", 1), ("resultado", 2), ("resultado", 0), ("resumo", None)])
+        self.assertEqual(linhas[1]["sql_gerado_final"], "SELECT 'rapido'")
+        self.assertEqual((linhas[-1]["total"], linhas[-1]["prompts_distintos"], linhas[-1]["sucessos"]), (3, 2, 3))
+
+    def test_prompts_invalidos(self):
+        self.assertEqual(self.cliente.post('/sql-gen/batch', json={"prompts": []}).status_code, 400)
+        self.assertEqual(self.cliente.post('/sql-gen/batch', json={"prompts": ["ok", ""]}).status_code, 400)
+        self.assertEqual(self.cliente.post('/sql-gen/batch', json={"prompts": ["ok"], "concorrencia": "x"}).status_code, 400)
+
+
+class TesteJobs(unittest.TestCase):
+
+    def setUp(self):
+        self.cliente = app.test_client()
+        self.diretorio = tempfile.TemporaryDirectory()
+        JobService.set_store(JobStore(os.path.join(self.diretorio.name, "jobs.sqlite3")))
+
+    def tearDown(self):
+        self.diretorio.cleanup()
+
+    def aguardar_status(self, job_id, *status):
+        limite = time.monotonic() + 5
+        while time.monotonic() < limite:
+            job = self.cliente.get(f'/jobs/{job_id}').get_json()
+            if job["status"] in status:
+                return job
+            time.sleep(0.01)
+        self.fail(f"Job {job_id} não chegou a {status}")
+
+    def test_submeter_reconectar_e_acompanhar(self):
+        liberar = asyncio.Event()
+        executados = []
+
+        async def pipeline(prompt, notificar=None, **kwargs):
+            executados.append(prompt)
+            notificar({"tipo": "etapa", "etapa": "extracao", "iteracao": 0})
+            await liberar.wait()
+            notificar({"tipo": "token", "texto": "SELECT 1"})
+            return {"sucesso": True, "sql_gerado_final": "SELECT 1", "erro": None}
+
+        with patch.object(RAGService, "generate_sql_from_prompt_async", side_effect=pipeline):
+            resposta = self.cliente.post('/jobs', json={"prompt": "empenhos de 2024"})
+            self.assertEqual(resposta.status_code, 202)
+            job = resposta.get_json()["job"]
+            self.assertEqual(resposta.headers["Location"], f"/jobs/{job['id']}")
+            self.aguardar_status(job["id"], "executando")
+
+            # O cliente que refaz a requisição recebe o mesmo job
+            repetida = self.cliente.post('/jobs', json={"prompt": "Empenhos de 2024?"}).get_json()
+            self.assertTrue(repetida["reaproveitado"])
+            self.assertEqual(repetida["job"]["id"], job["id"])
+
+            # O stream assina o job ainda em execução: recebe o histórico e os eventos seguintes
+            stream = self.cliente.get(f'/jobs/{job["id"]}/stream', buffered=False)
+            AsyncRunner.get_loop().call_soon_threadsafe(liberar.set)
+            eventos = ler_eventos(stream.get_data(as_text=True))
+
+        self.assertEqual(executados, ["empenhos de 2024"])
+        self.assertEqual([tipo for tipo, _ in eventos], ["status", "status", "etapa", "token", "resultado"])
+        self.assertEqual(eventos[-1][1]["status"], "concluido")
+        self.assertEqual(eventos[-1][1]["resultado"]["sql_gerado_final"], "SELECT 1")
+        self.assertEqual(self.cliente.delete(f'/jobs/{job["id"]}').status_code, 409)
+
+    def test_cancelar_job_em_execucao(self):
+        async def pipeline(prompt, notificar=None, **kwargs):
+            await asyncio.sleep(10)
+
+        with patch.object(RAGService, "generate_sql_from_prompt_async", side_effect=pipeline):
+            job = self.cliente.post('/jobs', json={"prompt": "lento"}).get_json()["job"]
+            self.aguardar_status(job["id"], "executando")
+            self.assertEqual(self.cliente.delete(f'/jobs/{job["id"]}').status_code, 202)
+            cancelado = self.aguardar_status(job["id"], "cancelado")
+
+        self.assertEqual(cancelado["erro"], "Job cancelado.")
+        # Um job cancelado não é reaproveitado
+        with patch.object(RAGService, "generate_sql_from_prompt_async", side_effect=pipeline):
+            novo = self.cliente.post('/jobs', json={"prompt": "lento"}).get_json()
+            self.assertFalse(novo["reaproveitado"])
+            self.cliente.delete(f'/jobs/{novo["job"]["id"]}')
+            self.aguardar_status(novo["job"]["id"], "cancelado")
+
+    def test_banco_de_jobs_acessado_fora_do_loop(self):
+        store = JobService.get_store()
+        threads = []
+        marcar, finalizar = store.mark_running, store.finish
+
+        def mark_running(job_id):
+            threads.append(threading.current_thread())
+            return marcar(job_id)
+
+        def finish(*args, **kwargs):
+            threads.append(threading.current_thread())
+            return finalizar(*args, **kwargs)
+
+        async def pipeline(prompt, notificar=None, **kwargs):
+            return {"sucesso": True, "sql_gerado_final": "SELECT 1", "erro": None}
+
+        with patch.object(store, "mark_running", side_effect=mark_running), \
+             patch.object(store, "finish", side_effect=finish), \
+             patch.object(RAGService, "generate_sql_from_prompt_async", side_effect=pipeline):
+            job = self.cliente.post('/jobs', json={"prompt": "fora do loop"}).get_json()["job"]
+            self.aguardar_status(job["id"], "concluido")
+
+        self.assertEqual(len(threads), 2)
+        self.assertNotIn(AsyncRunner._thread, threads)
+
+    def test_job_inexistente_e_prompt_ausente(self):
+        self.assertEqual(self.cliente.get('/jobs/inexistente').status_code, 404)
+        self.assertEqual(self.cliente.delete('/jobs/inexistente').status_code, 404)
+        self.assertEqual(self.cliente.get('/jobs/inexistente/stream').status_code, 404)
+        self.assertEqual(self.cliente.post('/jobs', json={}).status_code, 400)
+
+
+class TesteProntidao(unittest.TestCase):
+
+    def setUp(self):
+        self.cliente = app.test_client()
+        self.estado_original = dict(llm_controller._estado_aquecimento)
+        llm_controller._estado_aquecimento.clear()
+        llm_controller._estado_aquecimento.update({"pronto": False, "etapas_ms": {}, "erros": {}})
+
+    def tearDown(self):
+        if llm_controller._timer_aquecimento is not None:
+            llm_controller._timer_aquecimento.cancel()
+        llm_controller._estado_aquecimento.clear()
+        llm_controller._estado_aquecimento.update(self.estado_original)
+
+    def aquecer(self, **falhas):
+        etapas = {"gemini": (llm_controller.GeminiConfig, "initialize"), "busca": (llm_controller.SearchService, "warmup"),
+                  "catalogo": (llm_controller.SchemaCatalog, "get_tables")}
+        patches = [patch.object(alvo, nome, side_effect=falhas.get(etapa)) for etapa, (alvo, nome) in etapas.items()]
+        self.chamadas = {}
+        for etapa, p in zip(etapas, patches):
+            self.chamadas[etapa] = p.start()
+        try:
+            return llm_controller.aquecer_servicos()
+        finally:
+            for p in patches:
+                p.stop()
+
+    def test_pronto_somente_apos_aquecimento(self):
+        self.assertEqual(self.cliente.get('/health').status_code, 200)
+        self.assertEqual(self.cliente.get('/ready').status_code, 503)
+
+        estado = self.aquecer()
+        self.assertTrue(estado["pronto"])
+        self.assertEqual(set(estado["etapas_ms"]), {"gemini", "async_runner", "busca", "catalogo"})
+        self.assertEqual(self.cliente.get('/ready').status_code, 200)
+
+    def test_falha_no_aquecimento_nao_fica_pronto(self):
+        estado = self.aquecer(gemini=ValueError("LLM_API_KEY ausente"))
+        self.assertFalse(estado["pronto"])
+        resposta = self.cliente.get('/ready')
+        self.assertEqual(resposta.status_code, 503)
+        self.assertIn("gemini", resposta.get_json()["erros"])
+
+    def test_etapas_com_falha_sao_repetidas(self):
+        with patch.object(llm_controller, "_AQUECIMENTO_ESPERA_BASE", 30):
+            estado = self.aquecer(busca=ConnectionError("Qdrant indisponível"))
+        self.assertFalse(estado["pronto"])
+        self.assertEqual(estado["proxima_tentativa_segundos"], 30)
+        self.assertTrue(llm_controller._timer_aquecimento.is_alive())
+        llm_controller._timer_aquecimento.cancel()
+
+        # A nova tentativa (feita pelo timer) repete só a etapa que falhou
+        estado = self.aquecer()
+        self.assertTrue(estado["pronto"])
+        self.assertEqual(estado["tentativas"], 2)
+        self.assertEqual(self.chamadas["busca"].call_count, 1)
+        self.assertEqual(self.chamadas["gemini"].call_count, 0)
+        self.assertEqual(self.cliente.get('/ready').status_code, 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
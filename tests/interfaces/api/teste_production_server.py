@@ -0,0 +1,67 @@
+"""
+Testes da escolha e da configuração do servidor WSGI de produção.
+"""
+
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+# Adiciona o diretório 'src' ao PYTHONPATH, como no start_backend
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../src')))
+
+from interfaces.api.production_server import ProductionServer
+from interfaces.api import llm_controller
+
+
+class TesteProductionServer(unittest.TestCase):
+
+    def test_escolha_automatica_do_servidor(self):
+        instalados = {"uvicorn": True, "gunicorn": True, "waitress": True}
+        with patch.object(ProductionServer, "SERVIDOR", "auto"), \
+             patch.object(ProductionServer, "_disponivel", side_effect=lambda modulo: instalados[modulo]):
+            self.assertEqual(ProductionServer.escolher_servidor(), "uvicorn")
+            instalados["uvicorn"] = False
+            with patch.object(os, "name", "posix"):
+                self.assertEqual(ProductionServer.escolher_servidor(), "gunicorn")
+            with patch.object(os, "name", "nt"):
+                self.assertEqual(ProductionServer.escolher_servidor(), "waitress")
+            instalados["waitress"] = False
+            with patch.object(os, "name", "nt"):
+                self.assertEqual(ProductionServer.escolher_servidor(), "flask")
+
+        with patch.object(ProductionServer, "SERVIDOR", "waitress"):
+            self.assertEqual(ProductionServer.escolher_servidor(), "waitress")
+
+    def test_opcoes_gunicorn_aquecem_cada_worker_sem_preload(self):
+        with patch.object(ProductionServer, "WORKERS", 3), patch.object(ProductionServer, "THREADS", 4), \
+             patch.object(ProductionServer, "MAX_REQUESTS", 1000):
+            opcoes = ProductionServer.opcoes_gunicorn("0.0.0.0", 8000)
+
+        self.assertEqual(opcoes["bind"], "0.0.0.0:8000")
+        self.assertEqual((opcoes["workers"], opcoes["worker_class"], opcoes["threads"]), (3, "gthread", 4))
+        self.assertEqual(opcoes["max_requests_jitter"], 100)
+        self.assertFalse(opcoes["preload_app"])
+
+        with patch.object(llm_controller, "aquecer_servicos") as aquecer:
+            opcoes["post_worker_init"](object())
+        aquecer.assert_called_once()
+
+    def test_opcoes_uvicorn(self):
+        with patch.object(ProductionServer, "WORKERS", 3), patch.object(ProductionServer, "MAX_CONCORRENCIA", 0), \
+             patch.object(ProductionServer, "MAX_REQUESTS", 1000):
+            opcoes = ProductionServer.opcoes_uvicorn("0.0.0.0", 8000)
+
+        self.assertEqual((opcoes["host"], opcoes["port"], opcoes["workers"]), ("0.0.0.0", 8000, 3))
+        self.assertEqual(opcoes["lifespan"], "on")
+        self.assertIsNone(opcoes["limit_concurrency"])
+        self.assertEqual(opcoes["limit_max_requests"], 1000)
+
+    def test_servidor_invalido(self):
+        with patch.object(ProductionServer, "SERVIDOR", "uwsgi"):
+            with self.assertRaises(ValueError):
+                ProductionServer.iniciar()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+"""
+Testes para o event loop compartilhado do processo.
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import unittest
+
+# Adiciona o diretório 'src' ao PYTHONPATH, como no start_backend
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../src')))
+
+from shared.utils.async_runner import AsyncRunner
+
+
+class TesteAsyncRunner(unittest.TestCase):
+    """Testes do AsyncRunner."""
+
+    def test_corrotinas_rodam_no_mesmo_loop_de_qualquer_thread(self):
+        async def loop_atual():
+            return asyncio.get_running_loop()
+
+        loops = []
+        threads = [threading.Thread(target=lambda: loops.append(AsyncRunner.run(loop_atual()))) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(loops), 3)
+        self.assertTrue(all(loop is AsyncRunner.get_loop() for loop in loops))
+
+    def test_aguardar_de_outro_loop(self):
+        async def dobro(valor):
+            await asyncio.sleep(0)
+            return valor * 2
+
+        async def view():
+            return await asyncio.wrap_future(AsyncRunner.submit(dobro(21)))
+
+        self.assertEqual(asyncio.run(view()), 42)
+
+    def test_excecao_propagada(self):
+        async def falha():
+            raise ValueError("erro")
+
+        with self.assertRaises(ValueError):
+            AsyncRunner.run(falha())
+
+
+if __name__ == '__main__':
+    unittest.main()
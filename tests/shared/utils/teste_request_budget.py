@@ -0,0 +1,116 @@
+"""
+Testes para o orçamento por requisição do pipeline RAG.
+"""
+
+import asyncio
+import os
+import sys
+import unittest
+
+# Adiciona o diretório 'src' ao PYTHONPATH, como no start_backend
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../src')))
+
+from shared.utils.request_budget import RequestBudget, estimate_tokens
+
+
+class TesteRequestBudget(unittest.TestCase):
+    """Testes do RequestBudget."""
+
+    def setUp(self):
+        RequestBudget.reset_stats()
+
+    def tearDown(self):
+        RequestBudget.reset_stats()
+
+    def test_timeout_sem_orcamento_ativo_usa_o_padrao(self):
+        self.assertIsNone(RequestBudget.current())
+        self.assertEqual(RequestBudget.timeout_for(60.0), 60.0)
+        self.assertIsNone(RequestBudget.timeout_for(None))
+
+    def test_timeout_limitado_ao_prazo_restante_com_piso(self):
+        with RequestBudget(tempo_segundos=30).ativar():
+            self.assertLessEqual(RequestBudget.timeout_for(60.0), 30.0)
+            self.assertEqual(RequestBudget.timeout_for(10.0), 10.0)
+        with RequestBudget(tempo_segundos=0).ativar():
+            self.assertEqual(RequestBudget.timeout_for(60.0), RequestBudget.TIMEOUT_MINIMO)
+        self.assertIsNone(RequestBudget.current())
+
+    def test_registro_de_chamadas_segue_o_contexto_em_threads(self):
+        orcamento = RequestBudget()
+
+        async def pipeline():
+            with orcamento.ativar():
+                await asyncio.to_thread(RequestBudget.record_llm_call, 100, 10)
+                RequestBudget.record_llm_call(50, 5)
+
+        asyncio.run(pipeline())
+        consumido = orcamento.to_dict()["consumido"]
+        self.assertEqual((consumido["chamadas_llm"], consumido["tokens_entrada"], consumido["tokens_saida"]), (2, 150, 15))
+
+    def test_pode_verificar_informa_o_motivo(self):
+        self.assertTrue(RequestBudget(tempo_segundos=600).pode_verificar(1000))
+
+        sem_tempo = RequestBudget(tempo_segundos=1)
+        self.assertFalse(sem_tempo.pode_verificar(1000))
+        self.assertEqual(sem_tempo.encerrado_por, "tempo")
+
+        sem_chamadas = RequestBudget(tempo_segundos=600, max_chamadas_llm=2)
+        sem_chamadas.chamadas_llm = 1
+        self.assertFalse(sem_chamadas.pode_verificar(1000))
+        self.assertEqual(sem_chamadas.encerrado_por, "chamadas_llm")
+
+        sem_tokens = RequestBudget(tempo_segundos=600, max_tokens_entrada=500)
+        self.assertFalse(sem_tokens.pode_verificar(1000))
+        self.assertEqual(sem_tokens.encerrado_por, "tokens_entrada")
+
+    def test_reserva_chamadas_da_cascata_e_da_especulacao(self):
+        orcamento = RequestBudget(tempo_segundos=600, max_chamadas_llm=4)
+        self.assertTrue(orcamento.pode_verificar(10, chamadas_verificacao=3))
+        self.assertFalse(orcamento.pode_verificar(10, chamadas_verificacao=3, especulativa=True))
+        self.assertEqual(orcamento.encerrado_por, "chamadas_llm")
+
+        # Especulação com resposta final mais lenta que a verificação: a rodada leva 2x a final
+        RequestBudget.record_stage_cost("resposta_final", 12.0)
+        curto = RequestBudget(tempo_segundos=20)
+        self.assertTrue(curto.pode_verificar(10))
+        self.assertFalse(curto.pode_verificar(10, especulativa=True))
+        self.assertEqual(curto.encerrado_por, "tempo")
+
+    def test_custo_esperado_acompanha_a_media_movel(self):
+        inicial = RequestBudget.expected_stage_cost("verificacao")
+        for _ in range(30):
+            RequestBudget.record_stage_cost("verificacao", 1.0)
+        self.assertLess(RequestBudget.expected_stage_cost("verificacao"), inicial)
+        self.assertAlmostEqual(RequestBudget.expected_stage_cost("verificacao"), 1.0, places=2)
+        # Com verificações mais rápidas, um prazo curto já comporta outra rodada
+        self.assertTrue(RequestBudget(tempo_segundos=15).pode_verificar(10))
+
+    def test_chamada_extra_preserva_a_reserva_da_resposta_final(self):
+        self.assertTrue(RequestBudget.allows_extra_call())
+        with RequestBudget(max_chamadas_llm=4).ativar() as orcamento:
+            self.assertTrue(RequestBudget.allows_extra_call())
+            RequestBudget.record_llm_call(10, 5)
+            RequestBudget.record_llm_call(10, 5)
+            # Restam 2: a chamada em andamento e a resposta final
+            self.assertFalse(RequestBudget.allows_extra_call())
+            self.assertEqual(orcamento.chamadas_llm, 2)
+
+    def test_from_dict_e_estimativa_de_tokens(self):
+        orcamento = RequestBudget.from_dict({"tempo_segundos": 20, "max_chamadas_llm": 4})
+        limites = orcamento.to_dict()["limites"]
+        self.assertEqual(limites["tempo_segundos"], 20.0)
+        self.assertEqual(limites["max_chamadas_llm"], 4)
+        self.assertEqual(limites["max_tokens_entrada"], RequestBudget.TOKENS_ENTRADA_PADRAO)
+        with self.assertRaises(ValueError):
+            RequestBudget.from_dict({"tempo_segundos": "muito"})
+        for invalido in ({"tempo_segundos": 0}, {"max_chamadas_llm": -1}, {"max_tokens_entrada": True}, {"max_chamadas_llm": 0.5},
+                         {"tempo_segundos": float("inf")}, {"max_chamadas_llm": float("inf")}, {"tempo_segundos": float("nan")},
+                         {"max_tokens_entrada": "1e999"}, {"max_tokens_entrada": float("-inf")}):
+            with self.assertRaises(ValueError):
+                RequestBudget.from_dict(invalido)
+        self.assertEqual(estimate_tokens(""), 0)
+        self.assertEqual(estimate_tokens("a" * 400), 100)
+
+
+if __name__ == '__main__':
+    unittest.main()
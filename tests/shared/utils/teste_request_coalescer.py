@@ -0,0 +1,121 @@
+"""
+Testes para o agrupamento de pedidos concorrentes (RequestCoalescer / CoalescingScope).
+"""
+
+import asyncio
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+# Adiciona o diretório 'src' ao PYTHONPATH, como no start_backend
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../src')))
+
+from shared.utils.request_budget import RequestBudget
+from shared.utils.request_coalescer import CoalescingScope, RequestCoalescer
+from shared.utils.tracing import Tracer
+
+
+class TesteRequestCoalescer(unittest.TestCase):
+
+    def test_pedidos_concorrentes_viram_uma_chamada_deduplicada(self):
+        chamadas = []
+
+        async def executar(pedidos):
+            chamadas.append(sorted(pedidos))
+            await asyncio.sleep(0)
+            return {chave: chave.upper() for chave in pedidos}
+
+        async def cenario():
+            coalescer = RequestCoalescer(executar, janela_segundos=0.01)
+            primeiro, segundo = await asyncio.gather(
+                coalescer.get_many({"a": None, "b": None}),
+                coalescer.get_many({"b": None, "c": None}),
+            )
+            # Já resolvida: servida sem nova chamada
+            terceiro = await coalescer.get_many({"a": None})
+            return primeiro, segundo, terceiro, coalescer.get_stats()
+
+        primeiro, segundo, terceiro, stats = asyncio.run(cenario())
+        self.assertEqual(chamadas, [["a", "b", "c"]])
+        self.assertEqual((primeiro, segundo, terceiro), ({"a": "A", "b": "B"}, {"b": "B", "c": "C"}, {"a": "A"}))
+        self.assertEqual((stats["pedidos"], stats["compartilhados"], stats["chamadas"]), (5, 2, 1))
+
+    def test_lotes_limitados_e_falha_nao_lembrada(self):
+        chamadas = []
+
+        async def executar(pedidos):
+            chamadas.append(len(pedidos))
+            if "falha" in pedidos:
+                raise RuntimeError("API indisponível")
+            return {chave: 1 for chave in pedidos if chave != "ausente"}
+
+        async def cenario():
+            coalescer = RequestCoalescer(executar, janela_segundos=0, max_lote=2)
+            valores = await coalescer.get_many({"a": None, "b": None, "ausente": None})
+            with self.assertRaises(RuntimeError):
+                await coalescer.get_many({"falha": None})
+            novamente = await coalescer.get_many({"ausente": None})
+            return valores, novamente
+
+        valores, novamente = asyncio.run(cenario())
+        self.assertEqual(valores, {"a": 1, "b": 1, "ausente": None})
+        self.assertEqual(novamente, {"ausente": None})
+        # 3 chaves em partes de 2, a falha e o novo pedido da chave sem valor
+        self.assertEqual(chamadas, [2, 1, 1, 1])
+
+    def test_lote_em_contexto_limpo_com_o_maior_prazo(self):
+        vistos = []
+
+        async def executar(pedidos):
+            orcamento = RequestBudget.current()
+            vistos.append((Tracer.current_trace(), orcamento.restante_segundos() if orcamento else None))
+            # O consumo do lote não é cobrado do orçamento de quem o disparou
+            RequestBudget.record_llm_call(10, 0)
+            return {chave: 1 for chave in pedidos}
+
+        async def pedir(coalescer, chaves, tempo_segundos):
+            orcamento = RequestBudget(tempo_segundos=tempo_segundos) if tempo_segundos else None
+            with Tracer.trace("requisicao") as trace:
+                if orcamento is None:
+                    await coalescer.get_many(chaves)
+                else:
+                    with orcamento.ativar():
+                        await coalescer.get_many(chaves)
+            return trace, orcamento
+
+        async def cenario():
+            coalescer = RequestCoalescer(executar, janela_segundos=0.01, nome="teste")
+            com_prazo = await asyncio.gather(pedir(coalescer, {"a": None}, 5), pedir(coalescer, {"a": None, "b": None}, 30))
+            sem_prazo = await asyncio.gather(pedir(coalescer, {"c": None}, 5), pedir(coalescer, {"d": None}, None))
+            return com_prazo, sem_prazo
+
+        with patch.object(Tracer, "LOG_FILE", ""):
+            com_prazo, _ = asyncio.run(cenario())
+
+        # O lote não roda no trace do primeiro pedido e usa o maior prazo restante entre os pedidos
+        self.assertIsNone(vistos[0][0])
+        self.assertGreater(vistos[0][1], 29)
+        # Um pedido sem orçamento tira o prazo do lote
+        self.assertEqual(vistos[1], (None, None))
+        for (trace, orcamento), (enviadas, compartilhadas) in zip(com_prazo, [(1, 0), (1, 1)]):
+            span = next(s for s in trace.spans if s.nome == "coalescer.teste")
+            self.assertEqual((span.atributos["enviadas"], span.atributos["compartilhadas"]), (enviadas, compartilhadas))
+            self.assertEqual(orcamento.chamadas_llm, 0)
+
+    def test_escopo_por_contexto(self):
+        async def cenario():
+            escopo = CoalescingScope(janela_segundos=0.02)
+            self.assertIsNone(CoalescingScope.current())
+            with escopo.ativar():
+                self.assertIs(CoalescingScope.current(), escopo)
+                coalescer = escopo.coalescer("x", lambda pedidos: asyncio.sleep(0, {}))
+                self.assertIs(escopo.coalescer("x", None), coalescer)
+                self.assertEqual(coalescer.janela_segundos, 0.02)
+            self.assertIsNone(CoalescingScope.current())
+
+        asyncio.run(cenario())
+
+
+if __name__ == '__main__':
+    unittest.main()
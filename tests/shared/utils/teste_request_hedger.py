@@ -0,0 +1,201 @@
+"""
+Testes para as requisições com hedging (RequestHedger) e o uso no LLMService.
+"""
+
+import asyncio
+import os
+import sys
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+# Adiciona o diretório 'src' ao PYTHONPATH, como no start_backend
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../src')))
+
+from shared.utils.request_hedger import RequestHedger
+from shared.utils.request_budget import RequestBudget
+from infrastructure.external_services.llm_rate_limiter import LLMRateLimiter
+from infrastructure.external_services.llm_service import LLMService
+from config.api.api_config import GeminiConfig
+from shared.utils.async_runner import AsyncRunner
+
+
+def hedger_aquecido(**opcoes):
+    """Hedger com p90 de 20 ms já observado e crédito para uma cópia."""
+    hedger = RequestHedger(percentil=90, fracao_orcamento=1.0, min_amostras=5, atraso_minimo_segundos=0, **opcoes)
+    for _ in range(100):
+        hedger.record_latency("m", 0.02)
+    return hedger
+
+
+class TesteRequestHedger(unittest.TestCase):
+
+    def test_sem_amostras_nao_ha_copia(self):
+        hedger = RequestHedger(min_amostras=5)
+        chamadas = []
+
+        async def fabrica():
+            chamadas.append(1)
+            await asyncio.sleep(0.01)
+            return "ok"
+
+        self.assertEqual(asyncio.run(hedger.run("m", fabrica)), "ok")
+        self.assertEqual(len(chamadas), 1)
+        self.assertIsNone(hedger.limit_for("m"))
+
+    def test_chamada_lenta_ganha_copia_e_a_mais_rapida_vence(self):
+        hedger = hedger_aquecido()
+        duracoes = [1.0, 0.01]
+        canceladas = []
+
+        async def fabrica():
+            duracao = duracoes.pop(0)
+            try:
+                await asyncio.sleep(duracao)
+            except asyncio.CancelledError:
+                canceladas.append(duracao)
+                raise
+            return duracao
+
+        async def cenario():
+            resultado = await hedger.run("m", fabrica)
+            await asyncio.sleep(0)
+            return resultado
+
+        self.assertEqual(asyncio.run(cenario()), 0.01)
+        self.assertEqual(canceladas, [1.0])
+        stats = hedger.get_stats()["chaves"]["m"]
+        self.assertEqual((stats["chamadas"], stats["copias"], stats["copias_vencedoras"]), (1, 1, 1))
+
+    def test_orcamento_limita_as_copias(self):
+        hedger = hedger_aquecido()
+        hedger.fracao_orcamento = 0.5
+        chamadas = []
+
+        async def fabrica():
+            chamadas.append(1)
+            await asyncio.sleep(0.05)
+            return "ok"
+
+        async def cenario():
+            for _ in range(4):
+                await hedger.run("m", fabrica)
+
+        asyncio.run(cenario())
+        stats = hedger.get_stats()["chaves"]["m"]
+        # Crédito 0.5 por chamada: cópias na 2ª e na 4ª
+        self.assertEqual((stats["copias"], stats["negadas_orcamento"]), (2, 2))
+        self.assertEqual(len(chamadas), 6)
+
+    def test_chamador_veta_a_copia_e_e_avisado_do_descarte(self):
+        async def lenta():
+            await asyncio.sleep(0.05)
+            return "ok"
+
+        hedger = hedger_aquecido()
+        self.assertEqual(asyncio.run(hedger.run("m", lenta, pode_copiar=lambda: False)), "ok")
+        stats = hedger.get_stats()["chaves"]["m"]
+        self.assertEqual((stats["copias"], stats["negadas_chamador"]), (0, 1))
+
+        descartadas = []
+        self.assertEqual(asyncio.run(hedger_aquecido().run("m", lenta, ao_descartar=lambda: descartadas.append(1))), "ok")
+        self.assertEqual(descartadas, [1])
+
+    def test_falha_de_uma_tentativa_espera_a_outra(self):
+        hedger = hedger_aquecido()
+        comportamentos = ["falha_lenta", "ok"]
+
+        async def fabrica():
+            comportamento = comportamentos.pop(0)
+            await asyncio.sleep(0.05 if comportamento == "falha_lenta" else 0.1)
+            if comportamento == "falha_lenta":
+                raise RuntimeError("falhou")
+            return comportamento
+
+        self.assertEqual(asyncio.run(hedger.run("m", fabrica)), "ok")
+
+        async def sempre_falha():
+            await asyncio.sleep(0.05)
+            raise RuntimeError("indisponível")
+
+        with self.assertRaises(RuntimeError):
+            asyncio.run(hedger_aquecido().run("m", sempre_falha))
+
+    def test_llm_service_usa_hedging_quando_habilitado(self):
+        hedger = hedger_aquecido()
+        hedger._latencias["gemini-2.0-flash:verificacao"] = hedger._latencias.pop("m")
+
+        async def gerar(prompt, request_options=None):
+            # Primeira chamada travada; a cópia responde logo
+            if gerar.chamadas == 0:
+                gerar.chamadas += 1
+                await asyncio.sleep(5)
+            return MagicMock(text="2002", usage_metadata=None)
+        gerar.chamadas = 0
+
+        modelo = MagicMock()
+        modelo.generate_content_async = AsyncMock(side_effect=gerar)
+        cliente = MagicMock()
+        cliente.GenerativeModel.return_value = modelo
+        with patch.object(LLMService, "HEDGING_ENABLED", True), patch.object(LLMService, "_hedger", hedger), \
+             patch.object(LLMService, "_CACHE_ENABLED", False), patch.object(GeminiConfig, "get_client", return_value=cliente):
+            texto = AsyncRunner.run(LLMService.processar_prompt_async("verifique", etapa="verificacao"), timeout=2)
+
+        self.assertEqual(texto, "2002")
+        self.assertEqual(modelo.generate_content_async.await_count, 2)
+        self.assertEqual(hedger.get_stats()["chaves"]["gemini-2.0-flash:verificacao"]["copias_vencedoras"], 1)
+
+
+class TesteHedgingLLMService(unittest.TestCase):
+
+    def setUp(self):
+        self.hedger = hedger_aquecido()
+        self.hedger._latencias["gemini-2.0-flash:verificacao"] = self.hedger._latencias.pop("m")
+        self.limitador = LLMRateLimiter({"gemini-2.0-flash": (0, 0)})
+        LLMService.set_rate_limiter(self.limitador)
+
+    def tearDown(self):
+        LLMService.set_rate_limiter(None)
+
+    def gerar(self, modelo, prompt):
+        with patch.object(LLMService, "HEDGING_ENABLED", True), patch.object(LLMService, "_hedger", self.hedger), \
+             patch.object(LLMService, "_CACHE_ENABLED", False), patch.object(GeminiConfig, "get_client", return_value=MagicMock(GenerativeModel=MagicMock(return_value=modelo))):
+            orcamento = RequestBudget()
+
+            async def chamar():
+                with orcamento.ativar():
+                    return await LLMService.processar_prompt_async(prompt, etapa="verificacao")
+
+            return AsyncRunner.run(chamar(), timeout=5), orcamento
+
+    def test_copia_descartada_e_cobrada_e_espera_na_fila_fora_da_latencia(self):
+        async def gerar(prompt, request_options=None):
+            await asyncio.sleep(0.1)
+            return MagicMock(text="2002", usage_metadata=None)
+
+        modelo = MagicMock(generate_content_async=AsyncMock(side_effect=gerar))
+        # 0.3s de pausa no limite de taxa: não entra na latência nem dispara a cópia antes da vez
+        self.limitador.record_quota_error("gemini-2.0-flash", 0.3)
+        texto, orcamento = self.gerar(modelo, "verifique")
+
+        self.assertEqual(texto, "2002")
+        self.assertEqual(modelo.generate_content_async.await_count, 2)
+        # A resposta e a tentativa descartada
+        self.assertEqual(orcamento.chamadas_llm, 2)
+        self.assertLess(max(self.hedger._latencias["gemini-2.0-flash:verificacao"]), 0.25)
+
+    def test_sem_copia_com_fila_no_limite_de_taxa(self):
+        async def gerar(prompt, request_options=None):
+            # Outro chamador entra na fila do modelo enquanto esta chamada está em andamento
+            self.limitador._contadores("gemini-2.0-flash")["fila"] += 1
+            await asyncio.sleep(0.1)
+            return MagicMock(text="2002", usage_metadata=None)
+
+        modelo = MagicMock(generate_content_async=AsyncMock(side_effect=gerar))
+        texto, orcamento = self.gerar(modelo, "verifique")
+
+        self.assertEqual((texto, modelo.generate_content_async.await_count, orcamento.chamadas_llm), ("2002", 1, 1))
+        self.assertEqual(self.hedger.get_stats()["chaves"]["gemini-2.0-flash:verificacao"]["negadas_chamador"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+"""
+Testes para o parser de chunks e o formato compacto usado nos prompts.
+"""
+
+import os
+import sys
+import unittest
+
+# Adiciona o diretório 'src' ao PYTHONPATH, como no start_backend
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../src')))
+
+from shared.utils.schema_chunk_parser import parse_chunk
+from shared.utils.schema_chunk_serializer import compact_schema
+from shared.utils.request_budget import estimate_tokens
+
+CHUNK = (
+    "el_cpe_ex;ct_liquidacao;Liquidações de empenho;id;id_empenho;id_documento;vl_liquidacao;"
+    "PK:id;FK:id_empenho>el_cpe_ex.ct_empenho(id)[DIR:OUTGOING];FK:id_documento>el_cpe_base.ct_documento(id)[DIR:OUTGOING];"
+    "FK:id<el_cpe_ex.ct_pagamento(id_liquidacao)[DIR:INCOMING];FK:id<el_cpe_ex.ct_retencao(id_liquidacao)[DIR:INCOMING];"
+    "IDX:ix_liquidacao_empenho(id_empenho)"
+)
+
+
+class TesteSchemaChunkSerializer(unittest.TestCase):
+
+    def test_parse_chunk(self):
+        chunk = parse_chunk(CHUNK)
+        self.assertEqual((chunk.schema, chunk.tabela, chunk.descricao), ("el_cpe_ex", "ct_liquidacao", "Liquidações de empenho"))
+        self.assertEqual(chunk.colunas, ["id", "id_empenho", "id_documento", "vl_liquidacao"])
+        self.assertEqual(chunk.chave_primaria, ["id"])
+        self.assertEqual([fk.direcao for fk in chunk.foreign_keys], ["OUTGOING", "OUTGOING", "INCOMING", "INCOMING"])
+        self.assertEqual(chunk.indices, ["ix_liquidacao_empenho(id_empenho)"])
+        self.assertIsNone(parse_chunk("sem formato"))
+
+    def test_formato_compacto(self):
+        self.assertEqual(compact_schema(CHUNK, anotacao="(92%)"), (
+            "el_cpe_ex.ct_liquidacao (92%): Liquidações de empenho\n"
+            "colunas: id,id_empenho,id_documento,vl_liquidacao\n"
+            "pk: id\n"
+            # Mesmo schema perde o prefixo; outro schema mantém
+            "fk: id_empenho>ct_empenho.id id_documento>el_cpe_base.ct_documento.id\n"
+            # FKs de entrada agrupadas pela coluna referenciada
+            "ref: id<ct_pagamento.id_liquidacao,ct_retencao.id_liquidacao\n"
+            "idx: ix_liquidacao_empenho(id_empenho)\n"
+        ))
+        self.assertLess(estimate_tokens(compact_schema(CHUNK)), estimate_tokens(CHUNK))
+
+    def test_chunk_fora_do_formato_e_mantido(self):
+        self.assertEqual(compact_schema("texto livre"), "texto livre")
+
+
+if __name__ == '__main__':
+    unittest.main()
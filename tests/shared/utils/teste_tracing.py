@@ -0,0 +1,119 @@
+"""
+Testes para os spans de latência (Tracer).
+"""
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+
+# Adiciona o diretório 'src' ao PYTHONPATH, como no start_backend
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../src')))
+
+from shared.utils.tracing import Tracer
+
+
+class TesteTracer(unittest.TestCase):
+    """Testes do Tracer."""
+
+    def setUp(self):
+        self.diretorio = tempfile.TemporaryDirectory()
+        self.arquivo = os.path.join(self.diretorio.name, "trace.jsonl")
+        self.patch_arquivo = patch.object(Tracer, "LOG_FILE", self.arquivo)
+        self.patch_arquivo.start()
+
+    def tearDown(self):
+        Tracer.flush()
+        self.patch_arquivo.stop()
+        self.diretorio.cleanup()
+
+    def test_span_fora_de_trace_nao_registra(self):
+        with Tracer.span("solto", a=1) as span:
+            span.set(b=2)
+        self.assertIsNone(Tracer.current_trace())
+        self.assertFalse(os.path.exists(self.arquivo))
+
+    def test_hierarquia_e_atributos_de_contexto(self):
+        with Tracer.trace("raiz") as trace:
+            Tracer.set_context(iteracao=2)
+            with Tracer.span("filho", nivel_modelo="medio") as filho:
+                with Tracer.span("neto") as neto:
+                    neto.set(caracteres=10)
+
+        spans = {s["nome"]: s for s in trace.resumo()["spans"]}
+        self.assertIsNone(spans["raiz"]["parent_id"])
+        self.assertEqual(spans["filho"]["parent_id"], spans["raiz"]["span_id"])
+        self.assertEqual(spans["neto"]["parent_id"], filho.span_id)
+        self.assertEqual(spans["neto"]["atributos"], {"iteracao": 2, "caracteres": 10})
+        self.assertNotIn("iteracao", spans["raiz"]["atributos"])
+
+    def test_propagacao_por_gather_e_to_thread(self):
+        def trabalho_bloqueante():
+            with Tracer.span("thread"):
+                pass
+
+        async def tarefa(i):
+            with Tracer.span("tarefa", i=i):
+                await asyncio.sleep(0)
+
+        async def pipeline():
+            with Tracer.trace("raiz") as trace:
+                await asyncio.gather(tarefa(0), tarefa(1), asyncio.to_thread(trabalho_bloqueante))
+            return trace
+
+        resumo = asyncio.run(pipeline()).resumo()
+        raiz = next(s for s in resumo["spans"] if s["nome"] == "raiz")
+        filhos = [s for s in resumo["spans"] if s["parent_id"] == raiz["span_id"]]
+        self.assertEqual(sorted(s["nome"] for s in filhos), ["tarefa", "tarefa", "thread"])
+        self.assertEqual(set(resumo["por_etapa"]), {"raiz", "tarefa", "thread"})
+
+    def test_excecao_marca_o_span_e_propaga(self):
+        with self.assertRaises(ValueError):
+            with Tracer.trace("raiz") as trace:
+                with Tracer.span("falha"):
+                    raise ValueError("x")
+        spans = {s["nome"]: s for s in trace.resumo()["spans"]}
+        self.assertEqual(spans["falha"]["erro"], "ValueError: x")
+
+    def test_exporta_uma_linha_otlp_por_trace(self):
+        with Tracer.trace("raiz", caracteres_prompt=5) as trace:
+            with Tracer.span("filho", modelo="m", taxa=0.5, ok=True):
+                pass
+
+        self.assertTrue(Tracer.flush())
+        with open(self.arquivo, encoding="utf-8") as f:
+            linhas = f.read().splitlines()
+        self.assertEqual(len(linhas), 1)
+        spans = json.loads(linhas[0])["resourceSpans"][0]["scopeSpans"][0]["spans"]
+        self.assertEqual({s["traceId"] for s in spans}, {trace.trace_id})
+        filho = next(s for s in spans if s["name"] == "filho")
+        self.assertEqual(filho["parentSpanId"], next(s for s in spans if s["name"] == "raiz")["spanId"])
+        self.assertGreaterEqual(int(filho["endTimeUnixNano"]), int(filho["startTimeUnixNano"]))
+        self.assertIn({"key": "ok", "value": {"boolValue": True}}, filho["attributes"])
+
+    def test_gravacao_fora_da_thread_do_trace(self):
+        threads_gravacao = []
+        abrir = open
+
+        def abrir_registrando(*args, **kwargs):
+            threads_gravacao.append(threading.current_thread().name)
+            return abrir(*args, **kwargs)
+
+        with patch("builtins.open", side_effect=abrir_registrando):
+            for _ in range(3):
+                with Tracer.trace("raiz"):
+                    pass
+            self.assertTrue(Tracer.flush())
+
+        self.assertTrue(threads_gravacao)
+        self.assertNotIn(threading.current_thread().name, threads_gravacao)
+        with abrir(self.arquivo, encoding="utf-8") as f:
+            self.assertEqual(len(f.read().splitlines()), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()